@@ -4,12 +4,12 @@ User models for Smart Lib
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
-from apps.core.models import BaseModel, TimeStampedModel
+from apps.core.models import BaseModel, TimeStampedModel, DirtyFieldsMixin
 from apps.core.utils import generate_unique_code, hash_sensitive_data
 import uuid
 
 
-class User(AbstractUser):
+class User(DirtyFieldsMixin, AbstractUser):
     """
     Custom User model for Smart Lib
     """
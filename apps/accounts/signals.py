@@ -62,22 +62,17 @@ def log_user_logout(sender, request, user, **kwargs):
 @receiver(pre_save, sender=User)
 def track_user_approval(sender, instance, **kwargs):
     """Track when user gets approved"""
-    if instance.pk:
-        try:
-            old_instance = User.objects.get(pk=instance.pk)
-            if not old_instance.is_approved and instance.is_approved:
-                # User was just approved
-                ActivityLog.objects.create(
-                    user=instance,
-                    activity_type='PROFILE_UPDATE',
-                    description='User account approved',
-                    metadata={
-                        'approved_by': instance.approved_by.full_name if instance.approved_by else 'System',
-                        'approval_date': instance.approval_date.isoformat() if instance.approval_date else None,
-                    }
-                )
-        except User.DoesNotExist:
-            pass
+    if not instance._state.adding and not instance.previous_value('is_approved') and instance.is_approved:
+        # User was just approved
+        ActivityLog.objects.create(
+            user=instance,
+            activity_type='PROFILE_UPDATE',
+            description='User account approved',
+            metadata={
+                'approved_by': instance.approved_by.full_name if instance.approved_by else 'System',
+                'approval_date': instance.approval_date.isoformat() if instance.approval_date else None,
+            }
+        )
 
 
 @receiver(post_save, sender=UserLibraryAccess)
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
+from apps.dashboard.summary import invalidate_user_summaries
 from .models import (
     BookCategory, Author, Publisher, Book, BookReservation,
     BookDigitalAccess, BookReview, BookWishlist, BookReadingList,
@@ -271,7 +272,9 @@ class BookReservationAdmin(admin.ModelAdmin):
     actions = ['mark_returned', 'send_reminders', 'mark_overdue']
     
     def mark_returned(self, request, queryset):
-        updated = queryset.filter(status='CHECKED_OUT').update(
+        reservations = queryset.filter(status='CHECKED_OUT')
+        invalidate_user_summaries(reservations.values_list('user_id', flat=True), ['book_reservations'])
+        updated = reservations.update(
             status='RETURNED',
             return_date=timezone.now()
         )
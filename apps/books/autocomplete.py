@@ -0,0 +1,490 @@
+"""
+Typo-tolerant autocomplete for the search box
+
+Book titles, author names and category names are held in an index in each
+process. Entries are split into normalised word tokens (lower case, accents
+removed). The distinct tokens are kept in one sorted array, and the entries of
+each token are stored contiguously, so every entry under a prefix is found with
+two binary searches and one slice. Entries are numbered by descending weight
+(reservations and views), so the first matches are the top suggestions. Terms
+with too few prefix matches are widened through a trigram index to tokens
+within one or two typos.
+
+A process loads the index from a snapshot file when one is configured, or
+builds it from the database on first use. Saves of books, authors and
+categories are appended to a change log in the cache; each process replays the
+log on its next lookup, keeping changed entries in a small overlay until they
+are folded into the arrays.
+"""
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q, Sum
+
+logger = logging.getLogger(__name__)
+
+SUGGESTION_LIMIT = 10
+MAX_QUERY_TERMS = 6
+RESERVATION_WEIGHT = 2.0
+VIEW_WEIGHT = 1.0
+# Terms shorter than this are matched as prefixes only
+FUZZY_MIN_LENGTH = 3
+FUZZY_CANDIDATES = 64
+# Changed entries kept beside the arrays before they are rebuilt
+OVERLAY_LIMIT = 500
+MAX_REPLAY = 1000
+CHANGE_LOG_TIMEOUT = 24 * 60 * 60
+CHANGE_VERSION_KEY = 'books:autocomplete:version'
+SNAPSHOT_CHECK_SECONDS = 60
+# Without a snapshot, weights are refreshed by rebuilding this often
+INDEX_MAX_AGE_SECONDS = 6 * 60 * 60
+
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+
+def normalise(text):
+    """Lower-case text with accents removed"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def tokenize(text):
+    """Normalised word tokens of a text"""
+    return TOKEN_PATTERN.findall(normalise(text))
+
+
+def _trigrams(token):
+    # Padded at the start only, since terms are compared with token prefixes
+    padded = f'  {token}'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_typos(term):
+    """Edits allowed between a term and a token prefix"""
+    if len(term) < FUZZY_MIN_LENGTH:
+        return 0
+    return 1 if len(term) < 6 else 2
+
+
+def prefix_distance(term, token, limit=None):
+    """
+    Fewest edits (with transpositions) turning a term into any prefix of a token
+
+    With a ``limit``, stops early and returns ``limit + 1`` once it is exceeded.
+    """
+    if limit is not None:
+        # Prefixes longer than this are already too far away
+        token = token[:len(term) + limit]
+    previous_previous = None
+    previous = list(range(len(token) + 1))
+    for i, term_char in enumerate(term, start=1):
+        current = [i] + [0] * len(token)
+        for j, token_char in enumerate(token, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (term_char != token_char)
+            )
+            if (
+                previous_previous is not None and j > 1
+                and term_char == token[j - 2] and term[i - 2] == token_char
+            ):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return min(previous)
+
+
+def _weight(reservations, views):
+    return round(
+        RESERVATION_WEIGHT * math.log1p(reservations or 0) + VIEW_WEIGHT * math.log1p(views or 0), 4
+    )
+
+
+def _entry(kind, entry_id, label, text, weight):
+    return {'type': kind, 'id': str(entry_id), 'label': label, 'text': text, 'weight': weight}
+
+
+def _book_entries(ids=None):
+    from .models import Book
+
+    books = Book.objects.filter(is_deleted=False)
+    if ids is not None:
+        books = books.filter(id__in=ids)
+    for book_id, title, subtitle, reservations, views in books.values_list(
+        'id', 'title', 'subtitle', 'total_reservations', 'view_count'
+    ):
+        yield _entry('book', book_id, title, f'{title} {subtitle}', _weight(reservations, views))
+
+
+def _popularity(relation):
+    books = Q(**{f'{relation}__is_deleted': False})
+    return {
+        'reservations': Sum(f'{relation}__total_reservations', filter=books),
+        'views': Sum(f'{relation}__view_count', filter=books),
+    }
+
+
+def _author_entries(ids=None):
+    from .models import Author
+
+    authors = Author.objects.filter(is_deleted=False)
+    if ids is not None:
+        authors = authors.filter(id__in=ids)
+    for author in authors.annotate(**_popularity('books')):
+        yield _entry(
+            'author', author.id, author.full_name, author.full_name,
+            _weight(author.reservations, author.views)
+        )
+
+
+def _category_entries(ids=None):
+    from .models import BookCategory
+
+    categories = BookCategory.objects.filter(is_active=True, is_deleted=False)
+    if ids is not None:
+        categories = categories.filter(id__in=ids)
+    for category in categories.annotate(**_popularity('books')):
+        yield _entry(
+            'category', category.id, category.name, category.name,
+            _weight(category.reservations, category.views)
+        )
+
+
+ENTRY_LOADERS = {
+    'book': _book_entries,
+    'author': _author_entries,
+    'category': _category_entries,
+}
+
+
+class AutocompleteIndex:
+    """
+    Prefix and trigram index over weighted suggestion entries
+
+    Entries are dicts with type, id, label, the text they are matched on and a
+    weight. Changed entries live in ``overlay`` and the array copies they
+    replace are masked out in ``removed``.
+    """
+
+    def __init__(self, entries, version=0):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.entries = sorted(entries, key=lambda entry: (-entry['weight'], entry['label']))
+        self.positions = {
+            (entry['type'], entry['id']): position for position, entry in enumerate(self.entries)
+        }
+        self.removed = np.zeros(len(self.entries), dtype=bool)
+        self.overlay = {}
+
+        postings = defaultdict(list)
+        for position, entry in enumerate(self.entries):
+            for token in set(tokenize(entry['text'])):
+                postings[token].append(position)
+        self.tokens = sorted(postings)
+        offsets = np.zeros(len(self.tokens) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[token]) for token in self.tokens])
+        self.offsets = offsets
+        self.postings = np.fromiter(
+            (position for token in self.tokens for position in postings[token]),
+            dtype=np.int32, count=int(offsets[-1])
+        )
+
+        trigrams = defaultdict(list)
+        for token_index, token in enumerate(self.tokens):
+            for trigram in _trigrams(token):
+                trigrams[trigram].append(token_index)
+        self.trigrams = {trigram: np.array(indexes, dtype=np.int32) for trigram, indexes in trigrams.items()}
+
+    def __len__(self):
+        return len(self.entries) - int(self.removed.sum()) + len(self.overlay)
+
+    def current_entries(self):
+        """Every live entry, from the arrays and the overlay"""
+        return [
+            entry for position, entry in enumerate(self.entries) if not self.removed[position]
+        ] + list(self.overlay.values())
+
+    def apply(self, kind, ids, entries):
+        """
+        Replace the entries of one type with fresh ones
+
+        Args:
+            ids: Ids that changed; those missing from ``entries`` are dropped
+            entries: Current entries for some of those ids
+
+        Returns:
+            AutocompleteIndex: This index, or a rebuilt one once the overlay is full
+        """
+        fresh = {entry['id']: entry for entry in entries}
+        for entry_id in ids:
+            key = (kind, str(entry_id))
+            position = self.positions.get(key)
+            if position is not None:
+                self.removed[position] = True
+            entry = fresh.get(str(entry_id))
+            if entry is None:
+                self.overlay.pop(key, None)
+            else:
+                self.overlay[key] = dict(entry, tokens=set(tokenize(entry['text'])))
+
+        if len(self.overlay) > OVERLAY_LIMIT:
+            return AutocompleteIndex(
+                [{key: value for key, value in entry.items() if key != 'tokens'} for entry in self.current_entries()],
+                self.version
+            )
+        return self
+
+    def _fuzzy_tokens(self, term):
+        """Indexes of tokens with a prefix within ``max_typos`` of a term"""
+        typos = max_typos(term)
+        grams = [self.trigrams[trigram] for trigram in _trigrams(term) if trigram in self.trigrams]
+        if not typos or not grams:
+            return []
+        shared = np.bincount(np.concatenate(grams), minlength=len(self.tokens))
+        # Each edit changes at most three trigrams
+        candidates = np.flatnonzero(shared >= max(1, len(_trigrams(term)) - 3 * typos))
+        if len(candidates) > FUZZY_CANDIDATES:
+            candidates = candidates[np.argpartition(-shared[candidates], FUZZY_CANDIDATES)[:FUZZY_CANDIDATES]]
+        return [
+            index for index in candidates.tolist()
+            if prefix_distance(term, self.tokens[index], typos) <= typos
+        ]
+
+    def _term_mask(self, term, fuzzy):
+        mask = np.zeros(len(self.entries), dtype=bool)
+        low = bisect_left(self.tokens, term)
+        high = bisect_left(self.tokens, term + '\U0010ffff')
+        mask[self.postings[self.offsets[low]:self.offsets[high]]] = True
+        if fuzzy:
+            for index in self._fuzzy_tokens(term):
+                mask[self.postings[self.offsets[index]:self.offsets[index + 1]]] = True
+        return mask
+
+    def _overlay_matches(self, terms, fuzzy):
+        def matches(term, tokens):
+            return any(
+                token.startswith(term) or (fuzzy and prefix_distance(term, token, max_typos(term)) <= max_typos(term))
+                for token in tokens
+            )
+        return [
+            entry for entry in self.overlay.values()
+            if all(matches(term, entry['tokens']) for term in terms)
+        ]
+
+    def _match(self, terms, limit, fuzzy):
+        mask = ~self.removed
+        for term in terms:
+            mask &= self._term_mask(term, fuzzy)
+        # Positions follow descending weight, so the first hits are the best
+        hits = [self.entries[position] for position in np.flatnonzero(mask)[:limit].tolist()]
+        if self.overlay:
+            hits = sorted(
+                hits + self._overlay_matches(terms, fuzzy),
+                key=lambda entry: (-entry['weight'], entry['label'])
+            )[:limit]
+        return hits
+
+    def suggest(self, query, limit=SUGGESTION_LIMIT):
+        """
+        Top suggestions for what has been typed so far
+
+        Every term must match the start of a word of the entry. When there are
+        fewer than ``limit`` such entries, entries matching within a typo or
+        two follow them.
+
+        Returns:
+            list: Dicts with type, id, label and score, best first
+        """
+        terms = tokenize(query)[:MAX_QUERY_TERMS]
+        if not terms or limit < 1:
+            return []
+
+        hits = self._match(terms, limit, fuzzy=False)
+        if len(hits) < limit and any(max_typos(term) for term in terms):
+            seen = {(entry['type'], entry['id']) for entry in hits}
+            hits += [
+                entry for entry in self._match(terms, limit, fuzzy=True)
+                if (entry['type'], entry['id']) not in seen
+            ][:limit - len(hits)]
+
+        return [
+            {'type': entry['type'], 'id': entry['id'], 'label': entry['label'], 'score': entry['weight']}
+            for entry in hits
+        ]
+
+
+def build_autocomplete_index():
+    """Build the index from the database, at the current change log version"""
+    version = _change_log_version()
+    entries = [entry for loader in ENTRY_LOADERS.values() for entry in loader()]
+    return AutocompleteIndex(entries, version)
+
+
+def snapshot_path():
+    """Configured snapshot file, or None"""
+    return getattr(settings, 'SMART_LIB_SETTINGS', {}).get('BOOK_AUTOCOMPLETE_SNAPSHOT') or None
+
+
+def write_autocomplete_snapshot(path=None):
+    """
+    Build the index entries from the database and write them to the snapshot file
+
+    The file is replaced atomically, so processes never read a partial one.
+
+    Returns:
+        int: Number of entries written, or None if no snapshot is configured
+    """
+    path = path or snapshot_path()
+    if not path:
+        return None
+
+    index = build_autocomplete_index()
+    directory = os.path.dirname(os.fspath(path)) or '.'
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', dir=directory, delete=False, encoding='utf-8') as snapshot:
+        json.dump({'version': index.version, 'entries': index.entries}, snapshot)
+    os.replace(snapshot.name, path)
+    return len(index.entries)
+
+
+def load_autocomplete_snapshot(path=None):
+    """Index from the snapshot file, or None if there is no readable snapshot"""
+    path = path or snapshot_path()
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding='utf-8') as snapshot:
+            data = json.load(snapshot)
+        return AutocompleteIndex(data['entries'], data['version'])
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring unreadable autocomplete snapshot {path}: {e}")
+        return None
+
+
+def _change_key(version):
+    return f'{CHANGE_VERSION_KEY}:{version}'
+
+
+def _change_log_version():
+    return cache.get(CHANGE_VERSION_KEY) or 0
+
+
+def record_autocomplete_changes(kind, ids):
+    """Append changed entries of one type to the change log once the transaction commits"""
+    ids = [str(entry_id) for entry_id in ids]
+    if not ids:
+        return
+
+    def record():
+        cache.add(CHANGE_VERSION_KEY, 0, None)
+        version = cache.incr(CHANGE_VERSION_KEY)
+        cache.set(_change_key(version), (kind, ids), CHANGE_LOG_TIMEOUT)
+
+    transaction.on_commit(record)
+
+
+def _replay(index, version):
+    """
+    Bring an index up to a change log version
+
+    Changed entries are reloaded with one query per type. An index too far
+    behind, or one whose changes have expired, is rebuilt instead.
+    """
+    if version - index.version > MAX_REPLAY:
+        return build_autocomplete_index()
+
+    versions = range(index.version + 1, version + 1)
+    changes = cache.get_many([_change_key(number) for number in versions])
+    changed = defaultdict(set)
+    for number in versions:
+        change = changes.get(_change_key(number))
+        if change is None:
+            if number == version:
+                # Counted but not written yet; pick it up on the next lookup
+                version = number - 1
+                break
+            return build_autocomplete_index()
+        kind, ids = change
+        changed[kind].update(ids)
+
+    for kind, ids in changed.items():
+        index = index.apply(kind, ids, ENTRY_LOADERS[kind](ids))
+    index.version = version
+    return index
+
+
+class _State:
+    index = None
+    snapshot_mtime = None
+    snapshot_checked_at = 0.0
+
+
+_state = _State()
+_lock = threading.Lock()
+
+
+def _snapshot_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _load():
+    path = snapshot_path()
+    if path:
+        _state.snapshot_mtime = _snapshot_mtime(path)
+        _state.snapshot_checked_at = time.monotonic()
+    return load_autocomplete_snapshot(path) or build_autocomplete_index()
+
+
+def _is_stale(index):
+    path = snapshot_path()
+    if not path:
+        return time.monotonic() - index.built_at > INDEX_MAX_AGE_SECONDS
+    if time.monotonic() - _state.snapshot_checked_at < SNAPSHOT_CHECK_SECONDS:
+        return False
+    _state.snapshot_checked_at = time.monotonic()
+    mtime = _snapshot_mtime(path)
+    return mtime is not None and mtime != _state.snapshot_mtime
+
+
+def get_autocomplete_index():
+    """This process's index, loaded on first use and brought up to date with the change log"""
+    version = _change_log_version()
+    with _lock:
+        index = _state.index
+        if index is None or _is_stale(index):
+            index = _load()
+        if version < index.version:
+            # The change log was lost, so changes since may be missing too
+            index = build_autocomplete_index()
+        elif version > index.version:
+            index = _replay(index, version)
+        _state.index = index
+        return index
+
+
+def reset_autocomplete_index():
+    """Drop this process's index so the next lookup loads it again"""
+    with _lock:
+        _state.index = None
+
+
+def suggest(query, limit=SUGGESTION_LIMIT):
+    """Top autocomplete suggestions for a query"""
+    return get_autocomplete_index().suggest(query, limit)
@@ -0,0 +1,83 @@
+"""
+Category tree helpers
+
+Every category stores a materialised path: the hex ids of its ancestors and
+itself, each followed by a slash. A subtree is one indexed prefix query on
+``path``, and the ancestors of a category are read from its own path without
+touching the database. Book counts per category, each including the books of
+its subcategories, are rolled up from one grouped query and cached until a
+book or category change drops them.
+"""
+import uuid
+from collections import Counter
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+CATEGORY_COUNTS_KEY = 'books:category_book_counts'
+CATEGORY_COUNTS_TIMEOUT = 60 * 60
+
+
+def category_path(parent_path, category_id):
+    """Materialised path of a category under a parent path ('' for a root)"""
+    return f"{parent_path}{category_id.hex}/"
+
+
+def path_ids(path):
+    """Category ids along a path, root first"""
+    return [uuid.UUID(segment) for segment in path.split('/') if segment]
+
+
+def live_descendants(path, descendants):
+    """
+    Descendants not hidden by a deleted category between them and the root of the subtree
+
+    Args:
+        path: Path of the subtree root
+        descendants: (id, path, is_deleted) rows under that path
+    """
+    deleted = {category_id.hex for category_id, _, is_deleted in descendants if is_deleted}
+    return [
+        category_id for category_id, descendant_path, _ in descendants
+        if not deleted.intersection(descendant_path[len(path):].split('/'))
+    ]
+
+
+def compute_category_book_counts():
+    """
+    Books per category including every live subcategory, with two queries
+
+    Returns:
+        dict: Category id (as a string) to its book count
+    """
+    from .models import Book, BookCategory
+
+    categories = list(BookCategory.objects.values_list('id', 'path', 'is_deleted'))
+    deleted = {category_id for category_id, _, is_deleted in categories if is_deleted}
+    paths = {category_id: path for category_id, path, _ in categories}
+    direct = Book.objects.filter(is_deleted=False).order_by().values('category_id').annotate(
+        count=Count('id')
+    ).values_list('category_id', 'count')
+
+    totals = Counter({str(category_id): 0 for category_id in paths})
+    for category_id, count in direct:
+        # Up the path until a deleted category cuts the subtree off
+        for ancestor_id in reversed(path_ids(paths.get(category_id, ''))):
+            totals[str(ancestor_id)] += count
+            if ancestor_id in deleted:
+                break
+    return dict(totals)
+
+
+def get_category_book_counts():
+    """Cached book counts per category, computed on first use"""
+    counts = cache.get(CATEGORY_COUNTS_KEY)
+    if counts is None:
+        counts = compute_category_book_counts()
+        cache.set(CATEGORY_COUNTS_KEY, counts, CATEGORY_COUNTS_TIMEOUT)
+    return counts
+
+
+def invalidate_category_book_counts():
+    """Drop the cached counts once the current transaction commits"""
+    transaction.on_commit(lambda: cache.delete(CATEGORY_COUNTS_KEY))
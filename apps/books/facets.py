@@ -0,0 +1,119 @@
+"""
+Facet counts for book search
+
+Next to a page of search results, the catalogue filters show how many of the
+matching books fall under each category, language, book type, publisher,
+availability and publication year. All of them come from one grouped query
+over the result set: books are grouped by every facet column at once and the
+groups are folded into per-facet counts in Python, so the cost does not grow
+with the number of facets or facet values. Counts are cached briefly under a
+key built from the normalised search parameters and the libraries in scope.
+"""
+import hashlib
+import json
+from collections import Counter
+from django.core.cache import cache
+from django.db.models import BooleanField, Case, Count, Q, Value, When
+from django.db.models.functions import ExtractYear
+from apps.core.utils import SmartLibCache
+from .search import query_terms
+
+FACET_CACHE_TIMEOUT = 60
+FACET_VALUE_LIMIT = 50
+# Search parameters that change the page or its order but not the matching books
+PAGE_PARAMS = {'page', 'page_size', 'sort_by', 'facets'}
+AVAILABLE_BOOKS = Q(book_type='PHYSICAL', available_copies__gt=0) | Q(book_type='DIGITAL') | Q(book_type='BOTH')
+
+
+def facet_cache_key(params, library_scope):
+    """
+    Cache key for the facets of a search
+
+    Args:
+        params: Validated search parameters
+        library_scope: Library ids the user may see, or None for every library
+    """
+    normalised = {
+        key: str(value) for key, value in params.items()
+        if key not in PAGE_PARAMS and value not in (None, '')
+    }
+    query = ' '.join(query_terms(params.get('query')))
+    if query:
+        normalised['query'] = query
+    else:
+        normalised.pop('query', None)
+    normalised['libraries'] = 'all' if library_scope is None else sorted(str(library_id) for library_id in library_scope)
+
+    digest = hashlib.sha256(json.dumps(normalised, sort_keys=True).encode()).hexdigest()[:32]
+    return SmartLibCache.get_cache_key('books:facets', digest)
+
+
+def _values(counts, labels):
+    return [
+        {'value': value, 'label': labels[value], 'count': count}
+        for value, count in sorted(counts.items(), key=lambda item: (-item[1], labels[item[0]]))
+    ][:FACET_VALUE_LIMIT]
+
+
+def compute_facets(queryset):
+    """
+    Facet counts for the books in a queryset, with one grouped query
+
+    Returns:
+        dict: Lists of value, label and count per facet, most common first,
+            and the publication year range with counts per year
+    """
+    from .models import Book
+
+    groups = queryset.order_by().annotate(
+        available=Case(When(AVAILABLE_BOOKS, then=Value(True)), default=Value(False), output_field=BooleanField()),
+        year=ExtractYear('publication_date')
+    ).values(
+        'category_id', 'category__name', 'language', 'book_type',
+        'publisher_id', 'publisher__name', 'available', 'year'
+    ).annotate(count=Count('id', distinct=True))
+
+    counts = {facet: Counter() for facet in ['category', 'language', 'book_type', 'publisher', 'availability', 'year']}
+    labels = {
+        'category': {},
+        'language': dict(Book.LANGUAGES),
+        'book_type': dict(Book.BOOK_TYPES),
+        'publisher': {},
+        'availability': {True: 'Available', False: 'Unavailable'},
+    }
+    for group in groups:
+        count = group['count']
+        category_id, publisher_id = str(group['category_id']), str(group['publisher_id'])
+        counts['category'][category_id] += count
+        labels['category'][category_id] = group['category__name']
+        counts['publisher'][publisher_id] += count
+        labels['publisher'][publisher_id] = group['publisher__name']
+        counts['language'][group['language']] += count
+        counts['book_type'][group['book_type']] += count
+        counts['availability'][group['available']] += count
+        if group['year'] is not None:
+            counts['year'][group['year']] += count
+
+    years = sorted(counts['year'])
+    return {
+        'category': _values(counts['category'], labels['category']),
+        'language': _values(counts['language'], labels['language']),
+        'book_type': _values(counts['book_type'], labels['book_type']),
+        'publisher': _values(counts['publisher'], labels['publisher']),
+        'availability': _values(counts['availability'], labels['availability']),
+        'publication_year': {
+            'min': years[0] if years else None,
+            'max': years[-1] if years else None,
+            'counts': [{'value': year, 'count': counts['year'][year]} for year in years],
+        },
+    }
+
+
+def get_facets(queryset, params, library_scope):
+    """Facet counts of a search, from the cache when the same search ran recently"""
+    key = facet_cache_key(params, library_scope)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(queryset)
+        cache.set(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
@@ -0,0 +1,167 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SQLITE_SEARCH_INDEX = [
+    """
+    CREATE VIRTUAL TABLE books_search_document_fts USING fts5(
+        title, subtitle, authors, publisher, keywords, identifiers, description,
+        content='books_search_document', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER books_search_document_ai AFTER INSERT ON books_search_document BEGIN
+        INSERT INTO books_search_document_fts (
+            rowid, title, subtitle, authors, publisher, keywords, identifiers, description
+        ) VALUES (
+            new.id, new.title, new.subtitle, new.authors, new.publisher, new.keywords,
+            new.identifiers, new.description
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER books_search_document_ad AFTER DELETE ON books_search_document BEGIN
+        INSERT INTO books_search_document_fts (
+            books_search_document_fts, rowid, title, subtitle, authors, publisher,
+            keywords, identifiers, description
+        ) VALUES (
+            'delete', old.id, old.title, old.subtitle, old.authors, old.publisher,
+            old.keywords, old.identifiers, old.description
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER books_search_document_au AFTER UPDATE ON books_search_document BEGIN
+        INSERT INTO books_search_document_fts (
+            books_search_document_fts, rowid, title, subtitle, authors, publisher,
+            keywords, identifiers, description
+        ) VALUES (
+            'delete', old.id, old.title, old.subtitle, old.authors, old.publisher,
+            old.keywords, old.identifiers, old.description
+        );
+        INSERT INTO books_search_document_fts (
+            rowid, title, subtitle, authors, publisher, keywords, identifiers, description
+        ) VALUES (
+            new.id, new.title, new.subtitle, new.authors, new.publisher, new.keywords,
+            new.identifiers, new.description
+        );
+    END
+    """,
+]
+
+SQLITE_DROP_SEARCH_INDEX = [
+    "DROP TRIGGER IF EXISTS books_search_document_au",
+    "DROP TRIGGER IF EXISTS books_search_document_ad",
+    "DROP TRIGGER IF EXISTS books_search_document_ai",
+    "DROP TABLE IF EXISTS books_search_document_fts",
+]
+
+POSTGRESQL_SEARCH_INDEX = [
+    """
+    ALTER TABLE books_search_document ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', title), 'A') ||
+        setweight(to_tsvector('simple', identifiers), 'A') ||
+        setweight(to_tsvector('simple', authors), 'B') ||
+        setweight(to_tsvector('simple', subtitle), 'B') ||
+        setweight(to_tsvector('simple', keywords), 'B') ||
+        setweight(to_tsvector('simple', publisher), 'C') ||
+        setweight(to_tsvector('simple', description), 'D')
+    ) STORED
+    """,
+    "CREATE INDEX books_search_document_vector ON books_search_document USING GIN (search_vector)",
+]
+
+POSTGRESQL_DROP_SEARCH_INDEX = [
+    "DROP INDEX IF EXISTS books_search_document_vector",
+    "ALTER TABLE books_search_document DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {
+        'sqlite': SQLITE_SEARCH_INDEX,
+        'postgresql': POSTGRESQL_SEARCH_INDEX,
+    }.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {
+        'sqlite': SQLITE_DROP_SEARCH_INDEX,
+        'postgresql': POSTGRESQL_DROP_SEARCH_INDEX,
+    }.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def index_existing_books(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    BookSearchDocument = apps.get_model('books', 'BookSearchDocument')
+
+    books = Book.objects.filter(is_deleted=False).select_related('publisher').prefetch_related('authors')
+    documents = []
+    for book in books.iterator(chunk_size=500):
+        documents.append(BookSearchDocument(
+            book_id=book.id,
+            title=book.title,
+            subtitle=book.subtitle,
+            authors=' '.join(
+                ' '.join(filter(None, [author.first_name, author.middle_name, author.last_name]))
+                for author in book.authors.all()
+            ),
+            publisher=book.publisher.name,
+            keywords=' '.join(str(keyword) for keyword in book.keywords or []),
+            identifiers=' '.join(filter(None, [book.isbn, book.isbn13, book.book_code])),
+            description=book.description
+        ))
+        if len(documents) >= 500:
+            BookSearchDocument.objects.bulk_create(documents)
+            documents = []
+    BookSearchDocument.objects.bulk_create(documents)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BookSearchDocument",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("title", models.TextField()),
+                ("subtitle", models.TextField(blank=True)),
+                ("authors", models.TextField(blank=True)),
+                ("publisher", models.TextField(blank=True)),
+                ("keywords", models.TextField(blank=True)),
+                ("identifiers", models.TextField(blank=True)),
+                ("description", models.TextField(blank=True)),
+                (
+                    "book",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_document",
+                        to="books.book",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "books_search_document",
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(index_existing_books, migrations.RunPython.noop),
+    ]
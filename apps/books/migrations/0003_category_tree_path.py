@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:57
+
+from collections import defaultdict
+from django.db import migrations, models
+
+
+def build_category_paths(apps, schema_editor):
+    BookCategory = apps.get_model('books', 'BookCategory')
+
+    categories = {category.id: category for category in BookCategory.objects.all()}
+    children = defaultdict(list)
+    for category in categories.values():
+        children[category.parent_category_id].append(category)
+
+    # Walk down from the roots; anything unreachable (a cycle) becomes a root
+    pending = [(category, None) for category in children[None]]
+    pending += [
+        (category, None) for category in categories.values()
+        if category.parent_category_id is not None and category.parent_category_id not in categories
+    ]
+    visited = set()
+    while pending or len(visited) < len(categories):
+        if not pending:
+            orphan = next(category for category in categories.values() if category.id not in visited)
+            pending.append((orphan, None))
+        category, parent = pending.pop()
+        if category.id in visited:
+            continue
+        visited.add(category.id)
+        category.path = f"{parent.path if parent else ''}{category.id.hex}/"
+        category.full_path = f"{parent.full_path} > {category.name}" if parent else category.name
+        category.depth = parent.depth + 1 if parent else 0
+        pending.extend((child, category) for child in children[category.id])
+
+    BookCategory.objects.bulk_update(categories.values(), ['path', 'full_path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0002_book_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bookcategory",
+            name="depth",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="bookcategory",
+            name="full_path",
+            field=models.CharField(blank=True, editable=False, max_length=1000),
+        ),
+        migrations.AddField(
+            model_name="bookcategory",
+            name="path",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=500
+            ),
+        ),
+        migrations.RunPython(build_category_paths, migrations.RunPython.noop),
+    ]
@@ -2,10 +2,14 @@
 Book models for Smart Lib
 """
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth import get_user_model
 from apps.core.models import BaseModel, TimeStampedModel
 from apps.core.utils import generate_unique_code, hash_sensitive_data
+from .categories import category_path, get_category_book_counts, live_descendants
 from datetime import timedelta
 import uuid
 
@@ -31,6 +35,11 @@ class BookCategory(BaseModel):
     is_active = models.BooleanField(default=True)
     sort_order = models.PositiveIntegerField(default=0)
     
+    # Materialised tree, maintained on save
+    path = models.CharField(max_length=500, db_index=True, editable=False, blank=True)
+    full_path = models.CharField(max_length=1000, editable=False, blank=True)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    
     class Meta:
         db_table = 'books_category'
         ordering = ['sort_order', 'name']
@@ -41,35 +50,61 @@ class BookCategory(BaseModel):
             return f"{self.parent_category.name} > {self.name}"
         return self.name
     
+    def _parent_tree(self):
+        """Stored path, full path and depth of the parent, or None for a root"""
+        if self.parent_category_id is None:
+            return None
+        parent = BookCategory.objects.filter(pk=self.parent_category_id).values(
+            'path', 'full_path', 'depth'
+        ).first()
+        if parent and self.path and parent['path'].startswith(self.path):
+            raise ValidationError({
+                'parent_category': 'A category cannot be moved under itself or one of its subcategories.'
+            })
+        return parent
+    
+    def clean(self):
+        super().clean()
+        self._parent_tree()
+    
     def save(self, *args, **kwargs):
         if not self.code:
             self.code = generate_unique_code('CAT', 4)
+        
+        previous_path = self.previous_value('path')
+        previous_full_path = self.previous_value('full_path')
+        previous_depth = self.previous_value('depth')
+        
+        parent = self._parent_tree()
+        self.path = category_path(parent['path'] if parent else '', self.id)
+        self.full_path = f"{parent['full_path']} > {self.name}" if parent else self.name
+        self.depth = parent['depth'] + 1 if parent else 0
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'path', 'full_path', 'depth'}
         super().save(*args, **kwargs)
-    
-    @property
-    def full_path(self):
-        """Get full category path"""
-        if self.parent_category:
-            return f"{self.parent_category.full_path} > {self.name}"
-        return self.name
+        
+        if previous_path and (previous_path, previous_full_path) != (self.path, self.full_path):
+            # Moved or renamed: rewrite the subtree's prefixes in one update
+            BookCategory.objects.filter(path__startswith=previous_path).exclude(pk=self.pk).update(
+                path=Concat(Value(self.path), Substr('path', len(previous_path) + 1)),
+                full_path=Concat(Value(self.full_path), Substr('full_path', len(previous_full_path) + 1)),
+                depth=F('depth') + (self.depth - previous_depth)
+            )
     
     def get_all_books_count(self):
         """Get total books in this category and subcategories"""
-        from django.db.models import Q
-        categories = [self.id]
-        categories.extend(self.get_all_subcategories())
-        return Book.objects.filter(
-            category_id__in=categories,
-            is_deleted=False
-        ).count()
+        return get_category_book_counts().get(str(self.id), 0)
     
     def get_all_subcategories(self):
-        """Get all subcategory IDs recursively"""
-        subcategory_ids = []
-        for subcategory in self.subcategories.filter(is_deleted=False):
-            subcategory_ids.append(subcategory.id)
-            subcategory_ids.extend(subcategory.get_all_subcategories())
-        return subcategory_ids
+        """Get all subcategory IDs with one query on the materialised path"""
+        if not self.path:
+            return []
+        descendants = BookCategory.objects.filter(
+            path__startswith=self.path
+        ).exclude(pk=self.pk).order_by('path').values_list('id', 'path', 'is_deleted')
+        return live_descendants(self.path, list(descendants))
 
 
 class Author(BaseModel):
@@ -805,4 +840,29 @@ class BookRecommendation(BaseModel):
     @property
     def is_expired(self):
         """Check if recommendation is expired"""
-        return timezone.now() > self.expires_at
\ No newline at end of file
+        return timezone.now() > self.expires_at
+
+
+class BookSearchDocument(models.Model):
+    """
+    Flattened text of a book for the full-text index
+
+    Rows are rebuilt by ``apps.books.search`` whenever a book, its authors or
+    its publisher change. The integer key doubles as the FTS5 rowid on SQLite;
+    on PostgreSQL a weighted tsvector column is generated from the text. Both
+    indexes are created by migration, outside the model.
+    """
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, related_name='search_document')
+    title = models.TextField()
+    subtitle = models.TextField(blank=True)
+    authors = models.TextField(blank=True)
+    publisher = models.TextField(blank=True)
+    keywords = models.TextField(blank=True)
+    identifiers = models.TextField(blank=True)
+    description = models.TextField(blank=True)
+    
+    class Meta:
+        db_table = 'books_search_document'
+    
+    def __str__(self):
+        return self.title
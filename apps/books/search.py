@@ -0,0 +1,314 @@
+"""
+Full-text search over the book catalogue
+
+Each book has a search document holding its title, subtitle, authors,
+publisher, keywords, identifiers and description as flat text. On SQLite the
+documents are indexed by an FTS5 table kept in step by triggers, and on
+PostgreSQL by a generated, weighted tsvector column with a GIN index. Both
+sit behind ``BookSearchBackend``, which can restrict a queryset to the books
+matching a query, rank them by field-weighted relevance a page at a time and
+highlight the matched terms.
+
+Every query term is matched as a prefix, so results follow the search box as
+the user types. Documents are rebuilt by signals when a book, its authors or
+its publisher change, and by a periodic batch rebuild.
+"""
+import re
+import uuid
+from django.core.exceptions import EmptyResultSet, ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+SEARCH_INDEX_BATCH_SIZE = 500
+MAX_QUERY_TERMS = 8
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+SNIPPET_WORDS = 24
+# Fields in index column order, with their PostgreSQL weight class
+FIELD_WEIGHTS = {
+    'title': 'A',
+    'subtitle': 'B',
+    'authors': 'B',
+    'publisher': 'C',
+    'keywords': 'B',
+    'identifiers': 'A',
+    'description': 'D',
+}
+# bm25 multipliers matching the PostgreSQL weight classes
+BM25_WEIGHTS = {'A': 10.0, 'B': 4.0, 'C': 2.0, 'D': 1.0}
+HIGHLIGHT_FIELDS = ['title', 'authors', 'description']
+# Source fields whose change makes a book's search document stale
+BOOK_SEARCH_FIELDS = {
+    'title', 'subtitle', 'description', 'keywords', 'isbn', 'isbn13',
+    'book_code', 'publisher', 'is_deleted',
+}
+
+TERM_PATTERN = re.compile(r'[^\W_]+')
+
+
+def query_terms(query):
+    """Lower-cased word terms of a query, at most ``MAX_QUERY_TERMS``"""
+    return TERM_PATTERN.findall((query or '').lower())[:MAX_QUERY_TERMS]
+
+
+def _document(book):
+    from .models import BookSearchDocument
+
+    return BookSearchDocument(
+        book_id=book.id,
+        title=book.title,
+        subtitle=book.subtitle,
+        authors=' '.join(author.full_name for author in book.authors.all()),
+        publisher=book.publisher.name,
+        keywords=' '.join(str(keyword) for keyword in book.keywords or []),
+        identifiers=' '.join(filter(None, [book.isbn, book.isbn13, book.book_code])),
+        description=book.description
+    )
+
+
+def index_books(book_ids):
+    """Rebuild the search documents of the given books; deleted books are dropped"""
+    from .models import Book, BookSearchDocument
+
+    book_ids = list(book_ids)
+    if not book_ids:
+        return 0
+    books = Book.objects.filter(
+        id__in=book_ids,
+        is_deleted=False
+    ).select_related('publisher').prefetch_related('authors')
+
+    with transaction.atomic():
+        BookSearchDocument.objects.filter(book_id__in=book_ids).delete()
+        documents = BookSearchDocument.objects.bulk_create(
+            [_document(book) for book in books], batch_size=SEARCH_INDEX_BATCH_SIZE
+        )
+    return len(documents)
+
+
+def rebuild_search_index():
+    """
+    Rebuild every search document in batches of ``SEARCH_INDEX_BATCH_SIZE``
+
+    Returns:
+        int: Number of books indexed
+    """
+    from .models import Book
+
+    indexed = 0
+    last_id = None
+    while True:
+        batch = Book.objects.order_by('id')
+        if last_id is not None:
+            batch = batch.filter(id__gt=last_id)
+        book_ids = list(batch.values_list('id', flat=True)[:SEARCH_INDEX_BATCH_SIZE])
+        if not book_ids:
+            return indexed
+        indexed += index_books(book_ids)
+        last_id = book_ids[-1]
+
+
+class BookSearchBackend:
+    """
+    Full-text index over the book search documents
+
+    Subclasses provide the SQL for one database; everything else is shared.
+    """
+    document_table = 'books_search_document'
+
+    def match_expression(self, terms):
+        """Query parameter matching documents that contain every term as a prefix"""
+        raise NotImplementedError
+
+    def match_sql(self, expression):
+        """SQL selecting the book ids of matching documents"""
+        raise NotImplementedError
+
+    def rank_sql(self, expression, candidates_sql, candidates_params):
+        """SQL selecting book id, score and total matches among candidates, best first"""
+        raise NotImplementedError
+
+    def highlight_sql(self, expression, book_ids):
+        """SQL selecting book id and the highlighted ``HIGHLIGHT_FIELDS``"""
+        raise NotImplementedError
+
+    def filter(self, queryset, query):
+        """Restrict a book queryset to the books matching a query"""
+        terms = query_terms(query)
+        if not terms:
+            return queryset.none()
+        sql, params = self.match_sql(self.match_expression(terms))
+        return queryset.filter(id__in=RawSQL(sql, params))
+
+    def rank(self, queryset, query, offset, limit):
+        """
+        One page of the books in a queryset that match a query, most relevant first
+
+        Returns:
+            tuple: (total matches, list of (book id, score))
+        """
+        terms = query_terms(query)
+        if not terms:
+            return 0, []
+        try:
+            candidates_sql, candidates_params = queryset.order_by().values('id').query.sql_with_params()
+        except EmptyResultSet:
+            return 0, []
+
+        sql, params = self.rank_sql(self.match_expression(terms), candidates_sql, candidates_params)
+        with connection.cursor() as cursor:
+            cursor.execute(f"{sql} LIMIT %s OFFSET %s", params + [limit, offset])
+            rows = cursor.fetchall()
+        if rows:
+            total = rows[0][2]
+        elif offset:
+            # Past the last page no row carries the window count
+            total = self.filter(queryset, query).count()
+        else:
+            total = 0
+        return total, [(uuid.UUID(str(book_id)), float(score)) for book_id, score, _ in rows]
+
+    def highlights(self, query, book_ids):
+        """
+        Matched terms wrapped in ``HIGHLIGHT_START``/``HIGHLIGHT_END`` per book
+
+        Returns:
+            dict: Book id to a dict of the highlighted fields that matched
+        """
+        terms = query_terms(query)
+        book_ids = [uuid.UUID(str(book_id)) for book_id in book_ids]
+        if not terms or not book_ids:
+            return {}
+
+        sql, params = self.highlight_sql(self.match_expression(terms), book_ids)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        return {
+            uuid.UUID(str(book_id)): {
+                field: value for field, value in zip(HIGHLIGHT_FIELDS, values)
+                if value and HIGHLIGHT_START in value
+            }
+            for book_id, *values in rows
+        }
+
+    def _book_id_params(self, book_ids):
+        from .models import BookSearchDocument
+
+        field = BookSearchDocument._meta.get_field('book')
+        return [field.get_db_prep_value(book_id, connection) for book_id in book_ids]
+
+
+class SQLiteBookSearchBackend(BookSearchBackend):
+    """FTS5 index with bm25 ranking"""
+    fts_table = 'books_search_document_fts'
+
+    def match_expression(self, terms):
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def _from(self):
+        return (
+            f"FROM {self.fts_table} JOIN {self.document_table} document "
+            f"ON document.id = {self.fts_table}.rowid WHERE {self.fts_table} MATCH %s"
+        )
+
+    def match_sql(self, expression):
+        return f"SELECT document.book_id {self._from()}", [expression]
+
+    def rank_sql(self, expression, candidates_sql, candidates_params):
+        weights = ', '.join(str(BM25_WEIGHTS[weight]) for weight in FIELD_WEIGHTS.values())
+        # bm25 cannot be used next to a window function, so rank in a subquery
+        return (
+            f"SELECT document.book_id, matched.score, COUNT(*) OVER () "
+            f"FROM (SELECT rowid, -bm25({self.fts_table}, {weights}) AS score "
+            f"FROM {self.fts_table} WHERE {self.fts_table} MATCH %s) matched "
+            f"JOIN {self.document_table} document ON document.id = matched.rowid "
+            f"WHERE document.book_id IN ({candidates_sql}) "
+            f"ORDER BY matched.score DESC, document.book_id",
+            [expression] + list(candidates_params)
+        )
+
+    def highlight_sql(self, expression, book_ids):
+        columns = list(FIELD_WEIGHTS)
+        selects = []
+        params = []
+        for field in HIGHLIGHT_FIELDS:
+            if field == 'description':
+                selects.append(f"snippet({self.fts_table}, %s, %s, %s, '...', %s)")
+                params += [columns.index(field), HIGHLIGHT_START, HIGHLIGHT_END, SNIPPET_WORDS]
+            else:
+                selects.append(f"highlight({self.fts_table}, %s, %s, %s)")
+                params += [columns.index(field), HIGHLIGHT_START, HIGHLIGHT_END]
+        placeholders = ', '.join(['%s'] * len(book_ids))
+        return (
+            f"SELECT document.book_id, {', '.join(selects)} "
+            f"{self._from()} AND document.book_id IN ({placeholders})",
+            params + [expression] + self._book_id_params(book_ids)
+        )
+
+
+class PostgresBookSearchBackend(BookSearchBackend):
+    """Weighted tsvector with a GIN index and ts_rank ranking"""
+    config = 'simple'
+
+    def match_expression(self, terms):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def _from(self):
+        return (
+            f"FROM {self.document_table} document, to_tsquery('{self.config}', %s) query "
+            f"WHERE document.search_vector @@ query"
+        )
+
+    def match_sql(self, expression):
+        return f"SELECT document.book_id {self._from()}", [expression]
+
+    def rank_sql(self, expression, candidates_sql, candidates_params):
+        return (
+            f"SELECT document.book_id, ts_rank(document.search_vector, query) AS score, COUNT(*) OVER () "
+            f"{self._from()} AND document.book_id IN ({candidates_sql}) "
+            f"ORDER BY score DESC, document.book_id",
+            [expression] + list(candidates_params)
+        )
+
+    def highlight_sql(self, expression, book_ids):
+        selection = f'StartSel="{HIGHLIGHT_START}", StopSel="{HIGHLIGHT_END}"'
+        options = {
+            'title': f'{selection}, HighlightAll=true',
+            'authors': f'{selection}, HighlightAll=true',
+            'description': f'{selection}, MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 2}',
+        }
+        selects = [
+            f"ts_headline('{self.config}', document.{field}, query, %s)" for field in HIGHLIGHT_FIELDS
+        ]
+        return (
+            f"SELECT document.book_id, {', '.join(selects)} "
+            f"FROM {self.document_table} document, to_tsquery('{self.config}', %s) query "
+            f"WHERE document.book_id = ANY(%s)",
+            [options[field] for field in HIGHLIGHT_FIELDS] + [expression, book_ids]
+        )
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteBookSearchBackend,
+    'postgresql': PostgresBookSearchBackend,
+}
+
+
+def get_search_backend():
+    """Search backend for the default database"""
+    backend = SEARCH_BACKENDS.get(connection.vendor)
+    if backend is None:
+        raise ImproperlyConfigured(f"No book search backend for {connection.vendor}")
+    return backend()
+
+
+class BookSearchFilter(SearchFilter):
+    """DRF search filter that matches books through the full-text index"""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return get_search_backend().filter(queryset, ' '.join(terms))
@@ -4,6 +4,7 @@ Serializers for books app
 from rest_framework import serializers
 from django.utils import timezone
 from apps.core.serializers import BaseModelSerializer
+from .categories import get_category_book_counts
 from .models import (
     BookCategory, Author, Publisher, Book, BookReservation,
     BookDigitalAccess, BookReview, BookWishlist, BookReadingList,
@@ -31,10 +32,15 @@ class BookCategorySerializer(BaseModelSerializer):
         read_only_fields = ['id', 'code', 'created_at']
     
     def get_subcategories_count(self, obj):
+        if hasattr(obj, 'live_subcategories'):
+            return obj.live_subcategories
         return obj.subcategories.filter(is_deleted=False).count()
     
     def get_books_count(self, obj):
-        return obj.get_all_books_count()
+        # Read the cached counts once for the whole list
+        if not hasattr(self, '_book_counts'):
+            self._book_counts = get_category_book_counts()
+        return self._book_counts.get(str(obj.id), 0)
 
 
 class AuthorSerializer(BaseModelSerializer):
@@ -395,6 +401,12 @@ class BookRecommendationSerializer(serializers.ModelSerializer):
         ]
 
 
+class BookAutocompleteSerializer(serializers.Serializer):
+    """Serializer for autocomplete parameters"""
+    q = serializers.CharField(max_length=100, allow_blank=True)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=20, default=10)
+
+
 class BookSearchSerializer(serializers.Serializer):
     """Serializer for book search parameters"""
     query = serializers.CharField(required=False, allow_blank=True)
@@ -416,6 +428,7 @@ class BookSearchSerializer(serializers.Serializer):
     publication_year_to = serializers.IntegerField(required=False, max_value=2030)
     sort_by = serializers.ChoiceField(
         choices=[
+            ('relevance', 'Relevance'),
             ('title', 'Title'),
             ('author', 'Author'),
             ('publication_date', 'Publication Date'),
@@ -424,8 +437,11 @@ class BookSearchSerializer(serializers.Serializer):
             ('newest', 'Newest'),
         ],
         required=False,
-        default='title'
+        default='relevance'
     )
+    page = serializers.IntegerField(required=False, min_value=1, default=1)
+    page_size = serializers.IntegerField(required=False, min_value=1, max_value=100, default=20)
+    facets = serializers.BooleanField(required=False, default=False)
     
     def validate(self, attrs):
         if attrs.get('publication_year_from') and attrs.get('publication_year_to'):
@@ -1,11 +1,15 @@
 """
 Signals for books app
 """
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save, m2m_changed
 from django.dispatch import receiver
 from django.db.models import Avg
+from apps.core.counters import increment_counter
 from apps.core.models import ActivityLog
-from .models import Book, BookReservation, BookReview
+from .autocomplete import record_autocomplete_changes
+from .categories import invalidate_category_book_counts
+from .models import Author, Book, BookCategory, BookReservation, BookReview, Publisher
+from .search import BOOK_SEARCH_FIELDS, index_books
 
 
 @receiver(post_save, sender=BookReservation)
@@ -13,13 +17,12 @@ def update_book_statistics(sender, instance, created, **kwargs):
     """Update book statistics when reservation is created or updated"""
     if created:
         # Increment total reservations
-        instance.book.total_reservations += 1
+        increment_counter(Book, instance.book_id, 'total_reservations')
         
         # Update available copies for physical books
         if instance.reservation_type == 'PHYSICAL':
             instance.book.available_copies = max(0, instance.book.available_copies - 1)
-        
-        instance.book.save()
+            instance.book.save_changed()
         
         # Log reservation activity
         ActivityLog.objects.create(
@@ -35,14 +38,8 @@ def update_book_statistics(sender, instance, created, **kwargs):
         )
     
     # Update checkout count when status changes to CHECKED_OUT
-    if instance.status == 'CHECKED_OUT':
-        try:
-            old_instance = BookReservation.objects.get(pk=instance.pk)
-            if old_instance.status != 'CHECKED_OUT':
-                instance.book.total_checkouts += 1
-                instance.book.save()
-        except BookReservation.DoesNotExist:
-            pass
+    if instance.status == 'CHECKED_OUT' and instance.previous_value('status') != 'CHECKED_OUT':
+        increment_counter(Book, instance.book_id, 'total_checkouts')
 
 
 @receiver(post_save, sender=BookReview)
@@ -74,60 +71,140 @@ def update_book_rating(sender, instance, created, **kwargs):
 @receiver(pre_save, sender=BookReservation)
 def track_reservation_status_changes(sender, instance, **kwargs):
     """Track reservation status changes"""
-    if instance.pk:
-        try:
-            old_instance = BookReservation.objects.get(pk=instance.pk)
-            
-            # Track status changes
-            if old_instance.status != instance.status:
-                ActivityLog.objects.create(
-                    user=instance.user,
-                    activity_type='BOOK_RESERVE',
-                    description=f'Reservation status changed from {old_instance.status} to {instance.status}',
-                    metadata={
-                        'reservation_id': str(instance.id),
-                        'book_id': str(instance.book.id),
-                        'book_title': instance.book.title,
-                        'old_status': old_instance.status,
-                        'new_status': instance.status,
-                    }
-                )
+    if instance._state.adding:
+        return
+    
+    old_status = instance.previous_value('status')
+    
+    # Track status changes
+    if old_status != instance.status:
+        ActivityLog.objects.create(
+            user=instance.user,
+            activity_type='BOOK_RESERVE',
+            description=f'Reservation status changed from {old_status} to {instance.status}',
+            metadata={
+                'reservation_id': str(instance.id),
+                'book_id': str(instance.book.id),
+                'book_title': instance.book.title,
+                'old_status': old_status,
+                'new_status': instance.status,
+            }
+        )
+        
+        # Handle specific status changes
+        if instance.status == 'RETURNED' and old_status == 'CHECKED_OUT':
+            # Book returned - update availability
+            if instance.reservation_type == 'PHYSICAL':
+                instance.book.available_copies += 1
+                instance.book.save_changed()
                 
-                # Handle specific status changes
-                if instance.status == 'RETURNED' and old_instance.status == 'CHECKED_OUT':
-                    # Book returned - update availability
-                    if instance.reservation_type == 'PHYSICAL':
-                        instance.book.available_copies += 1
-                        instance.book.save()
-                        
-                elif instance.status == 'CANCELLED':
-                    # Reservation cancelled - update availability
-                    if instance.reservation_type == 'PHYSICAL' and old_instance.status in ['CONFIRMED', 'READY_FOR_PICKUP']:
-                        instance.book.available_copies += 1
-                        instance.book.save()
-                        
-        except BookReservation.DoesNotExist:
-            pass
+        elif instance.status == 'CANCELLED':
+            # Reservation cancelled - update availability
+            if instance.reservation_type == 'PHYSICAL' and old_status in ['CONFIRMED', 'READY_FOR_PICKUP']:
+                instance.book.available_copies += 1
+                instance.book.save_changed()
 
 
 @receiver(pre_save, sender=BookReview)
 def log_review_approval(sender, instance, **kwargs):
     """Log when review gets approved"""
-    if instance.pk:
-        try:
-            old_instance = BookReview.objects.get(pk=instance.pk)
-            if not old_instance.is_approved and instance.is_approved:
-                # Review was just approved
-                ActivityLog.objects.create(
-                    user=instance.user,
-                    activity_type='PROFILE_UPDATE',
-                    description=f'Book review approved for {instance.book.title}',
-                    metadata={
-                        'book_id': str(instance.book.id),
-                        'book_title': instance.book.title,
-                        'rating': instance.overall_rating,
-                        'approved_by': instance.approved_by.get_full_name() if instance.approved_by else 'System',
-                    }
-                )
-        except BookReview.DoesNotExist:
-            pass
\ No newline at end of file
+    if not instance._state.adding and not instance.previous_value('is_approved') and instance.is_approved:
+        # Review was just approved
+        ActivityLog.objects.create(
+            user=instance.user,
+            activity_type='PROFILE_UPDATE',
+            description=f'Book review approved for {instance.book.title}',
+            metadata={
+                'book_id': str(instance.book.id),
+                'book_title': instance.book.title,
+                'rating': instance.overall_rating,
+                'approved_by': instance.approved_by.get_full_name() if instance.approved_by else 'System',
+            }
+        )
+
+
+@receiver(post_save, sender=Book)
+def update_book_search_document(sender, instance, created, **kwargs):
+    """Reindex a book when its searchable text changes"""
+    if created or instance.changed_fields & BOOK_SEARCH_FIELDS:
+        index_books([instance.id])
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def update_search_documents_for_authors(sender, instance, action, reverse, pk_set, **kwargs):
+    """Reindex books whose author list changed"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            index_books([instance.id])
+    elif action == 'pre_clear':
+        # The cleared books are only known before the clear
+        instance._search_book_ids = list(instance.books.values_list('id', flat=True))
+    elif action == 'post_clear':
+        index_books(getattr(instance, '_search_book_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        index_books(pk_set)
+
+
+@receiver(post_save, sender=Author)
+def update_search_documents_for_author(sender, instance, created, **kwargs):
+    """Reindex an author's books when their name changes"""
+    if not created and instance.changed_fields & {'first_name', 'middle_name', 'last_name'}:
+        index_books(instance.books.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Publisher)
+def update_search_documents_for_publisher(sender, instance, created, **kwargs):
+    """Reindex a publisher's books when its name changes"""
+    if not created and instance.has_changed('name'):
+        index_books(instance.books.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Book)
+def update_book_autocomplete(sender, instance, created, **kwargs):
+    """Refresh a book's autocomplete entry when its title changes"""
+    if created or instance.changed_fields & {'title', 'subtitle', 'is_deleted'}:
+        record_autocomplete_changes('book', [instance.id])
+
+
+@receiver(post_save, sender=Author)
+def update_author_autocomplete(sender, instance, created, **kwargs):
+    """Refresh an author's autocomplete entry when their name changes"""
+    if created or instance.changed_fields & {'first_name', 'middle_name', 'last_name', 'is_deleted'}:
+        record_autocomplete_changes('author', [instance.id])
+
+
+@receiver(post_save, sender=BookCategory)
+def update_category_autocomplete(sender, instance, created, **kwargs):
+    """Refresh a category's autocomplete entry when its name or visibility changes"""
+    if created or instance.changed_fields & {'name', 'is_active', 'is_deleted'}:
+        record_autocomplete_changes('category', [instance.id])
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=BookCategory)
+def remove_autocomplete_entry(sender, instance, **kwargs):
+    """Drop the autocomplete entry of a deleted book, author or category"""
+    kind = {Book: 'book', Author: 'author', BookCategory: 'category'}[sender]
+    record_autocomplete_changes(kind, [instance.id])
+
+
+@receiver(post_save, sender=Book)
+def update_category_book_counts(sender, instance, created, **kwargs):
+    """Drop the cached category counts when a book is added, moved or deleted"""
+    if created or instance.changed_fields & {'category', 'is_deleted'}:
+        invalidate_category_book_counts()
+
+
+@receiver(post_save, sender=BookCategory)
+def update_category_tree_counts(sender, instance, created, **kwargs):
+    """Drop the cached category counts when a category moves or is deleted"""
+    if not created and instance.changed_fields & {'parent_category', 'is_deleted'}:
+        invalidate_category_book_counts()
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=BookCategory)
+def remove_from_category_book_counts(sender, instance, **kwargs):
+    """Drop the cached category counts when a book or category is deleted outright"""
+    invalidate_category_book_counts()
@@ -6,6 +6,8 @@ from django.utils import timezone
 from django.db.models import Count, Avg, Sum
 from datetime import timedelta, date
 from .models import Book, BookReservation, BookStatistics, BookDigitalAccess
+from .autocomplete import write_autocomplete_snapshot
+from .search import rebuild_search_index
 import logging
 
 logger = logging.getLogger(__name__)
@@ -71,105 +73,6 @@ def process_expired_reservations():
         return f"Error: {e}"
 
 
-@shared_task
-def send_reservation_reminders():
-    """Send reminders for upcoming due dates and pickup deadlines"""
-    try:
-        from apps.core.utils import send_notification_email
-        
-        now = timezone.now()
-        reminders_sent = 0
-        
-        # Pickup reminders (1 day before deadline)
-        pickup_reminders = BookReservation.objects.filter(
-            status='CONFIRMED',
-            pickup_deadline__gte=now,
-            pickup_deadline__lte=now + timedelta(hours=24),
-            reminder_sent=False,
-            is_deleted=False
-        ).select_related('user', 'book', 'pickup_library')
-        
-        for reservation in pickup_reminders:
-            try:
-                subject = "Smart Lib - Book Ready for Pickup"
-                message = f"""
-                Dear {reservation.user.get_full_name()},
-                
-                Your reserved book is ready for pickup:
-                
-                Book: {reservation.book.title}
-                Library: {reservation.pickup_library.name if reservation.pickup_library else reservation.book.library.name}
-                Pickup Deadline: {reservation.pickup_deadline.strftime('%Y-%m-%d %H:%M')}
-                
-                Please collect your book before the deadline to avoid cancellation.
-                
-                Best regards,
-                Smart Lib Team
-                """
-                
-                send_notification_email(
-                    to_email=reservation.user.email,
-                    subject=subject,
-                    message=message
-                )
-                
-                reservation.reminder_sent = True
-                reservation.save()
-                reminders_sent += 1
-                
-            except Exception as e:
-                logger.error(f"Error sending pickup reminder for reservation {reservation.id}: {e}")
-                continue
-        
-        # Due date reminders (2 days before due)
-        due_reminders = BookReservation.objects.filter(
-            status='CHECKED_OUT',
-            due_date__gte=now,
-            due_date__lte=now + timedelta(days=2),
-            reminder_sent=False,
-            is_deleted=False
-        ).select_related('user', 'book')
-        
-        for reservation in due_reminders:
-            try:
-                subject = "Smart Lib - Book Due Soon"
-                message = f"""
-                Dear {reservation.user.get_full_name()},
-                
-                Your book is due for return soon:
-                
-                Book: {reservation.book.title}
-                Due Date: {reservation.due_date.strftime('%Y-%m-%d %H:%M')}
-                
-                Please return the book on time to avoid late fees.
-                You can renew the book if eligible.
-                
-                Best regards,
-                Smart Lib Team
-                """
-                
-                send_notification_email(
-                    to_email=reservation.user.email,
-                    subject=subject,
-                    message=message
-                )
-                
-                reservation.reminder_sent = True
-                reservation.save()
-                reminders_sent += 1
-                
-            except Exception as e:
-                logger.error(f"Error sending due reminder for reservation {reservation.id}: {e}")
-                continue
-        
-        logger.info(f"Sent {reminders_sent} reservation reminders")
-        return f"Sent {reminders_sent} reminders"
-        
-    except Exception as e:
-        logger.error(f"Error sending reservation reminders: {e}")
-        return f"Error: {e}"
-
-
 @shared_task
 def generate_daily_book_statistics():
     """Generate daily statistics for all books"""
@@ -452,4 +355,65 @@ def generate_book_recommendations():
         
     except Exception as e:
         logger.error(f"Error generating book recommendations: {e}")
-        return f"Error: {e}"
\ No newline at end of file
+        return f"Error: {e}"
+
+
+@shared_task
+def reconcile_book_counters():
+    """Recompute book reservation and checkout counters from reservations"""
+    try:
+        from apps.core.counters import flush_counters, reconcile_counter
+        
+        flush_counters()
+        
+        reservations = BookReservation.objects.filter(is_deleted=False)
+        total_reservations = dict(
+            reservations.values('book_id').annotate(count=Count('id')).values_list('book_id', 'count')
+        )
+        total_checkouts = dict(
+            reservations.filter(
+                status__in=['CHECKED_OUT', 'OVERDUE', 'RETURNED']
+            ).values('book_id').annotate(count=Count('id')).values_list('book_id', 'count')
+        )
+        
+        corrected = (
+            reconcile_counter(Book, 'total_reservations', total_reservations) +
+            reconcile_counter(Book, 'total_checkouts', total_checkouts)
+        )
+        
+        logger.info(f"Corrected {corrected} book counters")
+        return f"Corrected {corrected} book counters"
+        
+    except Exception as e:
+        logger.error(f"Error in reconcile_book_counters: {e}")
+        return f"Error: {e}"
+
+
+@shared_task
+def rebuild_book_search_index():
+    """Rebuild every book's search document to correct any drift"""
+    try:
+        indexed = rebuild_search_index()
+        
+        logger.info(f"Indexed {indexed} books for search")
+        return f"Indexed {indexed} books for search"
+        
+    except Exception as e:
+        logger.error(f"Error in rebuild_book_search_index: {e}")
+        return f"Error: {e}"
+
+
+@shared_task
+def build_book_autocomplete_snapshot():
+    """Write the autocomplete snapshot that processes load their index from"""
+    try:
+        written = write_autocomplete_snapshot()
+        if written is None:
+            return "No autocomplete snapshot configured"
+        
+        logger.info(f"Wrote {written} autocomplete entries")
+        return f"Wrote {written} autocomplete entries"
+        
+    except Exception as e:
+        logger.error(f"Error in build_book_autocomplete_snapshot: {e}")
+        return f"Error: {e}"
@@ -1,7 +1,9 @@
 """
 Tests for books app
 """
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
@@ -491,4 +493,555 @@ class BookWishlistTest(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
-        self.assertEqual(response.data['results'][0]['book']['title'], 'Test Book')
\ No newline at end of file
+        self.assertEqual(response.data['results'][0]['book']['title'], 'Test Book')
+
+
+class BookFullTextSearchTest(APITestCase):
+    """Test the full-text book index and ranked search"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123',
+            is_approved=True
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.category = BookCategory.objects.create(
+            name='Computer Science',
+            created_by=self.user
+        )
+        
+        self.publisher = Publisher.objects.create(
+            name='Orchard Press',
+            created_by=self.user
+        )
+        
+        self.author = Author.objects.create(
+            first_name='Ada',
+            last_name='Lovelace',
+            created_by=self.user
+        )
+        
+        self.compilers = self.create_book(
+            'Compilers in Practice', '9780000000001',
+            description='Parsing, type checking and code generation.'
+        )
+        self.compilers.authors.add(self.author)
+        self.parsing = self.create_book(
+            'Everyday Algorithms', '9780000000002',
+            description='A gentle tour that ends with a chapter on compilers.'
+        )
+        self.gardening = self.create_book(
+            'Gardening Basics', '9780000000003',
+            description='Soil, seeds and patience.'
+        )
+        
+        from apps.accounts.models import UserLibraryAccess
+        UserLibraryAccess.objects.create(
+            user=self.user,
+            library=self.library,
+            granted_by=self.user,
+            created_by=self.user
+        )
+        
+        self.client.force_authenticate(user=self.user)
+    
+    def create_book(self, title, isbn, description=''):
+        return Book.objects.create(
+            title=title,
+            isbn=isbn,
+            isbn13=isbn,
+            description=description,
+            category=self.category,
+            publisher=self.publisher,
+            library=self.library,
+            book_type='PHYSICAL',
+            physical_copies=1,
+            available_copies=1,
+            created_by=self.user
+        )
+    
+    def search(self, **data):
+        response = self.client.post(reverse('books:book-search'), data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+    
+    def test_title_matches_rank_above_description_matches(self):
+        """Test field weights put title matches first and highlight the terms"""
+        data = self.search(query='compil')
+        
+        self.assertEqual(data['count'], 2)
+        titles = [result['title'] for result in data['results']]
+        self.assertEqual(titles, ['Compilers in Practice', 'Everyday Algorithms'])
+        self.assertGreater(data['results'][0]['score'], data['results'][1]['score'])
+        self.assertIn('<mark>Compilers</mark>', data['results'][0]['highlights']['title'])
+        self.assertIn('<mark>compilers</mark>', data['results'][1]['highlights']['description'])
+    
+    def test_search_matches_authors_publishers_and_identifiers(self):
+        """Test every term must match as a prefix of some indexed field"""
+        self.assertEqual(self.search(query='lovel compilers')['count'], 1)
+        self.assertEqual(self.search(query='orchard')['count'], 3)
+        self.assertEqual(self.search(query='9780000000003')['results'][0]['title'], 'Gardening Basics')
+        self.assertEqual(self.search(query='lovelace gardening')['count'], 0)
+    
+    def test_results_are_paginated(self):
+        """Test pages keep the total count and do not overlap"""
+        first = self.search(query='orchard', page_size=2)
+        second = self.search(query='orchard', page_size=2, page=2)
+        
+        self.assertEqual((first['count'], second['count']), (3, 3))
+        self.assertEqual(len(first['results']), 2)
+        self.assertEqual(len(second['results']), 1)
+        ids = {result['id'] for result in first['results'] + second['results']}
+        self.assertEqual(len(ids), 3)
+        
+        sorted_page = self.search(query='orchard', sort_by='title', page_size=2, page=2)
+        self.assertEqual(sorted_page['count'], 3)
+        self.assertEqual(sorted_page['results'][0]['title'], 'Gardening Basics')
+    
+    def test_index_follows_book_author_and_publisher_changes(self):
+        """Test signals keep the search documents current"""
+        self.gardening.title = 'Urban Beekeeping'
+        self.gardening.save()
+        self.assertEqual(self.search(query='gardening')['count'], 0)
+        self.assertEqual(self.search(query='beekeeping')['count'], 1)
+        
+        self.author.last_name = 'Byron'
+        self.author.save()
+        self.assertEqual(self.search(query='lovelace')['count'], 0)
+        self.assertEqual(self.search(query='byron')['count'], 1)
+        
+        self.gardening.authors.add(self.author)
+        self.assertEqual(self.search(query='byron')['count'], 2)
+        
+        self.publisher.name = 'Quince House'
+        self.publisher.save()
+        self.assertEqual(self.search(query='quince')['count'], 3)
+        
+        self.compilers.is_deleted = True
+        self.compilers.save()
+        self.assertEqual(self.search(query='compilers')['count'], 1)
+    
+    def test_rebuild_corrects_drift(self):
+        """Test the batch rebuild reindexes books changed behind the signals"""
+        from .search import rebuild_search_index
+        
+        Book.objects.filter(pk=self.gardening.pk).update(title='Urban Beekeeping')
+        self.assertEqual(self.search(query='beekeeping')['count'], 0)
+        
+        self.assertEqual(rebuild_search_index(), 3)
+        self.assertEqual(self.search(query='beekeeping')['count'], 1)
+    
+    def test_book_list_search_uses_index(self):
+        """Test the book list search parameter goes through the full-text index"""
+        response = self.client.get(reverse('books:book-list'), {'search': 'garden'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['title'] for result in response.data['results']], ['Gardening Basics'])
+
+
+class BookAutocompleteTest(APITestCase):
+    """Test the in-memory autocomplete index and endpoint"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from .autocomplete import reset_autocomplete_index
+        
+        cache.clear()
+        reset_autocomplete_index()
+        self.addCleanup(reset_autocomplete_index)
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123'
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.category = BookCategory.objects.create(
+            name='Programming',
+            created_by=self.user
+        )
+        
+        self.publisher = Publisher.objects.create(
+            name='Orchard Press',
+            created_by=self.user
+        )
+        
+        self.author = Author.objects.create(
+            first_name='Grace',
+            last_name='Hopper',
+            created_by=self.user
+        )
+        
+        self.create_book('Programming Pearls', '9780000000011', reservations=2)
+        self.create_book('Programming Rust', '9780000000012', reservations=40, views=300)
+        self.create_book('Prolog Made Simple', '9780000000013', views=5)
+        
+        self.client.force_authenticate(user=self.user)
+    
+    def create_book(self, title, isbn, reservations=0, views=0):
+        return Book.objects.create(
+            title=title,
+            isbn=isbn,
+            isbn13=isbn,
+            category=self.category,
+            publisher=self.publisher,
+            library=self.library,
+            total_reservations=reservations,
+            view_count=views,
+            created_by=self.user
+        )
+    
+    def suggest(self, query, **params):
+        response = self.client.get(reverse('books:book-autocomplete'), {'q': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(suggestion['type'], suggestion['label']) for suggestion in response.data['suggestions']]
+    
+    def test_prefix_suggestions_are_weighted_by_popularity(self):
+        """Test books, authors and categories are suggested, most popular first"""
+        self.assertEqual(self.suggest('progr'), [
+            ('category', 'Programming'),
+            ('book', 'Programming Rust'),
+            ('book', 'Programming Pearls'),
+        ])
+        self.assertEqual(self.suggest('pro', limit=2), [
+            ('category', 'Programming'),
+            ('book', 'Programming Rust'),
+        ])
+        self.assertEqual(self.suggest('prog pe'), [('book', 'Programming Pearls')])
+        self.assertEqual(self.suggest('hop'), [('author', 'Grace Hopper')])
+    
+    def test_typos_are_tolerated_after_exact_matches(self):
+        """Test misspelt terms still find entries within a typo or two"""
+        self.assertEqual(self.suggest('porgramming ru'), [('book', 'Programming Rust')])
+        self.assertEqual(self.suggest('hoper'), [('author', 'Grace Hopper')])
+        self.assertEqual(self.suggest('xyzzy'), [])
+    
+    def test_index_follows_changes(self):
+        """Test saved and deleted entries reach the index through the change log"""
+        self.assertEqual(self.suggest('compil'), [])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            book = self.create_book('Compilers in Practice', '9780000000014')
+            self.author.last_name = 'Brewster'
+            self.author.save()
+        self.assertEqual(self.suggest('compil'), [('book', 'Compilers in Practice')])
+        self.assertEqual(self.suggest('hopper'), [])
+        self.assertEqual(self.suggest('brews'), [('author', 'Grace Brewster')])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            book.is_deleted = True
+            book.save()
+        self.assertEqual(self.suggest('compil'), [])
+    
+    def test_snapshot_round_trip(self):
+        """Test a written snapshot loads into an equivalent index"""
+        import os
+        import tempfile
+        from .autocomplete import load_autocomplete_snapshot, write_autocomplete_snapshot
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'autocomplete.json')
+            self.assertEqual(write_autocomplete_snapshot(path), 5)
+            
+            with self.assertNumQueries(0):
+                index = load_autocomplete_snapshot(path)
+                suggestions = index.suggest('progr')
+        
+        self.assertEqual([suggestion['label'] for suggestion in suggestions], [
+            'Programming', 'Programming Rust', 'Programming Pearls'
+        ])
+    
+    def test_lookup_latency_budget(self):
+        """Test a warm lookup over a large catalogue stays under five milliseconds"""
+        import random
+        import time
+        from .autocomplete import AutocompleteIndex
+        
+        rng = random.Random(0)
+        words = [
+            ''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(3, 10)))
+            for _ in range(5000)
+        ]
+        index = AutocompleteIndex([
+            {
+                'type': 'book', 'id': str(number), 'label': title, 'text': title,
+                'weight': rng.random()
+            }
+            for number, title in enumerate(' '.join(rng.sample(words, 4)) for _ in range(50000))
+        ])
+        
+        for query in ['a', 'ab', 'mor', 'qzx', words[0][:4], f'{words[1]} {words[2][:2]}']:
+            timings = []
+            for _ in range(3):
+                started = time.perf_counter()
+                index.suggest(query)
+                timings.append(time.perf_counter() - started)
+            self.assertLess(min(timings), 0.005, query)
+
+
+class BookSearchFacetTest(APITestCase):
+    """Test facet counts returned with book search"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        
+        cache.clear()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123',
+            is_approved=True
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.science = BookCategory.objects.create(name='Science', created_by=self.user)
+        self.history = BookCategory.objects.create(name='History', created_by=self.user)
+        self.orchard = Publisher.objects.create(name='Orchard Press', created_by=self.user)
+        self.quince = Publisher.objects.create(name='Quince House', created_by=self.user)
+        
+        self.create_book('Astronomy Primer', self.science, self.orchard, year=2019)
+        self.create_book('Chemistry Primer', self.science, self.orchard, year=2021, available_copies=0)
+        self.create_book('Biology Primer', self.science, self.quince, year=2021, book_type='DIGITAL', language='UR')
+        self.create_book('Roman History', self.history, self.quince)
+        
+        from apps.accounts.models import UserLibraryAccess
+        UserLibraryAccess.objects.create(
+            user=self.user,
+            library=self.library,
+            granted_by=self.user,
+            created_by=self.user
+        )
+        
+        self.client.force_authenticate(user=self.user)
+    
+    def create_book(self, title, category, publisher, year=None, available_copies=1,
+                    book_type='PHYSICAL', language='EN'):
+        count = Book.objects.count()
+        return Book.objects.create(
+            title=title,
+            isbn=f'97800000001{count:02d}',
+            isbn13=f'97800000001{count:02d}',
+            category=category,
+            publisher=publisher,
+            library=self.library,
+            publication_date=date(year, 1, 1) if year else None,
+            book_type=book_type,
+            language=language,
+            physical_copies=1,
+            available_copies=available_copies,
+            created_by=self.user
+        )
+    
+    def search(self, **data):
+        response = self.client.post(reverse('books:book-search'), {'facets': True, **data})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+    
+    def counts(self, facet):
+        return {value['label']: value['count'] for value in facet}
+    
+    def test_facets_count_the_whole_result_set(self):
+        """Test facets cover every matching book, not just the current page"""
+        data = self.search(query='primer', sort_by='title', page_size=1)
+        facets = data['facets']
+        
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(len(data['results']), 1)
+        self.assertEqual(self.counts(facets['category']), {'Science': 3})
+        self.assertEqual(self.counts(facets['publisher']), {'Orchard Press': 2, 'Quince House': 1})
+        self.assertEqual(self.counts(facets['language']), {'English': 2, 'Urdu': 1})
+        self.assertEqual(self.counts(facets['book_type']), {'Physical Book': 2, 'Digital Book': 1})
+        self.assertEqual(self.counts(facets['availability']), {'Available': 2, 'Unavailable': 1})
+        self.assertEqual(facets['publication_year'], {
+            'min': 2019,
+            'max': 2021,
+            'counts': [{'value': 2019, 'count': 1}, {'value': 2021, 'count': 2}]
+        })
+        
+        response = self.client.post(reverse('books:book-search'), {'sort_by': 'title', 'page_size': 1})
+        self.assertNotIn('facets', response.data)
+    
+    def test_facet_queries_do_not_grow_with_facet_values(self):
+        """Test a search with facets costs the same queries however many values there are"""
+        from django.core.cache import cache
+        
+        with self.assertNumQueries(5):
+            self.search(sort_by='title', page_size=1)
+        
+        for number in range(6):
+            category = BookCategory.objects.create(name=f'Category {number}', created_by=self.user)
+            publisher = Publisher.objects.create(name=f'Publisher {number}', created_by=self.user)
+            self.create_book(f'Book {number}', category, publisher, year=2000 + number)
+        # Counts are cached briefly rather than invalidated, so start cold
+        cache.clear()
+        
+        with self.assertNumQueries(5):
+            data = self.search(sort_by='title', page_size=1)
+        self.assertEqual(len(data['facets']['category']), 8)
+        self.assertEqual(len(data['facets']['publisher']), 8)
+    
+    def test_facets_are_cached_by_normalised_query(self):
+        """Test the same search in another order or spelling reuses the cached facets"""
+        with CaptureQueriesContext(connection) as cold:
+            first = self.search(query='Primer', sort_by='title', page_size=1)
+        with CaptureQueriesContext(connection) as warm:
+            second = self.search(query='  primer ', sort_by='author', page_size=1)
+        
+        self.assertEqual(len(warm), len(cold) - 1)
+        self.assertEqual(second['facets'], first['facets'])
+
+
+class BookCategoryTreeTest(APITestCase):
+    """Test the materialised category tree and cached book counts"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        
+        cache.clear()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123'
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.publisher = Publisher.objects.create(name='Orchard Press', created_by=self.user)
+        
+        self.science = self.create_category('Science')
+        self.physics = self.create_category('Physics', self.science)
+        self.optics = self.create_category('Optics', self.physics)
+        self.biology = self.create_category('Biology', self.science)
+        
+        self.create_book('Science Today', self.science)
+        self.create_book('Light and Lenses', self.optics)
+        self.create_book('Lasers', self.optics)
+        self.create_book('Cells', self.biology)
+        
+        self.client.force_authenticate(user=self.user)
+    
+    def create_category(self, name, parent=None):
+        return BookCategory.objects.create(name=name, parent_category=parent, created_by=self.user)
+    
+    def create_book(self, title, category):
+        count = Book.objects.count()
+        return Book.objects.create(
+            title=title,
+            isbn=f'97800000002{count:02d}',
+            isbn13=f'97800000002{count:02d}',
+            category=category,
+            publisher=self.publisher,
+            library=self.library,
+            created_by=self.user
+        )
+    
+    def test_paths_are_maintained_on_save(self):
+        """Test paths, full paths and depths follow creates, moves and renames"""
+        self.assertEqual(self.optics.full_path, 'Science > Physics > Optics')
+        self.assertEqual(self.optics.depth, 2)
+        self.assertTrue(self.optics.path.startswith(self.physics.path))
+        
+        self.physics.parent_category = self.biology
+        self.physics.save()
+        self.science.name = 'Natural Sciences'
+        self.science.save()
+        
+        self.optics.refresh_from_db()
+        self.assertEqual(self.optics.full_path, 'Natural Sciences > Biology > Physics > Optics')
+        self.assertEqual(self.optics.depth, 3)
+        self.assertTrue(self.optics.path.startswith(self.biology.path))
+        
+        from django.core.exceptions import ValidationError
+        self.science.parent_category = self.optics
+        with self.assertRaises(ValidationError):
+            self.science.save()
+    
+    def test_subcategories_in_one_query(self):
+        """Test descendants come from one query and skip deleted subtrees"""
+        with self.assertNumQueries(1):
+            descendants = self.science.get_all_subcategories()
+        self.assertEqual(set(descendants), {self.physics.id, self.optics.id, self.biology.id})
+        
+        self.physics.is_deleted = True
+        self.physics.save()
+        self.assertEqual(self.science.get_all_subcategories(), [self.biology.id])
+    
+    def test_book_counts_include_subcategories_and_are_cached(self):
+        """Test rolled-up counts are computed once and refreshed by changes"""
+        with self.assertNumQueries(2):
+            self.assertEqual(self.science.get_all_books_count(), 4)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.physics.get_all_books_count(), 2)
+            self.assertEqual(self.optics.get_all_books_count(), 2)
+            self.assertEqual(self.biology.get_all_books_count(), 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_book('Prisms', self.optics)
+        self.assertEqual(self.science.get_all_books_count(), 5)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.physics.is_deleted = True
+            self.physics.save()
+        self.assertEqual(self.science.get_all_books_count(), 2)
+        self.assertEqual(self.physics.get_all_books_count(), 3)
+    
+    def test_category_list_queries_do_not_grow_with_rows(self):
+        """Test the category list costs the same queries however many categories it shows"""
+        url = reverse('books:category-list')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.get(url)
+        counts = {category['name']: category['books_count'] for category in response.data['results']}
+        self.assertEqual(counts, {'Science': 4, 'Physics': 2, 'Optics': 2, 'Biology': 1})
+        
+        for number in range(5):
+            self.create_category(f'Topic {number}', self.biology)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 9)
+        self.assertEqual(len(many), len(few))
+        
+        biology = next(category for category in response.data['results'] if category['name'] == 'Biology')
+        self.assertEqual(biology['subcategories_count'], 5)
+        self.assertEqual(biology['full_path'], 'Science > Biology')
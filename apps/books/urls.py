@@ -15,6 +15,7 @@ urlpatterns = [
     # Books
     path('', views.BookListView.as_view(), name='book-list'),
     path('search/', views.search_books, name='book-search'),
+    path('autocomplete/', views.autocomplete_books, name='book-autocomplete'),
     path('<uuid:id>/', views.BookDetailView.as_view(), name='book-detail'),
     
     # Book Reservations
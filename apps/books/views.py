@@ -4,10 +4,13 @@ Views for books app
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Q, Count, Avg, F
+from rest_framework.filters import OrderingFilter
+from django_filters.rest_framework import DjangoFilterBackend
+from django.db.models import Q, Count, Avg, Min
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from django.http import HttpResponse, Http404
+from apps.core.counters import increment_counter
 from apps.core.permissions import IsAdminUser
 from .models import (
     BookCategory, Author, Publisher, Book, BookReservation,
@@ -20,8 +23,11 @@ from .serializers import (
     BookReservationCreateSerializer, BookDigitalAccessSerializer,
     BookReviewSerializer, BookWishlistSerializer, BookReadingListSerializer,
     BookStatisticsSerializer, BookRecommendationSerializer,
-    BookSearchSerializer, DigitalBookAccessSerializer
+    BookSearchSerializer, BookAutocompleteSerializer, DigitalBookAccessSerializer
 )
+from .autocomplete import suggest
+from .facets import AVAILABLE_BOOKS, get_facets
+from .search import BookSearchFilter, get_search_backend
 import mimetypes
 import os
 
@@ -35,6 +41,8 @@ class BookCategoryListView(generics.ListAPIView):
         return BookCategory.objects.filter(
             is_active=True,
             is_deleted=False
+        ).select_related('parent_category').annotate(
+            live_subcategories=Count('subcategories', filter=Q(subcategories__is_deleted=False))
         ).order_by('sort_order', 'name')
 
 
@@ -66,11 +74,11 @@ class BookListView(generics.ListAPIView):
     """List books with filtering and search"""
     serializer_class = BookListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, BookSearchFilter, OrderingFilter]
     filterset_fields = [
         'category', 'book_type', 'status', 'library', 'language',
         'is_featured', 'is_new_arrival', 'is_popular', 'is_premium'
     ]
-    search_fields = ['title', 'subtitle', 'isbn', 'isbn13', 'description']
     ordering_fields = [
         'title', 'publication_date', 'average_rating', 'total_reviews',
         'view_count', 'created_at'
@@ -114,7 +122,7 @@ class BookDetailView(generics.RetrieveAPIView):
         instance = self.get_object()
         
         # Increment view count
-        Book.objects.filter(id=instance.id).update(view_count=F('view_count') + 1)
+        increment_counter(Book, instance.id, 'view_count')
         
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -131,17 +139,6 @@ def search_books(request):
     queryset = Book.objects.filter(is_deleted=False)
     
     # Apply filters
-    if data.get('query'):
-        queryset = queryset.filter(
-            Q(title__icontains=data['query']) |
-            Q(subtitle__icontains=data['query']) |
-            Q(description__icontains=data['query']) |
-            Q(authors__first_name__icontains=data['query']) |
-            Q(authors__last_name__icontains=data['query']) |
-            Q(publisher__name__icontains=data['query']) |
-            Q(keywords__icontains=data['query'])
-        ).distinct()
-    
     if data.get('category_id'):
         # Include subcategories
         category = get_object_or_404(BookCategory, id=data['category_id'])
@@ -165,11 +162,7 @@ def search_books(request):
     
     if data.get('is_available') is not None:
         if data['is_available']:
-            queryset = queryset.filter(
-                Q(book_type='PHYSICAL', available_copies__gt=0) |
-                Q(book_type='DIGITAL') |
-                Q(book_type='BOTH')
-            )
+            queryset = queryset.filter(AVAILABLE_BOOKS)
     
     if data.get('is_featured') is not None:
         queryset = queryset.filter(is_featured=data['is_featured'])
@@ -194,42 +187,98 @@ def search_books(request):
     
     # Apply user access restrictions
     user = request.user
+    library_scope = None
     if not user.is_super_admin:
         if user.role == 'ADMIN':
             admin_profile = getattr(user, 'admin_profile', None)
-            if admin_profile and admin_profile.managed_library:
-                queryset = queryset.filter(library=admin_profile.managed_library)
+            if admin_profile and admin_profile.managed_library_id:
+                library_scope = [admin_profile.managed_library_id]
             else:
-                queryset = queryset.none()
+                library_scope = []
         else:
-            accessible_libraries = user.library_access.filter(
+            library_scope = list(user.library_access.filter(
                 is_active=True
-            ).values_list('library_id', flat=True)
-            queryset = queryset.filter(library_id__in=accessible_libraries)
-    
-    # Apply sorting
-    sort_by = data.get('sort_by', 'title')
-    if sort_by == 'author':
-        queryset = queryset.order_by('authors__last_name', 'authors__first_name')
-    elif sort_by == 'publication_date':
-        queryset = queryset.order_by('-publication_date')
-    elif sort_by == 'rating':
-        queryset = queryset.order_by('-average_rating')
-    elif sort_by == 'popularity':
-        queryset = queryset.order_by('-total_reservations', '-view_count')
-    elif sort_by == 'newest':
-        queryset = queryset.order_by('-created_at')
+            ).values_list('library_id', flat=True))
+        queryset = queryset.filter(library_id__in=library_scope)
+    
+    # Match the query through the full-text index
+    query = data.get('query', '').strip()
+    backend = get_search_backend() if query else None
+    sort_by = data['sort_by']
+    offset = (data['page'] - 1) * data['page_size']
+    scores = {}
+    
+    # Facet counts cover every matching book, not just this page
+    facets = None
+    if data['facets']:
+        matching = backend.filter(queryset, query) if backend else queryset
+        facets = get_facets(matching, data, library_scope)
+    
+    if backend and sort_by == 'relevance':
+        count, hits = backend.rank(queryset, query, offset, data['page_size'])
+        scores = dict(hits)
+        books = Book.objects.filter(id__in=list(scores)).select_related(
+            'category', 'publisher', 'library'
+        ).prefetch_related('authors').in_bulk()
+        books = [books[book_id] for book_id in scores]
     else:
-        queryset = queryset.order_by('title')
+        if backend:
+            queryset = backend.filter(queryset, query)
+        
+        # Apply sorting
+        if sort_by == 'author':
+            queryset = queryset.annotate(
+                first_author=Min('authors__last_name')
+            ).order_by('first_author', 'title')
+        elif sort_by == 'publication_date':
+            queryset = queryset.order_by('-publication_date')
+        elif sort_by == 'rating':
+            queryset = queryset.order_by('-average_rating')
+        elif sort_by == 'popularity':
+            queryset = queryset.order_by('-total_reservations', '-view_count')
+        elif sort_by == 'newest':
+            queryset = queryset.order_by('-created_at')
+        else:
+            queryset = queryset.order_by('title')
+        
+        count = queryset.count()
+        books = list(queryset.select_related(
+            'category', 'publisher', 'library'
+        ).prefetch_related('authors')[offset:offset + data['page_size']])
+    
+    highlights = backend.highlights(query, [book.id for book in books]) if backend else {}
     
     # Serialize results
-    serializer = BookListSerializer(
-        queryset.distinct(), many=True, context={'request': request}
-    )
+    results = BookListSerializer(books, many=True, context={'request': request}).data
+    for book, result in zip(books, results):
+        if book.id in scores:
+            result['score'] = scores[book.id]
+        if backend:
+            result['highlights'] = highlights.get(book.id, {})
+    
+    response = {
+        'count': count,
+        'page': data['page'],
+        'page_size': data['page_size'],
+        'results': results
+    }
+    if facets is not None:
+        response['facets'] = facets
+    
+    return Response(response)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def autocomplete_books(request):
+    """Suggest book titles, authors and categories as the user types"""
+    serializer = BookAutocompleteSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
     
+    query = serializer.validated_data['q']
     return Response({
-        'count': queryset.distinct().count(),
-        'results': serializer.data
+        'query': query,
+        'suggestions': suggest(query, serializer.validated_data['limit'])
     })
 
 
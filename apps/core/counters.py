@@ -0,0 +1,201 @@
+"""
+Write-coalescing counters for denormalised statistics
+
+Counters such as ``Seat.total_bookings`` or ``Book.view_count`` are bumped on
+hot paths. Instead of a read-modify-save of the whole row, an increment is
+added to a Redis hash and the hash is flushed in batches, with one UPDATE per
+model, so busy seats and books stop queueing on their row locks. Without Redis
+an increment is applied straight away with an atomic F() update.
+
+Counters are derived data: the reconciliation jobs recompute them from their
+source tables and correct any drift.
+"""
+import logging
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+from django.apps import apps
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Case, When, Value, F
+from django.db.models.functions import Greatest
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FLUSH_THRESHOLD = 500
+COUNTER_PENDING_KEY = 'counters:pending'
+COUNTER_FLUSH_SCHEDULED_KEY = 'counters:flush_scheduled'
+RECONCILE_BATCH_SIZE = 500
+
+
+def _redis():
+    """Raw Redis connection behind the default cache, or None"""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def _coerce(model_field, amount):
+    """Convert a buffered amount to the type of the counter column"""
+    if isinstance(model_field, models.DecimalField):
+        return Decimal(str(amount)).quantize(Decimal(1).scaleb(-model_field.decimal_places))
+    return int(amount)
+
+
+def _adjusted(model_field, amount):
+    """Counter column plus an amount, never below zero"""
+    return Greatest(
+        F(model_field.name) + Value(_coerce(model_field, amount)),
+        Value(_coerce(model_field, 0)),
+        output_field=model_field
+    )
+
+
+def increment_counter(model, pk, field, amount=1, buffered=True):
+    """
+    Add to a counter column of one row
+
+    Args:
+        model: Model class owning the counter
+        pk: Primary key of the row
+        field: Name of the counter column
+        amount: Amount to add, may be negative
+        buffered: Coalesce with other increments; pass False for counters
+            that gate decisions, such as event capacity
+    """
+    if not amount:
+        return
+    redis = _redis() if buffered else None
+    if redis is None:
+        _apply_now(model, pk, field, amount)
+        return
+    # Buffer only once the change is committed, so a rollback leaves no trace
+    transaction.on_commit(lambda: _buffer(redis, model, pk, field, amount))
+
+
+def _apply_now(model, pk, field, amount):
+    model.objects.filter(pk=pk).update(**{field: _adjusted(model._meta.get_field(field), amount)})
+
+
+def _buffer(redis, model, pk, field, amount):
+    member = f'{model._meta.label}|{pk}|{field}'
+    try:
+        pipe = redis.pipeline()
+        pipe.hincrbyfloat(cache.make_key(COUNTER_PENDING_KEY), member, float(amount))
+        pipe.hlen(cache.make_key(COUNTER_PENDING_KEY))
+        _, pending = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Counter buffer unavailable, applying {member} directly: {e}")
+        _apply_now(model, pk, field, amount)
+        return
+
+    if pending >= COUNTER_FLUSH_THRESHOLD and cache.add(COUNTER_FLUSH_SCHEDULED_KEY, 1, 30):
+        from .tasks import flush_buffered_counters
+        flush_buffered_counters.delay()
+
+
+def flush_counters():
+    """
+    Write buffered increments to the database
+
+    The pending hash is renamed before it is read, so increments that arrive
+    during a flush go to a fresh hash and are picked up by the next one.
+
+    Returns:
+        int: Number of counters written
+    """
+    redis = _redis()
+    if redis is None:
+        return 0
+    from redis.exceptions import ResponseError
+
+    cache.delete(COUNTER_FLUSH_SCHEDULED_KEY)
+    pending_key = cache.make_key(COUNTER_PENDING_KEY)
+    batch_key = cache.make_key(f'counters:flushing:{uuid.uuid4().hex}')
+    try:
+        redis.rename(pending_key, batch_key)
+    except ResponseError:
+        # Nothing buffered
+        return 0
+
+    batch = redis.hgetall(batch_key)
+    deltas = defaultdict(dict)
+    for member, amount in batch.items():
+        label, pk, field = member.decode().split('|')
+        deltas[label][(pk, field)] = Decimal(amount.decode())
+
+    try:
+        apply_counter_deltas(deltas)
+    except Exception:
+        # Hand the batch back so the next flush retries it
+        pipe = redis.pipeline()
+        for member, amount in batch.items():
+            pipe.hincrbyfloat(pending_key, member, float(amount))
+        pipe.delete(batch_key)
+        pipe.execute()
+        raise
+
+    redis.delete(batch_key)
+    return len(batch)
+
+
+def apply_counter_deltas(deltas):
+    """
+    Apply coalesced increments with one UPDATE per model
+
+    Args:
+        deltas: Amounts keyed by model label, then by (pk, field)
+    """
+    with transaction.atomic():
+        for label, changes in deltas.items():
+            model = apps.get_model(label)
+            amounts_by_field = defaultdict(dict)
+            for (pk, field), amount in changes.items():
+                amounts_by_field[field][pk] = amount
+            model.objects.filter(pk__in={pk for pk, _ in changes}).update(**{
+                field: _delta_case(model._meta.get_field(field), amounts)
+                for field, amounts in amounts_by_field.items()
+            })
+
+
+def _delta_case(model_field, amounts):
+    return Case(
+        *[When(pk=pk, then=_adjusted(model_field, amount)) for pk, amount in amounts.items()],
+        default=F(model_field.name),
+        output_field=model_field
+    )
+
+
+def reconcile_counter(model, field, true_values):
+    """
+    Overwrite a counter with values recomputed from its source table
+
+    Flush buffered increments first; an increment buffered while this runs is
+    applied on top and corrected by the next reconciliation.
+
+    Args:
+        true_values: Correct value by primary key; rows missing from it are
+            reset to zero
+
+    Returns:
+        int: Number of rows corrected
+    """
+    model_field = model._meta.get_field(field)
+    drift = {}
+    for pk, value in model.objects.values_list('pk', field).iterator():
+        expected = _coerce(model_field, true_values.get(pk, 0))
+        if value != expected:
+            drift[pk] = expected
+
+    pks = list(drift)
+    for start in range(0, len(pks), RECONCILE_BATCH_SIZE):
+        chunk = pks[start:start + RECONCILE_BATCH_SIZE]
+        model.objects.filter(pk__in=chunk).update(**{
+            field: Case(
+                *[When(pk=pk, then=Value(drift[pk])) for pk in chunk],
+                output_field=model_field
+            )
+        })
+    return len(drift)
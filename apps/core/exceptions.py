@@ -0,0 +1,14 @@
+"""
+Custom API exceptions for Smart Lib
+"""
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class ConflictError(APIException):
+    """
+    Raised when a request loses a race for a shared resource
+    """
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The resource was modified by another request.'
+    default_code = 'conflict'
@@ -2,9 +2,104 @@
 Core models that provide base functionality for other apps
 """
 from django.db import models
+import copy
 import uuid
 
 
+class DirtyFieldsMixin(models.Model):
+    """
+    Abstract model that remembers the field values an instance was loaded or
+    last saved with, so signals can see what changed without re-reading the row
+    """
+    class Meta:
+        abstract = True
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_fields()
+        return instance
+    
+    def _snapshot_fields(self, fields=None):
+        """Record current values of the given (or all loaded) fields"""
+        deferred = self.get_deferred_fields()
+        snapshot = dict(self.__dict__.get('_loaded_values') or {}) if fields is not None else {}
+        for field in self._meta.concrete_fields:
+            if field.attname in deferred:
+                continue
+            if fields is not None and field.name not in fields and field.attname not in fields:
+                continue
+            value = getattr(self, field.attname)
+            snapshot[field.attname] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+        self._loaded_values = snapshot
+    
+    def _get_loaded_values(self):
+        loaded = self.__dict__.get('_loaded_values')
+        if loaded is None:
+            if self._state.adding:
+                return {}
+            # Saved instances that were never loaded, e.g. from bulk_create
+            row = type(self)._base_manager.using(self._state.db).filter(pk=self.pk).values(
+                *[field.attname for field in self._meta.concrete_fields]
+            ).first()
+            loaded = self._loaded_values = row or {}
+        return loaded
+    
+    def previous_value(self, field_name):
+        """
+        Value a field had when the instance was loaded or last saved; None for
+        instances that are being added
+        """
+        field = self._meta.get_field(field_name)
+        return self._get_loaded_values().get(field.attname)
+    
+    @property
+    def changed_fields(self):
+        """Names of fields that differ from their loaded values"""
+        loaded = self._get_loaded_values()
+        return {
+            field.name for field in self._meta.concrete_fields
+            if field.attname in loaded and getattr(self, field.attname) != loaded[field.attname]
+        }
+    
+    def has_changed(self, field_name):
+        """Check if a field differs from its loaded value"""
+        return field_name in self.changed_fields
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            # New rows have no previous values
+            self._loaded_values = {}
+        super().save(*args, **kwargs)
+        # Receivers of post_save still see the previous values
+        self._snapshot_fields(kwargs.get('update_fields'))
+    
+    def save_changed(self, **kwargs):
+        """
+        Save only the fields that changed since the instance was loaded
+        
+        Returns:
+            bool: False if there was nothing to save
+        """
+        if self._state.adding:
+            self.save(**kwargs)
+            return True
+        
+        changed = self.changed_fields
+        if not changed:
+            return False
+        auto_now = {
+            field.name for field in self._meta.concrete_fields
+            if getattr(field, 'auto_now', False)
+        }
+        self.save(update_fields=changed | auto_now, **kwargs)
+        return True
+    
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._snapshot_fields(fields)
+
+
 class TimeStampedModel(models.Model):
     """
     Abstract base model that provides self-updating created and modified fields
@@ -64,7 +159,7 @@ class AuditModel(models.Model):
         abstract = True
 
 
-class BaseModel(TimeStampedModel, SoftDeleteModel, AuditModel):
+class BaseModel(DirtyFieldsMixin, TimeStampedModel, SoftDeleteModel, AuditModel):
     """
     Base model that combines all common functionality
     """
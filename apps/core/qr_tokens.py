@@ -0,0 +1,110 @@
+"""
+Signed, self-expiring QR check-in tokens
+
+A token carries everything a check-in needs to know (what it is for, whose it
+is and when it may be used) signed with HMAC-SHA256 under the project secret,
+so it is verified without a database read and issuing one writes nothing. The
+nonce of a token is recorded in the cache when it is used, so the same code
+cannot be replayed for the same action.
+"""
+import secrets
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+from .utils import SmartLibCache
+
+QR_TOKEN_SALT = 'smartlib.qr-token'
+REPLAY_LEEWAY_SECONDS = 60
+
+
+class QRTokenError(Exception):
+    """Raised when a QR token is malformed, forged, expired or already used"""
+
+
+def _encode_claim(value):
+    if isinstance(value, uuid.UUID):
+        return value.hex
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return value
+
+
+def issue_qr_token(kind, object_id, user_id, expires_at, **claims):
+    """
+    Sign a compact QR payload
+
+    UUID claims are stored as hex and datetimes as epoch seconds; read them
+    back with ``claim_time``.
+
+    Returns:
+        str: URL-safe token to encode in the QR code
+    """
+    payload = {
+        'k': kind,
+        'i': _encode_claim(uuid.UUID(str(object_id))),
+        'u': _encode_claim(uuid.UUID(str(user_id))),
+        'exp': _encode_claim(expires_at),
+        'n': secrets.token_urlsafe(6),
+    }
+    payload.update({key: _encode_claim(value) for key, value in claims.items()})
+    return signing.Signer(salt=QR_TOKEN_SALT).sign_object(payload, compress=True)
+
+
+def _expiry(claims, expiry_claim):
+    """Epoch seconds a token is valid until, falling back to its issuance expiry"""
+    return claims.get(expiry_claim, claims['exp'])
+
+
+def verify_qr_token(token, kind, user=None, at=None, expiry_claim='exp'):
+    """
+    Check the signature, kind, owner and expiry of a token
+
+    Args:
+        user: Required owner of the token, if any
+        at: When the token was presented, for scans synced later; defaults to now
+        expiry_claim: Claim holding the expiry for this use, such as the end
+            of a booking for check-out; tokens without it use ``exp``
+
+    Returns:
+        dict: The token claims
+
+    Raises:
+        QRTokenError: If the token cannot be used
+    """
+    try:
+        claims = signing.Signer(salt=QR_TOKEN_SALT).unsign_object(token)
+    except (signing.BadSignature, ValueError, TypeError):
+        raise QRTokenError("Invalid QR code")
+
+    if not isinstance(claims, dict) or claims.get('k') != kind:
+        raise QRTokenError("Invalid QR code")
+    if user is not None and claims.get('u') != user.id.hex:
+        raise QRTokenError("Invalid QR code")
+    if 'exp' not in claims:
+        raise QRTokenError("Invalid QR code")
+    if _expiry(claims, expiry_claim) < (at or timezone.now()).timestamp():
+        raise QRTokenError("QR code has expired")
+    return claims
+
+
+def claim_time(claims, key):
+    """Read an epoch-seconds claim as an aware datetime"""
+    return datetime.fromtimestamp(claims[key], tz=dt_timezone.utc)
+
+
+def consume_qr_token(claims, action, expiry_claim='exp'):
+    """
+    Record that a token was used for an action
+
+    The nonce is kept until shortly after the token expires for that action,
+    after which the expiry check rejects the token anyway.
+
+    Raises:
+        QRTokenError: If the token was already used for this action
+    """
+    timeout = max(int(_expiry(claims, expiry_claim) - timezone.now().timestamp()), 0) + REPLAY_LEEWAY_SECONDS
+    key = SmartLibCache.get_cache_key('qr_used', action, claims['n'])
+    if not cache.add(key, 1, timeout):
+        raise QRTokenError("QR code has already been used")
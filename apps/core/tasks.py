@@ -0,0 +1,21 @@
+"""
+Celery tasks for core app
+"""
+from celery import shared_task
+from .counters import flush_counters
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_buffered_counters():
+    """Write buffered statistics counters to the database"""
+    try:
+        flushed = flush_counters()
+        
+        return f"Flushed {flushed} counters"
+        
+    except Exception as e:
+        logger.error(f"Error in flush_buffered_counters: {e}")
+        return f"Error: {e}"
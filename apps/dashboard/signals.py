@@ -0,0 +1,53 @@
+"""
+Signals for dashboard app
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.seats.models import SeatBooking
+from apps.books.models import BookReservation
+from apps.events.models import Event, EventRegistration
+from .summary import invalidate_user_summaries
+
+SUMMARY_TABLE_BY_MODEL = {
+    SeatBooking: 'seat_bookings',
+    BookReservation: 'book_reservations',
+    EventRegistration: 'event_registrations',
+}
+
+
+@receiver(post_save, sender=SeatBooking)
+def invalidate_seat_booking_summary(sender, instance, created, **kwargs):
+    """Drop the user's cached booking counts when a booking is made or changes state"""
+    if created or instance.changed_fields & {'status', 'booking_date', 'is_deleted'}:
+        invalidate_user_summaries([instance.user_id], ['seat_bookings'])
+
+
+@receiver(post_save, sender=BookReservation)
+def invalidate_book_reservation_summary(sender, instance, created, **kwargs):
+    """Drop the user's cached reservation counts when a reservation is made or changes state"""
+    if created or instance.changed_fields & {'status', 'is_deleted'}:
+        invalidate_user_summaries([instance.user_id], ['book_reservations'])
+
+
+@receiver(post_save, sender=EventRegistration)
+def invalidate_event_registration_summary(sender, instance, created, **kwargs):
+    """Drop the user's cached registration counts when a registration is made or changes state"""
+    if created or instance.changed_fields & {'status', 'event', 'is_deleted'}:
+        invalidate_user_summaries([instance.user_id], ['event_registrations'])
+
+
+@receiver(post_delete, sender=SeatBooking)
+@receiver(post_delete, sender=BookReservation)
+@receiver(post_delete, sender=EventRegistration)
+def invalidate_summary_on_delete(sender, instance, **kwargs):
+    """Drop the user's cached counts when a row is deleted outright"""
+    invalidate_user_summaries([instance.user_id], [SUMMARY_TABLE_BY_MODEL[sender]])
+
+
+@receiver(post_save, sender=Event)
+def invalidate_registrant_summaries(sender, instance, created, **kwargs):
+    """Drop the registrants' cached counts when an event moves to another day"""
+    if not created and instance.has_changed('start_date'):
+        invalidate_user_summaries(
+            instance.registrations.values_list('user_id', flat=True), ['event_registrations']
+        )
@@ -0,0 +1,104 @@
+"""
+Per-user activity summaries
+
+The home screen and the booking summary show how many seat bookings, book
+reservations and event registrations a user has in each state. Each table is
+summarised with one query using conditional aggregation, and the result is
+cached per user and per day. Saves of the underlying rows drop the cached
+summary through signals; bulk status updates call
+``invalidate_user_summaries`` themselves.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from apps.core.utils import SmartLibCache
+
+USER_SUMMARY_TIMEOUT = 10 * 60
+SUMMARY_TABLES = ('seat_bookings', 'book_reservations', 'event_registrations')
+CURRENT_BOOKING_STATUSES = ['CONFIRMED', 'CHECKED_IN']
+ACTIVE_RESERVATION_STATUSES = ['PENDING', 'CONFIRMED', 'READY_FOR_PICKUP', 'CHECKED_OUT']
+UPCOMING_REGISTRATION_STATUSES = ['CONFIRMED', 'WAITLISTED']
+
+
+def _seat_booking_summary(user_id, today):
+    from apps.seats.models import SeatBooking
+
+    return SeatBooking.objects.filter(user_id=user_id, is_deleted=False).aggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(status='COMPLETED')),
+        no_shows=Count('id', filter=Q(status='NO_SHOW')),
+        current=Count('id', filter=Q(booking_date=today, status__in=CURRENT_BOOKING_STATUSES)),
+        upcoming=Count('id', filter=Q(booking_date__gt=today, status='CONFIRMED')),
+    )
+
+
+def _book_reservation_summary(user_id, today):
+    from apps.books.models import BookReservation
+
+    return BookReservation.objects.filter(user_id=user_id, is_deleted=False).aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status__in=ACTIVE_RESERVATION_STATUSES)),
+        checked_out=Count('id', filter=Q(status='CHECKED_OUT')),
+    )
+
+
+def _event_registration_summary(user_id, today):
+    from apps.events.models import EventRegistration
+
+    return EventRegistration.objects.filter(user_id=user_id, is_deleted=False).aggregate(
+        total=Count('id'),
+        upcoming=Count('id', filter=Q(
+            event__start_date__gte=today, status__in=UPCOMING_REGISTRATION_STATUSES
+        )),
+        attended=Count('id', filter=Q(status='ATTENDED')),
+    )
+
+
+SUMMARY_BUILDERS = {
+    'seat_bookings': _seat_booking_summary,
+    'book_reservations': _book_reservation_summary,
+    'event_registrations': _event_registration_summary,
+}
+
+
+def _summary_key(user_id, table, today):
+    return SmartLibCache.get_user_cache_key(user_id, f'summary:{table}:{today.isoformat()}')
+
+
+def get_user_summary(user_id, tables=SUMMARY_TABLES):
+    """
+    Counts of a user's rows per state, one dict per table
+
+    Cached tables are read with one cache round trip; each missing table
+    costs one query.
+    """
+    today = timezone.now().date()
+    keys = {table: _summary_key(user_id, table, today) for table in tables}
+    cached = cache.get_many(list(keys.values()))
+
+    summary = {}
+    missing = {}
+    for table, key in keys.items():
+        if key in cached:
+            summary[table] = cached[key]
+        else:
+            summary[table] = missing[key] = SUMMARY_BUILDERS[table](user_id, today)
+    if missing:
+        cache.set_many(missing, USER_SUMMARY_TIMEOUT)
+    return summary
+
+
+def invalidate_user_summaries(user_ids, tables=SUMMARY_TABLES):
+    """Drop the cached summaries of the given users once the current transaction commits"""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    def invalidate():
+        today = timezone.now().date()
+        cache.delete_many([
+            _summary_key(user_id, table, today) for user_id in user_ids for table in tables
+        ])
+
+    transaction.on_commit(invalidate)
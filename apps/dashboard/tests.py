@@ -0,0 +1,211 @@
+"""
+Tests for dashboard app
+"""
+import time as perf_time
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from datetime import time, timedelta
+from apps.library.models import Library, LibraryFloor, LibrarySection
+from apps.seats.models import Seat, SeatBooking
+from apps.events.models import Event, EventCategory, EventRegistration
+from .summary import get_user_summary
+
+User = get_user_model()
+
+# Requests served by the test client on a warm cache stay well inside this
+LATENCY_BUDGET_SECONDS = 0.25
+
+
+class UserSummaryTest(APITestCase):
+    """Test cached single-query summaries behind the home screen endpoints"""
+
+    def setUp(self):
+        cache.clear()
+
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123'
+        )
+
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+
+        self.section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            created_by=self.user
+        )
+
+        self.seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.section,
+            seat_number='S001',
+            created_by=self.user
+        )
+
+        today = timezone.now().date()
+        self.today_booking = self.book(today, 'CONFIRMED')
+        for days in range(1, 6):
+            self.book(today + timedelta(days=days), 'CONFIRMED')
+        for days in range(1, 9):
+            self.book(today - timedelta(days=days), 'COMPLETED')
+        self.book(today - timedelta(days=9), 'NO_SHOW')
+
+        category = EventCategory.objects.create(name='Workshop', created_by=self.user)
+        event_date = today + timedelta(days=3)
+        self.event = Event.objects.create(
+            title='Test Workshop',
+            category=category,
+            organizer=self.user,
+            start_date=event_date,
+            end_date=event_date,
+            start_time=time(10, 0),
+            end_time=time(12, 0),
+            library=self.library,
+            registration_deadline=timezone.now() + timedelta(days=1),
+            status='REGISTRATION_OPEN',
+            created_by=self.user
+        )
+        EventRegistration.objects.create(
+            user=self.user,
+            event=self.event,
+            created_by=self.user
+        )
+
+        self.client.force_authenticate(user=self.user)
+
+    def book(self, booking_date, booking_status):
+        return SeatBooking.objects.create(
+            user=self.user,
+            seat=self.seat,
+            booking_date=booking_date,
+            start_time=time(23, 0),
+            end_time=time(23, 30),
+            status=booking_status,
+            created_by=self.user
+        )
+
+    def timed_get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            started = perf_time.perf_counter()
+            response = self.client.get(url)
+            elapsed = perf_time.perf_counter() - started
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(queries), elapsed
+
+    def test_summary_counts_each_table_in_one_query(self):
+        """Test each table is summarised with a single conditional aggregate"""
+        with self.assertNumQueries(3):
+            summary = get_user_summary(self.user.id)
+
+        self.assertEqual(summary['seat_bookings'], {
+            'total': 15, 'completed': 8, 'no_shows': 1, 'current': 1, 'upcoming': 5
+        })
+        self.assertEqual(summary['book_reservations'], {'total': 0, 'active': 0, 'checked_out': 0})
+        self.assertEqual(summary['event_registrations'], {'total': 1, 'upcoming': 1, 'attended': 0})
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_summary(self.user.id), summary)
+
+    def test_dashboard_stats_query_and_latency_budget(self):
+        """Test dashboard stats cost a fixed number of queries and stay within budget"""
+        url = reverse('dashboard:stats')
+
+        response, cold_queries, _ = self.timed_get(url)
+        self.assertEqual(response.data['current_bookings'], 1)
+        self.assertEqual(response.data['upcoming_events'], 1)
+        self.assertEqual(response.data['completion_rate'], round(8 / 15 * 100, 1))
+        # Profile plus one aggregate per table
+        self.assertEqual(cold_queries, 4)
+
+        _, warm_queries, elapsed = self.timed_get(url)
+        self.assertEqual(warm_queries, 1)
+        self.assertLess(elapsed, LATENCY_BUDGET_SECONDS)
+
+    def test_booking_summary_query_and_latency_budget(self):
+        """Test the booking summary costs the same queries however many bookings there are"""
+        url = reverse('seats:booking-summary')
+
+        response, cold_queries, _ = self.timed_get(url)
+        self.assertEqual(response.data['statistics']['total_bookings'], 15)
+        self.assertEqual(response.data['statistics']['no_shows'], 1)
+        self.assertEqual(len(response.data['current_bookings']), 1)
+        self.assertEqual(len(response.data['upcoming_bookings']), 5)
+        self.assertEqual(len(response.data['recent_bookings']), 5)
+        # Three booking lists plus the aggregate
+        self.assertEqual(cold_queries, 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for days in range(10, 20):
+                self.book(timezone.now().date() - timedelta(days=days), 'COMPLETED')
+        _, queries, _ = self.timed_get(url)
+        self.assertEqual(queries, 4)
+
+        _, warm_queries, elapsed = self.timed_get(url)
+        self.assertEqual(warm_queries, 3)
+        self.assertLess(elapsed, LATENCY_BUDGET_SECONDS)
+
+    def test_state_change_invalidates_summary(self):
+        """Test cancelling a booking or a registration refreshes the cached counts"""
+        get_user_summary(self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.today_booking.status = 'CANCELLED'
+            self.today_booking.save()
+            registration = EventRegistration.objects.get(user=self.user)
+            registration.status = 'CANCELLED'
+            registration.save()
+
+        summary = get_user_summary(self.user.id)
+        self.assertEqual(summary['seat_bookings']['current'], 0)
+        self.assertEqual(summary['event_registrations']['upcoming'], 0)
+
+    def test_bulk_no_show_invalidates_summary(self):
+        """Test bookings marked as no-shows in bulk refresh the cached counts"""
+        from apps.seats.tasks import process_expired_bookings
+
+        get_user_summary(self.user.id)
+        SeatBooking.objects.filter(pk=self.today_booking.pk).update(
+            auto_cancel_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            process_expired_bookings()
+
+        summary = get_user_summary(self.user.id)['seat_bookings']
+        self.assertEqual(summary['no_shows'], 2)
+        self.assertEqual(summary['current'], 0)
+
+    def test_moved_event_invalidates_registrant_summary(self):
+        """Test moving an event into the past refreshes its registrants' counts"""
+        get_user_summary(self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.start_date = timezone.now().date() - timedelta(days=1)
+            self.event.end_date = self.event.start_date
+            self.event.save()
+
+        self.assertEqual(get_user_summary(self.user.id)['event_registrations']['upcoming'], 0)
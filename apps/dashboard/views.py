@@ -4,14 +4,11 @@ Views for dashboard app
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from django.db.models import Sum, Count, Avg
-from django.utils import timezone
 from datetime import timedelta
 from apps.core.models import ActivityLog
 from apps.core.serializers import ActivityLogSerializer
 from apps.accounts.models import User, UserProfile
-from apps.seats.models import SeatBooking
-from apps.books.models import BookReservation
-from apps.events.models import EventRegistration
+from .summary import get_user_summary
 
 
 class DashboardStatsView(generics.GenericAPIView):
@@ -20,7 +17,6 @@ class DashboardStatsView(generics.GenericAPIView):
     
     def get(self, request):
         user = request.user
-        today = timezone.now().date()
         
         # Get user profile
         try:
@@ -28,28 +24,17 @@ class DashboardStatsView(generics.GenericAPIView):
         except UserProfile.DoesNotExist:
             profile = None
         
+        # Counts per state, one query per table, cached until the user's rows change
+        summary = get_user_summary(user.id)
+        
         # Current bookings (today)
-        current_bookings = SeatBooking.objects.filter(
-            user=user,
-            booking_date=today,
-            status__in=['CONFIRMED', 'CHECKED_IN'],
-            is_deleted=False
-        ).count()
+        current_bookings = summary['seat_bookings']['current']
         
         # Active book reservations
-        active_reservations = BookReservation.objects.filter(
-            user=user,
-            status__in=['PENDING', 'CONFIRMED', 'READY_FOR_PICKUP', 'CHECKED_OUT'],
-            is_deleted=False
-        ).count()
+        active_reservations = summary['book_reservations']['active']
         
         # Upcoming events
-        upcoming_events = EventRegistration.objects.filter(
-            user=user,
-            event__start_date__gte=today,
-            status__in=['CONFIRMED', 'WAITLISTED'],
-            is_deleted=False
-        ).count()
+        upcoming_events = summary['event_registrations']['upcoming']
         
         # Loyalty points
         loyalty_points = profile.loyalty_points if profile else 0
@@ -64,16 +49,8 @@ class DashboardStatsView(generics.GenericAPIView):
         events_attended = profile.events_attended if profile else 0
         
         # Completion rate
-        total_bookings = SeatBooking.objects.filter(
-            user=user,
-            is_deleted=False
-        ).count()
-        
-        completed_bookings = SeatBooking.objects.filter(
-            user=user,
-            status='COMPLETED',
-            is_deleted=False
-        ).count()
+        total_bookings = summary['seat_bookings']['total']
+        completed_bookings = summary['seat_bookings']['completed']
         
         completion_rate = (completed_bookings / total_bookings * 100) if total_bookings > 0 else 0
         
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
+from apps.dashboard.summary import invalidate_user_summaries
 from .models import (
     EventCategory, EventSpeaker, Event, EventRegistration,
     EventFeedback, EventWaitlist, EventResource, EventStatistics,
@@ -262,7 +263,9 @@ class EventRegistrationAdmin(admin.ModelAdmin):
     
     def mark_attended(self, request, queryset):
         from django.utils import timezone
-        updated = queryset.filter(status='CONFIRMED').update(
+        registrations = queryset.filter(status='CONFIRMED')
+        invalidate_user_summaries(registrations.values_list('user_id', flat=True), ['event_registrations'])
+        updated = registrations.update(
             status='ATTENDED',
             check_in_time=timezone.now()
         )
@@ -9,6 +9,8 @@ from apps.core.utils import generate_unique_code, generate_qr_code
 from datetime import timedelta
 import uuid
 
+EVENT_ATTENDANCE_POINTS = 25
+
 User = get_user_model()
 
 
@@ -324,6 +326,9 @@ class EventRegistration(BaseModel):
         ('REFUNDED', 'Refunded'),
     ]
     
+    # Registrations that do not take a place at the event
+    UNCOUNTED_STATUSES = ['CANCELLED', 'WAITLISTED', 'REFUNDED']
+    
     PAYMENT_STATUS = [
         ('PENDING', 'Payment Pending'),
         ('COMPLETED', 'Payment Completed'),
@@ -407,27 +412,110 @@ class EventRegistration(BaseModel):
         return self.status == 'ATTENDED' and self.check_in_time and not self.check_out_time
     
     def generate_qr_code(self):
-        """Generate QR code for event check-in"""
+        """
+        Generate a signed QR check-in token
+
+        The token expires on its own, so nothing is written to the database.
+        """
         from django.utils import timezone
-        from apps.core.utils import generate_secure_token
-        
-        # Generate QR code data
-        qr_data = {
-            'registration_id': str(self.id),
-            'registration_code': self.registration_code,
-            'event_id': str(self.event.id),
-            'event_code': self.event.event_code,
-            'user_id': str(self.user.id),
-            'access_token': generate_secure_token()[:16],
-            'generated_at': timezone.now().isoformat()
-        }
-        
-        import json
-        self.qr_code_data = json.dumps(qr_data)
+        from apps.core.qr_tokens import issue_qr_token
+        
+        event_start = timezone.make_aware(
+            timezone.datetime.combine(self.event.start_date, self.event.start_time)
+        )
         self.qr_code_expires_at = timezone.now() + timedelta(hours=24)
-        self.save()
         
-        return qr_data
+        # Allow check-in 30 minutes before event starts
+        self.qr_code_data = issue_qr_token(
+            'event_registration', self.id, self.user_id, self.qr_code_expires_at,
+            e=self.event_id,
+            nbf=event_start - timedelta(minutes=30)
+        )
+        return self.qr_code_data
+    
+    @classmethod
+    def check_in_with_token(cls, claims, user, check_in_method='QR'):
+        """
+        Check in with a verified QR token using conditional updates instead of
+        loading and saving the registration
+        
+        Returns:
+            tuple: (success, message)
+        
+        Raises:
+            QRTokenError: If the token was already used to check in
+        """
+        from django.db import transaction
+        from django.db.models import F
+        from django.utils import timezone
+        from apps.accounts.models import UserProfile, LoyaltyTransaction
+        from apps.core.counters import increment_counter
+        from apps.core.models import ActivityLog
+        from apps.core.qr_tokens import claim_time, consume_qr_token
+        from apps.dashboard.summary import invalidate_user_summaries
+        
+        now = timezone.now()
+        if now < claim_time(claims, 'nbf'):
+            return False, "Cannot check in at this time"
+        consume_qr_token(claims, 'check_in')
+        
+        with transaction.atomic():
+            checked_in = cls.objects.filter(
+                id=claims['i'],
+                user=user,
+                event_id=claims['e'],
+                status='CONFIRMED',
+                check_in_time__isnull=True,
+                is_deleted=False
+            ).update(status='ATTENDED', check_in_time=now, updated_at=now)
+            if not checked_in:
+                return False, "Cannot check in at this time"
+            
+            # Update event statistics
+            increment_counter(Event, claims['e'], 'total_attendees')
+            invalidate_user_summaries([user.pk], ['event_registrations'])
+            
+            registration_id = str(uuid.UUID(claims['i']))
+            event_id = str(uuid.UUID(claims['e']))
+            event_title = Event.objects.filter(pk=event_id).values_list('title', flat=True).first()
+            
+            # The update skips the status-change signal, so apply its effects here
+            ActivityLog.objects.bulk_create([
+                ActivityLog(
+                    user=user,
+                    activity_type='EVENT_REGISTER',
+                    description='Registration status changed from CONFIRMED to ATTENDED',
+                    metadata={
+                        'registration_id': registration_id,
+                        'event_id': event_id,
+                        'event_title': event_title,
+                        'old_status': 'CONFIRMED',
+                        'new_status': 'ATTENDED',
+                    }
+                ),
+                ActivityLog(
+                    user=user,
+                    activity_type='EVENT_ATTEND',
+                    description='Checked in to event',
+                    metadata={
+                        'registration_id': registration_id,
+                        'event_id': event_id,
+                        'check_in_method': check_in_method,
+                    }
+                ),
+            ])
+            if UserProfile.objects.filter(user=user).update(
+                loyalty_points=F('loyalty_points') + EVENT_ATTENDANCE_POINTS
+            ):
+                LoyaltyTransaction.objects.create(
+                    user=user,
+                    points=EVENT_ATTENDANCE_POINTS,
+                    transaction_type='EARNED',
+                    description=f'Event attendance: {event_title}',
+                    created_by=user
+                )
+        
+        return True, "Checked in successfully"
     
     def check_in(self, check_in_method='QR'):
         """Check in to the event"""
@@ -441,8 +529,8 @@ class EventRegistration(BaseModel):
         self.save()
         
         # Update event statistics
-        self.event.total_attendees += 1
-        self.event.save()
+        from apps.core.counters import increment_counter
+        increment_counter(Event, self.event_id, 'total_attendees')
         
         # Log activity
         from apps.core.models import ActivityLog
@@ -488,9 +576,9 @@ class EventRegistration(BaseModel):
         self.status = 'CANCELLED'
         self.save()
         
-        # Update event statistics
-        self.event.total_registrations = max(0, self.event.total_registrations - 1)
-        self.event.save()
+        # Update event statistics; capacity checks read this, so it is not buffered
+        from apps.core.counters import increment_counter
+        increment_counter(Event, self.event_id, 'total_registrations', -1, buffered=False)
         
         return True, "Registration cancelled successfully"
 
@@ -226,10 +226,6 @@ class EventRegistrationCreateSerializer(serializers.ModelSerializer):
         
         registration = super().create(validated_data)
         
-        # Update event statistics
-        event.total_registrations += 1
-        event.save()
-        
         return registration
 
 
@@ -386,13 +382,8 @@ class EventSearchSerializer(serializers.Serializer):
 
 class QRCodeDataSerializer(serializers.Serializer):
     """Serializer for QR code data"""
-    registration_id = serializers.UUIDField()
-    registration_code = serializers.CharField()
-    event_id = serializers.UUIDField()
-    event_code = serializers.CharField()
-    user_id = serializers.UUIDField()
-    access_token = serializers.CharField()
-    generated_at = serializers.DateTimeField()
+    qr_data = serializers.CharField(help_text="Signed check-in token")
+    expires_at = serializers.DateTimeField()
 
 
 class CheckInSerializer(serializers.Serializer):
@@ -4,14 +4,19 @@ Signals for events app
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from django.db.models import Avg
+from apps.core.counters import increment_counter
 from apps.core.models import ActivityLog
-from .models import Event, EventRegistration, EventFeedback
+from .models import Event, EventRegistration, EventFeedback, EVENT_ATTENDANCE_POINTS
 
 
 @receiver(post_save, sender=EventRegistration)
 def update_event_statistics(sender, instance, created, **kwargs):
     """Update event statistics when registration is created or updated"""
     if created:
+        # Capacity checks read this counter, so it is not buffered
+        if instance.status not in EventRegistration.UNCOUNTED_STATUSES:
+            increment_counter(Event, instance.event_id, 'total_registrations', buffered=False)
+        
         # Log registration activity
         ActivityLog.objects.create(
             user=instance.user,
@@ -63,36 +68,33 @@ def update_event_rating(sender, instance, created, **kwargs):
 @receiver(pre_save, sender=EventRegistration)
 def track_registration_status_changes(sender, instance, **kwargs):
     """Track registration status changes"""
-    if instance.pk:
-        try:
-            old_instance = EventRegistration.objects.get(pk=instance.pk)
-            
-            # Track status changes
-            if old_instance.status != instance.status:
-                ActivityLog.objects.create(
-                    user=instance.user,
-                    activity_type='EVENT_REGISTER',
-                    description=f'Registration status changed from {old_instance.status} to {instance.status}',
-                    metadata={
-                        'registration_id': str(instance.id),
-                        'event_id': str(instance.event.id),
-                        'event_title': instance.event.title,
-                        'old_status': old_instance.status,
-                        'new_status': instance.status,
-                    }
+    if instance._state.adding:
+        return
+    
+    old_status = instance.previous_value('status')
+    
+    # Track status changes
+    if old_status != instance.status:
+        ActivityLog.objects.create(
+            user=instance.user,
+            activity_type='EVENT_REGISTER',
+            description=f'Registration status changed from {old_status} to {instance.status}',
+            metadata={
+                'registration_id': str(instance.id),
+                'event_id': str(instance.event.id),
+                'event_title': instance.event.title,
+                'old_status': old_status,
+                'new_status': instance.status,
+            }
+        )
+        
+        # Handle specific status changes
+        if instance.status == 'ATTENDED' and old_status == 'CONFIRMED':
+            # User checked in - award loyalty points
+            if hasattr(instance.user, 'profile'):
+                instance.user.profile.add_loyalty_points(
+                    EVENT_ATTENDANCE_POINTS, f'Event attendance: {instance.event.title}'
                 )
-                
-                # Handle specific status changes
-                if instance.status == 'ATTENDED' and old_instance.status == 'CONFIRMED':
-                    # User checked in - award loyalty points
-                    if hasattr(instance.user, 'profile'):
-                        points = 25  # Points for event attendance
-                        instance.user.profile.add_loyalty_points(
-                            points, f'Event attendance: {instance.event.title}'
-                        )
-                        
-        except EventRegistration.DoesNotExist:
-            pass
 
 
 @receiver(post_save, sender=Event)
@@ -11,98 +11,6 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-@shared_task
-def process_event_reminders():
-    """Send event reminders to registered users"""
-    try:
-        from apps.core.utils import send_notification_email
-        
-        now = timezone.now()
-        reminders_sent = 0
-        
-        # Find events that need reminders
-        upcoming_events = Event.objects.filter(
-            status__in=['REGISTRATION_OPEN', 'REGISTRATION_CLOSED'],
-            send_reminders=True,
-            is_deleted=False
-        )
-        
-        for event in upcoming_events:
-            event_start = timezone.datetime.combine(event.start_date, event.start_time)
-            
-            # Check each reminder hour
-            for reminder_hours in event.reminder_hours:
-                reminder_time = event_start - timedelta(hours=reminder_hours)
-                
-                # Send reminder if it's time (within 30 minutes window)
-                if abs((now - reminder_time).total_seconds()) <= 1800:  # 30 minutes
-                    registrations = EventRegistration.objects.filter(
-                        event=event,
-                        status__in=['CONFIRMED', 'ATTENDED'],
-                        reminder_sent=False,
-                        is_deleted=False
-                    ).select_related('user')
-                    
-                    for registration in registrations:
-                        try:
-                            subject = f"Smart Lib - Event Reminder: {event.title}"
-                            message = f"""
-                            Dear {registration.user.get_full_name()},
-                            
-                            This is a reminder for your upcoming event:
-                            
-                            Event: {event.title}
-                            Date: {event.start_date}
-                            Time: {event.start_time} - {event.end_time}
-                            Location: {event.library.name}
-                            {f"Venue: {event.venue_details}" if event.venue_details else ""}
-                            {f"Online Link: {event.online_meeting_link}" if event.is_online else ""}
-                            
-                            Please arrive on time. Don't forget to bring any required materials.
-                            
-                            Best regards,
-                            Smart Lib Team
-                            """
-                            
-                            html_message = f"""
-                            <h2>Event Reminder</h2>
-                            <p>Dear {registration.user.get_full_name()},</p>
-                            <p>This is a reminder for your upcoming event:</p>
-                            <div style="background-color: #f8f9fa; padding: 20px; border-radius: 5px; margin: 20px 0;">
-                                <h3>{event.title}</h3>
-                                <p><strong>Date:</strong> {event.start_date}</p>
-                                <p><strong>Time:</strong> {event.start_time} - {event.end_time}</p>
-                                <p><strong>Location:</strong> {event.library.name}</p>
-                                {f"<p><strong>Venue:</strong> {event.venue_details}</p>" if event.venue_details else ""}
-                                {f"<p><strong>Online Link:</strong> <a href='{event.online_meeting_link}'>Join Meeting</a></p>" if event.is_online else ""}
-                            </div>
-                            <p>Please arrive on time. Don't forget to bring any required materials.</p>
-                            <p>Best regards,<br>Smart Lib Team</p>
-                            """
-                            
-                            send_notification_email(
-                                to_email=registration.user.email,
-                                subject=subject,
-                                message=message,
-                                html_message=html_message
-                            )
-                            
-                            registration.reminder_sent = True
-                            registration.save()
-                            reminders_sent += 1
-                            
-                        except Exception as e:
-                            logger.error(f"Error sending reminder for registration {registration.id}: {e}")
-                            continue
-        
-        logger.info(f"Sent {reminders_sent} event reminders")
-        return f"Sent {reminders_sent} reminders"
-        
-    except Exception as e:
-        logger.error(f"Error sending event reminders: {e}")
-        return f"Error: {e}"
-
-
 @shared_task
 def process_no_shows():
     """Mark registrations as no-show for events that have started"""
@@ -555,4 +463,37 @@ def generate_event_certificates():
         
     except Exception as e:
         logger.error(f"Error generating certificates: {e}")
-        return f"Error: {e}"
\ No newline at end of file
+        return f"Error: {e}"
+
+
+@shared_task
+def reconcile_event_counters():
+    """Recompute event registration and attendance counters from registrations"""
+    try:
+        from apps.core.counters import flush_counters, reconcile_counter
+        
+        flush_counters()
+        
+        registrations = EventRegistration.objects.filter(is_deleted=False)
+        total_registrations = dict(
+            registrations.exclude(
+                status__in=EventRegistration.UNCOUNTED_STATUSES
+            ).values('event_id').annotate(count=Count('id')).values_list('event_id', 'count')
+        )
+        total_attendees = dict(
+            registrations.filter(
+                check_in_time__isnull=False
+            ).values('event_id').annotate(count=Count('id')).values_list('event_id', 'count')
+        )
+        
+        corrected = (
+            reconcile_counter(Event, 'total_registrations', total_registrations) +
+            reconcile_counter(Event, 'total_attendees', total_attendees)
+        )
+        
+        logger.info(f"Corrected {corrected} event counters")
+        return f"Corrected {corrected} event counters"
+        
+    except Exception as e:
+        logger.error(f"Error in reconcile_event_counters: {e}")
+        return f"Error: {e}"
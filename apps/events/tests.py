@@ -386,6 +386,9 @@ class EventRegistrationAPITest(APITestCase):
         self.assertEqual(registration.user, self.user)
         self.assertEqual(registration.event, self.event)
         self.assertEqual(registration.status, 'CONFIRMED')
+        
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.total_registrations, 1)
     
     def test_list_user_registrations(self):
         """Test listing user's registrations"""
@@ -411,6 +414,9 @@ class EventRegistrationAPITest(APITestCase):
             created_by=self.user
         )
         
+        registration.refresh_from_db()
+        updated_at = registration.updated_at
+        
         url = reverse('events:generate-qr-code', kwargs={'registration_id': registration.id})
         response = self.client.post(url)
         
@@ -418,10 +424,47 @@ class EventRegistrationAPITest(APITestCase):
         self.assertIn('qr_data', response.data)
         self.assertIn('expires_at', response.data)
         
-        # Check that registration was updated
+        # The token is signed, not stored
         registration.refresh_from_db()
-        self.assertIsNotNone(registration.qr_code_data)
-        self.assertIsNotNone(registration.qr_code_expires_at)
+        self.assertEqual(registration.updated_at, updated_at)
+        self.assertIsNone(registration.qr_code_expires_at)
+    
+    def test_check_in_with_qr_token(self):
+        """Test checking in with a signed QR token"""
+        registration = EventRegistration.objects.create(
+            user=self.user,
+            event=self.event,
+            created_by=self.user
+        )
+        
+        # Open the check-in window
+        start = timezone.localtime() + timedelta(minutes=10)
+        Event.objects.filter(pk=self.event.pk).update(
+            start_date=start.date(),
+            start_time=start.time().replace(microsecond=0)
+        )
+        
+        url = reverse('events:generate-qr-code', kwargs={'registration_id': registration.id})
+        token = self.client.post(url).data['qr_data']
+        
+        from apps.accounts.models import UserProfile
+        points = UserProfile.objects.get(user=self.user).loyalty_points
+        
+        url = reverse('events:check-in')
+        response = self.client.post(url, {'qr_code_data': token}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        registration.refresh_from_db()
+        self.event.refresh_from_db()
+        self.assertEqual(registration.status, 'ATTENDED')
+        self.assertEqual(self.event.total_attendees, 1)
+        
+        # Attendance points are awarded as on the save path
+        self.assertEqual(UserProfile.objects.get(user=self.user).loyalty_points, points + 25)
+        
+        # A used token cannot be replayed
+        response = self.client.post(url, {'qr_code_data': token}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
     
     def test_event_summary(self):
         """Test user event summary"""
@@ -8,6 +8,7 @@ from django.db.models import Q, Count, Avg
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from apps.core.permissions import IsAdminUser
+from apps.core.qr_tokens import QRTokenError, verify_qr_token, consume_qr_token
 from .models import (
     EventCategory, EventSpeaker, Event, EventRegistration,
     EventFeedback, EventWaitlist, EventResource, EventStatistics,
@@ -20,7 +21,7 @@ from .serializers import (
     EventSeriesSerializer, EventNotificationSerializer, EventSearchSerializer,
     CheckInSerializer, CheckOutSerializer, QRCodeDataSerializer
 )
-import json
+import uuid
 
 
 class EventCategoryListView(generics.ListAPIView):
@@ -249,7 +250,7 @@ class EventRegistrationDetailView(generics.RetrieveUpdateDestroyAPIView):
 def generate_qr_code(request, registration_id):
     """Generate QR code for event registration"""
     try:
-        registration = EventRegistration.objects.get(
+        registration = EventRegistration.objects.select_related('event').get(
             id=registration_id,
             user=request.user,
             is_deleted=False
@@ -298,27 +299,27 @@ def check_in_event(request):
                 status=status.HTTP_404_NOT_FOUND
             )
     elif data.get('qr_code_data'):
+        # Signed tokens are checked in without loading the registration
         try:
-            qr_data = json.loads(data['qr_code_data'])
-            registration = EventRegistration.objects.get(
-                id=qr_data['registration_id'],
-                registration_code=qr_data['registration_code'],
-                user=request.user,
-                is_deleted=False
+            claims = verify_qr_token(data['qr_code_data'], 'event_registration', request.user)
+            success, message = EventRegistration.check_in_with_token(
+                claims, request.user, data.get('check_in_method', 'QR')
             )
-            
-            # Verify access token if provided
-            if data.get('access_token') and qr_data.get('access_token') != data['access_token']:
-                return Response(
-                    {'error': 'Invalid access token'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-                
-        except (json.JSONDecodeError, KeyError, EventRegistration.DoesNotExist):
+        except QRTokenError as e:
             return Response(
-                {'error': 'Invalid QR code'},
+                {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        
+        if success:
+            return Response({
+                'message': message,
+                'registration_id': str(uuid.UUID(claims['i']))
+            })
+        return Response(
+            {'error': message},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     # Perform check-in
     success, message = registration.check_in(data.get('check_in_method', 'QR'))
@@ -343,6 +344,7 @@ def check_out_event(request):
     serializer.is_valid(raise_exception=True)
     
     data = serializer.validated_data
+    claims = None
     
     # Get registration
     if data.get('registration_id'):
@@ -359,23 +361,33 @@ def check_out_event(request):
             )
     elif data.get('qr_code_data'):
         try:
-            qr_data = json.loads(data['qr_code_data'])
+            claims = verify_qr_token(data['qr_code_data'], 'event_registration', request.user)
             registration = EventRegistration.objects.get(
-                id=qr_data['registration_id'],
-                registration_code=qr_data['registration_code'],
+                id=claims['i'],
                 user=request.user,
                 is_deleted=False
             )
-        except (json.JSONDecodeError, KeyError, EventRegistration.DoesNotExist):
+        except QRTokenError as e:
             return Response(
-                {'error': 'Invalid QR code'},
+                {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        except EventRegistration.DoesNotExist:
+            return Response(
+                {'error': 'Registration not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
     
     # Perform check-out
     success, message = registration.check_out(data.get('check_out_method', 'QR'))
     
     if success:
+        if claims is not None:
+            # Record the code only once it has checked the registration out
+            try:
+                consume_qr_token(claims, 'check_out')
+            except QRTokenError:
+                pass
         return Response({
             'message': message,
             'registration': EventRegistrationSerializer(registration).data
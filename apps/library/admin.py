@@ -378,6 +378,13 @@ class LibraryConfigurationAdmin(admin.ModelAdmin):
                 'overstay_penalty_per_hour'
             )
         }),
+        ('No-show Settings', {
+            'fields': (
+                'enable_early_release', 'early_release_no_show_probability',
+                'early_release_minutes', 'enable_overbooking',
+                'overbooking_no_show_probability', 'max_overbookings_per_day'
+            )
+        }),
         ('Loyalty Settings', {
             'fields': (
                 'booking_completion_points', 'review_submission_points',
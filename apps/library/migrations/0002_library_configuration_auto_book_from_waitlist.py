@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="libraryconfiguration",
+            name="auto_book_from_waitlist",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:59
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0002_library_configuration_auto_book_from_waitlist"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="libraryconfiguration",
+            name="early_release_minutes",
+            field=models.PositiveIntegerField(default=10),
+        ),
+        migrations.AddField(
+            model_name="libraryconfiguration",
+            name="early_release_no_show_probability",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0.5,
+                max_digits=3,
+                validators=[
+                    django.core.validators.MinValueValidator(0),
+                    django.core.validators.MaxValueValidator(1),
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="libraryconfiguration",
+            name="enable_early_release",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="libraryconfiguration",
+            name="enable_overbooking",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="libraryconfiguration",
+            name="max_overbookings_per_day",
+            field=models.PositiveIntegerField(default=5),
+        ),
+        migrations.AddField(
+            model_name="libraryconfiguration",
+            name="overbooking_no_show_probability",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0.7,
+                max_digits=3,
+                validators=[
+                    django.core.validators.MinValueValidator(0),
+                    django.core.validators.MaxValueValidator(1),
+                ],
+            ),
+        ),
+    ]
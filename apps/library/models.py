@@ -5,13 +5,16 @@ from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from apps.core.models import BaseModel, TimeStampedModel
 from apps.core.utils import generate_unique_code
+from .occupancy import OccupancyMixin
 import uuid
 
 
-class Library(BaseModel):
+class Library(OccupancyMixin, BaseModel):
     """
     Model representing a library location
     """
+    occupancy_scope = 'library'
+    
     LIBRARY_TYPES = [
         ('MAIN', 'Main Library'),
         ('BRANCH', 'Branch Library'),
@@ -109,26 +112,6 @@ class Library(BaseModel):
         now = timezone.now().time()
         return self.opening_time <= now <= self.closing_time
     
-    @property
-    def available_seats(self):
-        """Get number of available seats"""
-        from apps.seats.models import Seat
-        return Seat.objects.filter(
-            library=self,
-            status='AVAILABLE',
-            is_deleted=False
-        ).count()
-    
-    @property
-    def occupied_seats(self):
-        """Get number of occupied seats"""
-        from apps.seats.models import Seat
-        return Seat.objects.filter(
-            library=self,
-            status='OCCUPIED',
-            is_deleted=False
-        ).count()
-    
     def get_occupancy_rate(self):
         """Calculate current occupancy rate"""
         if self.total_seats == 0:
@@ -151,10 +134,12 @@ class Library(BaseModel):
         ).exists()
 
 
-class LibraryFloor(BaseModel):
+class LibraryFloor(OccupancyMixin, BaseModel):
     """
     Model representing floors within a library
     """
+    occupancy_scope = 'floor'
+    
     library = models.ForeignKey(Library, on_delete=models.CASCADE, related_name='floors')
     floor_number = models.IntegerField()
     floor_name = models.CharField(max_length=100)
@@ -183,24 +168,20 @@ class LibraryFloor(BaseModel):
     def __str__(self):
         return f"{self.library.name} - {self.floor_name}"
     
-    @property
-    def available_seats(self):
-        """Get available seats on this floor"""
-        return self.seats.filter(status='AVAILABLE', is_deleted=False).count()
-    
     @property
     def occupancy_rate(self):
         """Calculate floor occupancy rate"""
         if self.total_seats == 0:
             return 0
-        occupied = self.seats.filter(status='OCCUPIED', is_deleted=False).count()
-        return (occupied / self.total_seats) * 100
+        return (self.occupied_seats / self.total_seats) * 100
 
 
-class LibrarySection(BaseModel):
+class LibrarySection(OccupancyMixin, BaseModel):
     """
     Model representing sections within a library floor
     """
+    occupancy_scope = 'section'
+    
     SECTION_TYPES = [
         ('SILENT', 'Silent Study'),
         ('GROUP', 'Group Study'),
@@ -246,15 +227,9 @@ class LibrarySection(BaseModel):
     def __str__(self):
         return f"{self.floor.library.name} - {self.floor.floor_name} - {self.name}"
     
-    @property
-    def available_seats(self):
-        """Get available seats in this section"""
-        return self.seats.filter(status='AVAILABLE', is_deleted=False).count()
-    
     def is_section_full(self):
         """Check if section is at capacity"""
-        current_occupancy = self.seats.filter(status='OCCUPIED', is_deleted=False).count()
-        return current_occupancy >= self.max_occupancy
+        return self.occupied_seats >= self.max_occupancy
 
 
 class LibraryAmenity(BaseModel):
@@ -544,6 +519,24 @@ class LibraryConfiguration(BaseModel):
     late_cancellation_penalty_points = models.PositiveIntegerField(default=5)
     overstay_penalty_per_hour = models.PositiveIntegerField(default=5)
     
+    # No-show Settings
+    enable_early_release = models.BooleanField(default=False)
+    early_release_no_show_probability = models.DecimalField(
+        max_digits=3,
+        decimal_places=2,
+        default=0.50,
+        validators=[MinValueValidator(0), MaxValueValidator(1)]
+    )
+    early_release_minutes = models.PositiveIntegerField(default=10)
+    enable_overbooking = models.BooleanField(default=False)
+    overbooking_no_show_probability = models.DecimalField(
+        max_digits=3,
+        decimal_places=2,
+        default=0.70,
+        validators=[MinValueValidator(0), MaxValueValidator(1)]
+    )
+    max_overbookings_per_day = models.PositiveIntegerField(default=5)
+    
     # Loyalty Settings
     booking_completion_points = models.PositiveIntegerField(default=10)
     review_submission_points = models.PositiveIntegerField(default=5)
@@ -560,6 +553,7 @@ class LibraryConfiguration(BaseModel):
     enable_recurring_bookings = models.BooleanField(default=False)
     enable_group_bookings = models.BooleanField(default=False)
     enable_waitlist = models.BooleanField(default=True)
+    auto_book_from_waitlist = models.BooleanField(default=False)
     enable_reviews = models.BooleanField(default=True)
     
     # Integration Settings
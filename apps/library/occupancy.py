@@ -0,0 +1,163 @@
+"""
+Live seat occupancy counters for libraries, floors and sections
+
+Seat counts per status are kept in the cache as plain integers so they can be
+adjusted with atomic INCR/DECR on every seat status transition and read for
+many libraries, floors or sections with a single MGET. Missing counters are
+rebuilt from the database with one grouped query per scope, and a periodic
+task reconciles everything to correct drift from bulk updates.
+"""
+from django.core.cache import cache
+from django.db.models import Count
+
+SCOPES = {
+    'library': 'library_id',
+    'floor': 'floor_id',
+    'section': 'section_id',
+}
+TRACKED_STATUSES = ['AVAILABLE', 'OCCUPIED']
+OCCUPANCY_TIMEOUT = 60 * 60
+
+
+def get_counter_key(scope, scope_id, seat_status):
+    """Generate cache key for one occupancy counter"""
+    return f"occupancy:{scope}:{scope_id}:{seat_status}"
+
+
+def _seat_scopes(library_id, floor_id, section_id):
+    return [('library', library_id), ('floor', floor_id), ('section', section_id)]
+
+
+def apply_seat_transition(library_id, floor_id, section_id, old_status, new_status):
+    """
+    Adjust counters for a seat moving from one status to another
+
+    Pass ``None`` as the old status for a new seat and as the new status for a
+    deleted one. Counters that are not cached yet are left for the next read to
+    rebuild.
+    """
+    if old_status == new_status:
+        return
+
+    for scope, scope_id in _seat_scopes(library_id, floor_id, section_id):
+        for seat_status, delta in ((old_status, -1), (new_status, 1)):
+            if seat_status not in TRACKED_STATUSES:
+                continue
+            try:
+                cache.incr(get_counter_key(scope, scope_id, seat_status), delta)
+            except ValueError:
+                pass
+
+
+def get_occupancy_counts(scope, scope_ids):
+    """
+    Read counters for many libraries, floors or sections at once
+
+    Returns:
+        dict: scope id -> {status: count} for every tracked status
+    """
+    scope_ids = list(scope_ids)
+    keys = {
+        get_counter_key(scope, scope_id, seat_status): (scope_id, seat_status)
+        for scope_id in scope_ids
+        for seat_status in TRACKED_STATUSES
+    }
+    cached = cache.get_many(list(keys))
+
+    counts = {scope_id: {} for scope_id in scope_ids}
+    for key, value in cached.items():
+        scope_id, seat_status = keys[key]
+        counts[scope_id][seat_status] = value
+
+    missing = [
+        scope_id for scope_id, scope_counts in counts.items()
+        if len(scope_counts) < len(TRACKED_STATUSES)
+    ]
+    if missing:
+        reconciled = reconcile_occupancy(scope, missing)
+        for scope_id in missing:
+            counts[scope_id] = reconciled[str(scope_id)]
+    return counts
+
+
+def reconcile_occupancy(scope, scope_ids=None):
+    """
+    Recount seats per status from the database and overwrite the counters
+
+    Returns:
+        dict: str(scope id) -> {status: count}
+    """
+    from apps.seats.models import Seat
+
+    field = SCOPES[scope]
+    seats = Seat.objects.filter(is_deleted=False, status__in=TRACKED_STATUSES)
+    if scope_ids is not None:
+        seats = seats.filter(**{f'{field}__in': scope_ids})
+
+    counts = {
+        str(scope_id): dict.fromkeys(TRACKED_STATUSES, 0)
+        for scope_id in scope_ids or []
+    }
+    for scope_id, seat_status, total in seats.values_list(field, 'status').annotate(
+        total=Count('id')
+    ).order_by():
+        counts.setdefault(str(scope_id), dict.fromkeys(TRACKED_STATUSES, 0))[seat_status] = total
+
+    cache.set_many(
+        {
+            get_counter_key(scope, scope_id, seat_status): total
+            for scope_id, scope_counts in counts.items()
+            for seat_status, total in scope_counts.items()
+        },
+        OCCUPANCY_TIMEOUT
+    )
+    return counts
+
+
+def reconcile_library_occupancy(library_ids=None):
+    """Reconcile the library, floor and section counters of the given libraries"""
+    from apps.library.models import Library, LibraryFloor, LibrarySection
+
+    # Pass explicit ids so scopes whose seats have all left a status reset to 0
+    if library_ids is None:
+        library_ids = list(Library.objects.filter(is_deleted=False).values_list('id', flat=True))
+    floors = LibraryFloor.objects.filter(library_id__in=library_ids, is_deleted=False)
+    sections = LibrarySection.objects.filter(floor__library_id__in=library_ids, is_deleted=False)
+
+    reconcile_occupancy('library', library_ids)
+    reconcile_occupancy('floor', list(floors.values_list('id', flat=True)))
+    reconcile_occupancy('section', list(sections.values_list('id', flat=True)))
+
+
+class OccupancyMixin:
+    """
+    Seat occupancy properties for libraries, floors and sections backed by the
+    cached counters
+    """
+    occupancy_scope = None
+
+    def get_occupancy(self):
+        """Counts of available and occupied seats"""
+        if getattr(self, '_occupancy', None) is None:
+            self._occupancy = get_occupancy_counts(self.occupancy_scope, [self.id])[self.id]
+        return self._occupancy
+
+    @property
+    def available_seats(self):
+        """Get number of available seats"""
+        return self.get_occupancy()['AVAILABLE']
+
+    @property
+    def occupied_seats(self):
+        """Get number of occupied seats"""
+        return self.get_occupancy()['OCCUPIED']
+
+
+def prefetch_occupancy(instances):
+    """Load counters for a list of libraries, floors or sections with one MGET"""
+    instances = [instance for instance in instances if getattr(instance, '_occupancy', None) is None]
+    if not instances:
+        return
+    counts = get_occupancy_counts(instances[0].occupancy_scope, [instance.id for instance in instances])
+    for instance in instances:
+        instance._occupancy = counts[instance.id]
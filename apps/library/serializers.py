@@ -4,6 +4,7 @@ Serializers for library app
 from rest_framework import serializers
 from django.db.models import Avg
 from apps.core.serializers import BaseModelSerializer
+from .occupancy import prefetch_occupancy
 from .models import (
     Library, LibraryFloor, LibrarySection, LibraryAmenity,
     LibraryOperatingHours, LibraryHoliday, LibraryReview,
@@ -11,6 +12,15 @@ from .models import (
 )
 
 
+class OccupancyListSerializer(serializers.ListSerializer):
+    """List serializer that reads seat occupancy counters for all rows at once"""
+    
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        prefetch_occupancy(items)
+        return super().to_representation(items)
+
+
 class LibraryAmenitySerializer(BaseModelSerializer):
     """Serializer for library amenities"""
     
@@ -63,6 +73,7 @@ class LibrarySectionSerializer(BaseModelSerializer):
     
     class Meta:
         model = LibrarySection
+        list_serializer_class = OccupancyListSerializer
         fields = [
             'id', 'name', 'section_type', 'section_type_display',
             'description', 'total_seats', 'available_seats', 'max_occupancy',
@@ -82,6 +93,7 @@ class LibraryFloorSerializer(BaseModelSerializer):
     
     class Meta:
         model = LibraryFloor
+        list_serializer_class = OccupancyListSerializer
         fields = [
             'id', 'floor_number', 'floor_name', 'description',
             'total_seats', 'available_seats', 'occupancy_rate',
@@ -107,6 +119,7 @@ class LibraryListSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Library
+        list_serializer_class = OccupancyListSerializer
         fields = [
             'id', 'name', 'code', 'library_type', 'library_type_display',
             'status', 'status_display', 'city', 'address', 'phone_number',
@@ -271,6 +284,9 @@ class LibraryConfigurationSerializer(BaseModelSerializer):
             'early_checkin_minutes', 'late_checkout_grace_minutes',
             'qr_code_expiry_minutes', 'no_show_penalty_points',
             'late_cancellation_penalty_points', 'overstay_penalty_per_hour',
+            'enable_early_release', 'early_release_no_show_probability',
+            'early_release_minutes', 'enable_overbooking',
+            'overbooking_no_show_probability', 'max_overbookings_per_day',
             'booking_completion_points', 'review_submission_points',
             'referral_points', 'reminder_hours_before',
             'send_booking_confirmations', 'send_checkin_reminders',
@@ -49,21 +49,16 @@ def update_library_rating(sender, instance, created, **kwargs):
 @receiver(pre_save, sender=LibraryReview)
 def log_review_approval(sender, instance, **kwargs):
     """Log when review gets approved"""
-    if instance.pk:
-        try:
-            old_instance = LibraryReview.objects.get(pk=instance.pk)
-            if not old_instance.is_approved and instance.is_approved:
-                # Review was just approved
-                ActivityLog.objects.create(
-                    user=instance.user,
-                    activity_type='PROFILE_UPDATE',
-                    description=f'Library review approved for {instance.library.name}',
-                    metadata={
-                        'library_id': str(instance.library.id),
-                        'library_name': instance.library.name,
-                        'rating': instance.rating,
-                        'approved_by': instance.approved_by.get_full_name() if instance.approved_by else 'System',
-                    }
-                )
-        except LibraryReview.DoesNotExist:
-            pass
\ No newline at end of file
+    if not instance._state.adding and not instance.previous_value('is_approved') and instance.is_approved:
+        # Review was just approved
+        ActivityLog.objects.create(
+            user=instance.user,
+            activity_type='PROFILE_UPDATE',
+            description=f'Library review approved for {instance.library.name}',
+            metadata={
+                'library_id': str(instance.library.id),
+                'library_name': instance.library.name,
+                'rating': instance.rating,
+                'approved_by': instance.approved_by.get_full_name() if instance.approved_by else 'System',
+            }
+        )
\ No newline at end of file
@@ -6,6 +6,7 @@ from django.utils import timezone
 from django.db.models import Count, Avg, Sum
 from datetime import timedelta, date
 from .models import Library, LibraryStatistics, LibraryNotification
+from .occupancy import reconcile_library_occupancy
 import logging
 
 logger = logging.getLogger(__name__)
@@ -75,9 +76,8 @@ def generate_daily_library_statistics():
                     cancellations=cancellations,
                     average_session_duration=avg_duration,
                     total_study_hours=total_hours,
-                    # These would be calculated from actual data
-                    peak_occupancy=0,
-                    average_occupancy=0.0,
+                    # Occupancy is filled in from the occupancy series
+                    # by build_daily_occupancy_series
                     subscription_revenue=0.0,
                     penalty_revenue=0.0,
                 )
@@ -120,54 +120,19 @@ def cleanup_expired_notifications():
 
 @shared_task
 def update_library_occupancy_stats():
-    """Update real-time occupancy statistics for libraries"""
+    """Refresh today's occupancy statistics for libraries from the occupancy series"""
     try:
-        from apps.seats.models import Seat
+        from apps.seats.tasks import build_daily_occupancy_series
         
+        today = timezone.now().date()
         libraries_updated = 0
         
-        for library in Library.objects.filter(
-            status='ACTIVE',
-            is_deleted=False
-        ):
-            try:
-                # Get current occupancy
-                total_seats = library.total_seats
-                occupied_seats = Seat.objects.filter(
-                    library=library,
-                    status='OCCUPIED',
-                    is_deleted=False
-                ).count()
-                
-                # Calculate occupancy rate
-                occupancy_rate = (occupied_seats / total_seats * 100) if total_seats > 0 else 0
-                
-                # Update today's statistics if exists
-                today = timezone.now().date()
-                stats, created = LibraryStatistics.objects.get_or_create(
-                    library=library,
-                    date=today,
-                    defaults={
-                        'peak_occupancy': occupied_seats,
-                        'average_occupancy': occupancy_rate,
-                    }
-                )
-                
-                if not created:
-                    # Update peak occupancy if current is higher
-                    if occupied_seats > stats.peak_occupancy:
-                        stats.peak_occupancy = occupied_seats
-                        stats.peak_hour = timezone.now().time()
-                    
-                    # Update average occupancy (simple moving average)
-                    stats.average_occupancy = (stats.average_occupancy + occupancy_rate) / 2
-                    stats.save()
-                
-                libraries_updated += 1
-                
-            except Exception as e:
-                logger.error(f"Error updating occupancy for library {library.name}: {e}")
-                continue
+        for library in Library.objects.filter(status='ACTIVE', is_deleted=False):
+            LibraryStatistics.objects.get_or_create(library=library, date=today)
+            libraries_updated += 1
+        
+        # Peak and average occupancy are swept from today's check-ins
+        build_daily_occupancy_series(today, today)
         
         logger.info(f"Updated occupancy stats for {libraries_updated} libraries")
         return f"Updated {libraries_updated} libraries"
@@ -177,6 +142,20 @@ def update_library_occupancy_stats():
         return f"Error: {e}"
 
 
+@shared_task
+def reconcile_occupancy_counters():
+    """Recount live occupancy counters from the database to correct drift"""
+    try:
+        reconcile_library_occupancy()
+        
+        logger.info("Reconciled library occupancy counters")
+        return "Reconciled occupancy counters"
+        
+    except Exception as e:
+        logger.error(f"Error in reconcile_occupancy_counters: {e}")
+        return f"Error: {e}"
+
+
 @shared_task
 def send_library_maintenance_reminders():
     """Send maintenance reminders for libraries"""
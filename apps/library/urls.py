@@ -11,6 +11,7 @@ urlpatterns = [
     path('', views.LibraryListView.as_view(), name='library-list'),
     path('search/', views.search_libraries, name='library-search'),
     path('<uuid:id>/', views.LibraryDetailView.as_view(), name='library-detail'),
+    path('<uuid:library_id>/occupancy/', views.library_occupancy_now, name='library-occupancy'),
     
     # Library Structure
     path('<uuid:library_id>/floors/', views.LibraryFloorListView.as_view(), name='library-floors'),
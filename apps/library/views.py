@@ -18,6 +18,7 @@ from .serializers import (
     LibraryHolidaySerializer, LibraryReviewSerializer, LibraryStatisticsSerializer,
     LibraryNotificationSerializer, LibraryConfigurationSerializer, LibrarySearchSerializer
 )
+from .occupancy import prefetch_occupancy
 
 
 class LibraryListView(generics.ListAPIView):
@@ -155,6 +156,66 @@ def search_libraries(request):
     })
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def library_occupancy_now(request, library_id):
+    """Get live seat occupancy of a library, its floors and sections"""
+    try:
+        library = Library.objects.get(id=library_id, is_deleted=False)
+    except Library.DoesNotExist:
+        return Response(
+            {'error': 'Library not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    if not library.can_user_access(request.user):
+        return Response(
+            {'error': "You don't have access to this library"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    floors = list(library.floors.filter(is_deleted=False).order_by('floor_number'))
+    sections = list(LibrarySection.objects.filter(
+        floor__library=library,
+        is_deleted=False
+    ).order_by('floor__floor_number', 'name'))
+    
+    # One counter read per scope
+    prefetch_occupancy([library])
+    prefetch_occupancy(floors)
+    prefetch_occupancy(sections)
+    
+    return Response({
+        'library_id': str(library.id),
+        'available_seats': library.available_seats,
+        'occupied_seats': library.occupied_seats,
+        'total_seats': library.total_seats,
+        'occupancy_rate': library.get_occupancy_rate(),
+        'floors': [
+            {
+                'id': str(floor.id),
+                'floor_number': floor.floor_number,
+                'available_seats': floor.available_seats,
+                'occupied_seats': floor.occupied_seats,
+                'total_seats': floor.total_seats,
+            }
+            for floor in floors
+        ],
+        'sections': [
+            {
+                'id': str(section.id),
+                'floor_id': str(section.floor_id),
+                'name': section.name,
+                'available_seats': section.available_seats,
+                'occupied_seats': section.occupied_seats,
+                'total_seats': section.total_seats,
+            }
+            for section in sections
+        ],
+        'as_of': timezone.now(),
+    })
+
+
 class LibraryFloorListView(generics.ListAPIView):
     """List floors for a specific library"""
     serializer_class = LibraryFloorSerializer
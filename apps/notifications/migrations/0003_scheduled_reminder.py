@@ -0,0 +1,133 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:09
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+from django.utils import timezone
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def _batches(queryset):
+    """Rows of a queryset in primary key order, a batch at a time"""
+    queryset = queryset.order_by('pk')
+    batch = list(queryset[:BACKFILL_BATCH_SIZE])
+    while batch:
+        yield batch
+        batch = list(queryset.filter(pk__gt=batch[-1].pk)[:BACKFILL_BATCH_SIZE])
+
+
+def schedule_existing_reminders(apps, schema_editor):
+    from apps.notifications.reminders import (
+        schedule_seat_booking_reminders, schedule_reservation_reminders, schedule_event_reminders,
+        SEAT_REMINDER_STATUSES, PICKUP_REMINDER_STATUSES, DUE_REMINDER_STATUSES,
+        EVENT_REMINDER_STATUSES
+    )
+
+    SeatBooking = apps.get_model('seats', 'SeatBooking')
+    BookReservation = apps.get_model('books', 'BookReservation')
+    Event = apps.get_model('events', 'Event')
+    now = timezone.now()
+
+    for bookings in _batches(SeatBooking.objects.filter(
+        status__in=SEAT_REMINDER_STATUSES,
+        booking_date__gte=now.date(),
+        is_deleted=False
+    )):
+        schedule_seat_booking_reminders(bookings)
+
+    for reservations in _batches(BookReservation.objects.filter(
+        Q(status__in=PICKUP_REMINDER_STATUSES, pickup_deadline__gt=now) |
+        Q(status__in=DUE_REMINDER_STATUSES, due_date__gt=now),
+        is_deleted=False
+    )):
+        for reservation in reservations:
+            schedule_reservation_reminders(reservation)
+
+    for events in _batches(Event.objects.filter(
+        status__in=EVENT_REMINDER_STATUSES,
+        send_reminders=True,
+        start_date__gte=now.date(),
+        is_deleted=False
+    )):
+        for event in events:
+            schedule_event_reminders(event)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "notifications",
+            "0002_rename_notificatio_user_id_e19395_idx_notificatio_user_id_05b4bc_idx_and_more",
+        ),
+        ("seats", "0003_no_show_prediction"),
+        ("books", "0001_initial"),
+        ("events", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScheduledReminder",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "reminder_type",
+                    models.CharField(
+                        choices=[
+                            ("SEAT_BOOKING", "Seat Booking"),
+                            ("BOOK_PICKUP", "Book Pickup"),
+                            ("BOOK_DUE", "Book Due"),
+                            ("EVENT", "Event"),
+                        ],
+                        max_length=15,
+                    ),
+                ),
+                ("object_id", models.UUIDField()),
+                ("lead_minutes", models.PositiveIntegerField()),
+                ("due_at", models.DateTimeField()),
+                ("expires_at", models.DateTimeField()),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="scheduled_reminders",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "notifications_scheduled_reminder",
+                "ordering": ["due_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["due_at"], name="notificatio_due_at_fb7974_idx"
+                    ),
+                    models.Index(
+                        fields=["reminder_type", "object_id"],
+                        name="notificatio_reminde_c19547_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("reminder_type", "object_id", "lead_minutes"),
+                        name="unique_scheduled_reminder",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(schedule_existing_reminders, migrations.RunPython.noop),
+    ]
@@ -50,4 +50,43 @@ class Notification(TimeStampedModel):
             type=notification_type,
             action_url=action_url,
             metadata=metadata or {}
-        )
\ No newline at end of file
+        )
+
+
+class ScheduledReminder(TimeStampedModel):
+    """
+    Reminder due at an exact time for a booking, reservation or registration
+
+    Rows are written when the target is created or changed and deleted once
+    dispatched, so the table only ever holds pending reminders.
+    """
+    REMINDER_TYPES = [
+        ('SEAT_BOOKING', 'Seat Booking'),
+        ('BOOK_PICKUP', 'Book Pickup'),
+        ('BOOK_DUE', 'Book Due'),
+        ('EVENT', 'Event'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='scheduled_reminders')
+    reminder_type = models.CharField(max_length=15, choices=REMINDER_TYPES)
+    object_id = models.UUIDField()
+    lead_minutes = models.PositiveIntegerField()
+    due_at = models.DateTimeField()
+    expires_at = models.DateTimeField()  # When the booking, deadline or event starts
+    
+    class Meta:
+        db_table = 'notifications_scheduled_reminder'
+        ordering = ['due_at']
+        indexes = [
+            models.Index(fields=['due_at']),
+            models.Index(fields=['reminder_type', 'object_id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['reminder_type', 'object_id', 'lead_minutes'],
+                name='unique_scheduled_reminder'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_reminder_type_display()} reminder for {self.user.username} at {self.due_at}"
@@ -0,0 +1,371 @@
+"""
+Exact-time reminder scheduling
+
+Reminders for seat bookings, book reservations and event registrations are
+computed when the target is created or changed and kept in a table indexed
+on ``due_at``. A periodic dispatcher pops every due reminder in batches and
+sends them, so nothing is ever found by scanning bookings by the hour.
+
+Rescheduling replaces a target's pending reminders with a delete and a bulk
+insert. The dispatcher re-checks each target's current state before sending,
+so reminders left behind by bulk updates are never delivered stale.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from django.db import transaction
+from django.utils import timezone
+
+SEAT_BOOKING_LEAD_MINUTES = [24 * 60, 2 * 60, 30]
+BOOK_PICKUP_LEAD_MINUTES = [24 * 60]
+BOOK_DUE_LEAD_MINUTES = [2 * 24 * 60]
+DISPATCH_BATCH_SIZE = 500
+
+SEAT_REMINDER_STATUSES = ['CONFIRMED']
+PICKUP_REMINDER_STATUSES = ['CONFIRMED', 'READY_FOR_PICKUP']
+DUE_REMINDER_STATUSES = ['CHECKED_OUT']
+EVENT_REMINDER_STATUSES = ['REGISTRATION_OPEN', 'REGISTRATION_CLOSED']
+REGISTRATION_REMINDER_STATUSES = ['CONFIRMED', 'ATTENDED']
+
+
+def _local_datetime(day, start):
+    return timezone.make_aware(datetime.combine(day, start))
+
+
+def _reminders(reminder_type, object_id, user_id, starts_at, lead_minutes, now):
+    """Reminders still in the future for one target"""
+    from .models import ScheduledReminder
+
+    return [
+        ScheduledReminder(
+            user_id=user_id,
+            reminder_type=reminder_type,
+            object_id=object_id,
+            lead_minutes=minutes,
+            due_at=starts_at - timedelta(minutes=minutes),
+            expires_at=starts_at
+        )
+        for minutes in set(lead_minutes)
+        if starts_at - timedelta(minutes=minutes) > now
+    ]
+
+
+def replace_reminders(reminder_type, object_ids, reminders):
+    """Swap the pending reminders of the given targets for a new set"""
+    from .models import ScheduledReminder
+
+    with transaction.atomic():
+        ScheduledReminder.objects.filter(
+            reminder_type=reminder_type,
+            object_id__in=list(object_ids)
+        ).delete()
+        ScheduledReminder.objects.bulk_create(reminders, batch_size=DISPATCH_BATCH_SIZE)
+
+
+def schedule_seat_booking_reminders(bookings):
+    """Reschedule reminders for seat bookings; only confirmed ones get any"""
+    now = timezone.now()
+    reminders = []
+    for booking in bookings:
+        if booking.status in SEAT_REMINDER_STATUSES and not booking.is_deleted:
+            reminders += _reminders(
+                'SEAT_BOOKING', booking.id, booking.user_id,
+                _local_datetime(booking.booking_date, booking.start_time),
+                SEAT_BOOKING_LEAD_MINUTES, now
+            )
+    replace_reminders('SEAT_BOOKING', [booking.id for booking in bookings], reminders)
+
+
+def schedule_reservation_reminders(reservation):
+    """Reschedule pickup and due date reminders for a book reservation"""
+    now = timezone.now()
+    pickup_reminders = []
+    due_reminders = []
+    if not reservation.is_deleted:
+        if reservation.status in PICKUP_REMINDER_STATUSES and reservation.pickup_deadline:
+            pickup_reminders = _reminders(
+                'BOOK_PICKUP', reservation.id, reservation.user_id,
+                reservation.pickup_deadline, BOOK_PICKUP_LEAD_MINUTES, now
+            )
+        if reservation.status in DUE_REMINDER_STATUSES and reservation.due_date:
+            due_reminders = _reminders(
+                'BOOK_DUE', reservation.id, reservation.user_id,
+                reservation.due_date, BOOK_DUE_LEAD_MINUTES, now
+            )
+    replace_reminders('BOOK_PICKUP', [reservation.id], pickup_reminders)
+    replace_reminders('BOOK_DUE', [reservation.id], due_reminders)
+
+
+def schedule_event_reminders(event, registrations=None):
+    """
+    Reschedule reminders for an event's registrations at its reminder hours
+
+    Args:
+        registrations: (id, user_id, status) tuples; all of the event's by default
+    """
+    if registrations is None:
+        registrations = list(event.registrations.filter(is_deleted=False).values_list(
+            'id', 'user_id', 'status'
+        ))
+
+    now = timezone.now()
+    reminders = []
+    if event.send_reminders and event.status in EVENT_REMINDER_STATUSES and not event.is_deleted:
+        starts_at = _local_datetime(event.start_date, event.start_time)
+        lead_minutes = [round(float(hours) * 60) for hours in event.reminder_hours or []]
+        for registration_id, user_id, status in registrations:
+            if status in REGISTRATION_REMINDER_STATUSES:
+                reminders += _reminders('EVENT', registration_id, user_id, starts_at, lead_minutes, now)
+    replace_reminders('EVENT', [registration_id for registration_id, _, _ in registrations], reminders)
+
+
+def _seat_booking_messages(object_ids):
+    from apps.seats.models import SeatBooking
+
+    bookings = SeatBooking.objects.filter(
+        id__in=object_ids,
+        status__in=SEAT_REMINDER_STATUSES,
+        is_deleted=False
+    ).select_related('user', 'seat', 'seat__library')
+
+    messages = {}
+    for booking in bookings:
+        details = f"""
+        Library: {booking.seat.library.name}
+        Seat: {booking.seat.seat_number}
+        Date: {booking.booking_date}
+        Time: {booking.start_time} - {booking.end_time}
+        """
+        messages[booking.id] = {
+            'user': booking.user,
+            'title': 'Upcoming Seat Booking Reminder',
+            'message': f'Your seat booking for {booking.seat.seat_number} at {booking.seat.library.name} is scheduled for {booking.booking_date} at {booking.start_time}.',
+            'notification_type': 'INFO',
+            'action_url': '/my-bookings',
+            'metadata': {
+                'booking_id': str(booking.id),
+                'seat_id': str(booking.seat_id),
+                'status': booking.status
+            },
+            'subject': 'Smart Lib - Booking Reminder',
+            'email': f"""
+        Dear {booking.user.get_full_name()},
+
+        This is a reminder for your upcoming seat booking:
+        {details}
+        Please arrive on time to avoid cancellation.
+
+        Best regards,
+        Smart Lib Team
+        """,
+        }
+    return SeatBooking, messages
+
+
+def _book_pickup_messages(object_ids):
+    from apps.books.models import BookReservation
+
+    reservations = BookReservation.objects.filter(
+        id__in=object_ids,
+        status__in=PICKUP_REMINDER_STATUSES,
+        is_deleted=False
+    ).select_related('user', 'book', 'book__library', 'pickup_library')
+
+    messages = {}
+    for reservation in reservations:
+        library = reservation.pickup_library or reservation.book.library
+        deadline = timezone.localtime(reservation.pickup_deadline).strftime('%Y-%m-%d %H:%M')
+        messages[reservation.id] = {
+            'user': reservation.user,
+            'title': 'Book Pickup Reminder',
+            'message': f'Please collect "{reservation.book.title}" from {library.name} before {deadline}.',
+            'notification_type': 'INFO',
+            'action_url': '/my-reservations',
+            'metadata': {
+                'reservation_id': str(reservation.id),
+                'book_id': str(reservation.book_id),
+                'status': reservation.status
+            },
+            'subject': 'Smart Lib - Book Ready for Pickup',
+            'email': f"""
+        Dear {reservation.user.get_full_name()},
+
+        Your reserved book is ready for pickup:
+
+        Book: {reservation.book.title}
+        Library: {library.name}
+        Pickup Deadline: {deadline}
+
+        Please collect your book before the deadline to avoid cancellation.
+
+        Best regards,
+        Smart Lib Team
+        """,
+        }
+    return BookReservation, messages
+
+
+def _book_due_messages(object_ids):
+    from apps.books.models import BookReservation
+
+    reservations = BookReservation.objects.filter(
+        id__in=object_ids,
+        status__in=DUE_REMINDER_STATUSES,
+        is_deleted=False
+    ).select_related('user', 'book')
+
+    messages = {}
+    for reservation in reservations:
+        due_date = timezone.localtime(reservation.due_date).strftime('%Y-%m-%d %H:%M')
+        messages[reservation.id] = {
+            'user': reservation.user,
+            'title': 'Book Due Soon',
+            'message': f'Your book "{reservation.book.title}" is due on {due_date}. Please return it on time to avoid late fees.',
+            'notification_type': 'WARNING',
+            'action_url': '/my-reservations',
+            'metadata': {
+                'reservation_id': str(reservation.id),
+                'book_id': str(reservation.book_id),
+                'status': reservation.status
+            },
+            'subject': 'Smart Lib - Book Due Soon',
+            'email': f"""
+        Dear {reservation.user.get_full_name()},
+
+        Your book is due for return soon:
+
+        Book: {reservation.book.title}
+        Due Date: {due_date}
+
+        Please return the book on time to avoid late fees.
+        You can renew the book if eligible.
+
+        Best regards,
+        Smart Lib Team
+        """,
+        }
+    return BookReservation, messages
+
+
+def _event_messages(object_ids):
+    from apps.events.models import EventRegistration
+
+    registrations = EventRegistration.objects.filter(
+        id__in=object_ids,
+        status__in=REGISTRATION_REMINDER_STATUSES,
+        event__status__in=EVENT_REMINDER_STATUSES,
+        event__send_reminders=True,
+        is_deleted=False
+    ).select_related('user', 'event', 'event__library')
+
+    messages = {}
+    for registration in registrations:
+        event = registration.event
+        messages[registration.id] = {
+            'user': registration.user,
+            'title': f'Event Reminder: {event.title}',
+            'message': f'"{event.title}" starts on {event.start_date} at {event.start_time}.',
+            'notification_type': 'INFO',
+            'action_url': '/my-events',
+            'metadata': {
+                'registration_id': str(registration.id),
+                'event_id': str(event.id),
+                'status': registration.status
+            },
+            'subject': f'Smart Lib - Event Reminder: {event.title}',
+            'email': f"""
+        Dear {registration.user.get_full_name()},
+
+        This is a reminder for your upcoming event:
+
+        Event: {event.title}
+        Date: {event.start_date}
+        Time: {event.start_time} - {event.end_time}
+        Location: {event.library.name}
+        {f"Venue: {event.venue_details}" if event.venue_details else ""}
+        {f"Online Link: {event.online_meeting_link}" if event.is_online else ""}
+
+        Please arrive on time. Don't forget to bring any required materials.
+
+        Best regards,
+        Smart Lib Team
+        """,
+        }
+    return EventRegistration, messages
+
+
+MESSAGE_BUILDERS = {
+    'SEAT_BOOKING': _seat_booking_messages,
+    'BOOK_PICKUP': _book_pickup_messages,
+    'BOOK_DUE': _book_due_messages,
+    'EVENT': _event_messages,
+}
+
+
+def _dispatch_batch(now):
+    """
+    Pop one batch of due reminders and record their notifications
+
+    Returns:
+        tuple: (number of reminders popped, messages to email)
+    """
+    from .models import Notification, ScheduledReminder
+
+    with transaction.atomic():
+        due = list(ScheduledReminder.objects.select_for_update(skip_locked=True).filter(
+            due_at__lte=now
+        ).order_by('due_at').values(
+            'id', 'reminder_type', 'object_id', 'expires_at'
+        )[:DISPATCH_BATCH_SIZE])
+        if not due:
+            return 0, []
+        ScheduledReminder.objects.filter(id__in=[reminder['id'] for reminder in due]).delete()
+
+        # Reminders that were due while the dispatcher was down collapse to one per target
+        object_ids = defaultdict(set)
+        for reminder in due:
+            if reminder['expires_at'] > now:
+                object_ids[reminder['reminder_type']].add(reminder['object_id'])
+
+        sent = []
+        for reminder_type, ids in object_ids.items():
+            model, messages = MESSAGE_BUILDERS[reminder_type](ids)
+            if messages:
+                model.objects.filter(id__in=list(messages)).update(reminder_sent=True)
+            sent.extend(messages.values())
+
+        Notification.objects.bulk_create([
+            Notification(
+                user=message['user'],
+                title=message['title'],
+                message=message['message'],
+                type=message['notification_type'],
+                action_url=message['action_url'],
+                metadata=message['metadata']
+            )
+            for message in sent
+        ])
+    return len(due), sent
+
+
+def dispatch_due_reminders(now=None):
+    """
+    Send every reminder that is due
+
+    Returns:
+        int: Number of reminders sent
+    """
+    from apps.core.utils import send_notification_email
+
+    now = now or timezone.now()
+    sent_count = 0
+    while True:
+        popped, sent = _dispatch_batch(now)
+        if not popped:
+            return sent_count
+        for message in sent:
+            send_notification_email(
+                to_email=message['user'].email,
+                subject=message['subject'],
+                message=message['email']
+            )
+        sent_count += len(sent)
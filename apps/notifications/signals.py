@@ -6,8 +6,11 @@ from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from apps.seats.models import SeatBooking
 from apps.books.models import BookReservation
-from apps.events.models import EventRegistration
+from apps.events.models import Event, EventRegistration
 from .models import Notification
+from .reminders import (
+    schedule_seat_booking_reminders, schedule_reservation_reminders, schedule_event_reminders
+)
 
 User = get_user_model()
 
@@ -206,4 +209,37 @@ def create_event_registration_notification(sender, instance, created, **kwargs):
                 'event_id': str(instance.event.id),
                 'status': instance.status
             }
-        )
\ No newline at end of file
+        )
+
+
+@receiver(post_save, sender=SeatBooking)
+def reschedule_seat_booking_reminders(sender, instance, created, **kwargs):
+    """Recompute reminder times when a booking is made, moved or cancelled"""
+    if created or instance.changed_fields & {'status', 'booking_date', 'start_time', 'is_deleted'}:
+        schedule_seat_booking_reminders([instance])
+
+
+@receiver(post_save, sender=BookReservation)
+def reschedule_reservation_reminders(sender, instance, created, **kwargs):
+    """Recompute pickup and due date reminders when a reservation changes"""
+    if created or instance.changed_fields & {'status', 'pickup_deadline', 'due_date', 'is_deleted'}:
+        schedule_reservation_reminders(instance)
+
+
+@receiver(post_save, sender=EventRegistration)
+def reschedule_registration_reminders(sender, instance, created, **kwargs):
+    """Recompute reminders when a registration is made or its status changes"""
+    if created or instance.changed_fields & {'status', 'is_deleted'}:
+        schedule_event_reminders(
+            instance.event,
+            [(instance.id, instance.user_id, None if instance.is_deleted else instance.status)]
+        )
+
+
+@receiver(post_save, sender=Event)
+def reschedule_event_reminders(sender, instance, created, **kwargs):
+    """Recompute every registration's reminders when the event is moved or its reminders change"""
+    if not created and instance.changed_fields & {
+        'start_date', 'start_time', 'status', 'send_reminders', 'reminder_hours', 'is_deleted'
+    }:
+        schedule_event_reminders(instance)
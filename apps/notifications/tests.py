@@ -0,0 +1,170 @@
+"""
+Tests for notifications app
+"""
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+from apps.library.models import Library, LibraryFloor, LibrarySection
+from apps.seats.models import Seat, SeatBooking
+from apps.events.models import Event, EventCategory, EventRegistration
+from .models import Notification, ScheduledReminder
+from .reminders import dispatch_due_reminders
+
+User = get_user_model()
+
+
+class ReminderSchedulerTest(TestCase):
+    """Test exact-time reminder scheduling and dispatch"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123'
+        )
+
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+
+        self.section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            created_by=self.user
+        )
+
+        self.seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.section,
+            seat_number='S001',
+            created_by=self.user
+        )
+
+        self.booking_date = timezone.now().date() + timedelta(days=2)
+        self.booking = SeatBooking.objects.create(
+            user=self.user,
+            seat=self.seat,
+            booking_date=self.booking_date,
+            start_time=time(10, 0),
+            end_time=time(12, 0),
+            created_by=self.user
+        )
+
+    def starts_at(self, day, start):
+        return timezone.make_aware(datetime.combine(day, start))
+
+    def due_times(self, object_id):
+        return sorted(
+            ScheduledReminder.objects.filter(object_id=object_id).values_list('due_at', flat=True)
+        )
+
+    def test_booking_reminders_scheduled_at_exact_times(self):
+        """Test a booking gets reminders exactly 24 hours, 2 hours and 30 minutes before"""
+        starts_at = self.starts_at(self.booking_date, time(10, 0))
+
+        self.assertEqual(self.due_times(self.booking.id), [
+            starts_at - timedelta(hours=24),
+            starts_at - timedelta(hours=2),
+            starts_at - timedelta(minutes=30),
+        ])
+
+    def test_moved_booking_is_rescheduled(self):
+        """Test moving a booking moves its reminders"""
+        self.booking.start_time = time(14, 0)
+        self.booking.end_time = time(15, 0)
+        self.booking.save()
+
+        starts_at = self.starts_at(self.booking_date, time(14, 0))
+        self.assertEqual(self.due_times(self.booking.id)[-1], starts_at - timedelta(minutes=30))
+        self.assertEqual(ScheduledReminder.objects.count(), 3)
+
+    def test_cancelled_booking_reminders_are_removed(self):
+        """Test cancelling a booking cancels its pending reminders"""
+        self.booking.status = 'CANCELLED'
+        self.booking.save()
+
+        self.assertFalse(ScheduledReminder.objects.exists())
+
+    def test_dispatch_sends_due_reminders_once(self):
+        """Test due reminders are sent, recorded and removed"""
+        now = self.starts_at(self.booking_date, time(8, 0))
+
+        self.assertEqual(dispatch_due_reminders(now), 1)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertTrue(Notification.objects.filter(
+            user=self.user, title='Upcoming Seat Booking Reminder'
+        ).exists())
+        self.booking.refresh_from_db()
+        self.assertTrue(self.booking.reminder_sent)
+        # Only the 30 minute reminder is still pending
+        self.assertEqual(ScheduledReminder.objects.count(), 1)
+        self.assertEqual(dispatch_due_reminders(now), 0)
+
+    def test_dispatch_skips_targets_changed_behind_its_back(self):
+        """Test reminders for bookings cancelled by bulk updates are dropped"""
+        SeatBooking.objects.filter(pk=self.booking.pk).update(status='CANCELLED')
+
+        self.assertEqual(dispatch_due_reminders(self.starts_at(self.booking_date, time(9, 45))), 0)
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(ScheduledReminder.objects.exists())
+
+    def test_event_reminders_follow_the_event(self):
+        """Test registrations get the event's reminder hours and follow a moved event"""
+        category = EventCategory.objects.create(name='Workshop', created_by=self.user)
+        event_date = timezone.now().date() + timedelta(days=3)
+        event = Event.objects.create(
+            title='Test Workshop',
+            category=category,
+            organizer=self.user,
+            start_date=event_date,
+            end_date=event_date,
+            start_time=time(10, 0),
+            end_time=time(12, 0),
+            library=self.library,
+            registration_deadline=timezone.now() + timedelta(days=1),
+            status='REGISTRATION_OPEN',
+            reminder_hours=[24, 2],
+            created_by=self.user
+        )
+        registration = EventRegistration.objects.create(
+            user=self.user,
+            event=event,
+            created_by=self.user
+        )
+
+        starts_at = self.starts_at(event_date, time(10, 0))
+        self.assertEqual(self.due_times(registration.id), [
+            starts_at - timedelta(hours=24),
+            starts_at - timedelta(hours=2),
+        ])
+
+        event.start_time = time(16, 0)
+        event.end_time = time(18, 0)
+        event.save()
+
+        starts_at = self.starts_at(event_date, time(16, 0))
+        self.assertEqual(self.due_times(registration.id)[-1], starts_at - timedelta(hours=2))
+
+        event.status = 'CANCELLED'
+        event.save()
+
+        self.assertEqual(self.due_times(registration.id), [])
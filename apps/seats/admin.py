@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
+from apps.dashboard.summary import invalidate_user_summaries
 from .models import (
     Seat, SeatBooking, SeatBookingWaitlist, SeatReview,
     SeatMaintenanceLog, SeatUsageStatistics
@@ -174,12 +175,16 @@ class SeatBookingAdmin(admin.ModelAdmin):
     actions = ['mark_no_show', 'cancel_bookings', 'send_reminders']
     
     def mark_no_show(self, request, queryset):
-        updated = queryset.filter(status='CONFIRMED').update(status='NO_SHOW')
+        bookings = queryset.filter(status='CONFIRMED')
+        invalidate_user_summaries(bookings.values_list('user_id', flat=True), ['seat_bookings'])
+        updated = bookings.update(status='NO_SHOW')
         self.message_user(request, f'{updated} bookings marked as no-show.')
     mark_no_show.short_description = 'Mark selected bookings as no-show'
     
     def cancel_bookings(self, request, queryset):
-        updated = queryset.filter(status__in=['CONFIRMED', 'PENDING']).update(status='CANCELLED')
+        bookings = queryset.filter(status__in=['CONFIRMED', 'PENDING'])
+        invalidate_user_summaries(bookings.values_list('user_id', flat=True), ['seat_bookings'])
+        updated = bookings.update(status='CANCELLED')
         self.message_user(request, f'{updated} bookings cancelled.')
     cancel_bookings.short_description = 'Cancel selected bookings'
     
@@ -0,0 +1,219 @@
+"""
+Slot-bitmap availability index for seats
+
+Each seat's occupancy for a day is stored as an integer bitmap where bit ``n``
+covers the ``n``-th fixed slot of the day (``SLOT_MINUTES`` long). Bitmaps live
+in the cache under a per-library, per-day namespace and are built lazily with a
+single bookings query for all seats missing from the cache. Booking times are
+rounded outwards to slot boundaries, so the index never reports a conflicting
+window as free.
+"""
+from datetime import time
+from django.core.cache import cache
+from apps.core.utils import SmartLibCache
+
+SLOT_MINUTES = 5
+SLOT_SECONDS = SLOT_MINUTES * 60
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+ACTIVE_BOOKING_STATUSES = ['CONFIRMED', 'CHECKED_IN']
+INDEX_TIMEOUT = 60 * 60 * 24 * 2
+
+
+def _seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def time_to_slot(value, round_up=False):
+    """Convert a time of day to a slot index"""
+    if round_up:
+        return -(-_seconds(value) // SLOT_SECONDS)
+    return _seconds(value) // SLOT_SECONDS
+
+
+def slot_to_time(slot):
+    """Convert a slot index back to the time of day it starts at"""
+    if slot >= SLOTS_PER_DAY:
+        return time.max
+    minutes = slot * SLOT_MINUTES
+    return time(minutes // 60, minutes % 60)
+
+
+def is_slot_aligned(value):
+    """Check if a time falls exactly on a slot boundary"""
+    return _seconds(value) % SLOT_SECONDS == 0 and not value.microsecond
+
+
+def slot_mask(start_time, end_time):
+    """Bitmap covering every slot touched by the given time window"""
+    first = time_to_slot(start_time)
+    last = min(time_to_slot(end_time, round_up=True), SLOTS_PER_DAY)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def free_runs(bitmap, first_slot=0, last_slot=SLOTS_PER_DAY):
+    """Return (start_slot, end_slot) pairs for each run of free slots"""
+    runs = []
+    run_start = None
+    for slot in range(first_slot, last_slot):
+        if bitmap >> slot & 1:
+            if run_start is not None:
+                runs.append((run_start, slot))
+                run_start = None
+        elif run_start is None:
+            run_start = slot
+    if run_start is not None:
+        runs.append((run_start, last_slot))
+    return runs
+
+
+def occupied_runs(bitmap, first_slot=0, last_slot=SLOTS_PER_DAY):
+    """Run-length encode occupied slots as [offset, length] pairs from first_slot"""
+    runs = []
+    cursor = first_slot
+    for start, end in free_runs(bitmap, first_slot, last_slot):
+        if start > cursor:
+            runs.append([cursor - first_slot, start - cursor])
+        cursor = end
+    if cursor < last_slot:
+        runs.append([cursor - first_slot, last_slot - cursor])
+    return runs
+
+
+def bitstring(bitmap, first_slot=0, last_slot=SLOTS_PER_DAY):
+    """Encode slots as a string of '1' (occupied) and '0' (free) characters"""
+    return ''.join(
+        '1' if bitmap >> slot & 1 else '0'
+        for slot in range(first_slot, last_slot)
+    )
+
+
+def summarise_free_time(bitmap, first_slot, last_slot, requested_slot=None):
+    """
+    Free minutes, longest free block in minutes and minutes from the requested
+    slot to the nearest free slot at or after it, within [first_slot, last_slot)
+    """
+    runs = free_runs(bitmap, first_slot, last_slot)
+    free_minutes = sum(end - start for start, end in runs) * SLOT_MINUTES
+    longest_minutes = max((end - start for start, end in runs), default=0) * SLOT_MINUTES
+
+    wait_minutes = None
+    if requested_slot is None:
+        wait_minutes = 0 if runs else None
+    else:
+        for start, end in runs:
+            if end > requested_slot:
+                wait_minutes = max(start - requested_slot, 0) * SLOT_MINUTES
+                break
+    return free_minutes, longest_minutes, wait_minutes
+
+
+class SeatAvailabilityIndex:
+    """
+    Availability index for the seats of one library on one day
+    """
+    def __init__(self, library_id, booking_date):
+        self.library_id = library_id
+        self.booking_date = booking_date
+
+    def get_cache_key(self, seat_id):
+        """Generate cache key for a seat's bitmap"""
+        return SmartLibCache.get_library_cache_key(
+            self.library_id,
+            f"availability:{self.booking_date.isoformat()}:{seat_id}"
+        )
+
+    def get_bitmaps(self, seat_ids):
+        """Get bitmaps for the given seats, building any that are missing"""
+        seat_ids = [str(seat_id) for seat_id in seat_ids]
+        keys = {self.get_cache_key(seat_id): seat_id for seat_id in seat_ids}
+        cached = cache.get_many(list(keys))
+
+        bitmaps = {keys[key]: value for key, value in cached.items()}
+        missing = [seat_id for seat_id in seat_ids if seat_id not in bitmaps]
+        if missing:
+            bitmaps.update(self.rebuild(missing))
+        return bitmaps
+
+    def get_bitmap(self, seat_id):
+        """Get the bitmap for a single seat"""
+        return self.get_bitmaps([seat_id])[str(seat_id)]
+
+    def rebuild(self, seat_ids):
+        """Rebuild bitmaps for the given seats from one bookings query"""
+        from .models import SeatBooking
+
+        bitmaps = {str(seat_id): 0 for seat_id in seat_ids}
+        bookings = SeatBooking.objects.filter(
+            seat_id__in=seat_ids,
+            booking_date=self.booking_date,
+            status__in=ACTIVE_BOOKING_STATUSES,
+            is_deleted=False
+        ).values_list('seat_id', 'start_time', 'end_time')
+
+        for seat_id, start_time, end_time in bookings:
+            bitmaps[str(seat_id)] |= slot_mask(start_time, end_time)
+
+        self._store(bitmaps)
+        return bitmaps
+
+    def is_free(self, seat_id, start_time, end_time):
+        """Check if a seat is free for the whole time window"""
+        return not self.get_bitmap(seat_id) & slot_mask(start_time, end_time)
+
+    def free_seat_ids(self, seat_ids, start_time, end_time):
+        """Filter the given seats down to those free for the whole window"""
+        mask = slot_mask(start_time, end_time)
+        bitmaps = self.get_bitmaps(seat_ids)
+        return [seat_id for seat_id, bitmap in bitmaps.items() if not bitmap & mask]
+
+    def get_free_slots(self, seat_id, opening_time, closing_time):
+        """List free windows for a seat between opening and closing time"""
+        first = time_to_slot(opening_time, round_up=True)
+        last = time_to_slot(closing_time)
+        return [
+            {
+                'start_time': slot_to_time(start),
+                'end_time': slot_to_time(end),
+                'duration_minutes': (end - start) * SLOT_MINUTES,
+            }
+            for start, end in free_runs(self.get_bitmap(seat_id), first, last)
+        ]
+
+    def occupy(self, seat_id, start_time, end_time):
+        """Mark a booking's window as occupied"""
+        bitmap = self.get_bitmap(seat_id) | slot_mask(start_time, end_time)
+        self._store({str(seat_id): bitmap})
+
+    def release(self, seat_id, start_time, end_time):
+        """Free a booking's window"""
+        if not (is_slot_aligned(start_time) and is_slot_aligned(end_time)):
+            # Edge slots may be shared with a neighbouring booking
+            self.rebuild([seat_id])
+            return
+        bitmap = self.get_bitmap(seat_id) & ~slot_mask(start_time, end_time)
+        self._store({str(seat_id): bitmap})
+
+    def _store(self, bitmaps):
+        cache.set_many(
+            {self.get_cache_key(seat_id): bitmap for seat_id, bitmap in bitmaps.items()},
+            INDEX_TIMEOUT
+        )
+
+
+def occupy_dates(library_id, seat_id, booking_dates, start_time, end_time):
+    """
+    Mark the same window as occupied on several days for one seat
+
+    Only bitmaps already in the cache are updated; missing days are built
+    lazily from the database when first read, which already has the bookings.
+    """
+    keys = [
+        SeatAvailabilityIndex(library_id, booking_date).get_cache_key(seat_id)
+        for booking_date in booking_dates
+    ]
+    mask = slot_mask(start_time, end_time)
+    cached = cache.get_many(keys)
+    if cached:
+        cache.set_many({key: bitmap | mask for key, bitmap in cached.items()}, INDEX_TIMEOUT)
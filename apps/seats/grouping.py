@@ -0,0 +1,107 @@
+"""
+Adjacent-seat allocation for group bookings
+
+Free seats of each section are bucketed into a uniform grid keyed by their
+layout coordinates, so the nearest neighbours of a seat are found by searching
+outward ring by ring instead of scanning the whole floor. Every free seat is
+tried as the centre of a cluster and the tightest cluster of ``k`` seats wins.
+"""
+import math
+from collections import defaultdict
+from .availability import SeatAvailabilityIndex
+
+
+class SeatGrid:
+    """
+    Uniform grid over seat coordinates for nearest-neighbour lookups
+    """
+    def __init__(self, seats):
+        # seats: list of (seat_id, x, y)
+        self.seats = seats
+        xs = [x for _, x, _ in seats]
+        ys = [y for _, _, y in seats]
+        self.min_x, self.min_y = min(xs), min(ys)
+        area = max(max(xs) - self.min_x, 1) * max(max(ys) - self.min_y, 1)
+        # Aim for about one seat per cell
+        self.cell_size = max(math.sqrt(area / len(seats)), 1)
+        self.buckets = defaultdict(list)
+        for seat in seats:
+            self.buckets[self._cell(seat[1], seat[2])].append(seat)
+        self.max_ring = max(
+            (max(xs) - self.min_x) / self.cell_size,
+            (max(ys) - self.min_y) / self.cell_size
+        ) + 1
+
+    def _cell(self, x, y):
+        return (
+            int((x - self.min_x) // self.cell_size),
+            int((y - self.min_y) // self.cell_size)
+        )
+
+    def _ring(self, cx, cy, ring):
+        if ring == 0:
+            yield cx, cy
+            return
+        for dx in range(-ring, ring + 1):
+            yield cx + dx, cy - ring
+            yield cx + dx, cy + ring
+        for dy in range(-ring + 1, ring):
+            yield cx - ring, cy + dy
+            yield cx + ring, cy + dy
+
+    def nearest(self, x, y, k):
+        """Return the k seats closest to a point as (distance, seat_id) pairs"""
+        cx, cy = self._cell(x, y)
+        found = []
+        ring = 0
+        while ring <= self.max_ring:
+            for cell in self._ring(cx, cy, ring):
+                for seat_id, sx, sy in self.buckets.get(cell, ()):
+                    found.append((math.hypot(sx - x, sy - y), seat_id))
+            # Anything in a further ring is at least ring * cell_size away
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] <= ring * self.cell_size:
+                    break
+            ring += 1
+        found.sort()
+        return found[:k]
+
+
+def find_seat_cluster(seats, library_id, booking_date, start_time, end_time, group_size, exclude=()):
+    """
+    Find the tightest cluster of free seats within a single section
+
+    Args:
+        seats: Iterable of dicts with id, section_id, x_coordinate and y_coordinate
+        exclude: Seat ids to leave out, e.g. seats lost to a concurrent booking
+
+    Returns:
+        list: Seat ids of the best cluster, or None if no section has enough free seats
+    """
+    seats = [
+        seat for seat in seats
+        if seat['x_coordinate'] is not None and seat['y_coordinate'] is not None
+        and str(seat['id']) not in exclude
+    ]
+    index = SeatAvailabilityIndex(library_id, booking_date)
+    free = set(index.free_seat_ids([seat['id'] for seat in seats], start_time, end_time))
+
+    sections = defaultdict(list)
+    for seat in seats:
+        if str(seat['id']) in free:
+            sections[seat['section_id']].append(
+                (seat['id'], float(seat['x_coordinate']), float(seat['y_coordinate']))
+            )
+
+    best_cost, best_cluster = None, None
+    for section_seats in sections.values():
+        if len(section_seats) < group_size:
+            continue
+        grid = SeatGrid(section_seats)
+        for _, x, y in section_seats:
+            members = grid.nearest(x, y, group_size)
+            cost = (members[-1][0], sum(distance for distance, _ in members))
+            if best_cost is None or cost < best_cost:
+                best_cost, best_cluster = cost, [seat_id for _, seat_id in members]
+    return best_cluster
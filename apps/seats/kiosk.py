@@ -0,0 +1,328 @@
+"""
+Batch check-in and check-out for entrance kiosks
+
+Kiosks queue scans and send them in batches, including whole backlogs after a
+network outage. A batch is validated with one locked read of the bookings it
+mentions, replayed in scan order against their in-memory state, and applied
+with set-based updates and bulk inserts, so its cost does not grow with the
+number of scans the way replaying them one request at a time does.
+"""
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from django.db import transaction
+from django.db.models import Case, When, Value, F, IntegerField, DateTimeField
+from django.utils import timezone
+from apps.core.counters import increment_counter
+from apps.core.qr_tokens import QRTokenError, verify_qr_token, consume_qr_token
+from .availability import SeatAvailabilityIndex
+from .waitlist import schedule_waitlist_match
+
+KIOSK_BATCH_MAX = 500
+KIOSK_SCAN_MAX_AGE = timedelta(days=1)
+KIOSK_CLOCK_SKEW = timedelta(minutes=5)
+
+
+def apply_kiosk_scans(scans, library_id=None):
+    """
+    Apply a batch of kiosk scans
+
+    Args:
+        scans: Validated scans with action, scanned_at and either qr_code_data
+            or booking_id, plus an optional client scan_id
+        library_id: Restrict scans to bookings of one library
+
+    Returns:
+        list: One result per scan, in input order
+    """
+    from apps.library.occupancy import reconcile_library_occupancy
+    from .models import SeatBooking
+
+    now = timezone.now()
+    results = [
+        {'scan_id': scan.get('scan_id'), 'action': scan['action'], 'success': False}
+        for scan in scans
+    ]
+
+    # Resolve every scan to a booking without touching the database
+    pending = []
+    for index, scan in enumerate(scans):
+        claims = None
+        if scan['scanned_at'] > now + KIOSK_CLOCK_SKEW:
+            results[index]['error'] = "Scan time is in the future"
+            continue
+        if scan['scanned_at'] < now - KIOSK_SCAN_MAX_AGE:
+            results[index]['error'] = "Scan is too old to apply"
+            continue
+        if scan.get('qr_code_data'):
+            try:
+                # Codes serve for check-out until the booking ends
+                claims = verify_qr_token(
+                    scan['qr_code_data'], 'seat_booking', at=scan['scanned_at'],
+                    expiry_claim='be' if scan['action'] == 'CHECK_OUT' else 'exp'
+                )
+            except QRTokenError as e:
+                results[index]['error'] = str(e)
+                continue
+            booking_id = str(uuid.UUID(claims['i']))
+        else:
+            booking_id = str(scan['booking_id'])
+        results[index]['booking_id'] = booking_id
+        pending.append((scan['scanned_at'], index, booking_id, claims))
+
+    if not pending:
+        return results
+
+    with transaction.atomic():
+        bookings = SeatBooking.objects.select_for_update(of=('self',)).filter(
+            id__in={booking_id for _, _, booking_id, _ in pending},
+            is_deleted=False
+        )
+        if library_id is not None:
+            bookings = bookings.filter(seat__library_id=library_id)
+        bookings = {
+            str(booking['id']): booking
+            for booking in bookings.values(
+                'id', 'user_id', 'seat_id', 'status', 'booking_date', 'start_time',
+                'end_time', 'checked_in_at', 'actual_start_time', 'seat__library_id', 'seat__seat_number',
+                'seat__seat_code', 'seat__library__configuration__early_checkin_minutes',
+                'seat__library__configuration__booking_completion_points'
+            )
+        }
+
+        # Replay the scans in the order they happened
+        check_ins, check_outs = {}, {}
+        for scanned_at, index, booking_id, claims in sorted(pending, key=lambda item: item[:2]):
+            booking = bookings.get(booking_id)
+            if booking is None:
+                results[index]['error'] = "Booking not found"
+                continue
+
+            action = scans[index]['action']
+            if action == 'CHECK_IN':
+                error = _check_in_error(booking, scanned_at)
+            else:
+                error = _check_out_error(booking, scanned_at)
+            if not error and claims:
+                try:
+                    consume_qr_token(claims, action.lower(), 'be' if action == 'CHECK_OUT' else 'exp')
+                except QRTokenError as e:
+                    error = str(e)
+            if error:
+                results[index]['error'] = error
+                continue
+
+            method = 'QR' if claims else 'MANUAL'
+            if action == 'CHECK_IN':
+                booking.update(status='CHECKED_IN', checked_in_at=scanned_at, actual_start_time=scanned_at)
+                check_ins[booking_id] = (scanned_at, method)
+                results[index]['message'] = "Checked in successfully"
+            else:
+                booking['status'] = 'COMPLETED'
+                check_outs[booking_id] = (scanned_at, method)
+                results[index]['message'] = "Checked out successfully"
+            results[index]['success'] = True
+
+        if check_ins or check_outs:
+            _apply_transitions(bookings, check_ins, check_outs, now)
+
+    if check_outs:
+        # Bulk updates bypass booking signals, so refresh the availability index directly
+        seats_by_day = defaultdict(set)
+        for booking_id in check_outs:
+            booking = bookings[booking_id]
+            seats_by_day[(booking['seat__library_id'], booking['booking_date'])].add(booking['seat_id'])
+        for (day_library_id, booking_date), seat_ids in seats_by_day.items():
+            SeatAvailabilityIndex(day_library_id, booking_date).rebuild(seat_ids)
+
+        # Early check-outs free the rest of their window for the waitlist
+        for booking_id in check_outs:
+            booking = bookings[booking_id]
+            schedule_waitlist_match(
+                booking['seat__library_id'], booking['seat_id'], booking['booking_date'],
+                booking['start_time'], booking['end_time']
+            )
+
+    if check_ins or check_outs:
+        # Seats were updated in bulk, so recount their libraries' occupancy
+        reconcile_library_occupancy({
+            bookings[booking_id]['seat__library_id']
+            for booking_id in {**check_ins, **check_outs}
+        })
+
+    return results
+
+
+def _booking_start(booking):
+    return timezone.make_aware(datetime.combine(booking['booking_date'], booking['start_time']))
+
+
+def _check_in_error(booking, scanned_at):
+    if booking['status'] != 'CONFIRMED':
+        return "Cannot check in at this time"
+    booking_start = _booking_start(booking)
+    early_minutes = booking['seat__library__configuration__early_checkin_minutes'] or 0
+    if not booking_start - timedelta(minutes=early_minutes) <= scanned_at <= booking_start + timedelta(hours=1):
+        return "Cannot check in at this time"
+    return None
+
+
+def _check_out_error(booking, scanned_at):
+    if booking['status'] != 'CHECKED_IN':
+        return "Cannot check out at this time"
+    if booking['checked_in_at'] and scanned_at < booking['checked_in_at']:
+        return "Cannot check out before checking in"
+    return None
+
+
+def _timestamps(transitions):
+    """Per-booking scan time as a CASE expression"""
+    return Case(
+        *[When(id=booking_id, then=Value(scanned_at)) for booking_id, (scanned_at, _) in transitions.items()],
+        output_field=DateTimeField()
+    )
+
+
+def _apply_transitions(bookings, check_ins, check_outs, now):
+    """Write the accepted transitions with set-based updates and bulk inserts"""
+    from apps.accounts.models import UserProfile, LoyaltyTransaction
+    from apps.core.models import ActivityLog
+    from apps.dashboard.summary import invalidate_user_summaries
+    from apps.notifications.models import Notification
+    from .models import Seat, SeatBooking
+
+    invalidate_user_summaries(
+        {bookings[booking_id]['user_id'] for booking_id in {**check_ins, **check_outs}}, ['seat_bookings']
+    )
+    if check_ins:
+        SeatBooking.objects.filter(id__in=list(check_ins)).update(
+            status='CHECKED_IN',
+            checked_in_at=_timestamps(check_ins),
+            actual_start_time=_timestamps(check_ins),
+            updated_at=now
+        )
+
+    points_by_booking = {
+        booking_id: bookings[booking_id]['seat__library__configuration__booking_completion_points'] or 0
+        for booking_id in check_outs
+    }
+    if check_outs:
+        bookings_by_points = defaultdict(list)
+        for booking_id, points in points_by_booking.items():
+            bookings_by_points[points].append(booking_id)
+        SeatBooking.objects.filter(id__in=list(check_outs)).update(
+            status='COMPLETED',
+            checked_out_at=_timestamps(check_outs),
+            actual_end_time=_timestamps(check_outs),
+            loyalty_points_earned=Case(
+                *[When(id__in=ids, then=Value(points)) for points, ids in bookings_by_points.items()],
+                default=F('loyalty_points_earned'),
+                output_field=IntegerField()
+            ),
+            updated_at=now
+        )
+
+    # Seats follow the final state of their booking
+    occupied = {bookings[booking_id]['seat_id'] for booking_id in check_ins if booking_id not in check_outs}
+    released = {bookings[booking_id]['seat_id'] for booking_id in check_outs}
+    if occupied:
+        Seat.objects.filter(id__in=occupied).update(status='OCCUPIED', updated_at=now)
+    if released:
+        Seat.objects.filter(id__in=released, status='OCCUPIED').update(status='AVAILABLE', updated_at=now)
+
+    # Add the completed stays to their seats' usage hours
+    usage_by_seat = defaultdict(float)
+    for booking_id, (scanned_at, _) in check_outs.items():
+        booking = bookings[booking_id]
+        if booking['actual_start_time'] and scanned_at > booking['actual_start_time']:
+            usage_by_seat[booking['seat_id']] += (scanned_at - booking['actual_start_time']).total_seconds() / 3600
+    for seat_id, hours in usage_by_seat.items():
+        increment_counter(Seat, seat_id, 'total_usage_hours', hours)
+
+    # Award completion points, grouped by each user's total
+    points_by_user = defaultdict(int)
+    for booking_id, points in points_by_booking.items():
+        points_by_user[bookings[booking_id]['user_id']] += points
+    users_by_points = defaultdict(list)
+    for user_id, points in points_by_user.items():
+        if points:
+            users_by_points[points].append(user_id)
+    if users_by_points:
+        UserProfile.objects.filter(user_id__in=list(points_by_user)).update(
+            loyalty_points=Case(
+                *[
+                    When(user_id__in=user_ids, then=F('loyalty_points') + points)
+                    for points, user_ids in users_by_points.items()
+                ],
+                default=F('loyalty_points'),
+                output_field=IntegerField()
+            )
+        )
+    LoyaltyTransaction.objects.bulk_create([
+        LoyaltyTransaction(
+            user_id=bookings[booking_id]['user_id'],
+            points=points,
+            transaction_type='EARNED',
+            description='Seat booking completion',
+            reference_id=booking_id,
+        )
+        for booking_id, points in points_by_booking.items()
+        if points
+    ])
+
+    activity_logs, notifications = [], []
+    for transitions, activity_type, verb in (
+        (check_ins, 'SEAT_CHECKIN', 'Checked in to'),
+        (check_outs, 'SEAT_CHECKOUT', 'Checked out from'),
+    ):
+        for booking_id, (scanned_at, method) in transitions.items():
+            booking = bookings[booking_id]
+            metadata = {
+                'booking_id': booking_id,
+                'seat_code': booking['seat__seat_code'],
+                'scanned_at': scanned_at.isoformat(),
+            }
+            if activity_type == 'SEAT_CHECKIN':
+                metadata['check_in_method'] = method
+            else:
+                metadata['check_out_method'] = method
+                metadata['points_earned'] = points_by_booking[booking_id]
+            activity_logs.append(ActivityLog(
+                user_id=booking['user_id'],
+                activity_type=activity_type,
+                description=f"{verb} seat {booking['seat__seat_number']}",
+                metadata=metadata
+            ))
+    ActivityLog.objects.bulk_create(activity_logs)
+
+    for booking_id in check_ins:
+        if booking_id not in check_outs:
+            notifications.append(_notification(
+                bookings[booking_id], booking_id, 'CHECKED_IN',
+                'Seat Check-in Successful',
+                'You have successfully checked in to seat {seat}.', 'SUCCESS'
+            ))
+    for booking_id in check_outs:
+        notifications.append(_notification(
+            bookings[booking_id], booking_id, 'COMPLETED',
+            'Seat Check-out Completed',
+            'You have successfully checked out from seat {seat}.', 'INFO'
+        ))
+    Notification.objects.bulk_create(notifications)
+
+
+def _notification(booking, booking_id, booking_status, title, message, notification_type):
+    from apps.notifications.models import Notification
+
+    return Notification(
+        user_id=booking['user_id'],
+        title=title,
+        message=message.format(seat=booking['seat__seat_number']),
+        type=notification_type,
+        action_url='/my-bookings',
+        metadata={
+            'booking_id': booking_id,
+            'seat_id': str(booking['seat_id']),
+            'status': booking_status
+        }
+    )
@@ -0,0 +1,220 @@
+"""
+Bulk import of seat layouts
+
+A layout file lists one seat per row with its floor, section, seat number,
+coordinates and features. Files are read row by row, so a layout of any
+size is never held in memory. Each row is validated, and missing floors and
+sections are created on the way. Seats are inserted with ``bulk_create`` in
+chunks, with seat codes generated and checked for collisions a chunk at a
+time. Seat totals are recounted once at the end. Any invalid row rolls back
+the whole import.
+"""
+import csv
+import io
+import json
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from apps.core.utils import generate_unique_code
+from apps.library.models import Library, LibraryFloor, LibrarySection
+from apps.library.occupancy import reconcile_library_occupancy
+from .models import Seat
+from .recommend import invalidate_feature_matrix
+from .serializers import SeatLayoutRowSerializer
+
+LAYOUT_IMPORT_CHUNK_SIZE = 500
+LAYOUT_IMPORT_MAX_ERRORS = 100
+SEAT_CODE_ATTEMPTS = 10
+LAYOUT_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'jsonl'}
+
+
+class LayoutImportError(Exception):
+    """
+    Raised when a layout file has invalid rows; nothing is imported
+
+    Attributes:
+        errors: Dicts with the row number and its errors
+    """
+    def __init__(self, errors):
+        super().__init__("Layout file has invalid rows")
+        self.errors = errors
+
+
+def detect_layout_format(file_name):
+    """Layout format from a file name, or None if it is not recognised"""
+    for extension, file_format in LAYOUT_FORMATS.items():
+        if file_name.lower().endswith(extension):
+            return file_format
+    return None
+
+
+def iter_layout_rows(stream, file_format):
+    """
+    Yield (row number, row) pairs from a binary CSV or JSON Lines stream
+
+    CSV features are separated by semicolons. Empty CSV cells are left out so
+    the defaults apply.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        for number, row in enumerate(csv.DictReader(text), start=2):
+            row = {
+                key.strip(): value.strip() for key, value in row.items()
+                if key and value is not None and value.strip()
+            }
+            if 'features' in row:
+                row['features'] = [feature.strip() for feature in row['features'].split(';') if feature.strip()]
+            yield number, row
+    else:
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+
+
+def _assign_seat_codes(library, seats):
+    """Give each seat a code unused in the database and in the batch"""
+    pending = seats
+    for _ in range(SEAT_CODE_ATTEMPTS):
+        for seat in pending:
+            seat.seat_code = f"{library.code}-{generate_unique_code('S', 4)}"
+        codes = [seat.seat_code for seat in pending]
+        taken = set(Seat.objects.filter(seat_code__in=codes).values_list('seat_code', flat=True))
+
+        seen = set()
+        retry = []
+        for seat in pending:
+            if seat.seat_code in taken or seat.seat_code in seen:
+                retry.append(seat)
+            seen.add(seat.seat_code)
+        if not retry:
+            return
+        pending = retry
+    raise RuntimeError("Could not generate unique seat codes")
+
+
+def _insert_seats(library, seats):
+    _assign_seat_codes(library, seats)
+    Seat.objects.bulk_create(seats, batch_size=LAYOUT_IMPORT_CHUNK_SIZE)
+    return len(seats)
+
+
+def recount_total_seats(library_id):
+    """Recompute total_seats of a library, its floors and its sections with one update each"""
+    def seat_count(field):
+        return Coalesce(Subquery(
+            Seat.objects.filter(is_deleted=False, **{field: OuterRef('pk')}).order_by().values(field).annotate(
+                count=Count('id')
+            ).values('count')
+        ), Value(0))
+
+    LibrarySection.objects.filter(floor__library_id=library_id).update(total_seats=seat_count('section'))
+    LibraryFloor.objects.filter(library_id=library_id).update(total_seats=seat_count('floor'))
+    Library.objects.filter(id=library_id).update(total_seats=seat_count('library'))
+
+
+def import_seat_layout(library, rows, created_by, dry_run=False):
+    """
+    Import seats from layout rows into a library
+
+    Args:
+        rows: (row number, row) pairs, e.g. from iter_layout_rows
+        dry_run: Validate and count without keeping anything
+
+    Returns:
+        dict: Number of seats imported and of floors and sections created
+
+    Raises:
+        LayoutImportError: If any row is invalid
+    """
+    errors = []
+    summary = {'seats': 0, 'floors_created': 0, 'sections_created': 0}
+
+    with transaction.atomic():
+        floors = {floor.floor_number: floor for floor in LibraryFloor.objects.filter(library=library)}
+        sections = {
+            (section.floor_id, section.name.lower()): section
+            for section in LibrarySection.objects.filter(floor__library=library, is_deleted=False)
+        }
+        seat_numbers = set(Seat.objects.filter(library=library).values_list('seat_number', flat=True))
+
+        pending = []
+        for number, data in rows:
+            serializer = SeatLayoutRowSerializer(data=data)
+            if data is None or not serializer.is_valid():
+                errors.append({'row': number, 'errors': serializer.errors if data is not None else 'Invalid JSON'})
+            elif serializer.validated_data['seat_number'] in seat_numbers:
+                errors.append({'row': number, 'errors': {'seat_number': ['Seat number already exists']}})
+            else:
+                row = serializer.validated_data
+                seat_numbers.add(row['seat_number'])
+            if len(errors) >= LAYOUT_IMPORT_MAX_ERRORS:
+                break
+            if errors:
+                # Keep validating the rest of the file, but stop writing
+                continue
+
+            floor = floors.get(row['floor'])
+            if floor is None:
+                floor = floors[row['floor']] = LibraryFloor.objects.create(
+                    library=library,
+                    floor_number=row['floor'],
+                    floor_name=row.get('floor_name') or f"Floor {row['floor']}",
+                    created_by=created_by
+                )
+                summary['floors_created'] += 1
+
+            section = sections.get((floor.id, row['section'].lower()))
+            if section is None:
+                section = sections[(floor.id, row['section'].lower())] = LibrarySection.objects.create(
+                    floor=floor,
+                    name=row['section'],
+                    section_type=row['section_type'],
+                    created_by=created_by
+                )
+                summary['sections_created'] += 1
+
+            pending.append(Seat(
+                library=library,
+                floor=floor,
+                section=section,
+                seat_number=row['seat_number'],
+                seat_type=row['seat_type'],
+                x_coordinate=row.get('x_coordinate'),
+                y_coordinate=row.get('y_coordinate'),
+                rotation=row['rotation'],
+                has_power_outlet=row['has_power_outlet'],
+                has_ethernet=row['has_ethernet'],
+                has_monitor=row['has_monitor'],
+                has_whiteboard=row['has_whiteboard'],
+                is_near_window=row['is_near_window'],
+                is_accessible=row['is_accessible'],
+                is_premium=row['is_premium'],
+                is_bookable=row['is_bookable'],
+                max_booking_duration_hours=row['max_booking_duration_hours'],
+                description=row['description'],
+                features=row['features'],
+                created_by=created_by
+            ))
+            if len(pending) >= LAYOUT_IMPORT_CHUNK_SIZE:
+                summary['seats'] += _insert_seats(library, pending)
+                pending = []
+
+        if errors:
+            raise LayoutImportError(errors)
+        if pending:
+            summary['seats'] += _insert_seats(library, pending)
+
+        if dry_run:
+            transaction.set_rollback(True)
+            return summary
+
+        recount_total_seats(library.id)
+        # bulk_create skips the seat signals, so refresh what they maintain
+        transaction.on_commit(lambda: reconcile_library_occupancy([library.id]))
+        transaction.on_commit(lambda: invalidate_feature_matrix(library.id))
+
+    return summary
@@ -0,0 +1,310 @@
+"""
+Maintenance planning for sets of seats
+
+A maintenance window for many seats (a row of repairs, a section-wide
+cleaning) is checked against bookings with one query. The planner can
+suggest the nearest windows that disturb the fewest bookings, or schedule
+the maintenance and move every affected booking to an equivalent free seat
+in the same transaction.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .availability import SeatAvailabilityIndex, ACTIVE_BOOKING_STATUSES, slot_mask
+
+SUGGESTION_DAYS = 7
+SUGGESTION_STEP_MINUTES = 15
+SUGGESTION_LIMIT = 5
+OPEN_MAINTENANCE_STATUSES = ['SCHEDULED', 'IN_PROGRESS']
+OUT_OF_SERVICE_STATUSES = ['MAINTENANCE', 'OUT_OF_ORDER']
+
+
+class MaintenanceConflictError(Exception):
+    """
+    Raised when bookings in a maintenance window cannot all be moved
+
+    Attributes:
+        bookings: The bookings that could not be moved
+    """
+    def __init__(self, message, bookings):
+        super().__init__(message)
+        self.bookings = bookings
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def planned_maintenance(start, end):
+    """
+    Open maintenance that overlaps a window
+
+    Args:
+        start, end: Aware datetimes
+    """
+    from .models import SeatMaintenanceLog
+
+    return SeatMaintenanceLog.objects.filter(
+        status__in=OPEN_MAINTENANCE_STATUSES,
+        scheduled_date__lt=end,
+        scheduled_end__gt=start,
+        is_deleted=False
+    )
+
+
+def affected_bookings(seat_ids, start, end):
+    """
+    Active bookings of the given seats that overlap a same-day window
+
+    Args:
+        start, end: Aware datetimes on the same local day
+    """
+    from .models import SeatBooking
+
+    start, end = timezone.localtime(start), timezone.localtime(end)
+    return list(SeatBooking.objects.filter(
+        seat_id__in=list(seat_ids),
+        booking_date=start.date(),
+        status__in=ACTIVE_BOOKING_STATUSES,
+        start_time__lt=end.time(),
+        end_time__gt=start.time(),
+        is_deleted=False
+    ).order_by('start_time', 'seat__seat_number').values(
+        'id', 'user_id', 'seat_id', 'booking_date', 'start_time', 'end_time', 'status',
+        'seat__seat_number', 'seat__seat_type', 'seat__floor_id', 'seat__section_id',
+        'seat__has_power_outlet'
+    ))
+
+
+def suggest_windows(library, seat_ids, start, end, limit=SUGGESTION_LIMIT):
+    """
+    Nearest windows of the same length that disturb the fewest bookings
+
+    Candidates start every ``SUGGESTION_STEP_MINUTES`` within opening hours
+    over the next ``SUGGESTION_DAYS`` days. The bookings of the seats over
+    those days are read with one query, and the bookings each candidate
+    overlaps are counted with two binary searches per day.
+
+    Returns:
+        list: Dicts with start, end and affected_bookings, best first
+    """
+    from .models import SeatBooking
+
+    now = timezone.now()
+    start = timezone.localtime(start)
+    duration = int((end - start).total_seconds() // 60)
+    first_day = start.date()
+    last_day = first_day + timedelta(days=SUGGESTION_DAYS)
+
+    bookings_by_day = defaultdict(lambda: ([], []))
+    for booking_date, start_time, end_time in SeatBooking.objects.filter(
+        seat_id__in=list(seat_ids),
+        booking_date__range=(first_day, last_day),
+        status__in=ACTIVE_BOOKING_STATUSES,
+        is_deleted=False
+    ).values_list('booking_date', 'start_time', 'end_time'):
+        starts, ends = bookings_by_day[booking_date]
+        starts.append(_minutes(start_time))
+        ends.append(_minutes(end_time) or 24 * 60)
+
+    if library.is_24_hours:
+        opening, closing = 0, 24 * 60
+    else:
+        opening, closing = _minutes(library.opening_time), _minutes(library.closing_time)
+
+    candidates = []
+    offsets = np.arange(opening, closing - duration + 1, SUGGESTION_STEP_MINUTES)
+    for day_offset in range(SUGGESTION_DAYS + 1):
+        day = first_day + timedelta(days=day_offset)
+        day_start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        starts, ends = bookings_by_day[day]
+        starts, ends = np.sort(starts), np.sort(ends)
+        # Bookings starting before the window ends, less those that ended before it starts
+        overlapping = (
+            np.searchsorted(starts, offsets + duration, side='left')
+            - np.searchsorted(ends, offsets, side='right')
+        )
+        for offset, count in zip(offsets.tolist(), overlapping.tolist()):
+            window_start = day_start + timedelta(minutes=offset)
+            if window_start < now:
+                continue
+            candidates.append((
+                count,
+                abs((window_start - start).total_seconds()),
+                window_start
+            ))
+
+    candidates.sort()
+    return [
+        {
+            'start': window_start,
+            'end': window_start + timedelta(minutes=duration),
+            'affected_bookings': count,
+        }
+        for count, _, window_start in candidates[:limit]
+    ]
+
+
+def _relocation_targets(library_id, excluded_seat_ids, bookings, start, end):
+    """
+    Choose an equivalent free seat for each booking
+
+    Seats of the same type are preferred in the same section, then on the same
+    floor, then with the same power outlet. Free time is read from the
+    availability index rebuilt from the database, and seats given out are
+    marked busy as the bookings are placed.
+
+    Returns:
+        tuple: (booking id to seat values, bookings left without a seat)
+    """
+    from .models import Seat, SeatMaintenanceLog
+
+    busy_for_maintenance = SeatMaintenanceLog.objects.filter(
+        seat__library_id=library_id,
+        status__in=OPEN_MAINTENANCE_STATUSES,
+        scheduled_date__lt=end,
+        scheduled_end__gt=start,
+        is_deleted=False
+    ).values('seat_id')
+    candidates = list(Seat.objects.filter(
+        library_id=library_id,
+        seat_type__in={booking['seat__seat_type'] for booking in bookings},
+        is_bookable=True,
+        is_deleted=False
+    ).exclude(
+        Q(id__in=list(excluded_seat_ids)) | Q(id__in=busy_for_maintenance) |
+        Q(status__in=OUT_OF_SERVICE_STATUSES)
+    ).order_by('seat_number').values(
+        'id', 'seat_number', 'seat_type', 'floor_id', 'section_id', 'has_power_outlet'
+    ))
+    if not candidates:
+        return {}, list(bookings)
+
+    # The seats are locked, so the index rebuilt now stays accurate until commit
+    bitmaps = SeatAvailabilityIndex(library_id, timezone.localtime(start).date()).rebuild(
+        [seat['id'] for seat in candidates]
+    )
+    candidates_by_type = defaultdict(list)
+    for seat in candidates:
+        candidates_by_type[seat['seat_type']].append(seat)
+
+    moves = {}
+    unresolved = []
+    for booking in bookings:
+        mask = slot_mask(booking['start_time'], booking['end_time'])
+        ranked = sorted(
+            candidates_by_type[booking['seat__seat_type']],
+            key=lambda seat: (
+                seat['section_id'] != booking['seat__section_id'],
+                seat['floor_id'] != booking['seat__floor_id'],
+                seat['has_power_outlet'] != booking['seat__has_power_outlet'],
+            )
+        )
+        target = next((seat for seat in ranked if not bitmaps[str(seat['id'])] & mask), None)
+        if target is None:
+            unresolved.append(booking)
+            continue
+        bitmaps[str(target['id'])] |= mask
+        moves[booking['id']] = target
+
+    return moves, unresolved
+
+
+def schedule_maintenance(library, seat_ids, start, end, maintenance_type, description, created_by):
+    """
+    Schedule maintenance for a set of seats, moving the bookings in its way
+
+    Every seat of the library is locked, the affected bookings are read with
+    one query, moved to equivalent free seats with one bulk update and the
+    maintenance logs are created in bulk, all in one transaction.
+
+    Returns:
+        tuple: (maintenance logs, list of (booking values, new seat values))
+
+    Raises:
+        MaintenanceConflictError: If any affected booking is checked in or
+            no equivalent seat is free for it; nothing is changed
+    """
+    from apps.notifications.models import Notification
+    from .models import Seat, SeatBooking, SeatMaintenanceLog
+
+    seat_ids = {str(seat_id) for seat_id in seat_ids}
+    now = timezone.now()
+
+    with transaction.atomic():
+        # One lock query in primary key order, like group bookings
+        locked = list(Seat.objects.select_for_update().filter(
+            library_id=library.id,
+            is_deleted=False
+        ).order_by('pk').values_list('id', flat=True))
+        if not seat_ids <= {str(seat_id) for seat_id in locked}:
+            raise MaintenanceConflictError("One or more seats are not in this library", [])
+
+        affected = affected_bookings(seat_ids, start, end)
+        checked_in = [booking for booking in affected if booking['status'] != 'CONFIRMED']
+        movable = [booking for booking in affected if booking['status'] == 'CONFIRMED']
+
+        moves, unresolved = _relocation_targets(library.id, seat_ids, movable, start, end)
+        unresolved = checked_in + unresolved
+        if unresolved:
+            raise MaintenanceConflictError(
+                "Some bookings in this window cannot be moved to an equivalent seat", unresolved
+            )
+
+        if moves:
+            SeatBooking.objects.bulk_update([
+                SeatBooking(
+                    id=booking_id,
+                    seat_id=seat['id'],
+                    qr_code_data='',
+                    qr_code_expires_at=None,
+                    updated_at=now
+                )
+                for booking_id, seat in moves.items()
+            ], ['seat', 'qr_code_data', 'qr_code_expires_at', 'updated_at'])
+
+            Notification.objects.bulk_create([
+                Notification(
+                    user_id=booking['user_id'],
+                    title='Seat Booking Moved',
+                    message=(
+                        f"Seat {booking['seat__seat_number']} is under maintenance on {booking['booking_date']}, "
+                        f"so your booking was moved to seat {moves[booking['id']]['seat_number']} at the same time."
+                    ),
+                    type='WARNING',
+                    action_url='/my-bookings',
+                    metadata={
+                        'booking_id': str(booking['id']),
+                        'seat_id': str(moves[booking['id']]['id']),
+                        'previous_seat_id': str(booking['seat_id']),
+                        'status': booking['status']
+                    }
+                )
+                for booking in movable
+            ])
+
+            # bulk_update skips the booking signals, so refresh the index after commit
+            moved_seat_ids = {booking['seat_id'] for booking in movable} | {
+                seat['id'] for seat in moves.values()
+            }
+            booking_date = timezone.localtime(start).date()
+            transaction.on_commit(
+                lambda: SeatAvailabilityIndex(library.id, booking_date).rebuild(moved_seat_ids)
+            )
+
+        logs = SeatMaintenanceLog.objects.bulk_create([
+            SeatMaintenanceLog(
+                seat_id=seat_id,
+                maintenance_type=maintenance_type,
+                scheduled_date=start,
+                scheduled_end=end,
+                description=description,
+                created_by=created_by
+            )
+            for seat_id in sorted(seat_ids)
+        ])
+
+    return logs, [(booking, moves[booking['id']]) for booking in movable]
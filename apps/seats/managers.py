@@ -0,0 +1,341 @@
+"""
+Custom managers for seats app
+"""
+from django.db import models, transaction
+
+
+class BookingConflictError(Exception):
+    """Raised when a seat is already booked for the requested window"""
+
+
+class SeatBookingManager(models.Manager):
+    """Manager for seat bookings"""
+
+    def create_booking(self, seat, booking_date, start_time, end_time, **extra_fields):
+        """
+        Create a booking while holding a row lock on the seat
+
+        Concurrent bookings of the same seat are serialised on the seat row, and
+        the conflict check runs against the database inside the lock, so only
+        one of several simultaneous requests for overlapping windows can win.
+        SQLite has no row locks; there transactions take the write lock when
+        they begin, which serialises bookings the same way.
+
+        If the library overbooks and the window is held only by likely
+        no-shows, the booking is created as a provisional (``PENDING``)
+        overbooking instead, which is confirmed if the holders do not show up.
+
+        Raises:
+            BookingConflictError: If the window overlaps an active booking
+        """
+        from .models import Seat
+        from .noshow import can_overbook, holders_release_at
+
+        with transaction.atomic(using=self.db):
+            locked_seat = Seat.objects.select_for_update().get(pk=seat.pk)
+
+            if locked_seat.get_conflicting_bookings(booking_date, start_time, end_time).exists():
+                if not can_overbook(locked_seat, booking_date, start_time, end_time):
+                    raise BookingConflictError("Seat is already booked for this time")
+                # Lapses once the holders can no longer be released as no-shows
+                extra_fields.update(
+                    status='PENDING',
+                    is_overbooked=True,
+                    auto_cancel_at=holders_release_at(locked_seat.pk, booking_date, start_time, end_time)
+                )
+
+            return self.create(
+                seat=locked_seat,
+                booking_date=booking_date,
+                start_time=start_time,
+                end_time=end_time,
+                **extra_fields
+            )
+
+    def create_recurring_booking(self, user, seat, start_time, end_time, recurrence_pattern, **extra_fields):
+        """
+        Materialise every free occurrence of a recurring booking
+
+        All occurrences are checked for conflicts with one query under a row
+        lock on the seat. The first free occurrence becomes the parent booking
+        and the rest are written with ``bulk_create``; occurrences that clash
+        with an existing booking, planned maintenance or the user's daily
+        limit are skipped and reported rather than failing the whole request.
+
+        Returns:
+            tuple: (parent booking or None, list of created bookings,
+            list of {'date', 'reason'} conflicts)
+        """
+        from datetime import datetime
+        from django.db.models import Count
+        from django.utils import timezone
+        from apps.core.counters import increment_counter
+        from apps.core.models import ActivityLog
+        from apps.dashboard.summary import invalidate_user_summaries
+        from apps.notifications.reminders import schedule_seat_booking_reminders
+        from .availability import ACTIVE_BOOKING_STATUSES, occupy_dates
+        from .models import Seat, SeatMaintenanceLog
+        from .recurrence import expand_recurrence
+
+        dates = expand_recurrence(recurrence_pattern)
+
+        with transaction.atomic(using=self.db):
+            locked_seat = Seat.objects.select_for_update(of=('self',)).select_related(
+                'library__configuration'
+            ).get(pk=seat.pk)
+            library_config = locked_seat.library.configuration
+
+            booked_dates = set(
+                self.filter(
+                    seat=locked_seat,
+                    booking_date__in=dates,
+                    status__in=ACTIVE_BOOKING_STATUSES,
+                    start_time__lt=end_time,
+                    end_time__gt=start_time,
+                    is_deleted=False
+                ).values_list('booking_date', flat=True)
+            )
+            user_bookings = dict(
+                self.filter(
+                    user=user,
+                    booking_date__in=dates,
+                    status__in=ACTIVE_BOOKING_STATUSES,
+                    is_deleted=False
+                ).values_list('booking_date').annotate(count=Count('id')).order_by()
+            )
+            windows = {
+                occurrence: (
+                    timezone.make_aware(datetime.combine(occurrence, start_time)),
+                    timezone.make_aware(datetime.combine(occurrence, end_time))
+                )
+                for occurrence in dates
+            }
+            maintenance = list(
+                SeatMaintenanceLog.objects.filter(
+                    seat=locked_seat,
+                    status__in=['SCHEDULED', 'IN_PROGRESS'],
+                    scheduled_date__lt=max(end for _, end in windows.values()),
+                    scheduled_end__gt=min(start for start, _ in windows.values()),
+                    is_deleted=False
+                ).values_list('scheduled_date', 'scheduled_end')
+            ) if dates else []
+
+            conflicts = []
+            free_dates = []
+            for occurrence in dates:
+                booking_start, booking_end = windows[occurrence]
+                if occurrence in booked_dates:
+                    conflicts.append({'date': occurrence, 'reason': 'Seat is already booked for this time'})
+                elif any(begins < booking_end and ends > booking_start for begins, ends in maintenance):
+                    conflicts.append({'date': occurrence, 'reason': 'Seat is scheduled for maintenance at this time'})
+                elif user_bookings.get(occurrence, 0) >= library_config.max_daily_bookings_per_user:
+                    conflicts.append({
+                        'date': occurrence,
+                        'reason': f"Daily booking limit ({library_config.max_daily_bookings_per_user}) exceeded"
+                    })
+                else:
+                    free_dates.append(occurrence)
+
+            if not free_dates:
+                return None, [], conflicts
+
+            extra_fields['booking_type'] = 'RECURRING'
+            pattern = {
+                key: value.isoformat() if hasattr(value, 'isoformat') else value
+                for key, value in recurrence_pattern.items()
+            }
+            parent = self.create(
+                user=user,
+                seat=locked_seat,
+                booking_date=free_dates[0],
+                start_time=start_time,
+                end_time=end_time,
+                recurrence_pattern=pattern,
+                **extra_fields
+            )
+
+            instances = [
+                self.model(
+                    user=user,
+                    seat=locked_seat,
+                    booking_date=occurrence,
+                    start_time=start_time,
+                    end_time=end_time,
+                    parent_booking=parent,
+                    **extra_fields
+                )
+                for occurrence in free_dates[1:]
+            ]
+            for instance in instances:
+                instance.prepare_for_save()
+            instances = self.bulk_create(instances)
+
+            # bulk_create skips the booking signals, so apply their effects set-wise
+            if instances:
+                increment_counter(Seat, locked_seat.pk, 'total_bookings', len(instances))
+                ActivityLog.objects.bulk_create([
+                    ActivityLog(
+                        user=user,
+                        activity_type='SEAT_BOOK',
+                        description=f'Booked seat {locked_seat.seat_number} for {instance.booking_date}',
+                        metadata={
+                            'booking_id': str(instance.id),
+                            'seat_code': locked_seat.seat_code,
+                            'booking_date': instance.booking_date.isoformat(),
+                            'start_time': instance.start_time.isoformat(),
+                            'end_time': instance.end_time.isoformat(),
+                            'parent_booking_id': str(parent.id),
+                        }
+                    )
+                    for instance in instances
+                ])
+                occupied_dates = [instance.booking_date for instance in instances]
+                transaction.on_commit(lambda: occupy_dates(
+                    locked_seat.library_id, locked_seat.id, occupied_dates, start_time, end_time
+                ))
+                schedule_seat_booking_reminders(instances)
+                invalidate_user_summaries([user.pk], ['seat_bookings'])
+
+            return parent, [parent] + instances, conflicts
+
+    def create_group_booking(self, group_leader, seat_ids, booking_date, start_time, end_time, **extra_fields):
+        """
+        Book several seats for one group as a single all-or-nothing operation
+
+        All seat rows are locked in a fixed order and checked for conflicts
+        with one query, so the group either gets every seat or none of them.
+
+        Raises:
+            BookingConflictError: If any of the seats is out of service, under
+                planned maintenance or already booked; ``seat_ids`` lists them
+        """
+        import uuid
+        from datetime import datetime
+        from django.utils import timezone
+        from .availability import ACTIVE_BOOKING_STATUSES
+        from .maintenance import planned_maintenance
+        from .models import Seat
+
+        seat_ids = sorted(str(seat_id) for seat_id in seat_ids)
+
+        with transaction.atomic(using=self.db):
+            locked_seats = list(
+                Seat.objects.select_for_update().filter(pk__in=seat_ids).order_by('pk')
+            )
+            if len(locked_seats) != len(seat_ids):
+                raise BookingConflictError("One or more seats no longer exist")
+
+            unavailable = {str(seat.pk) for seat in locked_seats if not seat.is_available}
+            unavailable.update(str(seat_id) for seat_id in planned_maintenance(
+                timezone.make_aware(datetime.combine(booking_date, start_time)),
+                timezone.make_aware(datetime.combine(booking_date, end_time))
+            ).filter(seat_id__in=seat_ids).values_list('seat_id', flat=True))
+            if unavailable:
+                error = BookingConflictError("One or more seats are not available for this time")
+                error.seat_ids = sorted(unavailable)
+                raise error
+
+            conflicts = self.filter(
+                seat_id__in=seat_ids,
+                booking_date=booking_date,
+                status__in=ACTIVE_BOOKING_STATUSES,
+                start_time__lt=end_time,
+                end_time__gt=start_time,
+                is_deleted=False
+            ).values_list('seat_id', flat=True)
+            conflicting = [str(seat_id) for seat_id in conflicts]
+            if conflicting:
+                error = BookingConflictError("One or more seats are already booked for this time")
+                error.seat_ids = conflicting
+                raise error
+
+            group_booking_id = uuid.uuid4()
+            return [
+                self.create(
+                    user=group_leader,
+                    seat=seat,
+                    booking_date=booking_date,
+                    start_time=start_time,
+                    end_time=end_time,
+                    booking_type='GROUP',
+                    group_booking_id=group_booking_id,
+                    group_size=len(locked_seats),
+                    group_leader=group_leader,
+                    **extra_fields
+                )
+                for seat in locked_seats
+            ]
+
+    def check_in_with_token(self, claims, user, check_in_method='QR'):
+        """
+        Check in with a verified QR token
+
+        The token already proves who the booking belongs to and when it may be
+        checked in, so the booking is moved to CHECKED_IN with one conditional
+        update that only matches if it is still confirmed for the same slot.
+
+        Returns:
+            tuple: (success, message)
+
+        Raises:
+            QRTokenError: If the token was already used to check in
+        """
+        import uuid
+        from django.utils import timezone
+        from apps.core.models import ActivityLog
+        from apps.core.qr_tokens import claim_time, consume_qr_token
+        from .models import Seat
+
+        now = timezone.now()
+        if not claim_time(claims, 'nbf') <= now <= claim_time(claims, 'naf'):
+            return False, "Cannot check in at this time"
+        consume_qr_token(claims, 'check_in')
+
+        booking_start = timezone.localtime(claim_time(claims, 'bs'))
+        with transaction.atomic(using=self.db):
+            checked_in = self.filter(
+                id=claims['i'],
+                user=user,
+                seat_id=claims['s'],
+                booking_date=booking_start.date(),
+                start_time=booking_start.time(),
+                status='CONFIRMED',
+                is_deleted=False
+            ).update(
+                status='CHECKED_IN',
+                checked_in_at=now,
+                actual_start_time=now,
+                updated_at=now
+            )
+            if not checked_in:
+                return False, "Cannot check in at this time"
+
+            seat_occupied = Seat.objects.filter(id=claims['s'], status='AVAILABLE').update(
+                status='OCCUPIED', updated_at=now
+            )
+
+            ActivityLog.objects.create(
+                user=user,
+                activity_type='SEAT_CHECKIN',
+                description='Checked in to seat',
+                metadata={
+                    'booking_id': str(uuid.UUID(claims['i'])),
+                    'seat_id': str(uuid.UUID(claims['s'])),
+                    'check_in_method': check_in_method,
+                }
+            )
+
+            if seat_occupied:
+                transaction.on_commit(lambda: _occupy_seat_counters(claims['s']))
+
+        return True, "Checked in successfully"
+
+
+def _occupy_seat_counters(seat_id):
+    """Count a seat occupied by a bulk status update in the live occupancy counters"""
+    from apps.library.occupancy import apply_seat_transition
+    from .models import Seat
+
+    scopes = Seat.objects.filter(pk=seat_id).values_list('library_id', 'floor_id', 'section_id').first()
+    if scopes:
+        apply_seat_transition(*scopes, 'AVAILABLE', 'OCCUPIED')
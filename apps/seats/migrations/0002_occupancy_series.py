@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:53
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library", "0002_library_configuration_auto_book_from_waitlist"),
+        ("seats", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OccupancySeries",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "scope",
+                    models.CharField(
+                        choices=[
+                            ("SEAT", "Seat"),
+                            ("SECTION", "Section"),
+                            ("LIBRARY", "Library"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("seat_count", models.PositiveIntegerField(default=1)),
+                ("occupied_minutes", models.JSONField(default=list)),
+                ("peak_occupancy", models.PositiveIntegerField(default=0)),
+                ("peak_at", models.TimeField(blank=True, null=True)),
+                (
+                    "library",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="occupancy_series",
+                        to="library.library",
+                    ),
+                ),
+                (
+                    "seat",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="occupancy_series",
+                        to="seats.seat",
+                    ),
+                ),
+                (
+                    "section",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="occupancy_series",
+                        to="library.librarysection",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "seats_occupancy_series",
+                "ordering": ["library", "scope", "-date"],
+                "indexes": [
+                    models.Index(
+                        fields=["library", "scope", "date"],
+                        name="seats_occup_library_617f10_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("seats", "0002_occupancy_series"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="seatbooking",
+            name="is_overbooked",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="seatbooking",
+            name="no_show_probability",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=3, null=True
+            ),
+        ),
+    ]
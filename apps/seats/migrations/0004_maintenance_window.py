@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("seats", "0003_no_show_prediction"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="seatmaintenancelog",
+            name="scheduled_end",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
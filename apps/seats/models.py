@@ -6,6 +6,7 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth import get_user_model
 from apps.core.models import BaseModel, TimeStampedModel
 from apps.core.utils import generate_unique_code, generate_qr_code
+from .managers import SeatBookingManager
 from datetime import timedelta
 import uuid
 
@@ -113,64 +114,50 @@ class Seat(BaseModel):
     
     def get_availability_for_date(self, date):
         """Get availability slots for a specific date"""
-        from django.utils import timezone
+        from .availability import SeatAvailabilityIndex
         
-        # Get all bookings for the date
-        bookings = self.bookings.filter(
-            booking_date=date,
+        index = SeatAvailabilityIndex(self.library_id, date)
+        return index.get_free_slots(
+            self.id,
+            self.library.opening_time,
+            self.library.closing_time
+        )
+    
+    def get_conflicting_bookings(self, booking_date, start_time, end_time):
+        """Get active bookings overlapping the given window from the database"""
+        return self.bookings.filter(
+            booking_date=booking_date,
             status__in=['CONFIRMED', 'CHECKED_IN'],
             is_deleted=False
-        ).order_by('start_time')
-        
-        # Generate available time slots
-        library_config = self.library.configuration
-        opening_time = self.library.opening_time
-        closing_time = self.library.closing_time
-        
-        available_slots = []
-        current_time = opening_time
-        
-        for booking in bookings:
-            if current_time < booking.start_time:
-                available_slots.append({
-                    'start_time': current_time,
-                    'end_time': booking.start_time,
-                    'duration_minutes': (
-                        timezone.datetime.combine(date, booking.start_time) -
-                        timezone.datetime.combine(date, current_time)
-                    ).total_seconds() / 60
-                })
-            current_time = max(current_time, booking.end_time)
-        
-        # Add final slot if there's time left
-        if current_time < closing_time:
-            available_slots.append({
-                'start_time': current_time,
-                'end_time': closing_time,
-                'duration_minutes': (
-                    timezone.datetime.combine(date, closing_time) -
-                    timezone.datetime.combine(date, current_time)
-                ).total_seconds() / 60
-            })
-        
-        return available_slots
+        ).filter(
+            models.Q(start_time__lt=end_time) & models.Q(end_time__gt=start_time)
+        )
     
     def can_user_book(self, user, start_time, end_time, booking_date):
         """Check if user can book this seat for given time"""
+        from django.utils import timezone
+        from .availability import SeatAvailabilityIndex
+        
         if not self.is_available:
             return False, "Seat is not available"
         
         # Check if seat is already booked for this time
-        conflicting_bookings = self.bookings.filter(
-            booking_date=booking_date,
-            status__in=['CONFIRMED', 'CHECKED_IN'],
+        index = SeatAvailabilityIndex(self.library_id, booking_date)
+        if not index.is_free(self.id, start_time, end_time):
+            from .noshow import can_overbook
+            if not can_overbook(self, booking_date, start_time, end_time):
+                return False, "Seat is already booked for this time"
+        
+        # Check planned maintenance
+        booking_start = timezone.make_aware(timezone.datetime.combine(booking_date, start_time))
+        booking_end = timezone.make_aware(timezone.datetime.combine(booking_date, end_time))
+        if self.maintenance_logs.filter(
+            status__in=['SCHEDULED', 'IN_PROGRESS'],
+            scheduled_date__lt=booking_end,
+            scheduled_end__gt=booking_start,
             is_deleted=False
-        ).filter(
-            models.Q(start_time__lt=end_time) & models.Q(end_time__gt=start_time)
-        )
-        
-        if conflicting_bookings.exists():
-            return False, "Seat is already booked for this time"
+        ).exists():
+            return False, "Seat is scheduled for maintenance at this time"
         
         # Check user's daily booking limit
         library_config = self.library.configuration
@@ -248,6 +235,8 @@ class SeatBooking(BaseModel):
     auto_cancel_at = models.DateTimeField(null=True, blank=True)
     reminder_sent = models.BooleanField(default=False)
     late_cancellation = models.BooleanField(default=False)
+    no_show_probability = models.DecimalField(max_digits=3, decimal_places=2, null=True, blank=True)
+    is_overbooked = models.BooleanField(default=False)
     
     # Group Booking (if applicable)
     group_booking_id = models.UUIDField(null=True, blank=True)
@@ -279,6 +268,8 @@ class SeatBooking(BaseModel):
     penalty_points = models.PositiveIntegerField(default=0)
     loyalty_points_earned = models.PositiveIntegerField(default=0)
     
+    objects = SeatBookingManager()
+    
     class Meta:
         db_table = 'seats_booking'
         ordering = ['-booking_date', '-start_time']
@@ -293,19 +284,32 @@ class SeatBooking(BaseModel):
         return f"{self.user.get_full_name()} - {self.seat.seat_number} on {self.booking_date}"
     
     def save(self, *args, **kwargs):
+        self.prepare_for_save()
+        super().save(*args, **kwargs)
+    
+    def prepare_for_save(self):
+        """Fill in generated fields; also used before bulk_create, which skips save()"""
         if not self.booking_code:
             self.booking_code = generate_unique_code('BK', 8)
         
-        # Set auto-cancel time
-        if not self.auto_cancel_at and self.status == 'CONFIRMED':
+        # Score new bookings against the published no-show tables
+        if self._state.adding and self.no_show_probability is None:
+            from .noshow import predict_no_show
+            self.no_show_probability = predict_no_show(self.user_id, self.booking_date, self.start_time)
+        
+        # Set auto-cancel time, earlier for likely no-shows if the library releases them early
+        if not self.auto_cancel_at and (self.status == 'CONFIRMED' or self.is_overbooked):
             from django.utils import timezone
             library_config = self.seat.library.configuration
             booking_datetime = timezone.datetime.combine(self.booking_date, self.start_time)
-            self.auto_cancel_at = booking_datetime + timedelta(
-                minutes=library_config.auto_cancel_no_show_minutes
-            )
-        
-        super().save(*args, **kwargs)
+            minutes = library_config.auto_cancel_no_show_minutes
+            if (
+                library_config.enable_early_release
+                and self.no_show_probability is not None
+                and self.no_show_probability >= library_config.early_release_no_show_probability
+            ):
+                minutes = min(minutes, library_config.early_release_minutes)
+            self.auto_cancel_at = booking_datetime + timedelta(minutes=minutes)
     
     @property
     def duration_hours(self):
@@ -327,8 +331,8 @@ class SeatBooking(BaseModel):
         """Check if booking is currently active"""
         from django.utils import timezone
         now = timezone.now()
-        booking_start = timezone.datetime.combine(self.booking_date, self.start_time)
-        booking_end = timezone.datetime.combine(self.booking_date, self.end_time)
+        booking_start = timezone.make_aware(timezone.datetime.combine(self.booking_date, self.start_time))
+        booking_end = timezone.make_aware(timezone.datetime.combine(self.booking_date, self.end_time))
         
         return (
             self.status in ['CONFIRMED', 'CHECKED_IN'] and
@@ -340,7 +344,7 @@ class SeatBooking(BaseModel):
         """Check if user can check in"""
         from django.utils import timezone
         now = timezone.now()
-        booking_start = timezone.datetime.combine(self.booking_date, self.start_time)
+        booking_start = timezone.make_aware(timezone.datetime.combine(self.booking_date, self.start_time))
         
         # Allow early check-in based on library configuration
         library_config = self.seat.library.configuration
@@ -357,34 +361,36 @@ class SeatBooking(BaseModel):
         return self.status == 'CHECKED_IN'
     
     def generate_qr_code(self):
-        """Generate QR code for check-in"""
+        """
+        Generate a signed QR check-in token
+
+        The token carries the check-in window and expires on its own, so
+        nothing is written to the database. It stays valid for check-out
+        until the booking ends.
+        """
         from django.utils import timezone
-        from apps.core.utils import generate_secure_token
+        from apps.core.qr_tokens import issue_qr_token
         
-        # Generate access token
-        self.access_token = generate_secure_token()
-        
-        # Set QR code expiry
         library_config = self.seat.library.configuration
         self.qr_code_expires_at = timezone.now() + timedelta(
             minutes=library_config.qr_code_expiry_minutes
         )
+        booking_start = timezone.make_aware(
+            timezone.datetime.combine(self.booking_date, self.start_time)
+        )
+        booking_end = timezone.make_aware(
+            timezone.datetime.combine(self.booking_date, self.end_time)
+        )
         
-        # Create QR code data
-        qr_data = {
-            'booking_id': str(self.id),
-            'booking_code': self.booking_code,
-            'access_token': self.access_token,
-            'seat_code': self.seat.seat_code,
-            'user_id': str(self.user.id),
-            'expires_at': self.qr_code_expires_at.isoformat()
-        }
-        
-        import json
-        self.qr_code_data = json.dumps(qr_data)
-        self.save()
-        
-        return qr_data
+        self.qr_code_data = issue_qr_token(
+            'seat_booking', self.id, self.user_id, self.qr_code_expires_at,
+            s=self.seat_id,
+            bs=booking_start,
+            be=max(booking_end, self.qr_code_expires_at),
+            nbf=booking_start - timedelta(minutes=library_config.early_checkin_minutes),
+            naf=booking_start + timedelta(hours=1)
+        )
+        return self.qr_code_data
     
     def check_in(self, check_in_method='QR'):
         """Check in to the seat"""
@@ -399,9 +405,9 @@ class SeatBooking(BaseModel):
         
         # Update seat status
         self.seat.status = 'OCCUPIED'
-        self.seat.save()
+        self.seat.save_changed()
         
-        self.save()
+        self.save_changed()
         
         # Log activity
         from apps.core.models import ActivityLog
@@ -431,7 +437,7 @@ class SeatBooking(BaseModel):
         
         # Update seat status
         self.seat.status = 'AVAILABLE'
-        self.seat.save()
+        self.seat.save_changed()
         
         # Award loyalty points
         library_config = self.seat.library.configuration
@@ -442,7 +448,7 @@ class SeatBooking(BaseModel):
         if hasattr(self.user, 'profile'):
             self.user.profile.add_loyalty_points(points, 'Seat booking completion')
         
-        self.save()
+        self.save_changed()
         
         # Log activity
         from apps.core.models import ActivityLog
@@ -487,7 +493,7 @@ class SeatBooking(BaseModel):
                 self.user.profile.save()
         
         self.status = 'CANCELLED'
-        self.save()
+        self.save_changed()
         
         # Log activity
         from apps.core.models import ActivityLog
@@ -627,6 +633,7 @@ class SeatMaintenanceLog(BaseModel):
     
     # Scheduling
     scheduled_date = models.DateTimeField()
+    scheduled_end = models.DateTimeField(null=True, blank=True)
     started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     
@@ -698,4 +705,79 @@ class SeatUsageStatistics(TimeStampedModel):
         ordering = ['seat', '-date']
     
     def __str__(self):
-        return f"{self.seat.seat_number} - {self.date}"
\ No newline at end of file
+        return f"{self.seat.seat_number} - {self.date}"
+
+
+class OccupancySeries(TimeStampedModel):
+    """
+    Occupancy of a seat, section or whole library over one day
+    
+    ``occupied_minutes`` holds the seat-minutes in use in each fixed slot
+    from midnight; see ``apps.seats.timeseries``.
+    """
+    SCOPE_CHOICES = [
+        ('SEAT', 'Seat'),
+        ('SECTION', 'Section'),
+        ('LIBRARY', 'Library'),
+    ]
+    
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    library = models.ForeignKey('library.Library', on_delete=models.CASCADE, related_name='occupancy_series')
+    section = models.ForeignKey(
+        'library.LibrarySection',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='occupancy_series'
+    )
+    seat = models.ForeignKey(
+        Seat,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='occupancy_series'
+    )
+    date = models.DateField()
+    
+    # Series
+    seat_count = models.PositiveIntegerField(default=1)
+    occupied_minutes = models.JSONField(default=list)
+    peak_occupancy = models.PositiveIntegerField(default=0)
+    peak_at = models.TimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'seats_occupancy_series'
+        ordering = ['library', 'scope', '-date']
+        indexes = [
+            models.Index(fields=['library', 'scope', 'date']),
+        ]
+    
+    def __str__(self):
+        target = self.seat or self.section or self.library
+        return f"{target} - {self.date}"
+    
+    @property
+    def hourly_minutes(self):
+        """Seat-minutes in use per hour of the day"""
+        from .timeseries import hourly
+        return hourly(self.occupied_minutes)
+    
+    @property
+    def hourly_occupancy(self):
+        """Share of seats in use per hour of the day, as a percentage"""
+        capacity = self.seat_count * 60
+        return [
+            round(minutes / capacity * 100, 2) if capacity else 0
+            for minutes in self.hourly_minutes
+        ]
+    
+    @property
+    def peak_hour(self):
+        """Start of the busiest hour of the day"""
+        from .timeseries import peak_hour
+        return peak_hour(self.occupied_minutes)
+    
+    @property
+    def occupied_hours(self):
+        """Total seat-hours in use over the day"""
+        return sum(self.occupied_minutes) / 60
@@ -0,0 +1,308 @@
+"""
+No-show prediction and controlled overbooking for seat bookings
+
+A logistic regression is trained offline on booking outcomes. Each booking is
+described by the user's no-show record before it, the weekday and the hour it
+starts. Once trained, the model is evaluated for every user over every weekday
+and hour, and the probabilities are published to the cache as one 168-byte
+table per user plus a prior for users without history. Scoring a booking is a
+table lookup, never model inference.
+
+Libraries can use the score to release likely no-shows early and to accept a
+provisional booking for a window held only by likely no-shows. The provisional
+booking takes over if the holder does not show up or cancels, and lapses
+otherwise.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from apps.core.utils import SmartLibCache
+
+NO_SHOW_HISTORY_DAYS = 365
+NO_SHOW_MIN_SAMPLES = 50
+NO_SHOW_TABLE_TIMEOUT = 60 * 60 * 24 * 3
+NO_SHOW_SCORING_CHUNK = 2000
+# Pseudo-bookings at the overall rate that a user's own record is blended with
+PRIOR_WEIGHT = 5
+HOURS_PER_WEEK = 7 * 24
+OUTCOME_STATUSES = ['CHECKED_IN', 'COMPLETED', 'NO_SHOW']
+
+
+def _table_key(user_id):
+    return SmartLibCache.get_cache_key('noshow', 'user', user_id)
+
+
+def _prior_key():
+    return SmartLibCache.get_cache_key('noshow', 'prior')
+
+
+def predict_no_show(user_id, booking_date, start_time):
+    """
+    Look up the probability that a booking will be a no-show
+
+    Returns:
+        Decimal: Probability to two places, or None if no model is published
+    """
+    tables = cache.get_many([_table_key(user_id), _prior_key()])
+    table = tables.get(_table_key(user_id)) or tables.get(_prior_key())
+    if table is None:
+        return None
+    return Decimal(table[booking_date.weekday() * 24 + start_time.hour]) / 100
+
+
+def _features(no_show_rate, history, weekdays, hours):
+    """Feature matrix from per-row user record, weekday and start hour"""
+    angle = 2 * np.pi * hours / 24
+    return np.column_stack([
+        no_show_rate,
+        np.log1p(history),
+        np.eye(7)[weekdays],
+        np.sin(angle),
+        np.cos(angle),
+    ])
+
+
+def build_training_set(since):
+    """
+    Vectorised feature matrix and labels from booking outcomes
+
+    Each row only sees the user's bookings that started before it, so the
+    model is trained on what would have been known at booking time.
+
+    Returns:
+        tuple: (X, y, per-user summary as (user ids, no-shows, bookings), overall rate),
+            or None if there is too little history
+    """
+    from .models import SeatBooking
+
+    rows = list(SeatBooking.objects.filter(
+        booking_date__gte=since,
+        status__in=OUTCOME_STATUSES,
+        is_deleted=False
+    ).order_by('user_id', 'booking_date', 'start_time').values_list(
+        'user_id', 'booking_date', 'start_time', 'status'
+    ))
+    if len(rows) < NO_SHOW_MIN_SAMPLES:
+        return None
+
+    user_ids, booking_dates, start_times, statuses = zip(*rows)
+    users, user_index = np.unique(np.array([str(user_id) for user_id in user_ids]), return_inverse=True)
+    no_show = np.array([status == 'NO_SHOW' for status in statuses], dtype=float)
+    if no_show.min() == no_show.max():
+        return None
+    weekdays = np.array([day.weekday() for day in booking_dates])
+    hours = np.array([start.hour for start in start_times])
+
+    # Rows are grouped by user, so earlier bookings of the same user precede each row
+    position = np.arange(len(rows))
+    starts_group = np.concatenate([[True], user_index[1:] != user_index[:-1]])
+    first_row = np.maximum.accumulate(np.where(starts_group, position, 0))
+    history = position - first_row
+    cumulative = np.concatenate([[0], np.cumsum(no_show)])
+    past_no_shows = cumulative[position] - cumulative[first_row]
+
+    overall_rate = no_show.mean()
+    rate = (past_no_shows + PRIOR_WEIGHT * overall_rate) / (history + PRIOR_WEIGHT)
+
+    totals = np.bincount(user_index)
+    user_no_shows = np.bincount(user_index, weights=no_show)
+    return (
+        _features(rate, history, weekdays, hours),
+        no_show,
+        (users, user_no_shows, totals),
+        overall_rate,
+    )
+
+
+def _week_table(model, no_show_rate, history):
+    """Probabilities for every weekday and hour, for each row of user records"""
+    slots = np.arange(HOURS_PER_WEEK)
+    count = len(no_show_rate)
+    X = _features(
+        np.repeat(no_show_rate, HOURS_PER_WEEK),
+        np.repeat(history, HOURS_PER_WEEK),
+        np.tile(slots // 24, count),
+        np.tile(slots % 24, count),
+    )
+    probabilities = model.predict_proba(X)[:, 1].reshape(count, HOURS_PER_WEEK)
+    return np.rint(probabilities * 100).astype(np.uint8)
+
+
+def train_and_publish(now=None):
+    """
+    Train the no-show model and publish per-user probability tables
+
+    Returns:
+        int: Number of user tables published, or 0 if there was too little history
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    now = now or timezone.now()
+    training_set = build_training_set(now.date() - timedelta(days=NO_SHOW_HISTORY_DAYS))
+    if training_set is None:
+        return 0
+    X, y, (users, user_no_shows, totals), overall_rate = training_set
+
+    model = LogisticRegression(max_iter=1000)
+    model.fit(X, y)
+
+    # Score everyone at once, in chunks to bound memory
+    rates = (user_no_shows + PRIOR_WEIGHT * overall_rate) / (totals + PRIOR_WEIGHT)
+    for start in range(0, len(users), NO_SHOW_SCORING_CHUNK):
+        chunk = slice(start, start + NO_SHOW_SCORING_CHUNK)
+        tables = _week_table(model, rates[chunk], totals[chunk])
+        cache.set_many(
+            {_table_key(user_id): table.tobytes() for user_id, table in zip(users[chunk], tables)},
+            NO_SHOW_TABLE_TIMEOUT
+        )
+    prior = _week_table(model, np.array([overall_rate]), np.array([0]))[0]
+    cache.set(_prior_key(), prior.tobytes(), NO_SHOW_TABLE_TIMEOUT)
+
+    return len(users)
+
+
+def _overlapping(seat_id, booking_date, start_time, end_time):
+    from .models import SeatBooking
+
+    return SeatBooking.objects.filter(
+        seat_id=seat_id,
+        booking_date=booking_date,
+        start_time__lt=end_time,
+        end_time__gt=start_time,
+        is_deleted=False
+    )
+
+
+def can_overbook(seat, booking_date, start_time, end_time):
+    """
+    Check if a window may be booked provisionally over its current holders
+
+    Every overlapping booking must be confirmed, not checked in, and likely
+    to be a no-show; the window must not already carry a provisional booking;
+    and the library must be under its daily overbooking limit.
+    """
+    from .models import SeatBooking
+
+    config = seat.library.configuration
+    if not config.enable_overbooking:
+        return False
+
+    overlapping = _overlapping(seat.id, booking_date, start_time, end_time)
+    holders = list(overlapping.filter(
+        status__in=['CONFIRMED', 'CHECKED_IN']
+    ).values_list('status', 'no_show_probability'))
+    if not holders or any(
+        status != 'CONFIRMED' or probability is None
+        or probability < Decimal(str(config.overbooking_no_show_probability))
+        for status, probability in holders
+    ):
+        return False
+    if overlapping.filter(status='PENDING', is_overbooked=True).exists():
+        return False
+
+    return SeatBooking.objects.filter(
+        seat__library_id=seat.library_id,
+        booking_date=booking_date,
+        is_overbooked=True,
+        is_deleted=False
+    ).exclude(status='CANCELLED').count() < config.max_overbookings_per_day
+
+
+def holders_release_at(seat_id, booking_date, start_time, end_time):
+    """Latest no-show deadline among the bookings holding a window"""
+    return max(
+        _overlapping(seat_id, booking_date, start_time, end_time).filter(
+            status='CONFIRMED'
+        ).exclude(auto_cancel_at__isnull=True).values_list('auto_cancel_at', flat=True),
+        default=None
+    )
+
+
+def promote_overbookings(released, now):
+    """
+    Confirm provisional bookings whose holders have left their window
+
+    Holders leave by not showing up, cancelling or checking out. The promoted
+    bookings are updated in bulk, so their reminders are scheduled and their
+    users notified here, and the availability index is updated once the
+    transaction commits.
+
+    Args:
+        released: Booking values with seat_id, booking_date, start_time and end_time
+
+    Returns:
+        list: Values of the promoted bookings
+    """
+    from apps.dashboard.summary import invalidate_user_summaries
+    from apps.notifications.models import Notification
+    from apps.notifications.reminders import schedule_seat_booking_reminders
+    from .availability import SeatAvailabilityIndex
+    from .models import SeatBooking
+
+    windows = Q()
+    for booking in released:
+        windows |= Q(
+            seat_id=booking['seat_id'],
+            booking_date=booking['booking_date'],
+            start_time__lt=booking['end_time'],
+            end_time__gt=booking['start_time']
+        )
+    candidates = SeatBooking.objects.select_for_update(of=('self',)).filter(
+        windows,
+        status='PENDING',
+        is_overbooked=True,
+        is_deleted=False
+    ).values(
+        'id', 'user_id', 'seat_id', 'booking_date', 'start_time', 'end_time',
+        'seat__library_id', 'seat__seat_number',
+        'seat__library__configuration__auto_cancel_no_show_minutes'
+    )
+
+    # A window overlapping several holders is only free once all of them are gone
+    promoted = [
+        booking for booking in candidates
+        if not _overlapping(
+            booking['seat_id'], booking['booking_date'], booking['start_time'], booking['end_time']
+        ).filter(status__in=['CONFIRMED', 'CHECKED_IN']).exists()
+    ]
+    for booking in promoted:
+        # Holders can cancel well ahead, so the no-show clock starts no earlier than the booking
+        minutes = booking['seat__library__configuration__auto_cancel_no_show_minutes'] or 0
+        starts_at = timezone.make_aware(datetime.combine(booking['booking_date'], booking['start_time']))
+        SeatBooking.objects.filter(id=booking['id']).update(
+            status='CONFIRMED',
+            auto_cancel_at=max(starts_at, now) + timedelta(minutes=minutes),
+            updated_at=now
+        )
+        transaction.on_commit(
+            lambda booking=booking: SeatAvailabilityIndex(booking['seat__library_id'], booking['booking_date']).occupy(
+                booking['seat_id'], booking['start_time'], booking['end_time']
+            )
+        )
+
+    if promoted:
+        schedule_seat_booking_reminders(
+            SeatBooking.objects.filter(id__in=[booking['id'] for booking in promoted])
+        )
+
+    Notification.objects.bulk_create([
+        Notification(
+            user_id=booking['user_id'],
+            title='Seat Booking Confirmed',
+            message=f"Your provisional booking for seat {booking['seat__seat_number']} is now confirmed.",
+            type='SUCCESS',
+            action_url='/my-bookings',
+            metadata={
+                'booking_id': str(booking['id']),
+                'seat_id': str(booking['seat_id']),
+                'status': 'CONFIRMED'
+            }
+        )
+        for booking in promoted
+    ])
+    invalidate_user_summaries({booking['user_id'] for booking in promoted}, ['seat_bookings'])
+    return promoted
@@ -0,0 +1,205 @@
+"""
+Personalised seat recommendations
+
+The seats of a library are kept in the cache as a column-oriented feature
+matrix (seat type, section, power outlet, window, section noise level and
+review rating). A request builds the user's preferences from their past
+bookings with one query, reads the seats' availability bitmaps and scores
+every free seat with a handful of NumPy operations before taking the top k.
+"""
+import numpy as np
+from django.core.cache import cache
+from apps.core.utils import SmartLibCache
+from .availability import (
+    SeatAvailabilityIndex, SLOT_MINUTES, SLOTS_PER_DAY, slot_mask, time_to_slot
+)
+
+FEATURE_MATRIX_TIMEOUT = 60 * 60
+# Seat fields the feature matrix is built from, besides whether it is in service
+FEATURE_FIELDS = {
+    'library', 'section', 'seat_type', 'has_power_outlet',
+    'is_near_window', 'is_bookable', 'average_rating', 'is_deleted',
+}
+OUT_OF_SERVICE_STATUSES = ['MAINTENANCE', 'OUT_OF_ORDER']
+NOISE_LEVELS = {'SILENT': 0.0, 'LOW': 0.5, 'MODERATE': 1.0}
+HISTORY_LIMIT = 200
+# Minutes either side of the requested window that count towards availability
+AVAILABILITY_MARGIN_MINUTES = 60
+
+WEIGHTS = {
+    'seat_type': 2.0,
+    'section': 1.5,
+    'power_outlet': 1.0,
+    'window': 0.5,
+    'noise': 1.0,
+    'familiar': 0.5,
+    'rating': 1.5,
+    'availability': 1.0,
+}
+
+
+def _seat_type_codes():
+    from .models import Seat
+
+    return {code: index for index, (code, _) in enumerate(Seat.SEAT_TYPES)}
+
+
+def _matrix_key(library_id):
+    return SmartLibCache.get_library_cache_key(library_id, 'recommend:features')
+
+
+def invalidate_feature_matrix(library_id):
+    """Drop a library's cached seat feature matrix"""
+    cache.delete(_matrix_key(library_id))
+
+
+def build_feature_matrix(library_id):
+    """
+    Feature columns for the bookable, in-service seats of a library
+
+    Seats are sorted by id so past bookings can be located with a binary search.
+    """
+    from .models import Seat
+
+    type_codes = _seat_type_codes()
+    rows = list(Seat.objects.filter(
+        library_id=library_id,
+        is_bookable=True,
+        is_deleted=False
+    ).exclude(
+        status__in=OUT_OF_SERVICE_STATUSES
+    ).order_by('id').values_list(
+        'id', 'section_id', 'seat_type', 'has_power_outlet', 'is_near_window',
+        'average_rating', 'section__noise_level'
+    ))
+
+    seat_ids = np.array([str(row[0]) for row in rows], dtype=str)
+    sections, section_index = np.unique(
+        np.array([str(row[1]) for row in rows], dtype=str), return_inverse=True
+    )
+    return {
+        'seat_ids': seat_ids,
+        'sections': sections,
+        'section': section_index.astype(np.int32),
+        'seat_type': np.array([type_codes[row[2]] for row in rows], dtype=np.int32),
+        'power_outlet': np.array([row[3] for row in rows], dtype=float),
+        'window': np.array([row[4] for row in rows], dtype=float),
+        'rating': np.array([float(row[5] or 0) / 5 for row in rows], dtype=float),
+        'noise': np.array([NOISE_LEVELS.get(row[6], 0.5) for row in rows], dtype=float),
+    }
+
+
+def get_feature_matrix(library_id):
+    """Cached feature matrix of a library, built on first use"""
+    key = _matrix_key(library_id)
+    matrix = cache.get(key)
+    if matrix is None:
+        matrix = build_feature_matrix(library_id)
+        cache.set(key, matrix, FEATURE_MATRIX_TIMEOUT)
+    return matrix
+
+
+def _user_history(user, matrix):
+    """
+    Preferences from a user's recent bookings, in the matrix's coordinates
+
+    Returns:
+        dict: Share of bookings per seat type and per section of this library,
+            share with a power outlet and by a window, mean noise level and
+            bookings per seat; None if the user has no bookings
+    """
+    from .models import SeatBooking
+
+    rows = list(SeatBooking.objects.filter(
+        user=user,
+        status__in=['CONFIRMED', 'CHECKED_IN', 'COMPLETED'],
+        is_deleted=False
+    ).order_by('-booking_date', '-start_time').values_list(
+        'seat_id', 'seat__seat_type', 'seat__has_power_outlet',
+        'seat__is_near_window', 'seat__section__noise_level'
+    )[:HISTORY_LIMIT])
+    if not rows:
+        return None
+
+    type_codes = _seat_type_codes()
+    seat_ids, seat_types, power_outlets, windows, noise_levels = zip(*rows)
+    total = len(rows)
+
+    # Bookings of seats in this library, located by binary search on the sorted ids
+    booked = np.array([str(seat_id) for seat_id in seat_ids], dtype=str)
+    positions = np.minimum(np.searchsorted(matrix['seat_ids'], booked), len(matrix['seat_ids']) - 1)
+    found = positions[matrix['seat_ids'][positions] == booked]
+
+    return {
+        'seat_type': np.bincount(
+            [type_codes[seat_type] for seat_type in seat_types], minlength=len(type_codes)
+        ) / total,
+        'section': np.bincount(
+            matrix['section'][found], minlength=len(matrix['sections'])
+        ) / total,
+        'power_outlet': np.mean(power_outlets),
+        'window': np.mean(windows),
+        'noise': np.mean([NOISE_LEVELS.get(level, 0.5) for level in noise_levels]),
+        'seat': np.bincount(found, minlength=len(matrix['seat_ids'])) / total,
+    }
+
+
+def _availability(bitmaps, start_time, end_time):
+    """
+    Share of the margin around the window that is also free, per seat
+
+    Seats busy during the window itself get NaN.
+    """
+    window = slot_mask(start_time, end_time)
+    margin = AVAILABILITY_MARGIN_MINUTES // SLOT_MINUTES
+    first = max(time_to_slot(start_time) - margin, 0)
+    last = min(time_to_slot(end_time, round_up=True) + margin, SLOTS_PER_DAY)
+    around = (((1 << (last - first)) - 1) << first) & ~window
+    size = around.bit_count() or 1
+    return np.array([
+        np.nan if bitmap & window else 1 - (bitmap & around).bit_count() / size
+        for bitmap in bitmaps
+    ], dtype=float)
+
+
+def recommend_seats(user, library_id, booking_date, start_time, end_time, limit=10):
+    """
+    Rank the seats of a library that are free for a window, for one user
+
+    Returns:
+        list: (seat id, score) pairs for the top seats, best first
+    """
+    matrix = get_feature_matrix(library_id)
+    seat_count = len(matrix['seat_ids'])
+    if not seat_count or limit < 1:
+        return []
+
+    bitmaps = SeatAvailabilityIndex(library_id, booking_date).get_bitmaps(matrix['seat_ids'])
+    availability = _availability(
+        [bitmaps[seat_id] for seat_id in matrix['seat_ids']], start_time, end_time
+    )
+    free = ~np.isnan(availability)
+    if not free.any():
+        return []
+
+    scores = WEIGHTS['rating'] * matrix['rating'] + WEIGHTS['availability'] * np.nan_to_num(availability)
+    history = _user_history(user, matrix)
+    if history is None:
+        # Without a record, quieter sections with outlets are the safe default
+        scores += WEIGHTS['noise'] * (1 - matrix['noise']) + WEIGHTS['power_outlet'] * matrix['power_outlet']
+    else:
+        scores += (
+            WEIGHTS['seat_type'] * history['seat_type'][matrix['seat_type']]
+            + WEIGHTS['section'] * history['section'][matrix['section']]
+            + WEIGHTS['power_outlet'] * (1 - np.abs(matrix['power_outlet'] - history['power_outlet']))
+            + WEIGHTS['window'] * (1 - np.abs(matrix['window'] - history['window']))
+            + WEIGHTS['noise'] * (1 - np.abs(matrix['noise'] - history['noise']))
+            + WEIGHTS['familiar'] * history['seat']
+        )
+    scores[~free] = -np.inf
+
+    # Partial sort: only the top k are ordered
+    limit = min(limit, int(free.sum()))
+    top = np.argpartition(-scores, limit - 1)[:limit]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return [(matrix['seat_ids'][index], round(float(scores[index]), 4)) for index in top]
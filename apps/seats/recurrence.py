@@ -0,0 +1,85 @@
+"""
+Recurrence expansion for recurring seat bookings
+
+Patterns are a small RRULE-like subset stored as JSON on the parent booking::
+
+    {
+        "freq": "WEEKLY",
+        "interval": 1,
+        "byweekday": ["MO", "WE"],
+        "dtstart": "2025-02-03",
+        "until": "2025-05-30"
+    }
+
+``count`` may be given instead of (or as well as) ``until``.
+"""
+from datetime import date, timedelta
+
+FREQUENCIES = ['DAILY', 'WEEKLY']
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+MAX_OCCURRENCES = 200
+
+
+class RecurrenceError(ValueError):
+    """Raised when a recurrence pattern cannot be expanded"""
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+def expand_recurrence(pattern):
+    """
+    Expand a recurrence pattern into the sorted list of occurrence dates
+
+    Raises:
+        RecurrenceError: If the pattern is invalid or unbounded
+    """
+    freq = pattern.get('freq', 'WEEKLY')
+    if freq not in FREQUENCIES:
+        raise RecurrenceError(f"Unsupported frequency: {freq}")
+
+    interval = int(pattern.get('interval', 1))
+    if interval < 1:
+        raise RecurrenceError("Interval must be at least 1")
+
+    dtstart = _as_date(pattern.get('dtstart'))
+    if not dtstart:
+        raise RecurrenceError("Recurrence start date is required")
+
+    until = _as_date(pattern.get('until'))
+    count = pattern.get('count')
+    if not until and not count:
+        raise RecurrenceError("Recurrence needs an end date or an occurrence count")
+    limit = min(int(count), MAX_OCCURRENCES) if count else MAX_OCCURRENCES
+
+    weekdays = pattern.get('byweekday') or [WEEKDAYS[dtstart.weekday()]]
+    try:
+        weekdays = sorted(WEEKDAYS.index(day) for day in weekdays)
+    except ValueError:
+        raise RecurrenceError(f"Weekdays must be chosen from {', '.join(WEEKDAYS)}")
+
+    occurrences = []
+    if freq == 'DAILY':
+        current = dtstart
+        while len(occurrences) < limit and (not until or current <= until):
+            occurrences.append(current)
+            current += timedelta(days=interval)
+        return occurrences
+
+    # Weekly: walk week by week from the Monday of the start week
+    week_start = dtstart - timedelta(days=dtstart.weekday())
+    while len(occurrences) < limit:
+        for weekday in weekdays:
+            current = week_start + timedelta(days=weekday)
+            if current < dtstart:
+                continue
+            if until and current > until:
+                return occurrences
+            occurrences.append(current)
+            if len(occurrences) >= limit:
+                break
+        week_start += timedelta(weeks=interval)
+    return occurrences
@@ -4,10 +4,17 @@ Serializers for seats app
 from rest_framework import serializers
 from django.utils import timezone
 from apps.core.serializers import BaseModelSerializer
+from apps.core.exceptions import ConflictError
+from apps.library.models import LibrarySection
 from .models import (
     Seat, SeatBooking, SeatBookingWaitlist, SeatReview,
     SeatMaintenanceLog, SeatUsageStatistics
 )
+from .managers import BookingConflictError
+from .recurrence import (
+    FREQUENCIES, WEEKDAYS, MAX_OCCURRENCES, RecurrenceError, expand_recurrence
+)
+from .kiosk import KIOSK_BATCH_MAX
 
 
 class SeatSerializer(BaseModelSerializer):
@@ -87,6 +94,139 @@ class SeatAvailabilitySerializer(serializers.Serializer):
         return attrs
 
 
+class SeatAvailabilityMatrixSerializer(serializers.Serializer):
+    """Serializer for whole-library availability matrix parameters"""
+    library_id = serializers.UUIDField()
+    floor_id = serializers.UUIDField(required=False)
+    section_id = serializers.UUIDField(required=False)
+    date = serializers.DateField()
+    encoding = serializers.ChoiceField(
+        choices=[
+            ('runs', 'Run-length'),
+            ('bits', 'Bitstring'),
+        ],
+        required=False,
+        default='runs'
+    )
+    
+    def validate_date(self, value):
+        if value < timezone.now().date():
+            raise serializers.ValidationError("Cannot check availability for past dates")
+        return value
+
+
+class SeatRecommendationSerializer(serializers.Serializer):
+    """Serializer for seat recommendation parameters"""
+    library_id = serializers.UUIDField()
+    date = serializers.DateField()
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+    limit = serializers.IntegerField(required=False, default=10, min_value=1, max_value=50)
+    
+    def validate(self, attrs):
+        if attrs['start_time'] >= attrs['end_time']:
+            raise serializers.ValidationError("Start time must be before end time")
+        if attrs['date'] < timezone.now().date():
+            raise serializers.ValidationError("Cannot recommend seats for past dates")
+        return attrs
+
+
+class SeatMaintenancePlanSerializer(serializers.Serializer):
+    """Serializer for planning maintenance of several seats"""
+    library_id = serializers.UUIDField()
+    seat_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        required=False,
+        max_length=1000
+    )
+    section_id = serializers.UUIDField(required=False)
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    maintenance_type = serializers.ChoiceField(choices=SeatMaintenanceLog.MAINTENANCE_TYPES)
+    description = serializers.CharField(required=False, default='', allow_blank=True)
+    action = serializers.ChoiceField(
+        choices=[
+            ('suggest', 'Suggest windows'),
+            ('schedule', 'Schedule and relocate bookings'),
+        ],
+        required=False,
+        default='suggest'
+    )
+    
+    def validate(self, attrs):
+        if not attrs.get('seat_ids') and not attrs.get('section_id'):
+            raise serializers.ValidationError("Provide seat_ids or section_id")
+        if attrs['start'] >= attrs['end']:
+            raise serializers.ValidationError("Start must be before end")
+        if attrs['start'] < timezone.now():
+            raise serializers.ValidationError("Cannot plan maintenance in the past")
+        if timezone.localtime(attrs['start']).date() != timezone.localtime(attrs['end']).date():
+            raise serializers.ValidationError("Maintenance window must start and end on the same day")
+        return attrs
+
+
+class SeatLayoutRowSerializer(serializers.Serializer):
+    """Serializer for one seat of a layout import"""
+    floor = serializers.IntegerField()
+    floor_name = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    section = serializers.CharField(max_length=100)
+    section_type = serializers.ChoiceField(choices=LibrarySection.SECTION_TYPES, required=False, default='GENERAL')
+    seat_number = serializers.CharField(max_length=20)
+    seat_type = serializers.ChoiceField(choices=Seat.SEAT_TYPES, required=False, default='INDIVIDUAL')
+    x_coordinate = serializers.DecimalField(max_digits=8, decimal_places=2, required=False, allow_null=True)
+    y_coordinate = serializers.DecimalField(max_digits=8, decimal_places=2, required=False, allow_null=True)
+    rotation = serializers.IntegerField(required=False, default=0, min_value=0, max_value=359)
+    has_power_outlet = serializers.BooleanField(required=False, default=True)
+    has_ethernet = serializers.BooleanField(required=False, default=False)
+    has_monitor = serializers.BooleanField(required=False, default=False)
+    has_whiteboard = serializers.BooleanField(required=False, default=False)
+    is_near_window = serializers.BooleanField(required=False, default=False)
+    is_accessible = serializers.BooleanField(required=False, default=False)
+    is_premium = serializers.BooleanField(required=False, default=False)
+    is_bookable = serializers.BooleanField(required=False, default=True)
+    max_booking_duration_hours = serializers.IntegerField(required=False, default=8, min_value=1, max_value=24)
+    description = serializers.CharField(required=False, default='', allow_blank=True)
+    features = serializers.ListField(child=serializers.CharField(max_length=50), required=False, default=list)
+
+
+class SeatLayoutImportSerializer(serializers.Serializer):
+    """Serializer for seat layout import parameters"""
+    library_id = serializers.UUIDField()
+    file = serializers.FileField()
+    format = serializers.ChoiceField(
+        choices=[
+            ('csv', 'CSV'),
+            ('jsonl', 'JSON Lines'),
+        ],
+        required=False
+    )
+    dry_run = serializers.BooleanField(required=False, default=False)
+    
+    def validate(self, attrs):
+        if not attrs.get('format'):
+            from .layout_import import detect_layout_format
+            attrs['format'] = detect_layout_format(attrs['file'].name)
+            if not attrs['format']:
+                raise serializers.ValidationError("Cannot tell the file format, please provide it")
+        return attrs
+
+
+class OccupancyHeatmapSerializer(serializers.Serializer):
+    """Serializer for occupancy heatmap parameters"""
+    library_id = serializers.UUIDField()
+    section_id = serializers.UUIDField(required=False)
+    start_date = serializers.DateField()
+    end_date = serializers.DateField(required=False)
+    
+    def validate(self, attrs):
+        attrs.setdefault('end_date', attrs['start_date'])
+        if attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError("End date must be on or after start date")
+        if (attrs['end_date'] - attrs['start_date']).days > 366:
+            raise serializers.ValidationError("Date range cannot exceed one year")
+        return attrs
+
+
 class SeatBookingSerializer(BaseModelSerializer):
     """Serializer for seat bookings"""
     user_display = serializers.CharField(source='user.get_full_name', read_only=True)
@@ -110,14 +250,14 @@ class SeatBookingSerializer(BaseModelSerializer):
             'actual_start_time', 'actual_end_time', 'actual_duration_hours',
             'checked_in_at', 'checked_out_at', 'is_active',
             'can_check_in', 'can_check_out', 'auto_cancel_at',
-            'reminder_sent', 'late_cancellation', 'purpose',
+            'reminder_sent', 'late_cancellation', 'is_overbooked', 'purpose',
             'special_requirements', 'notes', 'penalty_points',
             'loyalty_points_earned', 'created_at', 'updated_at'
         ]
         read_only_fields = [
             'id', 'booking_code', 'actual_start_time', 'actual_end_time',
             'checked_in_at', 'checked_out_at', 'auto_cancel_at',
-            'reminder_sent', 'late_cancellation', 'penalty_points',
+            'reminder_sent', 'late_cancellation', 'is_overbooked', 'penalty_points',
             'loyalty_points_earned', 'created_at', 'updated_at'
         ]
     
@@ -153,7 +293,91 @@ class SeatBookingCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         validated_data['created_by'] = self.context['request'].user
-        return super().create(validated_data)
+        
+        try:
+            return SeatBooking.objects.create_booking(**validated_data)
+        except BookingConflictError as e:
+            raise ConflictError(str(e))
+
+
+class RecurringSeatBookingSerializer(serializers.Serializer):
+    """Serializer for recurring seat booking requests"""
+    seat_id = serializers.UUIDField()
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+    start_date = serializers.DateField()
+    until = serializers.DateField(required=False)
+    count = serializers.IntegerField(required=False, min_value=1, max_value=MAX_OCCURRENCES)
+    frequency = serializers.ChoiceField(choices=FREQUENCIES, required=False, default='WEEKLY')
+    interval = serializers.IntegerField(required=False, min_value=1, default=1)
+    weekdays = serializers.ListField(
+        child=serializers.ChoiceField(choices=WEEKDAYS),
+        required=False,
+        allow_empty=False
+    )
+    purpose = serializers.CharField(max_length=200, required=False, allow_blank=True)
+    special_requirements = serializers.CharField(required=False, allow_blank=True)
+    notes = serializers.CharField(required=False, allow_blank=True)
+    
+    def validate_start_date(self, value):
+        if value < timezone.now().date():
+            raise serializers.ValidationError("Cannot book seats for past dates")
+        return value
+    
+    def validate(self, attrs):
+        if attrs['start_time'] >= attrs['end_time']:
+            raise serializers.ValidationError("Start time must be before end time")
+        
+        if not attrs.get('until') and not attrs.get('count'):
+            raise serializers.ValidationError("Provide an end date or an occurrence count")
+        
+        if attrs.get('until') and attrs['until'] < attrs['start_date']:
+            raise serializers.ValidationError("End date must be after start date")
+        
+        pattern = {
+            'freq': attrs['frequency'],
+            'interval': attrs['interval'],
+            'dtstart': attrs['start_date'],
+        }
+        if attrs.get('weekdays'):
+            pattern['byweekday'] = attrs['weekdays']
+        if attrs.get('until'):
+            pattern['until'] = attrs['until']
+        if attrs.get('count'):
+            pattern['count'] = attrs['count']
+        
+        try:
+            if not expand_recurrence(pattern):
+                raise serializers.ValidationError("Recurrence has no occurrences")
+        except RecurrenceError as e:
+            raise serializers.ValidationError(str(e))
+        
+        attrs['recurrence_pattern'] = pattern
+        return attrs
+
+
+class GroupSeatBookingSerializer(serializers.Serializer):
+    """Serializer for adjacent-seat group booking requests"""
+    library_id = serializers.UUIDField()
+    floor_id = serializers.UUIDField(required=False)
+    section_id = serializers.UUIDField(required=False)
+    seat_type = serializers.ChoiceField(choices=Seat.SEAT_TYPES, required=False)
+    booking_date = serializers.DateField()
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+    group_size = serializers.IntegerField(min_value=2, max_value=20)
+    purpose = serializers.CharField(max_length=200, required=False, allow_blank=True)
+    notes = serializers.CharField(required=False, allow_blank=True)
+    
+    def validate_booking_date(self, value):
+        if value < timezone.now().date():
+            raise serializers.ValidationError("Cannot book seats for past dates")
+        return value
+    
+    def validate(self, attrs):
+        if attrs['start_time'] >= attrs['end_time']:
+            raise serializers.ValidationError("Start time must be before end time")
+        return attrs
 
 
 class SeatBookingWaitlistSerializer(BaseModelSerializer):
@@ -224,7 +448,7 @@ class SeatMaintenanceLogSerializer(BaseModelSerializer):
         fields = [
             'id', 'seat', 'seat_display', 'maintenance_type',
             'maintenance_type_display', 'status', 'status_display',
-            'scheduled_date', 'started_at', 'completed_at',
+            'scheduled_date', 'scheduled_end', 'started_at', 'completed_at',
             'assigned_to', 'assigned_to_display', 'performed_by',
             'performed_by_display', 'description', 'issues_found',
             'actions_taken', 'parts_used', 'cost', 'requires_follow_up',
@@ -251,11 +475,7 @@ class SeatUsageStatisticsSerializer(serializers.ModelSerializer):
 
 class QRCodeDataSerializer(serializers.Serializer):
     """Serializer for QR code data"""
-    booking_id = serializers.UUIDField()
-    booking_code = serializers.CharField()
-    access_token = serializers.CharField()
-    seat_code = serializers.CharField()
-    user_id = serializers.UUIDField()
+    qr_data = serializers.CharField(help_text="Signed check-in token")
     expires_at = serializers.DateTimeField()
 
 
@@ -295,6 +515,33 @@ class CheckOutSerializer(serializers.Serializer):
         return attrs
 
 
+class KioskScanSerializer(serializers.Serializer):
+    """Serializer for one scan queued by an entrance kiosk"""
+    scan_id = serializers.CharField(required=False, max_length=64)
+    action = serializers.ChoiceField(
+        choices=[('CHECK_IN', 'Check In'), ('CHECK_OUT', 'Check Out')]
+    )
+    booking_id = serializers.UUIDField(required=False)
+    qr_code_data = serializers.CharField(required=False)
+    scanned_at = serializers.DateTimeField()
+    
+    def validate(self, attrs):
+        if not any([attrs.get('booking_id'), attrs.get('qr_code_data')]):
+            raise serializers.ValidationError(
+                "Either booking_id or qr_code_data is required"
+            )
+        return attrs
+
+
+class KioskScanBatchSerializer(serializers.Serializer):
+    """Serializer for a batch of kiosk scans; scans are validated one by one"""
+    scans = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=KIOSK_BATCH_MAX
+    )
+
+
 class SeatSearchSerializer(serializers.Serializer):
     """Serializer for seat search parameters"""
     library_id = serializers.UUIDField(required=False)
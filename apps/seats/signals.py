@@ -1,11 +1,44 @@
 """
 Signals for seats app
 """
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
+from django.db import transaction
 from django.db.models import Avg
+from django.utils import timezone
+from apps.core.counters import increment_counter
 from apps.core.models import ActivityLog
-from .models import Seat, SeatBooking, SeatReview
+from apps.library.occupancy import apply_seat_transition
+from apps.library.models import LibrarySection
+from .models import Seat, SeatBooking, SeatReview, SeatBookingWaitlist, SeatMaintenanceLog
+from .availability import SeatAvailabilityIndex, ACTIVE_BOOKING_STATUSES
+from .waitlist import WaitlistIndex, schedule_waitlist_match
+from .noshow import promote_overbookings
+from .recommend import FEATURE_FIELDS, OUT_OF_SERVICE_STATUSES, invalidate_feature_matrix
+
+
+def _availability_snapshot(booking):
+    """Fields of a booking that determine its footprint in the availability index"""
+    return (
+        booking.seat.library_id, booking.seat_id, booking.booking_date,
+        booking.start_time, booking.end_time, booking.status
+    )
+
+
+def _previous_availability_snapshot(booking):
+    """Footprint of a booking as it was loaded, before the current save"""
+    seat_id = booking.previous_value('seat')
+    if seat_id is None:
+        return None
+    if seat_id == booking.seat_id:
+        library_id = booking.seat.library_id
+    else:
+        library_id = Seat.objects.filter(pk=seat_id).values_list('library_id', flat=True).first()
+    return (
+        library_id, seat_id, booking.previous_value('booking_date'),
+        booking.previous_value('start_time'), booking.previous_value('end_time'),
+        booking.previous_value('status')
+    )
 
 
 @receiver(post_save, sender=SeatBooking)
@@ -13,8 +46,7 @@ def update_seat_statistics(sender, instance, created, **kwargs):
     """Update seat statistics when booking is created or updated"""
     if created:
         # Increment total bookings
-        instance.seat.total_bookings += 1
-        instance.seat.save()
+        increment_counter(Seat, instance.seat_id, 'total_bookings')
         
         # Log booking activity
         ActivityLog.objects.create(
@@ -31,9 +63,11 @@ def update_seat_statistics(sender, instance, created, **kwargs):
         )
     
     # Update seat usage hours when booking is completed
-    if instance.status == 'COMPLETED' and instance.actual_duration_hours > 0:
-        instance.seat.total_usage_hours += instance.actual_duration_hours
-        instance.seat.save()
+    if (
+        instance.status == 'COMPLETED' and instance.previous_value('status') != 'COMPLETED'
+        and instance.actual_duration_hours > 0
+    ):
+        increment_counter(Seat, instance.seat_id, 'total_usage_hours', instance.actual_duration_hours)
 
 
 @receiver(post_save, sender=SeatReview)
@@ -57,31 +91,153 @@ def update_seat_rating(sender, instance, created, **kwargs):
 @receiver(pre_save, sender=SeatBooking)
 def track_booking_status_changes(sender, instance, **kwargs):
     """Track booking status changes"""
-    if instance.pk:
-        try:
-            old_instance = SeatBooking.objects.get(pk=instance.pk)
-            
-            # Track status changes
-            if old_instance.status != instance.status:
-                ActivityLog.objects.create(
-                    user=instance.user,
-                    activity_type='SEAT_BOOKING',
-                    description=f'Booking status changed from {old_instance.status} to {instance.status}',
-                    metadata={
-                        'booking_id': str(instance.id),
-                        'seat_code': instance.seat.seat_code,
-                        'old_status': old_instance.status,
-                        'new_status': instance.status,
-                    }
-                )
-                
-                # Update seat status based on booking status
-                if instance.status == 'CHECKED_IN':
-                    instance.seat.status = 'OCCUPIED'
-                    instance.seat.save()
-                elif old_instance.status == 'CHECKED_IN' and instance.status in ['COMPLETED', 'CANCELLED']:
-                    instance.seat.status = 'AVAILABLE'
-                    instance.seat.save()
-                    
-        except SeatBooking.DoesNotExist:
-            pass
\ No newline at end of file
+    if instance._state.adding:
+        return
+    
+    old_status = instance.previous_value('status')
+    
+    # Track status changes
+    if old_status != instance.status:
+        ActivityLog.objects.create(
+            user=instance.user,
+            activity_type='SEAT_BOOKING',
+            description=f'Booking status changed from {old_status} to {instance.status}',
+            metadata={
+                'booking_id': str(instance.id),
+                'seat_code': instance.seat.seat_code,
+                'old_status': old_status,
+                'new_status': instance.status,
+            }
+        )
+        
+        # Update seat status based on booking status
+        if instance.status == 'CHECKED_IN':
+            instance.seat.status = 'OCCUPIED'
+            instance.seat.save_changed()
+        elif old_status == 'CHECKED_IN' and instance.status in ['COMPLETED', 'CANCELLED']:
+            instance.seat.status = 'AVAILABLE'
+            instance.seat.save_changed()
+
+
+@receiver(post_save, sender=SeatBooking)
+def update_availability_index(sender, instance, created, **kwargs):
+    """Apply booking, cancellation, no-show and check-out to the availability index"""
+    previous = None if created else _previous_availability_snapshot(instance)
+    current = _availability_snapshot(instance)
+    
+    if previous == current:
+        return
+    
+    released = previous if previous and previous[5] in ACTIVE_BOOKING_STATUSES else None
+    occupied = current if current[5] in ACTIVE_BOOKING_STATUSES else None
+    
+    def apply():
+        if released:
+            library_id, seat_id, booking_date, start_time, end_time, _ = released
+            SeatAvailabilityIndex(library_id, booking_date).release(seat_id, start_time, end_time)
+        if occupied:
+            library_id, seat_id, booking_date, start_time, end_time, _ = occupied
+            SeatAvailabilityIndex(library_id, booking_date).occupy(seat_id, start_time, end_time)
+    
+    # The index must never show a booking that was rolled back
+    transaction.on_commit(apply)
+    
+    if released:
+        library_id, seat_id, booking_date, start_time, end_time, _ = released
+        
+        # A provisional booking takes over the window before the waitlist sees it;
+        # only scored, confirmed holders can have been overbooked
+        if released[5] == 'CONFIRMED' and instance.no_show_probability is not None:
+            with transaction.atomic():
+                promote_overbookings([{
+                    'seat_id': seat_id, 'booking_date': booking_date,
+                    'start_time': start_time, 'end_time': end_time
+                }], timezone.now())
+        
+        # Cancellation, check-out or a moved booking frees capacity for the waitlist
+        schedule_waitlist_match(library_id, seat_id, booking_date, start_time, end_time)
+
+
+@receiver(post_save, sender=SeatBookingWaitlist)
+@receiver(post_delete, sender=SeatBookingWaitlist)
+def invalidate_waitlist_index(sender, instance, **kwargs):
+    """Drop the cached waitlist index when an entry changes"""
+    WaitlistIndex(instance.seat_id, instance.booking_date).invalidate()
+
+
+@receiver(post_save, sender=SeatMaintenanceLog)
+def release_seat_after_maintenance(sender, instance, **kwargs):
+    """Return a seat to service when its maintenance is completed"""
+    if instance.status != 'COMPLETED' or instance.seat.status != 'MAINTENANCE':
+        return
+    
+    seat = instance.seat
+    seat.status = 'AVAILABLE'
+    seat.save()
+    
+    # Offer the seat to everyone still waiting for it
+    from django.utils import timezone
+    from datetime import time
+    
+    waiting_dates = SeatBookingWaitlist.objects.filter(
+        seat=seat,
+        booking_date__gte=timezone.now().date(),
+        is_active=True,
+        notified_at__isnull=True,
+        is_deleted=False
+    ).values_list('booking_date', flat=True).order_by().distinct()
+    
+    for booking_date in waiting_dates:
+        schedule_waitlist_match(seat.library_id, seat.id, booking_date, time.min, time.max)
+
+
+def _occupancy_snapshot(seat, previous=False):
+    """Scopes and counted status of a seat; deleted seats count as no status"""
+    value = seat.previous_value if previous else lambda field_name: getattr(seat, field_name)
+    return (
+        value('library_id'), value('floor_id'), value('section_id'),
+        None if value('is_deleted') else value('status')
+    )
+
+
+@receiver(post_save, sender=Seat)
+def update_occupancy_counters(sender, instance, created, **kwargs):
+    """Apply seat status transitions to the live occupancy counters"""
+    previous = None if created else _occupancy_snapshot(instance, previous=True)
+    current = _occupancy_snapshot(instance)
+    
+    if previous == current:
+        return
+    
+    def apply():
+        if previous and previous[:3] != current[:3]:
+            # Seat moved between floors or sections
+            apply_seat_transition(*previous[:3], previous[3], None)
+            apply_seat_transition(*current[:3], None, current[3])
+        else:
+            apply_seat_transition(*current[:3], previous[3] if previous else None, current[3])
+    
+    transaction.on_commit(apply)
+
+
+@receiver(post_save, sender=Seat)
+def invalidate_recommendation_features(sender, instance, created, **kwargs):
+    """Drop the cached feature matrix when a seat's recommendation features change"""
+    if not created:
+        # Status flips on every check-in; only leaving or returning to service matters
+        was_in_service = instance.previous_value('status') not in OUT_OF_SERVICE_STATUSES
+        in_service = instance.status not in OUT_OF_SERVICE_STATUSES
+        if was_in_service == in_service and not instance.changed_fields & FEATURE_FIELDS:
+            return
+    
+    library_ids = {instance.library_id, instance.previous_value('library')} - {None}
+    for library_id in library_ids:
+        transaction.on_commit(lambda library_id=library_id: invalidate_feature_matrix(library_id))
+
+
+@receiver(post_save, sender=LibrarySection)
+def invalidate_section_recommendation_features(sender, instance, created, **kwargs):
+    """Drop the cached feature matrix when a section's noise level changes"""
+    if not created and instance.has_changed('noise_level'):
+        library_id = instance.floor.library_id
+        transaction.on_commit(lambda: invalidate_feature_matrix(library_id))
@@ -3,149 +3,329 @@ Celery tasks for seats app
 """
 from celery import shared_task
 from django.utils import timezone
-from django.db.models import Count, Avg, Sum
-from datetime import timedelta, date
-from .models import Seat, SeatBooking, SeatUsageStatistics
+from django.db import transaction
+from django.db.models import (
+    Count, Avg, Sum, F, Q, Value, Case, When, IntegerField, DurationField, ExpressionWrapper
+)
+from django.db.models.functions import Greatest
+from datetime import timedelta, date, time as dt_time
+from decimal import Decimal
+from collections import defaultdict
+from .models import Seat, SeatBooking, SeatUsageStatistics, OccupancySeries
+from .availability import SeatAvailabilityIndex
+from .timeseries import build_occupancy_series, peak_hour
+from .noshow import promote_overbookings, train_and_publish
+from .waitlist import match_freed_window, schedule_waitlist_match
+from apps.library.occupancy import reconcile_library_occupancy
+from apps.dashboard.summary import invalidate_user_summaries
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 
+NO_SHOW_BATCH_SIZE = 500
+STATISTICS_BATCH_SIZE = 1000
+
+
 @shared_task
 def process_expired_bookings():
     """Process expired bookings and mark as no-show"""
     try:
+        started = time.perf_counter()
         now = timezone.now()
+        no_show_count = 0
         
-        # Find bookings that should be auto-cancelled
-        expired_bookings = SeatBooking.objects.filter(
-            status='CONFIRMED',
-            auto_cancel_at__lt=now,
-            is_deleted=False
+        while True:
+            processed = _process_no_show_batch(now)
+            no_show_count += processed
+            if processed < NO_SHOW_BATCH_SIZE:
+                break
+        
+        # Provisional overbookings whose holders showed up lapse
+        _expire_overbookings(now)
+        
+        elapsed = time.perf_counter() - started
+        logger.info(f"Processed {no_show_count} expired bookings in {elapsed:.3f}s")
+        return f"Processed {no_show_count} expired bookings in {elapsed:.3f}s"
+        
+    except Exception as e:
+        logger.error(f"Error processing expired bookings: {e}")
+        return f"Error: {e}"
+
+
+def _process_no_show_batch(now):
+    """Mark one batch of expired bookings as no-show with set-based writes"""
+    from apps.accounts.models import UserProfile, LoyaltyTransaction
+    from apps.core.models import ActivityLog
+    from apps.library.models import LibraryConfiguration
+    
+    default_penalty = LibraryConfiguration._meta.get_field('no_show_penalty_points').default
+    
+    with transaction.atomic():
+        # Find bookings that should be auto-cancelled, skipping rows another run holds
+        bookings = list(
+            SeatBooking.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+                status='CONFIRMED',
+                auto_cancel_at__lt=now,
+                is_deleted=False
+            ).values(
+                'id', 'user_id', 'seat_id', 'booking_date', 'start_time', 'end_time',
+                'seat__library_id', 'seat__seat_number', 'seat__seat_code',
+                'seat__library__configuration__no_show_penalty_points'
+            )[:NO_SHOW_BATCH_SIZE]
         )
+        if not bookings:
+            return 0
         
-        no_show_count = 0
-        for booking in expired_bookings:
-            # Mark as no-show
-            booking.status = 'NO_SHOW'
-            
-            # Apply penalty points
-            library_config = booking.seat.library.configuration
-            penalty_points = library_config.no_show_penalty_points
-            booking.penalty_points = penalty_points
-            
-            # Deduct points from user profile
-            if hasattr(booking.user, 'profile'):
-                booking.user.profile.loyalty_points = max(
-                    0, booking.user.profile.loyalty_points - penalty_points
+        bookings_by_penalty = defaultdict(list)
+        penalty_by_user = defaultdict(int)
+        for booking in bookings:
+            penalty = booking['seat__library__configuration__no_show_penalty_points']
+            booking['penalty_points'] = default_penalty if penalty is None else penalty
+            bookings_by_penalty[booking['penalty_points']].append(booking['id'])
+            penalty_by_user[booking['user_id']] += booking['penalty_points']
+        
+        # Mark as no-show and apply penalty points
+        SeatBooking.objects.filter(id__in=[b['id'] for b in bookings]).update(
+            status='NO_SHOW',
+            penalty_points=Case(
+                *[When(id__in=ids, then=Value(penalty)) for penalty, ids in bookings_by_penalty.items()],
+                default=F('penalty_points'),
+                output_field=IntegerField()
+            ),
+            updated_at=now
+        )
+        
+        # Release seats that were held for these bookings
+        Seat.objects.filter(
+            id__in={b['seat_id'] for b in bookings},
+            status='RESERVED'
+        ).update(status='AVAILABLE', updated_at=now)
+        
+        # Deduct points from user profiles, grouped by total penalty
+        users_by_penalty = defaultdict(list)
+        for user_id, penalty in penalty_by_user.items():
+            if penalty:
+                users_by_penalty[penalty].append(user_id)
+        if users_by_penalty:
+            UserProfile.objects.filter(user_id__in=penalty_by_user).update(
+                loyalty_points=Case(
+                    *[
+                        When(user_id__in=user_ids, then=Greatest(F('loyalty_points') - penalty, 0, output_field=IntegerField()))
+                        for penalty, user_ids in users_by_penalty.items()
+                    ],
+                    default=F('loyalty_points'),
+                    output_field=IntegerField()
                 )
-                booking.user.profile.save()
-            
-            # Make seat available
-            booking.seat.status = 'AVAILABLE'
-            booking.seat.save()
-            
-            booking.save()
-            no_show_count += 1
-            
-            # Log activity
-            from apps.core.models import ActivityLog
-            ActivityLog.objects.create(
-                user=booking.user,
+            )
+        
+        LoyaltyTransaction.objects.bulk_create([
+            LoyaltyTransaction(
+                user_id=booking['user_id'],
+                points=-booking['penalty_points'],
+                transaction_type='ADJUSTED',
+                description=f"No-show penalty for seat {booking['seat__seat_number']}",
+                reference_id=str(booking['id']),
+            )
+            for booking in bookings
+            if booking['penalty_points']
+        ])
+        
+        # Provisional overbookings take over the windows the no-shows held
+        promote_overbookings(bookings, now)
+        
+        # Log activity
+        ActivityLog.objects.bulk_create([
+            ActivityLog(
+                user_id=booking['user_id'],
                 activity_type='SEAT_BOOKING',
-                description=f'Booking marked as no-show for seat {booking.seat.seat_number}',
+                description=f"Booking marked as no-show for seat {booking['seat__seat_number']}",
                 metadata={
-                    'booking_id': str(booking.id),
-                    'seat_code': booking.seat.seat_code,
-                    'penalty_points': penalty_points,
+                    'booking_id': str(booking['id']),
+                    'seat_code': booking['seat__seat_code'],
+                    'penalty_points': booking['penalty_points'],
                 }
             )
+            for booking in bookings
+        ])
         
-        logger.info(f"Processed {no_show_count} expired bookings")
-        return f"Processed {no_show_count} expired bookings"
+        # Bulk updates bypass booking signals, so drop the users' cached counts here
+        invalidate_user_summaries({booking['user_id'] for booking in bookings}, ['seat_bookings'])
+    
+    # Bulk updates bypass booking signals, so refresh the availability index directly
+    seats_by_day = defaultdict(set)
+    for booking in bookings:
+        seats_by_day[(booking['seat__library_id'], booking['booking_date'])].add(booking['seat_id'])
+    for (library_id, booking_date), seat_ids in seats_by_day.items():
+        SeatAvailabilityIndex(library_id, booking_date).rebuild(seat_ids)
+    
+    # Released seats were updated in bulk, so recount their libraries' occupancy
+    reconcile_library_occupancy({library_id for library_id, _ in seats_by_day})
+    
+    # No-shows free the rest of their window for the waitlist
+    for booking in bookings:
+        schedule_waitlist_match(
+            booking['seat__library_id'], booking['seat_id'], booking['booking_date'],
+            booking['start_time'], booking['end_time']
+        )
+    
+    return len(bookings)
+
+
+def _expire_overbookings(now):
+    """Settle provisional overbookings that were not promoted by their deadline"""
+    from apps.notifications.models import Notification
+    
+    with transaction.atomic():
+        expired = list(SeatBooking.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+            status='PENDING',
+            is_overbooked=True,
+            auto_cancel_at__lt=now,
+            is_deleted=False
+        ).values('id', 'user_id', 'seat_id', 'booking_date', 'start_time', 'end_time', 'seat__seat_number'))
+        if not expired:
+            return 0
+        
+        # Windows nobody holds any more go to the provisional booking; the rest lapse
+        promoted = {booking['id'] for booking in promote_overbookings(expired, now)}
+        expired = [booking for booking in expired if booking['id'] not in promoted]
+        if not expired:
+            return 0
+        
+        SeatBooking.objects.filter(id__in=[booking['id'] for booking in expired]).update(
+            status='CANCELLED',
+            updated_at=now
+        )
+        Notification.objects.bulk_create([
+            Notification(
+                user_id=booking['user_id'],
+                title='Provisional Booking Released',
+                message=f"Seat {booking['seat__seat_number']} was taken by its original booking, so your provisional booking was released.",
+                type='INFO',
+                action_url='/my-bookings',
+                metadata={
+                    'booking_id': str(booking['id']),
+                    'seat_id': str(booking['seat_id']),
+                    'status': 'CANCELLED'
+                }
+            )
+            for booking in expired
+        ])
+        invalidate_user_summaries({booking['user_id'] for booking in expired}, ['seat_bookings'])
+    
+    return len(expired)
+
+
+@shared_task
+def train_no_show_model():
+    """Retrain the no-show model and republish per-user probability tables"""
+    try:
+        started = time.perf_counter()
+        published = train_and_publish()
+        
+        elapsed = time.perf_counter() - started
+        logger.info(f"Published {published} no-show tables in {elapsed:.3f}s")
+        return f"Published {published} no-show tables"
         
     except Exception as e:
-        logger.error(f"Error processing expired bookings: {e}")
+        logger.error(f"Error in train_no_show_model: {e}")
         return f"Error: {e}"
 
 
 @shared_task
-def generate_daily_seat_statistics():
-    """Generate daily statistics for all seats"""
+def generate_daily_seat_statistics(start_date=None, end_date=None):
+    """Generate daily statistics for all seats, optionally backfilling a date range"""
     try:
         yesterday = timezone.now().date() - timedelta(days=1)
-        seats_processed = 0
+        start_date = _as_date(start_date) or yesterday
+        end_date = _as_date(end_date) or start_date
+        dates = [start_date + timedelta(days=n) for n in range((end_date - start_date).days + 1)]
         
-        for seat in Seat.objects.filter(is_deleted=False):
-            try:
-                # Check if statistics already exist for yesterday
-                if SeatUsageStatistics.objects.filter(
-                    seat=seat,
-                    date=yesterday
-                ).exists():
-                    continue
-                
-                # Get bookings for yesterday
-                bookings = SeatBooking.objects.filter(
-                    seat=seat,
-                    booking_date=yesterday,
-                    is_deleted=False
-                )
-                
-                # Calculate statistics
-                total_bookings = bookings.count()
-                successful_checkins = bookings.filter(
-                    status__in=['CHECKED_IN', 'COMPLETED']
-                ).count()
-                no_shows = bookings.filter(status='NO_SHOW').count()
-                cancellations = bookings.filter(status='CANCELLED').count()
-                
-                # Calculate time metrics
-                total_booked_hours = sum([
-                    booking.duration_hours for booking in bookings
-                ])
-                
-                completed_bookings = bookings.filter(status='COMPLETED')
-                total_used_hours = sum([
-                    booking.actual_duration_hours for booking in completed_bookings
-                    if booking.actual_duration_hours
-                ])
-                
-                avg_session_duration = (
-                    total_used_hours / completed_bookings.count()
-                    if completed_bookings.count() > 0 else 0
-                )
-                
-                # Calculate utilization rate (assuming 12 hours available per day)
-                available_hours = 12  # This should come from library operating hours
-                utilization_rate = (total_used_hours / available_hours * 100) if available_hours > 0 else 0
-                
-                # Get unique users
-                unique_users = bookings.values('user').distinct().count()
-                
-                # Create statistics record
-                SeatUsageStatistics.objects.create(
-                    seat=seat,
-                    date=yesterday,
-                    total_bookings=total_bookings,
-                    successful_checkins=successful_checkins,
-                    no_shows=no_shows,
-                    cancellations=cancellations,
-                    total_booked_hours=total_booked_hours,
-                    total_used_hours=total_used_hours,
-                    average_session_duration=avg_session_duration,
-                    utilization_rate=utilization_rate,
-                    unique_users=unique_users,
-                )
-                
-                seats_processed += 1
+        # Booking metrics for every seat and day in one grouped query
+        completed = Q(
+            status='COMPLETED',
+            actual_start_time__isnull=False,
+            actual_end_time__isnull=False
+        )
+        metrics = {
+            (row['seat_id'], row['booking_date']): row
+            for row in SeatBooking.objects.filter(
+                booking_date__range=(start_date, end_date),
+                is_deleted=False
+            ).values('seat_id', 'booking_date').annotate(
+                total_bookings=Count('id'),
+                successful_checkins=Count('id', filter=Q(status__in=['CHECKED_IN', 'COMPLETED'])),
+                no_shows=Count('id', filter=Q(status='NO_SHOW')),
+                cancellations=Count('id', filter=Q(status='CANCELLED')),
+                completed_bookings=Count('id', filter=completed),
+                booked_time=Sum(ExpressionWrapper(
+                    F('end_time') - F('start_time'), output_field=DurationField()
+                )),
+                used_time=Sum(ExpressionWrapper(
+                    F('actual_end_time') - F('actual_start_time'), output_field=DurationField()
+                ), filter=completed),
+                unique_users=Count('user', distinct=True),
+            ).order_by()
+        }
+        
+        # Peak hours come from the occupancy series, rebuilt here so they match the bookings
+        for day in dates:
+            build_occupancy_series(day)
+        peak_hours = {
+            (seat_id, day): peak_hour(minutes)
+            for seat_id, day, minutes in OccupancySeries.objects.filter(
+                scope='SEAT',
+                date__range=(start_date, end_date)
+            ).values_list('seat_id', 'date', 'occupied_minutes')
+        }
+        opening_hours = _get_available_hours(dates)
+        
+        statistics = []
+        for seat_id, library_id in Seat.objects.filter(is_deleted=False).values_list('id', 'library_id'):
+            for day in dates:
+                row = metrics.get((seat_id, day), {})
+                booked_hours = _hours(row.get('booked_time'))
+                used_hours = _hours(row.get('used_time'))
+                completed_bookings = row.get('completed_bookings', 0)
+                available_hours = opening_hours.get((library_id, day), 0)
                 
-            except Exception as e:
-                logger.error(f"Error generating statistics for seat {seat.seat_number}: {e}")
-                continue
+                statistics.append(SeatUsageStatistics(
+                    seat_id=seat_id,
+                    date=day,
+                    total_bookings=row.get('total_bookings', 0),
+                    successful_checkins=row.get('successful_checkins', 0),
+                    no_shows=row.get('no_shows', 0),
+                    cancellations=row.get('cancellations', 0),
+                    total_booked_hours=_decimal(booked_hours),
+                    total_used_hours=_decimal(used_hours),
+                    average_session_duration=_decimal(
+                        used_hours / completed_bookings if completed_bookings else 0
+                    ),
+                    utilization_rate=_decimal(
+                        min(used_hours / available_hours * 100, 100) if available_hours > 0 else 0
+                    ),
+                    peak_usage_hour=peak_hours.get((seat_id, day)),
+                    unique_users=row.get('unique_users', 0),
+                ))
         
-        logger.info(f"Generated daily statistics for {seats_processed} seats")
-        return f"Processed {seats_processed} seats"
+        SeatUsageStatistics.objects.bulk_create(
+            statistics,
+            batch_size=STATISTICS_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['seat', 'date'],
+            update_fields=[
+                'total_bookings', 'successful_checkins', 'no_shows', 'cancellations',
+                'total_booked_hours', 'total_used_hours', 'average_session_duration',
+                'utilization_rate', 'peak_usage_hour', 'unique_users', 'updated_at',
+            ]
+        )
+        
+        logger.info(
+            f"Generated daily statistics for {len(statistics)} seat-days "
+            f"from {start_date} to {end_date}"
+        )
+        return f"Processed {len(statistics)} seat-days"
         
     except Exception as e:
         logger.error(f"Error in generate_daily_seat_statistics: {e}")
@@ -153,93 +333,104 @@ def generate_daily_seat_statistics():
 
 
 @shared_task
-def send_booking_reminders():
-    """Send reminders for upcoming bookings"""
+def build_daily_occupancy_series(start_date=None, end_date=None):
+    """Rebuild occupancy series and library utilization, by default for yesterday and today"""
     try:
-        from apps.core.utils import send_notification_email
+        from apps.library.models import LibraryStatistics
         
-        now = timezone.now()
-        reminder_times = [
-            now + timedelta(hours=24),  # 24 hours before
-            now + timedelta(hours=2),   # 2 hours before
-            now + timedelta(minutes=30) # 30 minutes before
-        ]
+        today = timezone.now().date()
+        start_date = _as_date(start_date) or today - timedelta(days=1)
+        end_date = _as_date(end_date) or today
+        dates = [start_date + timedelta(days=n) for n in range((end_date - start_date).days + 1)]
+        opening_hours = _get_available_hours(dates)
         
-        reminders_sent = 0
+        libraries_updated = 0
+        for day in dates:
+            for library_id, series in build_occupancy_series(day).items():
+                available_hours = opening_hours.get((library_id, day), 0) * series.seat_count
+                libraries_updated += LibraryStatistics.objects.filter(
+                    library_id=library_id,
+                    date=day
+                ).update(
+                    peak_occupancy=series.peak_occupancy,
+                    peak_hour=series.peak_hour,
+                    average_occupancy=_decimal(
+                        min(series.occupied_hours / available_hours * 100, 100) if available_hours > 0 else 0
+                    ),
+                    updated_at=timezone.now()
+                )
         
-        for reminder_time in reminder_times:
-            # Find bookings that need reminders
-            bookings = SeatBooking.objects.filter(
-                status='CONFIRMED',
-                reminder_sent=False,
-                booking_date=reminder_time.date(),
-                start_time__hour=reminder_time.hour,
-                is_deleted=False
-            ).select_related('user', 'seat', 'seat__library')
-            
-            for booking in bookings:
-                try:
-                    # Calculate hours until booking
-                    booking_datetime = timezone.datetime.combine(
-                        booking.booking_date, booking.start_time
-                    )
-                    hours_until = (booking_datetime - now).total_seconds() / 3600
-                    
-                    if 0 < hours_until <= 24:  # Send reminder if within 24 hours
-                        subject = f"Smart Lib - Booking Reminder"
-                        message = f"""
-                        Dear {booking.user.get_full_name()},
-                        
-                        This is a reminder for your upcoming seat booking:
-                        
-                        Library: {booking.seat.library.name}
-                        Seat: {booking.seat.seat_number}
-                        Date: {booking.booking_date}
-                        Time: {booking.start_time} - {booking.end_time}
-                        
-                        Please arrive on time to avoid cancellation.
-                        
-                        Best regards,
-                        Smart Lib Team
-                        """
-                        
-                        html_message = f"""
-                        <h2>Booking Reminder</h2>
-                        <p>Dear {booking.user.get_full_name()},</p>
-                        <p>This is a reminder for your upcoming seat booking:</p>
-                        <ul>
-                            <li><strong>Library:</strong> {booking.seat.library.name}</li>
-                            <li><strong>Seat:</strong> {booking.seat.seat_number}</li>
-                            <li><strong>Date:</strong> {booking.booking_date}</li>
-                            <li><strong>Time:</strong> {booking.start_time} - {booking.end_time}</li>
-                        </ul>
-                        <p>Please arrive on time to avoid cancellation.</p>
-                        <p>Best regards,<br>Smart Lib Team</p>
-                        """
-                        
-                        send_notification_email(
-                            to_email=booking.user.email,
-                            subject=subject,
-                            message=message,
-                            html_message=html_message
-                        )
-                        
-                        booking.reminder_sent = True
-                        booking.save()
-                        reminders_sent += 1
-                        
-                except Exception as e:
-                    logger.error(f"Error sending reminder for booking {booking.id}: {e}")
-                    continue
-        
-        logger.info(f"Sent {reminders_sent} booking reminders")
-        return f"Sent {reminders_sent} reminders"
+        logger.info(f"Built occupancy series from {start_date} to {end_date}")
+        return f"Built occupancy series for {len(dates)} days, updated {libraries_updated} library statistics"
         
     except Exception as e:
-        logger.error(f"Error sending booking reminders: {e}")
+        logger.error(f"Error in build_daily_occupancy_series: {e}")
         return f"Error: {e}"
 
 
+def _as_date(value):
+    """Accept dates passed as ISO strings through the task queue"""
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+def _hours(duration):
+    return duration.total_seconds() / 3600 if duration else 0
+
+
+def _decimal(value):
+    return Decimal(value).quantize(Decimal('0.01'))
+
+
+def _get_available_hours(dates):
+    """Opening hours of each library on each of the given dates"""
+    from apps.library.models import Library, LibraryOperatingHours, LibraryHoliday
+    
+    def span(opening_time, closing_time, is_24_hours):
+        if is_24_hours:
+            return 24
+        opening = timedelta(hours=opening_time.hour, minutes=opening_time.minute)
+        closing = timedelta(hours=closing_time.hour, minutes=closing_time.minute)
+        if closing <= opening:
+            closing += timedelta(days=1)
+        return (closing - opening).total_seconds() / 3600
+    
+    default_hours = {
+        library['id']: span(library['opening_time'], library['closing_time'], library['is_24_hours'])
+        for library in Library.objects.filter(is_deleted=False).values(
+            'id', 'opening_time', 'closing_time', 'is_24_hours'
+        )
+    }
+    weekday_hours = {
+        (hours['library_id'], hours['day_of_week']): (
+            0 if hours['is_closed']
+            else span(hours['opening_time'], hours['closing_time'], hours['is_24_hours'])
+        )
+        for hours in LibraryOperatingHours.objects.filter(is_deleted=False).values(
+            'library_id', 'day_of_week', 'opening_time', 'closing_time', 'is_closed', 'is_24_hours'
+        )
+    }
+    holidays = defaultdict(list)
+    for holiday in LibraryHoliday.objects.filter(
+        is_deleted=False,
+        start_date__lte=dates[-1],
+        end_date__gte=dates[0]
+    ).values('library_id', 'start_date', 'end_date'):
+        holidays[holiday['library_id']].append((holiday['start_date'], holiday['end_date']))
+    
+    available_hours = {}
+    for library_id, hours in default_hours.items():
+        for day in dates:
+            if any(start <= day <= end for start, end in holidays[library_id]):
+                available_hours[(library_id, day)] = 0
+            else:
+                available_hours[(library_id, day)] = weekday_hours.get(
+                    (library_id, day.weekday()), hours
+                )
+    return available_hours
+
+
 @shared_task
 def cleanup_expired_qr_codes():
     """Clean up expired QR codes"""
@@ -266,66 +457,52 @@ def cleanup_expired_qr_codes():
         return f"Error: {e}"
 
 
+@shared_task
+def match_seat_waitlist(library_id, seat_id, booking_date, start_time, end_time):
+    """Offer a freed seat window to the best waitlist candidate"""
+    try:
+        entry = match_freed_window(
+            library_id,
+            seat_id,
+            date.fromisoformat(booking_date),
+            dt_time.fromisoformat(start_time),
+            dt_time.fromisoformat(end_time)
+        )
+        
+        if entry:
+            logger.info(f"Served waitlist entry {entry.id} for seat {seat_id} on {booking_date}")
+            return f"Served waitlist entry {entry.id}"
+        return "No waitlist match"
+        
+    except Exception as e:
+        logger.error(f"Error matching waitlist for seat {seat_id}: {e}")
+        return f"Error: {e}"
+
+
 @shared_task
 def process_waitlist_notifications():
-    """Process waitlist and notify users when seats become available"""
+    """Sweep today's waitlist for capacity freed outside the usual booking events"""
     try:
-        from apps.core.utils import send_notification_email
         from .models import SeatBookingWaitlist
         
         today = timezone.now().date()
         notifications_sent = 0
         
-        # Get active waitlist entries for today
-        waitlist_entries = SeatBookingWaitlist.objects.filter(
+        # Matching is normally triggered by the events that free a seat; this
+        # catches anything freed another way, e.g. by direct admin edits
+        waiting_seats = SeatBookingWaitlist.objects.filter(
             booking_date=today,
             is_active=True,
             notified_at__isnull=True,
             is_deleted=False
-        ).select_related('user', 'seat').order_by('-priority_score', 'created_at')
+        ).values_list('seat_id', 'seat__library_id').order_by().distinct()
         
-        for entry in waitlist_entries:
+        for seat_id, library_id in waiting_seats:
             try:
-                # Check if seat is now available for the requested time
-                seat = entry.seat
-                can_book, message = seat.can_user_book(
-                    entry.user,
-                    entry.preferred_start_time,
-                    entry.preferred_end_time,
-                    entry.booking_date
-                )
-                
-                if can_book:
-                    # Send notification
-                    subject = "Smart Lib - Seat Available!"
-                    message = f"""
-                    Dear {entry.user.get_full_name()},
-                    
-                    Great news! The seat you were waiting for is now available:
-                    
-                    Seat: {seat.seat_number}
-                    Library: {seat.library.name}
-                    Date: {entry.booking_date}
-                    Time: {entry.preferred_start_time} - {entry.preferred_end_time}
-                    
-                    Please book it soon as it may be taken by others.
-                    
-                    Best regards,
-                    Smart Lib Team
-                    """
-                    
-                    send_notification_email(
-                        to_email=entry.user.email,
-                        subject=subject,
-                        message=message
-                    )
-                    
-                    entry.notified_at = timezone.now()
-                    entry.save()
+                if match_freed_window(library_id, seat_id, today, dt_time.min, dt_time.max):
                     notifications_sent += 1
-                    
             except Exception as e:
-                logger.error(f"Error processing waitlist entry {entry.id}: {e}")
+                logger.error(f"Error processing waitlist for seat {seat_id}: {e}")
                 continue
         
         logger.info(f"Sent {notifications_sent} waitlist notifications")
@@ -338,40 +515,76 @@ def process_waitlist_notifications():
 
 @shared_task
 def update_seat_maintenance_status():
-    """Update seat status based on maintenance schedules"""
+    """Put seats whose scheduled maintenance has started into maintenance"""
     try:
         from .models import SeatMaintenanceLog
+        from .recommend import invalidate_feature_matrix
         
         now = timezone.now()
-        updated_seats = 0
         
-        # Find scheduled maintenance that should start
-        scheduled_maintenance = SeatMaintenanceLog.objects.filter(
-            status='SCHEDULED',
-            scheduled_date__lte=now,
-            is_deleted=False
-        )
-        
-        for maintenance in scheduled_maintenance:
-            try:
-                # Update maintenance status
-                maintenance.status = 'IN_PROGRESS'
-                maintenance.started_at = now
-                maintenance.save()
-                
-                # Update seat status
-                maintenance.seat.status = 'MAINTENANCE'
-                maintenance.seat.save()
-                
-                updated_seats += 1
-                
-            except Exception as e:
-                logger.error(f"Error updating maintenance {maintenance.id}: {e}")
-                continue
+        with transaction.atomic():
+            due = list(SeatMaintenanceLog.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+                status='SCHEDULED',
+                scheduled_date__lte=now,
+                is_deleted=False
+            ).values_list('id', 'seat_id', 'seat__library_id'))
+            if not due:
+                return "Updated 0 seats for maintenance"
+            
+            SeatMaintenanceLog.objects.filter(id__in=[log_id for log_id, _, _ in due]).update(
+                status='IN_PROGRESS',
+                started_at=now,
+                updated_at=now
+            )
+            updated_seats = Seat.objects.filter(
+                id__in={seat_id for _, seat_id, _ in due}
+            ).update(status='MAINTENANCE', updated_at=now)
+            
+            # Bulk updates skip the seat signals, so refresh what they maintain
+            library_ids = {library_id for _, _, library_id in due}
+            transaction.on_commit(lambda: reconcile_library_occupancy(library_ids))
+            for library_id in library_ids:
+                transaction.on_commit(lambda library_id=library_id: invalidate_feature_matrix(library_id))
         
         logger.info(f"Updated {updated_seats} seats for maintenance")
         return f"Updated {updated_seats} seats for maintenance"
         
     except Exception as e:
         logger.error(f"Error updating seat maintenance status: {e}")
-        return f"Error: {e}"
\ No newline at end of file
+        return f"Error: {e}"
+
+
+@shared_task
+def reconcile_seat_counters():
+    """Recompute seat booking and usage counters from bookings"""
+    try:
+        from apps.core.counters import flush_counters, reconcile_counter
+        
+        flush_counters()
+        
+        bookings = SeatBooking.objects.filter(is_deleted=False)
+        total_bookings = dict(
+            bookings.values('seat_id').annotate(count=Count('id')).values_list('seat_id', 'count')
+        )
+        usage = bookings.filter(
+            status='COMPLETED',
+            actual_start_time__isnull=False,
+            actual_end_time__isnull=False
+        ).values('seat_id').annotate(
+            duration=Sum(ExpressionWrapper(
+                F('actual_end_time') - F('actual_start_time'), output_field=DurationField()
+            ))
+        ).values_list('seat_id', 'duration')
+        usage_hours = {seat_id: _decimal(_hours(duration)) for seat_id, duration in usage}
+        
+        corrected = (
+            reconcile_counter(Seat, 'total_bookings', total_bookings) +
+            reconcile_counter(Seat, 'total_usage_hours', usage_hours)
+        )
+        
+        logger.info(f"Corrected {corrected} seat counters")
+        return f"Corrected {corrected} seat counters"
+        
+    except Exception as e:
+        logger.error(f"Error in reconcile_seat_counters: {e}")
+        return f"Error: {e}"
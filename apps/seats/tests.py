@@ -1,15 +1,15 @@
 """
 Tests for seats app
 """
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
-from datetime import date, time, timedelta
+from datetime import date, datetime, time, timedelta
 from apps.library.models import Library, LibraryFloor, LibrarySection
-from .models import Seat, SeatBooking, SeatReview
+from .models import Seat, SeatBooking, SeatReview, SeatMaintenanceLog
 
 User = get_user_model()
 
@@ -206,6 +206,30 @@ class SeatBookingModelTest(TestCase):
         self.assertTrue(success)
         self.assertEqual(message, "Booking cancelled successfully")
         self.assertEqual(self.booking.status, 'CANCELLED')
+    
+    def test_create_booking_rejects_overlap(self):
+        """Test locked booking creation rejects an overlapping window"""
+        from .managers import BookingConflictError
+        
+        with self.assertRaises(BookingConflictError):
+            SeatBooking.objects.create_booking(
+                seat=self.seat,
+                booking_date=self.booking.booking_date,
+                start_time=time(11, 0),
+                end_time=time(13, 0),
+                user=self.user,
+                created_by=self.user
+            )
+        
+        booking = SeatBooking.objects.create_booking(
+            seat=self.seat,
+            booking_date=self.booking.booking_date,
+            start_time=time(12, 0),
+            end_time=time(13, 0),
+            user=self.user,
+            created_by=self.user
+        )
+        self.assertEqual(booking.status, 'CONFIRMED')
 
 
 class SeatAPITest(APITestCase):
@@ -292,6 +316,45 @@ class SeatAPITest(APITestCase):
         self.assertEqual(response.data['count'], 1)
         self.assertEqual(response.data['results'][0]['seat_number'], 'S001')
     
+    def test_seat_search_ranks_by_availability(self):
+        """Test availability sort ranks seats by free time"""
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        busy_seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.section,
+            seat_number='S000',
+            created_by=self.user
+        )
+        SeatBooking.objects.create(
+            user=self.user,
+            seat=busy_seat,
+            booking_date=tomorrow,
+            start_time=time(10, 0),
+            end_time=time(12, 0),
+            created_by=self.user
+        )
+        
+        url = reverse('seats:seat-search')
+        data = {
+            'library_id': str(self.library.id),
+            'date': tomorrow.isoformat(),
+            'start_time': '10:00',
+            'sort_by': 'availability'
+        }
+        response = self.client.post(url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            [seat['seat_number'] for seat in response.data['results']], ['S001', 'S000']
+        )
+        self.assertEqual(response.data['results'][1]['availability'], {
+            'free_minutes': 720,
+            'longest_free_block_minutes': 600,
+            'minutes_from_requested_start': 120,
+        })
+    
     def test_check_availability(self):
         """Test seat availability check"""
         url = reverse('seats:check-availability')
@@ -415,6 +478,9 @@ class SeatBookingAPITest(APITestCase):
             created_by=self.user
         )
         
+        booking.refresh_from_db()
+        updated_at = booking.updated_at
+        
         url = reverse('seats:generate-qr-code', kwargs={'booking_id': booking.id})
         response = self.client.post(url)
         
@@ -422,10 +488,45 @@ class SeatBookingAPITest(APITestCase):
         self.assertIn('qr_data', response.data)
         self.assertIn('expires_at', response.data)
         
-        # Check that booking was updated
+        # The token is signed, not stored
+        from apps.core.qr_tokens import verify_qr_token
+        claims = verify_qr_token(response.data['qr_data'], 'seat_booking', self.user)
+        self.assertEqual(claims['i'], booking.id.hex)
+        
+        booking.refresh_from_db()
+        self.assertEqual(booking.updated_at, updated_at)
+        self.assertIsNone(booking.qr_code_expires_at)
+    
+    def test_qr_check_out_until_booking_ends(self):
+        """Test a QR code checks out after its check-in expiry and is only used up by a check-out"""
+        config = self.library.configuration
+        config.qr_code_expiry_minutes = 0
+        config.save()
+        
+        start = (timezone.localtime() - timedelta(minutes=5)).replace(second=0, microsecond=0)
+        end = start + timedelta(hours=1)
+        booking = SeatBooking.objects.create(
+            user=self.user,
+            seat=self.seat,
+            booking_date=start.date(),
+            start_time=start.time(),
+            end_time=end.time() if end.date() == start.date() else time(23, 59, 59),
+            created_by=self.user
+        )
+        token = SeatBooking.objects.get(pk=booking.pk).generate_qr_code()
+        url = reverse('seats:check-out')
+        
+        # A failed check-out leaves the code usable
+        response = self.client.post(url, {'qr_code_data': token})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'Cannot check out at this time')
+        
+        SeatBooking.objects.get(pk=booking.pk).check_in()
+        response = self.client.post(url, {'qr_code_data': token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
         booking.refresh_from_db()
-        self.assertIsNotNone(booking.qr_code_data)
-        self.assertIsNotNone(booking.qr_code_expires_at)
+        self.assertEqual(booking.status, 'COMPLETED')
     
     def test_booking_summary(self):
         """Test user booking summary"""
@@ -436,4 +537,2592 @@ class SeatBookingAPITest(APITestCase):
         self.assertIn('current_bookings', response.data)
         self.assertIn('upcoming_bookings', response.data)
         self.assertIn('recent_bookings', response.data)
-        self.assertIn('statistics', response.data)
\ No newline at end of file
+        self.assertIn('statistics', response.data)
+
+
+class SeatAvailabilityIndexTest(TestCase):
+    """Test slot-bitmap availability index"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123'
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+        
+        self.section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            created_by=self.user
+        )
+        
+        self.seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.section,
+            seat_number='S001',
+            created_by=self.user
+        )
+        
+        self.tomorrow = timezone.now().date() + timedelta(days=1)
+        self.booking = SeatBooking.objects.create(
+            user=self.user,
+            seat=self.seat,
+            booking_date=self.tomorrow,
+            start_time=time(10, 0),
+            end_time=time(12, 0),
+            created_by=self.user
+        )
+    
+    def get_index(self):
+        from .availability import SeatAvailabilityIndex
+        return SeatAvailabilityIndex(self.library.id, self.tomorrow)
+    
+    def test_booking_marks_slots_occupied(self):
+        """Test new bookings are reflected in the index"""
+        index = self.get_index()
+        
+        self.assertFalse(index.is_free(self.seat.id, time(11, 0), time(13, 0)))
+        self.assertTrue(index.is_free(self.seat.id, time(12, 0), time(13, 0)))
+        self.assertTrue(index.is_free(self.seat.id, time(8, 0), time(10, 0)))
+    
+    def test_availability_check_reads_index(self):
+        """Test conflict detection does not query bookings once indexed"""
+        index = self.get_index()
+        index.get_bitmap(self.seat.id)
+        
+        with self.assertNumQueries(0):
+            self.assertFalse(index.is_free(self.seat.id, time(9, 0), time(10, 30)))
+    
+    def test_cancellation_frees_slots(self):
+        """Test cancelling a booking frees its slots"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.booking.status = 'CANCELLED'
+            self.booking.save()
+        
+        self.assertTrue(self.get_index().is_free(self.seat.id, time(10, 0), time(12, 0)))
+    
+    def test_rolled_back_booking_leaves_slots_free(self):
+        """Test a booking that is rolled back never reaches the index"""
+        from django.db import transaction
+        
+        index = self.get_index()
+        index.get_bitmap(self.seat.id)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    SeatBooking.objects.create(
+                        user=self.user,
+                        seat=self.seat,
+                        booking_date=self.tomorrow,
+                        start_time=time(14, 0),
+                        end_time=time(16, 0),
+                        created_by=self.user
+                    )
+                    raise RuntimeError('rolled back')
+        
+        self.assertTrue(index.is_free(self.seat.id, time(14, 0), time(16, 0)))
+    
+    def test_unaligned_release_keeps_neighbour(self):
+        """Test releasing a booking keeps a neighbour sharing an edge slot"""
+        other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            crn='ICAP-CA-2023-5678',
+            password='testpass123'
+        )
+        neighbour = SeatBooking.objects.create(
+            user=other_user,
+            seat=self.seat,
+            booking_date=self.tomorrow,
+            start_time=time(12, 2),
+            end_time=time(13, 0),
+            created_by=other_user
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.booking.end_time = time(12, 2)
+            self.booking.save()
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.booking.status = 'CANCELLED'
+            self.booking.save()
+        
+        index = self.get_index()
+        self.assertTrue(index.is_free(self.seat.id, time(10, 0), time(12, 0)))
+        self.assertFalse(index.is_free(self.seat.id, time(12, 30), time(13, 0)))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            neighbour.status = 'NO_SHOW'
+            neighbour.save()
+        self.assertTrue(index.is_free(self.seat.id, time(10, 0), time(13, 0)))
+    
+    def test_free_slot_listing(self):
+        """Test free slots are listed between opening and closing time"""
+        seat = Seat.objects.select_related('library').get(pk=self.seat.pk)
+        slots = seat.get_availability_for_date(self.tomorrow)
+        
+        self.assertEqual(
+            [(slot['start_time'], slot['end_time']) for slot in slots],
+            [(time(8, 0), time(10, 0)), (time(12, 0), time(22, 0))]
+        )
+        self.assertEqual(slots[0]['duration_minutes'], 120)
+
+
+class SeatAvailabilityMatrixAPITest(APITestCase):
+    """Test whole-library availability matrix endpoint"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123',
+            is_approved=True
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+        
+        self.section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            created_by=self.user
+        )
+        
+        self.seats = [
+            Seat.objects.create(
+                library=self.library,
+                floor=self.floor,
+                section=self.section,
+                seat_number=f'S{number:03d}',
+                x_coordinate=number,
+                y_coordinate=1,
+                created_by=self.user
+            )
+            for number in range(1, 6)
+        ]
+        
+        self.tomorrow = timezone.now().date() + timedelta(days=1)
+        SeatBooking.objects.create(
+            user=self.user,
+            seat=self.seats[0],
+            booking_date=self.tomorrow,
+            start_time=time(9, 0),
+            end_time=time(10, 0),
+            created_by=self.user
+        )
+        
+        from apps.accounts.models import UserLibraryAccess
+        UserLibraryAccess.objects.create(
+            user=self.user,
+            library=self.library,
+            granted_by=self.user,
+            created_by=self.user
+        )
+        
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('seats:availability-matrix')
+    
+    def test_matrix_encodes_occupied_runs(self):
+        """Test matrix returns every seat with run-length occupancy"""
+        response = self.client.post(self.url, {
+            'library_id': str(self.library.id),
+            'date': self.tomorrow.isoformat()
+        })
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['slot_count'], 14 * 12)
+        seats = {seat['seat_number']: seat for seat in response.data['seats']}
+        self.assertEqual(len(seats), 5)
+        self.assertEqual(seats['S001']['occupancy'], [[12, 12]])
+        self.assertEqual(seats['S002']['occupancy'], [])
+        self.assertEqual(seats['S002']['x_coordinate'], 2)
+    
+    def test_matrix_bitstring_encoding(self):
+        """Test matrix can be encoded as bitstrings"""
+        response = self.client.post(self.url, {
+            'library_id': str(self.library.id),
+            'date': self.tomorrow.isoformat(),
+            'encoding': 'bits'
+        })
+        
+        seats = {seat['seat_number']: seat for seat in response.data['seats']}
+        self.assertEqual(seats['S001']['occupancy'], '0' * 12 + '1' * 12 + '0' * 144)
+    
+    def test_matrix_query_count_is_fixed(self):
+        """Test query count does not grow with the number of seats"""
+        def count_queries():
+            from django.core.cache import cache
+            from django.db import connection
+            from django.test.utils import CaptureQueriesContext
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(self.url, {
+                    'library_id': str(self.library.id),
+                    'date': self.tomorrow.isoformat()
+                })
+            return len(queries)
+        
+        baseline = count_queries()
+        for number in range(6, 40):
+            Seat.objects.create(
+                library=self.library,
+                floor=self.floor,
+                section=self.section,
+                seat_number=f'S{number:03d}',
+                created_by=self.user
+            )
+        
+        self.assertEqual(count_queries(), baseline)
+
+
+class SeatRecommendationAPITest(APITestCase):
+    """Test personalised seat recommendations"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123',
+            is_approved=True
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+        
+        self.silent_section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            noise_level='SILENT',
+            created_by=self.user
+        )
+        self.group_section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Group Study',
+            section_type='GROUP',
+            noise_level='MODERATE',
+            created_by=self.user
+        )
+        
+        self.silent_seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.silent_section,
+            seat_number='S001',
+            seat_type='SILENT',
+            created_by=self.user
+        )
+        self.busy_seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.silent_section,
+            seat_number='S002',
+            seat_type='SILENT',
+            created_by=self.user
+        )
+        self.group_seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.group_section,
+            seat_number='G001',
+            seat_type='GROUP',
+            has_power_outlet=False,
+            created_by=self.user
+        )
+        
+        self.tomorrow = timezone.now().date() + timedelta(days=1)
+        SeatBooking.objects.create(
+            user=self.user,
+            seat=self.busy_seat,
+            booking_date=self.tomorrow,
+            start_time=time(9, 0),
+            end_time=time(12, 0),
+            created_by=self.user
+        )
+        
+        from apps.accounts.models import UserLibraryAccess
+        UserLibraryAccess.objects.create(
+            user=self.user,
+            library=self.library,
+            granted_by=self.user,
+            created_by=self.user
+        )
+        
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('seats:seat-recommend')
+    
+    def recommend(self, **extra):
+        response = self.client.post(self.url, {
+            'library_id': str(self.library.id),
+            'date': self.tomorrow.isoformat(),
+            'start_time': '10:00',
+            'end_time': '11:00',
+            **extra
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [seat['seat_number'] for seat in response.data['results']]
+    
+    def test_busy_seats_are_excluded(self):
+        """Test only seats free for the window are recommended"""
+        self.assertEqual(self.recommend(), ['S001', 'G001'])
+    
+    def test_history_drives_ranking(self):
+        """Test a user who books group seats gets group seats first"""
+        SeatBooking.objects.bulk_create([
+            SeatBooking(
+                user=self.user,
+                seat=self.group_seat,
+                booking_code=f'BKH{day:05d}',
+                booking_date=self.tomorrow - timedelta(days=day + 1),
+                start_time=time(10, 0),
+                end_time=time(11, 0),
+                status='COMPLETED',
+                created_by=self.user
+            )
+            for day in range(5)
+        ])
+        
+        self.assertEqual(self.recommend(), ['G001', 'S001'])
+    
+    def test_limit(self):
+        """Test only the top k seats are returned"""
+        self.assertEqual(self.recommend(limit=1), ['S001'])
+    
+    def test_seat_out_of_service_is_dropped(self):
+        """Test the cached feature matrix is refreshed when a seat leaves service"""
+        self.assertIn('S001', self.recommend())
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.silent_seat.status = 'MAINTENANCE'
+            self.silent_seat.save()
+        
+        self.assertEqual(self.recommend(), ['G001'])
+    
+    def test_invalid_window(self):
+        """Test window must end after it starts"""
+        response = self.client.post(self.url, {
+            'library_id': str(self.library.id),
+            'date': self.tomorrow.isoformat(),
+            'start_time': '11:00',
+            'end_time': '10:00'
+        })
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SeatBookingConcurrencyTest(TransactionTestCase):
+    """Stress test concurrent booking of a single seat"""
+    
+    ATTEMPTS = 200
+    WORKERS = 20
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123'
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+        
+        self.section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            created_by=self.user
+        )
+        
+        self.seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.section,
+            seat_number='S001',
+            created_by=self.user
+        )
+    
+    def test_exactly_one_concurrent_booking_wins(self):
+        """Test hundreds of simultaneous attempts at one seat produce one booking"""
+        from concurrent.futures import ThreadPoolExecutor
+        from django.db import connection
+        from .managers import BookingConflictError
+        
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        
+        def attempt(number):
+            try:
+                SeatBooking.objects.create_booking(
+                    seat=self.seat,
+                    booking_date=tomorrow,
+                    start_time=time(9, 0),
+                    end_time=time(11, 0),
+                    user=self.user,
+                    created_by=self.user
+                )
+                return True
+            except BookingConflictError:
+                return False
+            finally:
+                connection.close()
+        
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as executor:
+            results = list(executor.map(attempt, range(self.ATTEMPTS)))
+        
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(results.count(False), self.ATTEMPTS - 1)
+        self.assertEqual(
+            SeatBooking.objects.filter(seat=self.seat, booking_date=tomorrow).count(),
+            1
+        )
+
+
+class ProcessExpiredBookingsTaskTest(TestCase):
+    """Test set-based no-show processing"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            crn='ICAP-CA-2023-5678',
+            password='testpass123'
+        )
+        self.user.profile.loyalty_points = 15
+        self.user.profile.save()
+        self.other_user.profile.loyalty_points = 50
+        self.other_user.profile.save()
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+        
+        self.section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            created_by=self.user
+        )
+        
+        self.seats = [
+            Seat.objects.create(
+                library=self.library,
+                floor=self.floor,
+                section=self.section,
+                seat_number=f'S00{number}',
+                status='RESERVED',
+                created_by=self.user
+            )
+            for number in range(1, 4)
+        ]
+        
+        self.today = timezone.now().date()
+        self.bookings = [
+            SeatBooking.objects.create(
+                user=user,
+                seat=seat,
+                booking_date=self.today,
+                start_time=time(10, 0),
+                end_time=time(12, 0),
+                created_by=user
+            )
+            for user, seat in zip([self.user, self.user, self.other_user], self.seats)
+        ]
+        SeatBooking.objects.filter(id__in=[b.id for b in self.bookings]).update(
+            auto_cancel_at=timezone.now() - timedelta(minutes=5)
+        )
+    
+    def test_expired_bookings_marked_no_show(self):
+        """Test expired bookings are processed in bulk"""
+        from apps.accounts.models import LoyaltyTransaction
+        from apps.core.models import ActivityLog
+        from .availability import SeatAvailabilityIndex
+        from .tasks import process_expired_bookings
+        
+        result = process_expired_bookings()
+        
+        self.assertTrue(result.startswith('Processed 3 expired bookings'))
+        self.assertEqual(
+            SeatBooking.objects.filter(status='NO_SHOW', penalty_points=10).count(), 3
+        )
+        self.assertFalse(Seat.objects.filter(status='RESERVED').exists())
+        
+        self.user.profile.refresh_from_db()
+        self.other_user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.loyalty_points, 0)
+        self.assertEqual(self.other_user.profile.loyalty_points, 40)
+        
+        self.assertEqual(LoyaltyTransaction.objects.filter(points=-10).count(), 3)
+        self.assertEqual(ActivityLog.objects.filter(activity_type='SEAT_BOOKING').count(), 3)
+        
+        index = SeatAvailabilityIndex(self.library.id, self.today)
+        self.assertEqual(
+            len(index.free_seat_ids([s.id for s in self.seats], time(10, 0), time(12, 0))), 3
+        )
+    
+    def test_occupied_seat_not_released(self):
+        """Test seats taken over by someone else stay occupied"""
+        from .tasks import process_expired_bookings
+        
+        Seat.objects.filter(id=self.seats[0].id).update(status='OCCUPIED')
+        process_expired_bookings()
+        
+        self.seats[0].refresh_from_db()
+        self.assertEqual(self.seats[0].status, 'OCCUPIED')
+
+
+class DailySeatStatisticsTaskTest(TestCase):
+    """Test grouped daily seat statistics generation"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123'
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+        
+        self.section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            created_by=self.user
+        )
+        
+        self.seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.section,
+            seat_number='S001',
+            created_by=self.user
+        )
+        self.idle_seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.section,
+            seat_number='S002',
+            created_by=self.user
+        )
+        
+        self.yesterday = timezone.now().date() - timedelta(days=1)
+        for start, end, booking_status in [
+            (time(10, 0), time(12, 0), 'COMPLETED'),
+            (time(14, 0), time(15, 0), 'NO_SHOW'),
+            (time(16, 0), time(18, 0), 'CANCELLED'),
+        ]:
+            SeatBooking.objects.create(
+                user=self.user,
+                seat=self.seat,
+                booking_date=self.yesterday,
+                start_time=start,
+                end_time=end,
+                status=booking_status,
+                created_by=self.user
+            )
+        
+        started = timezone.make_aware(datetime.combine(self.yesterday, time(10, 5)))
+        SeatBooking.objects.filter(status='COMPLETED').update(
+            actual_start_time=started,
+            actual_end_time=started + timedelta(hours=1, minutes=45)
+        )
+    
+    def test_statistics_aggregated_per_seat(self):
+        """Test metrics are computed for every seat"""
+        from decimal import Decimal
+        from .models import SeatUsageStatistics
+        from .tasks import generate_daily_seat_statistics
+        
+        generate_daily_seat_statistics()
+        
+        stats = SeatUsageStatistics.objects.get(seat=self.seat, date=self.yesterday)
+        self.assertEqual(stats.total_bookings, 3)
+        self.assertEqual(stats.successful_checkins, 1)
+        self.assertEqual(stats.no_shows, 1)
+        self.assertEqual(stats.cancellations, 1)
+        self.assertEqual(stats.total_booked_hours, Decimal('5.00'))
+        self.assertEqual(stats.total_used_hours, Decimal('1.75'))
+        self.assertEqual(stats.average_session_duration, Decimal('1.75'))
+        self.assertEqual(stats.utilization_rate, Decimal('12.50'))
+        self.assertEqual(stats.peak_usage_hour, time(10, 0))
+        self.assertEqual(stats.unique_users, 1)
+        
+        idle = SeatUsageStatistics.objects.get(seat=self.idle_seat, date=self.yesterday)
+        self.assertEqual(idle.total_bookings, 0)
+        self.assertIsNone(idle.peak_usage_hour)
+    
+    def test_utilization_uses_operating_hours(self):
+        """Test per-weekday opening hours override the library default"""
+        from decimal import Decimal
+        from apps.library.models import LibraryOperatingHours
+        from .models import SeatUsageStatistics
+        from .tasks import generate_daily_seat_statistics
+        
+        LibraryOperatingHours.objects.create(
+            library=self.library,
+            day_of_week=self.yesterday.weekday(),
+            opening_time=time(10, 0),
+            closing_time=time(13, 30),
+            created_by=self.user
+        )
+        generate_daily_seat_statistics()
+        
+        stats = SeatUsageStatistics.objects.get(seat=self.seat, date=self.yesterday)
+        self.assertEqual(stats.utilization_rate, Decimal('50.00'))
+    
+    def test_backfill_range_is_idempotent(self):
+        """Test a date range can be backfilled and regenerated"""
+        from .models import SeatUsageStatistics
+        from .tasks import generate_daily_seat_statistics
+        
+        start = (self.yesterday - timedelta(days=2)).isoformat()
+        generate_daily_seat_statistics(start, self.yesterday.isoformat())
+        SeatBooking.objects.filter(status='CANCELLED').update(status='NO_SHOW')
+        generate_daily_seat_statistics(start, self.yesterday.isoformat())
+        
+        self.assertEqual(SeatUsageStatistics.objects.count(), 6)
+        stats = SeatUsageStatistics.objects.get(seat=self.seat, date=self.yesterday)
+        self.assertEqual(stats.no_shows, 2)
+        self.assertEqual(stats.cancellations, 0)
+
+
+class RecurringBookingTest(TestCase):
+    """Test recurring booking expansion and materialisation"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            crn='ICAP-CA-2023-5678',
+            password='testpass123'
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+        
+        self.section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            created_by=self.user
+        )
+        
+        self.seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.section,
+            seat_number='S001',
+            created_by=self.user
+        )
+        
+        today = timezone.now().date()
+        self.next_monday = today + timedelta(days=7 - today.weekday())
+        self.pattern = {
+            'freq': 'WEEKLY',
+            'byweekday': ['MO', 'WE'],
+            'dtstart': self.next_monday,
+            'count': 6,
+        }
+    
+    def test_weekly_expansion(self):
+        """Test weekly patterns expand to the requested weekdays"""
+        from .recurrence import expand_recurrence
+        
+        dates = expand_recurrence(self.pattern)
+        
+        self.assertEqual(len(dates), 6)
+        self.assertEqual(dates[0], self.next_monday)
+        self.assertEqual(dates[1], self.next_monday + timedelta(days=2))
+        self.assertEqual(dates[-1], self.next_monday + timedelta(days=16))
+        
+        until = expand_recurrence({
+            'freq': 'WEEKLY',
+            'interval': 2,
+            'dtstart': self.next_monday,
+            'until': self.next_monday + timedelta(weeks=5),
+        })
+        self.assertEqual(len(until), 3)
+    
+    def test_recurring_booking_reports_conflicts(self):
+        """Test free occurrences are booked and clashes are reported"""
+        from .availability import SeatAvailabilityIndex
+        
+        clash_date = self.next_monday + timedelta(days=7)
+        SeatBooking.objects.create(
+            user=self.other_user,
+            seat=self.seat,
+            booking_date=clash_date,
+            start_time=time(15, 0),
+            end_time=time(16, 0),
+            created_by=self.other_user
+        )
+        later = self.next_monday + timedelta(days=9)
+        SeatAvailabilityIndex(self.library.id, later).get_bitmap(self.seat.id)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            parent, bookings, conflicts = SeatBooking.objects.create_recurring_booking(
+                user=self.user,
+                seat=self.seat,
+                start_time=time(14, 0),
+                end_time=time(17, 0),
+                recurrence_pattern=self.pattern,
+                created_by=self.user
+            )
+        
+        self.assertEqual(len(bookings), 5)
+        self.assertEqual([c['date'] for c in conflicts], [clash_date])
+        self.assertEqual(parent.booking_type, 'RECURRING')
+        self.assertEqual(parent.recurring_instances.count(), 4)
+        self.assertTrue(all(b.booking_code and b.auto_cancel_at for b in bookings))
+        
+        self.seat.refresh_from_db()
+        self.assertEqual(self.seat.total_bookings, 6)
+        self.assertFalse(
+            SeatAvailabilityIndex(self.library.id, later).is_free(self.seat.id, time(14, 0), time(15, 0))
+        )
+    
+    def test_recurring_booking_skips_planned_maintenance(self):
+        """Test occurrences during planned maintenance are reported with their reason"""
+        from datetime import datetime
+        
+        maintenance_date = self.next_monday + timedelta(days=2)
+        SeatMaintenanceLog.objects.create(
+            seat=self.seat,
+            maintenance_type='REPAIR',
+            scheduled_date=timezone.make_aware(datetime.combine(maintenance_date, time(13, 0))),
+            scheduled_end=timezone.make_aware(datetime.combine(maintenance_date, time(15, 0))),
+            description='Replace desk lamp',
+            created_by=self.user
+        )
+        
+        parent, bookings, conflicts = SeatBooking.objects.create_recurring_booking(
+            user=self.user,
+            seat=self.seat,
+            start_time=time(14, 0),
+            end_time=time(17, 0),
+            recurrence_pattern=self.pattern,
+            created_by=self.user
+        )
+        
+        self.assertEqual(len(bookings), 5)
+        self.assertEqual(conflicts, [
+            {'date': maintenance_date, 'reason': 'Seat is scheduled for maintenance at this time'}
+        ])
+    
+    def test_conflict_check_is_one_query(self):
+        """Test query count does not grow with the number of occurrences"""
+        from django.core.cache import cache
+        
+        def book(count, start):
+            cache.clear()
+            pattern = dict(self.pattern, count=count)
+            return SeatBooking.objects.create_recurring_booking(
+                user=self.user,
+                seat=self.seat,
+                start_time=start,
+                end_time=time(start.hour + 1),
+                recurrence_pattern=pattern,
+                created_by=self.user
+            )
+        
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        self.library.configuration.max_daily_bookings_per_user = 5
+        self.library.configuration.save()
+        with CaptureQueriesContext(connection) as few:
+            book(2, time(9, 0))
+        with CaptureQueriesContext(connection) as many:
+            book(20, time(11, 0))
+        
+        self.assertEqual(len(few), len(many))
+
+
+class GroupSeatAllocationTest(TestCase):
+    """Test adjacent-seat allocation for group bookings"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123'
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+        
+        self.section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            created_by=self.user
+        )
+        
+        # A row of four seats and a separate row of three further along
+        self.seats = {
+            x: Seat.objects.create(
+                library=self.library,
+                floor=self.floor,
+                section=self.section,
+                seat_number=f'S{x:03d}',
+                x_coordinate=x,
+                y_coordinate=0,
+                created_by=self.user
+            )
+            for x in [0, 1, 2, 3, 10, 11, 12]
+        }
+        
+        self.tomorrow = timezone.now().date() + timedelta(days=1)
+        SeatBooking.objects.create(
+            user=self.user,
+            seat=self.seats[11],
+            booking_date=self.tomorrow,
+            start_time=time(9, 0),
+            end_time=time(11, 0),
+            created_by=self.user
+        )
+    
+    def get_seat_values(self):
+        return list(Seat.objects.filter(library=self.library).values(
+            'id', 'section_id', 'x_coordinate', 'y_coordinate'
+        ))
+    
+    def test_grid_nearest_neighbours(self):
+        """Test grid lookups return the closest seats"""
+        from .grouping import SeatGrid
+        
+        grid = SeatGrid([(x, float(x), 0.0) for x in self.seats])
+        
+        self.assertEqual([seat_id for _, seat_id in grid.nearest(11, 0, 3)], [11, 10, 12])
+        self.assertEqual([seat_id for _, seat_id in grid.nearest(0, 0, 2)], [0, 1])
+    
+    def test_tightest_free_cluster_found(self):
+        """Test the cluster avoids booked seats and stays compact"""
+        from .grouping import find_seat_cluster
+        
+        cluster = find_seat_cluster(
+            self.get_seat_values(), self.library.id, self.tomorrow,
+            time(10, 0), time(13, 0), 3
+        )
+        expected = {str(self.seats[x].id) for x in [0, 1, 2, 3]}
+        
+        self.assertEqual(len(cluster), 3)
+        self.assertTrue({str(seat_id) for seat_id in cluster} <= expected)
+        
+        # Outside the booked window the second row is free again
+        cluster = find_seat_cluster(
+            self.get_seat_values(), self.library.id, self.tomorrow,
+            time(12, 0), time(13, 0), 3,
+            exclude={str(self.seats[x].id) for x in [0, 1, 2, 3]}
+        )
+        self.assertEqual(
+            {str(seat_id) for seat_id in cluster},
+            {str(self.seats[x].id) for x in [10, 11, 12]}
+        )
+    
+    def test_group_booking_is_all_or_nothing(self):
+        """Test one conflicting seat fails the whole group"""
+        from .managers import BookingConflictError
+        
+        with self.assertRaises(BookingConflictError) as context:
+            SeatBooking.objects.create_group_booking(
+                group_leader=self.user,
+                seat_ids=[self.seats[10].id, self.seats[11].id, self.seats[12].id],
+                booking_date=self.tomorrow,
+                start_time=time(10, 0),
+                end_time=time(12, 0),
+                created_by=self.user
+            )
+        
+        self.assertEqual(context.exception.seat_ids, [str(self.seats[11].id)])
+        self.assertEqual(SeatBooking.objects.filter(booking_type='GROUP').count(), 0)
+        
+        bookings = SeatBooking.objects.create_group_booking(
+            group_leader=self.user,
+            seat_ids=[self.seats[0].id, self.seats[1].id],
+            booking_date=self.tomorrow,
+            start_time=time(10, 0),
+            end_time=time(12, 0),
+            created_by=self.user
+        )
+        self.assertEqual(len({booking.group_booking_id for booking in bookings}), 1)
+        self.assertTrue(all(booking.group_size == 2 for booking in bookings))
+    
+    def test_group_booking_rejects_unavailable_seats(self):
+        """Test seats out of service or under planned maintenance fail the group"""
+        from datetime import datetime
+        from .managers import BookingConflictError
+        
+        SeatMaintenanceLog.objects.create(
+            seat=self.seats[2],
+            maintenance_type='CLEANING',
+            scheduled_date=timezone.make_aware(datetime.combine(self.tomorrow, time(11, 0))),
+            scheduled_end=timezone.make_aware(datetime.combine(self.tomorrow, time(13, 0))),
+            description='Deep clean',
+            created_by=self.user
+        )
+        Seat.objects.filter(pk=self.seats[3].pk).update(status='OUT_OF_ORDER')
+        
+        with self.assertRaises(BookingConflictError) as context:
+            SeatBooking.objects.create_group_booking(
+                group_leader=self.user,
+                seat_ids=[self.seats[1].id, self.seats[2].id, self.seats[3].id],
+                booking_date=self.tomorrow,
+                start_time=time(10, 0),
+                end_time=time(12, 0),
+                created_by=self.user
+            )
+        
+        self.assertEqual(
+            set(context.exception.seat_ids),
+            {str(self.seats[2].id), str(self.seats[3].id)}
+        )
+        self.assertEqual(SeatBooking.objects.filter(booking_type='GROUP').count(), 0)
+
+
+class WaitlistMatcherTest(TestCase):
+    """Test event-driven waitlist matching"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            crn='ICAP-CA-2023-5678',
+            password='testpass123'
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+        
+        self.section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            created_by=self.user
+        )
+        
+        self.seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.section,
+            seat_number='S001',
+            created_by=self.user
+        )
+        
+        self.tomorrow = timezone.now().date() + timedelta(days=1)
+        self.booking = SeatBooking.objects.create(
+            user=self.other_user,
+            seat=self.seat,
+            booking_date=self.tomorrow,
+            start_time=time(10, 0),
+            end_time=time(12, 0),
+            created_by=self.other_user
+        )
+    
+    def add_entry(self, user, start, end, priority=0, **kwargs):
+        from .models import SeatBookingWaitlist
+        return SeatBookingWaitlist.objects.create(
+            user=user,
+            seat=self.seat,
+            booking_date=self.tomorrow,
+            preferred_start_time=start,
+            preferred_end_time=end,
+            priority_score=priority,
+            expires_at=timezone.now() + timedelta(days=1),
+            created_by=user,
+            **kwargs
+        )
+    
+    def cancel_booking(self):
+        from unittest import mock
+        from .tasks import match_seat_waitlist
+        
+        # Run the queued match in-process whatever the Celery configuration
+        with mock.patch.object(match_seat_waitlist, 'delay', side_effect=match_seat_waitlist):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.booking.status = 'CANCELLED'
+                self.booking.save()
+    
+    def test_cancellation_notifies_best_candidate(self):
+        """Test the highest-priority fitting request is notified"""
+        from django.core import mail
+        
+        low = self.add_entry(self.user, time(10, 0), time(11, 0), priority=1)
+        high = self.add_entry(self.other_user, time(10, 30), time(12, 0), priority=5)
+        self.cancel_booking()
+        
+        low.refresh_from_db()
+        high.refresh_from_db()
+        self.assertIsNotNone(high.notified_at)
+        self.assertIsNone(low.notified_at)
+        self.assertEqual(len(mail.outbox), 1)
+    
+    def test_auto_book_from_waitlist(self):
+        """Test the freed window is booked for the candidate when enabled"""
+        config = self.library.configuration
+        config.auto_book_from_waitlist = True
+        config.save()
+        entry = self.add_entry(self.user, time(10, 0), time(11, 0))
+        self.cancel_booking()
+        
+        entry.refresh_from_db()
+        self.assertFalse(entry.is_active)
+        self.assertTrue(SeatBooking.objects.filter(
+            user=self.user, seat=self.seat, booking_date=self.tomorrow,
+            start_time=time(10, 0), end_time=time(11, 0), status='CONFIRMED'
+        ).exists())
+    
+    def test_auto_book_respects_daily_limit(self):
+        """Test candidates at their daily booking limit are not booked on their behalf"""
+        config = self.library.configuration
+        config.auto_book_from_waitlist = True
+        config.max_daily_bookings_per_user = 1
+        config.save()
+        other_seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.section,
+            seat_number='S002',
+            created_by=self.user
+        )
+        SeatBooking.objects.create(
+            user=self.user,
+            seat=other_seat,
+            booking_date=self.tomorrow,
+            start_time=time(14, 0),
+            end_time=time(15, 0),
+            created_by=self.user
+        )
+        entry = self.add_entry(self.user, time(10, 0), time(11, 0))
+        self.cancel_booking()
+        
+        entry.refresh_from_db()
+        self.assertTrue(entry.is_active)
+        self.assertIsNone(entry.notified_at)
+        self.assertFalse(SeatBooking.objects.filter(user=self.user, seat=self.seat).exists())
+    
+    def test_flexible_request_gets_nearest_block(self):
+        """Test flexible requests are offered a block inside the free run"""
+        from .waitlist import WaitlistIndex
+        from .availability import time_to_slot
+        
+        entry = self.add_entry(
+            self.user, time(9, 0), time(13, 0), flexible_timing=True, acceptable_duration_hours=1
+        )
+        offers = WaitlistIndex(self.seat.id, self.tomorrow).candidates(
+            time_to_slot(time(10, 0)), time_to_slot(time(12, 0))
+        )
+        
+        self.assertEqual(offers, [(str(entry.id), time_to_slot(time(10, 0)), time_to_slot(time(11, 0)))])
+    
+    def test_no_waiting_requests_does_no_work(self):
+        """Test freed windows on seats nobody waits for cost no queries"""
+        from .waitlist import WaitlistIndex, match_freed_window
+        
+        WaitlistIndex(self.seat.id, self.tomorrow).get_entries()
+        with self.assertNumQueries(0):
+            self.assertIsNone(match_freed_window(
+                self.library.id, self.seat.id, self.tomorrow, time(10, 0), time(12, 0)
+            ))
+
+
+class QRCheckInTest(APITestCase):
+    """Test check-in with signed QR tokens"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from apps.accounts.models import UserLibraryAccess
+        
+        cache.clear()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123',
+            is_approved=True
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='00:00',
+            closing_time='23:59',
+            created_by=self.user
+        )
+        
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+        
+        self.section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            created_by=self.user
+        )
+        
+        self.seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.section,
+            seat_number='S001',
+            created_by=self.user
+        )
+        
+        UserLibraryAccess.objects.create(
+            user=self.user,
+            library=self.library,
+            granted_by=self.user,
+            created_by=self.user
+        )
+        
+        # A booking that started a few minutes ago
+        start = (timezone.localtime() - timedelta(minutes=5)).replace(second=0, microsecond=0)
+        end = start + timedelta(hours=1)
+        self.booking = SeatBooking.objects.create(
+            user=self.user,
+            seat=self.seat,
+            booking_date=start.date(),
+            start_time=start.time(),
+            end_time=end.time() if end.date() == start.date() else time(23, 59, 59),
+            created_by=self.user
+        )
+        
+        self.client.force_authenticate(user=self.user)
+    
+    def get_token(self):
+        url = reverse('seats:generate-qr-code', kwargs={'booking_id': self.booking.id})
+        return self.client.post(url).data['qr_data']
+    
+    def test_check_in_without_reading_booking(self):
+        """Test QR check-in runs conditional updates instead of loading the booking"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        token = self.get_token()
+        url = reverse('seats:check-in')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'qr_code_data': token}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and 'seats_booking' in query['sql']
+        ])
+        
+        self.booking.refresh_from_db()
+        self.seat.refresh_from_db()
+        self.assertEqual(self.booking.status, 'CHECKED_IN')
+        self.assertIsNotNone(self.booking.checked_in_at)
+        self.assertEqual(self.seat.status, 'OCCUPIED')
+    
+    def test_token_cannot_be_replayed(self):
+        """Test a used token is rejected"""
+        token = self.get_token()
+        url = reverse('seats:check-in')
+        self.client.post(url, {'qr_code_data': token}, format='json')
+        
+        response = self.client.post(url, {'qr_code_data': token}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'QR code has already been used')
+    
+    def test_tampered_token_rejected(self):
+        """Test forged tokens and tokens of other users are rejected"""
+        from apps.core.qr_tokens import issue_qr_token
+        
+        token = self.get_token()
+        url = reverse('seats:check-in')
+        
+        value, signature = token.rsplit(':', 1)
+        forged = f"{value}:{signature[::-1]}"
+        response = self.client.post(url, {'qr_code_data': forged}, format='json')
+        self.assertEqual(response.data['error'], 'Invalid QR code')
+        
+        other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            crn='ICAP-CA-2023-5678',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=other_user)
+        response = self.client.post(url, {'qr_code_data': token}, format='json')
+        self.assertEqual(response.data['error'], 'Invalid QR code')
+        
+        expired = issue_qr_token(
+            'seat_booking', self.booking.id, self.user.id, timezone.now() - timedelta(minutes=1)
+        )
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(url, {'qr_code_data': expired}, format='json')
+        self.assertEqual(response.data['error'], 'QR code has expired')
+        
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'CONFIRMED')
+
+
+class KioskScanBatchTest(APITestCase):
+    """Test batch kiosk check-in and check-out"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        
+        cache.clear()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123',
+            is_approved=True
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='00:00',
+            closing_time='23:59',
+            created_by=self.user
+        )
+        
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+        
+        self.section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            created_by=self.user
+        )
+        
+        self.admin = User.objects.create_user(
+            username='kiosk',
+            email='kiosk@example.com',
+            crn='ICAP-CA-2023-9999',
+            password='testpass123',
+            role='ADMIN',
+            is_approved=True
+        )
+        self.admin.admin_profile.managed_library = self.library
+        self.admin.admin_profile.save()
+        
+        # Bookings that started a few minutes ago
+        self.start = (timezone.localtime() - timedelta(minutes=5)).replace(second=0, microsecond=0)
+        self.bookings = [self.create_booking(f'S00{number}') for number in range(1, 7)]
+        
+        self.client.force_authenticate(user=self.admin)
+        self.url = reverse('seats:kiosk-scans')
+    
+    def create_booking(self, seat_number):
+        seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.section,
+            seat_number=seat_number,
+            created_by=self.user
+        )
+        end = self.start + timedelta(hours=1)
+        return SeatBooking.objects.create(
+            user=self.user,
+            seat=seat,
+            booking_date=self.start.date(),
+            start_time=self.start.time(),
+            end_time=end.time() if end.date() == self.start.date() else time(23, 59, 59),
+            created_by=self.user
+        )
+    
+    def scan(self, booking, action='CHECK_IN', minutes_ago=1, **extra):
+        scan = {
+            'booking_id': str(booking.id),
+            'action': action,
+            'scanned_at': (timezone.now() - timedelta(minutes=minutes_ago)).isoformat(),
+        }
+        scan.update(extra)
+        return scan
+    
+    def test_batch_returns_result_per_scan(self):
+        """Test a mixed batch is applied in scan order with one result per scan"""
+        from apps.accounts.models import LoyaltyTransaction
+        from apps.core.models import ActivityLog
+        from apps.notifications.models import Notification
+        
+        first, second = self.bookings[:2]
+        token = first.generate_qr_code()
+        notifications = Notification.objects.count()
+        
+        scans = [
+            # Sent out of order; the check-out happened after the check-in
+            self.scan(second, 'CHECK_OUT', minutes_ago=1, scan_id='b'),
+            self.scan(second, 'CHECK_IN', minutes_ago=3, scan_id='a'),
+            {'qr_code_data': token, 'action': 'CHECK_IN', 'scanned_at': timezone.now().isoformat()},
+            {'qr_code_data': token, 'action': 'CHECK_IN', 'scanned_at': timezone.now().isoformat()},
+            {'qr_code_data': token + 'x', 'action': 'CHECK_IN', 'scanned_at': timezone.now().isoformat()},
+            {'booking_id': str(first.id), 'scanned_at': timezone.now().isoformat()},
+        ]
+        response = self.client.post(self.url, {'scans': scans}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([result['success'] for result in results], [True, True, True, False, False, False])
+        self.assertEqual(results[0]['scan_id'], 'b')
+        self.assertEqual(results[3]['error'], 'Cannot check in at this time')
+        self.assertEqual(results[4]['error'], 'Invalid QR code')
+        self.assertIn('action', results[5]['error'])
+        self.assertEqual(response.data['succeeded'], 3)
+        
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, 'CHECKED_IN')
+        self.assertEqual(second.status, 'COMPLETED')
+        self.assertLess(second.actual_start_time, second.actual_end_time)
+        self.assertEqual(Seat.objects.get(pk=first.seat_id).status, 'OCCUPIED')
+        self.assertEqual(Seat.objects.get(pk=second.seat_id).status, 'AVAILABLE')
+        
+        self.assertEqual(LoyaltyTransaction.objects.filter(reference_id=str(second.id)).count(), 1)
+        self.assertEqual(ActivityLog.objects.filter(activity_type='SEAT_CHECKIN').count(), 2)
+        self.assertEqual(ActivityLog.objects.filter(activity_type='SEAT_CHECKOUT').count(), 1)
+        self.assertEqual(Notification.objects.count(), notifications + 2)
+    
+    def test_code_checks_out_after_check_in_expiry(self):
+        """Test a code expired for check-in still checks out while the booking lasts"""
+        config = self.library.configuration
+        config.qr_code_expiry_minutes = 0
+        config.save()
+        booking = self.bookings[0]
+        token = SeatBooking.objects.get(pk=booking.pk).generate_qr_code()
+        
+        response = self.client.post(self.url, {'scans': [
+            {'qr_code_data': token, 'action': 'CHECK_IN', 'scanned_at': timezone.now().isoformat()},
+            self.scan(booking, 'CHECK_IN', minutes_ago=2),
+            {'qr_code_data': token, 'action': 'CHECK_OUT', 'scanned_at': timezone.now().isoformat()},
+        ]}, format='json')
+        
+        results = response.data['results']
+        self.assertEqual([result['success'] for result in results], [False, True, True])
+        self.assertEqual(results[0]['error'], 'QR code has expired')
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'COMPLETED')
+    
+    def test_query_count_does_not_grow_with_batch(self):
+        """Test a batch costs the same number of queries whatever its size"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url, {'scans': [
+                self.scan(booking) for booking in self.bookings[:2]
+            ]}, format='json')
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(self.url, {'scans': [
+                self.scan(booking) for booking in self.bookings[2:]
+            ]}, format='json')
+        
+        self.assertEqual(response.data['succeeded'], 4)
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+    
+    def test_scans_outside_managed_library_rejected(self):
+        """Test admins cannot apply scans for other libraries"""
+        other_library = Library.objects.create(
+            name='Other Library',
+            address='456 Other Street',
+            city='Other City',
+            opening_time='00:00',
+            closing_time='23:59',
+            created_by=self.user
+        )
+        self.admin.admin_profile.managed_library = other_library
+        self.admin.admin_profile.save()
+        
+        response = self.client.post(self.url, {'scans': [self.scan(self.bookings[0])]}, format='json')
+        
+        self.assertEqual(response.data['results'][0]['error'], 'Booking not found')
+        self.bookings[0].refresh_from_db()
+        self.assertEqual(self.bookings[0].status, 'CONFIRMED')
+
+
+class DirtyFieldTrackingTest(TestCase):
+    """Test change tracking on loaded bookings"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123'
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+        
+        self.section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            created_by=self.user
+        )
+        
+        self.seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.section,
+            seat_number='S001',
+            created_by=self.user
+        )
+        
+        self.booking = SeatBooking.objects.create(
+            user=self.user,
+            seat=self.seat,
+            booking_date=timezone.now().date() + timedelta(days=1),
+            start_time=time(10, 0),
+            end_time=time(12, 0),
+            created_by=self.user
+        )
+    
+    def test_changed_fields_and_previous_value(self):
+        """Test loaded values are remembered until the next save"""
+        booking = SeatBooking.objects.get(pk=self.booking.pk)
+        self.assertEqual(booking.changed_fields, set())
+        
+        booking.status = 'CANCELLED'
+        booking.end_time = time(11, 0)
+        self.assertEqual(booking.changed_fields, {'status', 'end_time'})
+        self.assertEqual(booking.previous_value('status'), 'CONFIRMED')
+        self.assertTrue(booking.has_changed('status'))
+        
+        booking.save()
+        self.assertEqual(booking.changed_fields, set())
+        self.assertEqual(booking.previous_value('status'), 'CANCELLED')
+    
+    def test_status_change_does_not_refetch_booking(self):
+        """Test signals compare against the loaded values instead of re-reading the row"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from apps.core.models import ActivityLog
+        
+        booking = SeatBooking.objects.select_related('seat__library').get(pk=self.booking.pk)
+        booking.status = 'CANCELLED'
+        with CaptureQueriesContext(connection) as queries:
+            booking.save()
+        
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "seats_booking"' in query['sql']
+        ])
+        self.assertTrue(ActivityLog.objects.filter(
+            activity_type='SEAT_BOOKING',
+            metadata__old_status='CONFIRMED',
+            metadata__new_status='CANCELLED'
+        ).exists())
+    
+    def test_save_changed_writes_only_changed_fields(self):
+        """Test save_changed passes update_fields for the changed columns"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        booking = SeatBooking.objects.get(pk=self.booking.pk)
+        self.assertFalse(booking.save_changed())
+        
+        booking.notes = 'Window seat please'
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(booking.save_changed())
+        
+        update = next(query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "seats_booking"'))
+        self.assertIn('"notes"', update)
+        self.assertIn('"updated_at"', update)
+        self.assertNotIn('"status"', update)
+    
+    def test_untracked_instance_loads_previous_values_once(self):
+        """Test instances that were never loaded fall back to one read"""
+        booking = SeatBooking(pk=self.booking.pk, seat=self.seat, user=self.user)
+        booking._state.adding = False
+        
+        with self.assertNumQueries(1):
+            self.assertEqual(booking.previous_value('status'), 'CONFIRMED')
+            self.assertEqual(booking.previous_value('start_time'), time(10, 0))
+
+
+class SeatCounterTest(TestCase):
+    """Test seat statistics counters"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123'
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+        
+        self.section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            created_by=self.user
+        )
+        
+        self.seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.section,
+            seat_number='S001',
+            created_by=self.user
+        )
+        
+        self.other_seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.section,
+            seat_number='S002',
+            created_by=self.user
+        )
+        
+        self.booking = SeatBooking.objects.create(
+            user=self.user,
+            seat=self.seat,
+            booking_date=timezone.now().date() + timedelta(days=1),
+            start_time=time(10, 0),
+            end_time=time(12, 0),
+            created_by=self.user
+        )
+    
+    def test_booking_increments_without_saving_seat(self):
+        """Test a new booking bumps the counter without rewriting the seat row"""
+        self.seat.refresh_from_db()
+        self.assertEqual(self.seat.total_bookings, 1)
+        
+        # A stale copy of the seat does not overwrite the counter
+        stale = Seat.objects.get(pk=self.seat.pk)
+        SeatBooking.objects.create(
+            user=self.user,
+            seat=self.seat,
+            booking_date=timezone.now().date() + timedelta(days=2),
+            start_time=time(10, 0),
+            end_time=time(12, 0),
+            created_by=self.user
+        )
+        stale.notes = 'Wobbly chair'
+        stale.save_changed()
+        
+        self.seat.refresh_from_db()
+        self.assertEqual(self.seat.total_bookings, 2)
+    
+    def test_usage_hours_counted_once(self):
+        """Test usage hours are added on completion only, not on every later save"""
+        from decimal import Decimal
+        
+        now = timezone.now()
+        self.booking.status = 'COMPLETED'
+        self.booking.actual_start_time = now - timedelta(hours=1, minutes=30)
+        self.booking.actual_end_time = now
+        self.booking.save()
+        
+        self.booking.notes = 'Left early'
+        self.booking.save()
+        
+        self.seat.refresh_from_db()
+        self.assertEqual(self.seat.total_usage_hours, Decimal('1.50'))
+    
+    def test_apply_counter_deltas(self):
+        """Test coalesced increments for several rows are applied together"""
+        from decimal import Decimal
+        from apps.core.counters import apply_counter_deltas
+        
+        apply_counter_deltas({
+            'seats.Seat': {
+                (str(self.seat.pk), 'total_bookings'): Decimal('3'),
+                (str(self.seat.pk), 'total_usage_hours'): Decimal('2.25'),
+                (str(self.other_seat.pk), 'total_bookings'): Decimal('-5'),
+            }
+        })
+        
+        self.seat.refresh_from_db()
+        self.other_seat.refresh_from_db()
+        self.assertEqual(self.seat.total_bookings, 4)
+        self.assertEqual(self.seat.total_usage_hours, Decimal('2.25'))
+        # Counters never go below zero
+        self.assertEqual(self.other_seat.total_bookings, 0)
+    
+    def test_reconcile_seat_counters(self):
+        """Test drifted counters are recomputed from bookings"""
+        from decimal import Decimal
+        from .tasks import reconcile_seat_counters
+        
+        now = timezone.now()
+        SeatBooking.objects.filter(pk=self.booking.pk).update(
+            status='COMPLETED',
+            actual_start_time=now - timedelta(hours=2),
+            actual_end_time=now
+        )
+        Seat.objects.filter(pk=self.seat.pk).update(total_bookings=7, total_usage_hours=0)
+        Seat.objects.filter(pk=self.other_seat.pk).update(total_bookings=3)
+        
+        result = reconcile_seat_counters()
+        
+        self.assertEqual(result, "Corrected 3 seat counters")
+        self.seat.refresh_from_db()
+        self.other_seat.refresh_from_db()
+        self.assertEqual(self.seat.total_bookings, 1)
+        self.assertEqual(self.seat.total_usage_hours, Decimal('2.00'))
+        self.assertEqual(self.other_seat.total_bookings, 0)
+
+
+class OccupancySeriesTest(APITestCase):
+    """Test occupancy time-series built from check-in intervals"""
+    
+    def setUp(self):
+        from apps.library.models import LibraryStatistics
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123',
+            is_approved=True
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+        
+        self.section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            created_by=self.user
+        )
+        
+        self.seats = [
+            Seat.objects.create(
+                library=self.library,
+                floor=self.floor,
+                section=self.section,
+                seat_number=f'S00{number}',
+                created_by=self.user
+            )
+            for number in range(1, 4)
+        ]
+        
+        # Two overlapping stays and one back-to-back stay on the first seat
+        self.day = timezone.now().date() - timedelta(days=1)
+        for seat, start, end in [
+            (self.seats[0], time(9, 0), time(10, 30)),
+            (self.seats[1], time(10, 0), time(11, 0)),
+            (self.seats[0], time(10, 30), time(11, 0)),
+        ]:
+            booking = SeatBooking.objects.create(
+                user=self.user,
+                seat=seat,
+                booking_date=self.day,
+                start_time=start,
+                end_time=end,
+                created_by=self.user
+            )
+            SeatBooking.objects.filter(pk=booking.pk).update(
+                status='COMPLETED',
+                actual_start_time=timezone.make_aware(datetime.combine(self.day, start)),
+                actual_end_time=timezone.make_aware(datetime.combine(self.day, end))
+            )
+        
+        LibraryStatistics.objects.create(library=self.library, date=self.day)
+    
+    def test_sweep_occupancy(self):
+        """Test intervals are spread over slots and the peak is found"""
+        from .timeseries import sweep_occupancy, day_window
+        
+        window_start, _ = day_window(self.day)
+        at = lambda hour, minute: window_start + timedelta(hours=hour, minutes=minute)
+        minutes, peak, peak_offset = sweep_occupancy([
+            (at(9, 0), at(9, 20)),
+            (at(9, 10), at(9, 40)),
+            (at(9, 40), at(10, 0)),
+        ], window_start)
+        
+        self.assertEqual(minutes[36:40], [20, 20, 15, 15])
+        self.assertEqual(sum(minutes), 70)
+        self.assertEqual(peak, 2)
+        self.assertEqual(peak_offset, 9 * 3600 + 10 * 60)
+    
+    def test_build_series_and_library_statistics(self):
+        """Test seat, section and library series and the utilization derived from them"""
+        from decimal import Decimal
+        from apps.library.models import LibraryStatistics
+        from .models import OccupancySeries
+        from .tasks import build_daily_occupancy_series
+        
+        build_daily_occupancy_series(self.day.isoformat(), self.day.isoformat())
+        
+        self.assertEqual(OccupancySeries.objects.filter(scope='SEAT').count(), 2)
+        self.assertFalse(OccupancySeries.objects.filter(seat=self.seats[2]).exists())
+        
+        first_seat = OccupancySeries.objects.get(seat=self.seats[0])
+        self.assertEqual(first_seat.hourly_minutes[9:11], [60, 60])
+        self.assertEqual(first_seat.peak_occupancy, 1)
+        
+        library = OccupancySeries.objects.get(scope='LIBRARY')
+        self.assertEqual(library.seat_count, 3)
+        self.assertEqual(library.hourly_minutes[9:11], [60, 120])
+        self.assertEqual(library.peak_occupancy, 2)
+        self.assertEqual(library.peak_at, time(10, 0))
+        self.assertEqual(library.peak_hour, time(10, 0))
+        self.assertEqual(library.hourly_occupancy[10], 66.67)
+        
+        stats = LibraryStatistics.objects.get(library=self.library, date=self.day)
+        self.assertEqual(stats.peak_occupancy, 2)
+        self.assertEqual(stats.peak_hour, time(10, 0))
+        # 3 seat-hours used out of 3 seats open for 14 hours
+        self.assertEqual(stats.average_occupancy, Decimal('7.14'))
+        
+        # Rebuilding replaces the day's series
+        build_daily_occupancy_series(self.day.isoformat(), self.day.isoformat())
+        self.assertEqual(OccupancySeries.objects.filter(scope='LIBRARY').count(), 1)
+    
+    def test_heatmap_reads_series(self):
+        """Test the heatmap is served from stored series without reading bookings"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .timeseries import build_occupancy_series
+        
+        build_occupancy_series(self.day)
+        admin = User.objects.create_user(
+            username='admin',
+            email='admin@example.com',
+            crn='ICAP-CA-2023-9999',
+            password='testpass123',
+            role='ADMIN',
+            is_approved=True
+        )
+        admin.admin_profile.managed_library = self.library
+        admin.admin_profile.save()
+        self.client.force_authenticate(user=admin)
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('seats:occupancy-heatmap'), {
+                'library_id': str(self.library.id),
+                'section_id': str(self.section.id),
+                'start_date': (self.day - timedelta(days=6)).isoformat(),
+                'end_date': self.day.isoformat(),
+            }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['days']), 1)
+        self.assertEqual(response.data['days'][0]['hourly_occupancy'][10], 66.67)
+        self.assertEqual(response.data['peak_hour'], time(10, 0))
+        self.assertFalse([
+            query for query in queries.captured_queries if 'seats_booking' in query['sql']
+        ])
+
+
+class NoShowPredictionTest(TestCase):
+    """Test no-show scoring, early release and overbooking"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            crn='ICAP-CA-2023-5678',
+            password='testpass123'
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+        
+        self.section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            created_by=self.user
+        )
+        
+        self.seat = Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=self.section,
+            seat_number='S001',
+            created_by=self.user
+        )
+        
+        self.config = self.library.configuration
+        self.today = timezone.now().date()
+    
+    def publish_table(self, user, percent):
+        """Publish a flat no-show table for a user"""
+        from django.core.cache import cache
+        from .noshow import _table_key, HOURS_PER_WEEK
+        
+        cache.set(_table_key(user.id), bytes([percent] * HOURS_PER_WEEK))
+    
+    def book(self, user, **extra_fields):
+        return SeatBooking.objects.create_booking(
+            seat=self.seat,
+            booking_date=self.today,
+            start_time=time(10, 0),
+            end_time=time(12, 0),
+            user=user,
+            created_by=user,
+            **extra_fields
+        )
+    
+    def test_train_and_publish(self):
+        """Test the trained tables rank a habitual no-show above a reliable user"""
+        from .noshow import train_and_publish, predict_no_show
+        
+        history = []
+        for day in range(1, 41):
+            booking_date = self.today - timedelta(days=day)
+            history += [
+                SeatBooking(
+                    user=self.user,
+                    seat=self.seat,
+                    booking_code=f'BKU{day:05d}',
+                    booking_date=booking_date,
+                    start_time=time(9, 0),
+                    end_time=time(10, 0),
+                    status='NO_SHOW' if day % 4 else 'COMPLETED',
+                    created_by=self.user
+                ),
+                SeatBooking(
+                    user=self.other_user,
+                    seat=self.seat,
+                    booking_code=f'BKO{day:05d}',
+                    booking_date=booking_date,
+                    start_time=time(14, 0),
+                    end_time=time(15, 0),
+                    status='NO_SHOW' if day % 10 == 0 else 'COMPLETED',
+                    created_by=self.other_user
+                ),
+            ]
+        SeatBooking.objects.bulk_create(history)
+        
+        self.assertEqual(train_and_publish(), 2)
+        
+        unreliable = predict_no_show(self.user.id, self.today, time(9, 0))
+        reliable = predict_no_show(self.other_user.id, self.today, time(9, 0))
+        self.assertGreater(unreliable, reliable)
+        
+        # New bookings are scored from the published tables
+        booking = self.book(self.user)
+        self.assertEqual(booking.no_show_probability, predict_no_show(self.user.id, self.today, time(10, 0)))
+        
+        # Users without history fall back to the prior
+        newcomer = User.objects.create_user(
+            username='newcomer',
+            email='new@example.com',
+            crn='ICAP-CA-2023-0001',
+            password='testpass123'
+        )
+        self.assertIsNotNone(predict_no_show(newcomer.id, self.today, time(9, 0)))
+    
+    def test_untrained_model_leaves_bookings_unscored(self):
+        """Test nothing changes until a model is published"""
+        booking = self.book(self.user)
+        
+        self.assertIsNone(booking.no_show_probability)
+        self.assertEqual(
+            booking.auto_cancel_at,
+            datetime.combine(self.today, time(10, 0)) + timedelta(minutes=self.config.auto_cancel_no_show_minutes)
+        )
+    
+    def test_likely_no_show_released_early(self):
+        """Test the library releases likely no-shows sooner"""
+        self.config.enable_early_release = True
+        self.config.save()
+        self.publish_table(self.user, 80)
+        
+        booking = self.book(self.user)
+        
+        self.assertEqual(str(booking.no_show_probability), '0.8')
+        self.assertEqual(
+            booking.auto_cancel_at,
+            datetime.combine(self.today, time(10, 0)) + timedelta(minutes=self.config.early_release_minutes)
+        )
+    
+    def test_overbooking_promoted_when_holder_does_not_show(self):
+        """Test a provisional booking takes over the window of a no-show"""
+        from .managers import BookingConflictError
+        from .tasks import process_expired_bookings
+        
+        self.config.enable_overbooking = True
+        self.config.save()
+        self.publish_table(self.user, 90)
+        holder = self.book(self.user)
+        
+        holder.refresh_from_db()
+        
+        overbooking = self.book(self.other_user)
+        self.assertEqual(overbooking.status, 'PENDING')
+        self.assertTrue(overbooking.is_overbooked)
+        self.assertEqual(overbooking.auto_cancel_at, holder.auto_cancel_at)
+        
+        # Only one provisional booking per window
+        with self.assertRaises(BookingConflictError):
+            self.book(self.user)
+        
+        SeatBooking.objects.filter(pk=holder.pk).update(auto_cancel_at=timezone.now() - timedelta(minutes=1))
+        SeatBooking.objects.filter(pk=overbooking.pk).update(auto_cancel_at=timezone.now() - timedelta(minutes=1))
+        process_expired_bookings()
+        
+        holder.refresh_from_db()
+        overbooking.refresh_from_db()
+        self.assertEqual(holder.status, 'NO_SHOW')
+        self.assertEqual(overbooking.status, 'CONFIRMED')
+        self.assertGreater(overbooking.auto_cancel_at, timezone.now())
+    
+    def test_overbooking_lapses_when_holder_shows_up(self):
+        """Test a provisional booking is released if the holder checks in"""
+        from .tasks import process_expired_bookings
+        
+        self.config.enable_overbooking = True
+        self.config.save()
+        self.publish_table(self.user, 90)
+        holder = self.book(self.user)
+        overbooking = self.book(self.other_user)
+        
+        SeatBooking.objects.filter(pk=holder.pk).update(status='CHECKED_IN')
+        SeatBooking.objects.filter(pk=overbooking.pk).update(auto_cancel_at=timezone.now() - timedelta(minutes=1))
+        process_expired_bookings()
+        
+        overbooking.refresh_from_db()
+        self.assertEqual(overbooking.status, 'CANCELLED')
+    
+    def test_overbooking_promoted_when_holder_cancels(self):
+        """Test a provisional booking takes over the window of a cancelled booking"""
+        from apps.notifications.models import Notification
+        
+        self.config.enable_overbooking = True
+        self.config.save()
+        self.publish_table(self.user, 90)
+        holder = self.book(self.user)
+        overbooking = self.book(self.other_user)
+        
+        holder = SeatBooking.objects.get(pk=holder.pk)
+        holder.status = 'CANCELLED'
+        holder.save()
+        
+        overbooking.refresh_from_db()
+        self.assertEqual(overbooking.status, 'CONFIRMED')
+        self.assertTrue(Notification.objects.filter(
+            user=self.other_user, title='Seat Booking Confirmed'
+        ).exists())
+    
+    def test_overbooking_promoted_ahead_of_time_is_not_a_no_show(self):
+        """Test a booking promoted before it starts is not released as a no-show"""
+        from apps.notifications.models import ScheduledReminder
+        from .tasks import process_expired_bookings
+        
+        self.config.enable_overbooking = True
+        self.config.save()
+        self.publish_table(self.user, 90)
+        tomorrow = self.today + timedelta(days=1)
+        holder, overbooking = [
+            SeatBooking.objects.create_booking(
+                seat=self.seat,
+                booking_date=tomorrow,
+                start_time=time(10, 0),
+                end_time=time(12, 0),
+                user=user,
+                created_by=user
+            )
+            for user in [self.user, self.other_user]
+        ]
+        
+        holder = SeatBooking.objects.get(pk=holder.pk)
+        holder.status = 'CANCELLED'
+        holder.save()
+        process_expired_bookings()
+        
+        overbooking.refresh_from_db()
+        self.assertEqual(overbooking.status, 'CONFIRMED')
+        self.assertEqual(overbooking.penalty_points, 0)
+        self.assertEqual(
+            overbooking.auto_cancel_at,
+            timezone.make_aware(datetime.combine(tomorrow, time(10, 0)))
+            + timedelta(minutes=self.config.auto_cancel_no_show_minutes)
+        )
+        
+        lead_minutes = set(ScheduledReminder.objects.filter(
+            reminder_type='SEAT_BOOKING',
+            object_id=overbooking.id
+        ).values_list('lead_minutes', flat=True))
+        self.assertTrue({2 * 60, 30} <= lead_minutes)
+    
+    def test_overbooking_promoted_at_deadline_without_holders(self):
+        """Test a provisional booking is confirmed at its deadline once the holders are gone"""
+        from .tasks import process_expired_bookings
+        
+        self.config.enable_overbooking = True
+        self.config.save()
+        self.publish_table(self.user, 90)
+        holder = self.book(self.user)
+        overbooking = self.book(self.other_user)
+        
+        SeatBooking.objects.filter(pk=holder.pk).update(status='COMPLETED')
+        SeatBooking.objects.filter(pk=overbooking.pk).update(auto_cancel_at=timezone.now() - timedelta(minutes=1))
+        process_expired_bookings()
+        
+        overbooking.refresh_from_db()
+        self.assertEqual(overbooking.status, 'CONFIRMED')
+    
+    def test_reliable_holder_cannot_be_overbooked(self):
+        """Test windows held by likely attendees are not overbooked"""
+        from .managers import BookingConflictError
+        
+        self.config.enable_overbooking = True
+        self.config.save()
+        self.publish_table(self.user, 20)
+        self.book(self.user)
+        
+        with self.assertRaises(BookingConflictError):
+            self.book(self.other_user)
+
+
+class SeatMaintenancePlanTest(APITestCase):
+    """Test maintenance planning with bulk booking relocation"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123',
+            is_approved=True
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+        
+        self.section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Silent Study',
+            section_type='SILENT',
+            created_by=self.user
+        )
+        self.other_section = LibrarySection.objects.create(
+            floor=self.floor,
+            name='Reading Area',
+            section_type='READING',
+            created_by=self.user
+        )
+        
+        self.seats = [self.create_seat(self.section, f'A{number}') for number in range(1, 4)]
+        self.other_seats = [self.create_seat(self.other_section, f'B{number}') for number in range(1, 4)]
+        
+        self.tomorrow = timezone.now().date() + timedelta(days=1)
+        self.bookings = [self.create_booking(seat) for seat in self.seats[:2]]
+        self.create_booking(self.other_seats[0])
+        
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@example.com',
+            crn='ICAP-CA-2023-9999',
+            password='testpass123',
+            role='ADMIN',
+            is_approved=True
+        )
+        self.admin.admin_profile.managed_library = self.library
+        self.admin.admin_profile.save()
+        
+        self.client.force_authenticate(user=self.admin)
+        self.url = reverse('seats:maintenance-plan')
+    
+    def create_seat(self, section, seat_number):
+        return Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=section,
+            seat_number=seat_number,
+            created_by=self.user
+        )
+    
+    def create_booking(self, seat, start=time(10, 0), end=time(12, 0)):
+        return SeatBooking.objects.create(
+            user=self.user,
+            seat=seat,
+            booking_date=self.tomorrow,
+            start_time=start,
+            end_time=end,
+            created_by=self.user
+        )
+    
+    def plan(self, action):
+        return self.client.post(self.url, {
+            'library_id': str(self.library.id),
+            'section_id': str(self.section.id),
+            'start': timezone.make_aware(datetime.combine(self.tomorrow, time(10, 0))).isoformat(),
+            'end': timezone.make_aware(datetime.combine(self.tomorrow, time(12, 0))).isoformat(),
+            'maintenance_type': 'CLEANING',
+            'action': action
+        }, format='json')
+    
+    def test_suggest_reports_affected_bookings_and_free_windows(self):
+        """Test suggestions list the bookings in the way and undisturbed windows"""
+        response = self.plan('suggest')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['seat_count'], 3)
+        self.assertEqual(
+            {booking['booking_id'] for booking in response.data['affected_bookings']},
+            {booking.id for booking in self.bookings}
+        )
+        best = response.data['suggestions'][0]
+        self.assertEqual(best['affected_bookings'], 0)
+        self.assertEqual(best['end'] - best['start'], timedelta(hours=2))
+        self.assertFalse(SeatMaintenanceLog.objects.exists())
+    
+    def test_schedule_relocates_bookings_to_equivalent_seats(self):
+        """Test scheduling moves every affected booking in one go"""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.plan('schedule')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['maintenance_log_ids']), 3)
+        new_seats = set()
+        for booking in self.bookings:
+            booking.refresh_from_db()
+            self.assertEqual(booking.seat.section_id, self.other_section.id)
+            new_seats.add(booking.seat_id)
+        self.assertEqual(new_seats, {self.other_seats[1].id, self.other_seats[2].id})
+        
+        # The index follows the move and the seats under maintenance cannot be booked
+        from .availability import SeatAvailabilityIndex
+        index = SeatAvailabilityIndex(self.library.id, self.tomorrow)
+        self.assertTrue(index.is_free(self.seats[0].id, time(10, 0), time(12, 0)))
+        self.assertFalse(index.is_free(self.other_seats[1].id, time(10, 0), time(12, 0)))
+        can_book, _ = self.seats[0].can_user_book(self.user, time(11, 0), time(13, 0), self.tomorrow)
+        self.assertFalse(can_book)
+    
+    def test_schedule_without_free_seats_changes_nothing(self):
+        """Test the plan is refused as a whole when a booking cannot be moved"""
+        for seat in self.other_seats[1:]:
+            self.create_booking(seat, time(11, 0), time(13, 0))
+        
+        response = self.plan('schedule')
+        
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(len(response.data['unresolved_bookings']), 2)
+        self.assertTrue(response.data['suggestions'])
+        self.assertFalse(SeatMaintenanceLog.objects.exists())
+        for booking, seat in zip(self.bookings, self.seats):
+            booking.refresh_from_db()
+            self.assertEqual(booking.seat_id, seat.id)
+    
+    def test_maintenance_start_updates_seats_in_bulk(self):
+        """Test due maintenance puts every seat into maintenance"""
+        from .tasks import update_seat_maintenance_status
+        
+        SeatMaintenanceLog.objects.bulk_create([
+            SeatMaintenanceLog(
+                seat=seat,
+                maintenance_type='CLEANING',
+                scheduled_date=timezone.now() - timedelta(minutes=1),
+                scheduled_end=timezone.now() + timedelta(hours=1),
+                description='Section cleaning',
+                created_by=self.user
+            )
+            for seat in self.seats
+        ])
+        
+        update_seat_maintenance_status()
+        
+        self.assertEqual(
+            Seat.objects.filter(section=self.section, status='MAINTENANCE').count(), 3
+        )
+        self.assertFalse(SeatMaintenanceLog.objects.filter(status='SCHEDULED').exists())
+
+
+class SeatLayoutImportTest(APITestCase):
+    """Test bulk seat layout import"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            crn='ICAP-CA-2023-1234',
+            password='testpass123',
+            is_approved=True
+        )
+        
+        self.library = Library.objects.create(
+            name='Test Library',
+            address='123 Test Street',
+            city='Test City',
+            opening_time='08:00',
+            closing_time='22:00',
+            created_by=self.user
+        )
+        
+        self.floor = LibraryFloor.objects.create(
+            library=self.library,
+            floor_number=1,
+            floor_name='Ground Floor',
+            created_by=self.user
+        )
+        
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@example.com',
+            crn='ICAP-CA-2023-9999',
+            password='testpass123',
+            role='ADMIN',
+            is_approved=True
+        )
+        self.admin.admin_profile.managed_library = self.library
+        self.admin.admin_profile.save()
+        
+        self.client.force_authenticate(user=self.admin)
+        self.url = reverse('seats:layout-import')
+    
+    def upload(self, name, content, **extra):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        return self.client.post(self.url, {
+            'library_id': str(self.library.id),
+            'file': SimpleUploadedFile(name, content.encode()),
+            **extra
+        }, format='multipart')
+    
+    def csv_layout(self, rows):
+        header = 'floor,floor_name,section,section_type,seat_number,seat_type,x_coordinate,y_coordinate,has_power_outlet,features\n'
+        return header + ''.join(f'{row}\n' for row in rows)
+    
+    def test_csv_import_creates_seats_and_counts(self):
+        """Test a CSV layout creates floors, sections and seats and recounts totals"""
+        rows = [f'1,,Silent Study,SILENT,A{number:03d},SILENT,{number},1,yes,lamp;shelf' for number in range(1, 31)]
+        rows += [f'2,First Floor,Computers,COMPUTER,C{number:03d},COMPUTER,{number},2,no,' for number in range(1, 11)]
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.upload('layout.csv', self.csv_layout(rows))
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['seats'], 40)
+        self.assertEqual(response.data['floors_created'], 1)
+        self.assertEqual(response.data['sections_created'], 2)
+        
+        seats = Seat.objects.filter(library=self.library)
+        self.assertEqual(seats.values('seat_code').distinct().count(), 40)
+        seat = seats.get(seat_number='A005')
+        self.assertEqual(seat.floor, self.floor)
+        self.assertEqual(seat.features, ['lamp', 'shelf'])
+        self.assertFalse(seats.get(seat_number='C001').has_power_outlet)
+        
+        self.library.refresh_from_db()
+        self.assertEqual(self.library.total_seats, 40)
+        self.assertEqual(LibraryFloor.objects.get(library=self.library, floor_number=2).total_seats, 10)
+        self.assertEqual(LibrarySection.objects.get(name='Silent Study').total_seats, 30)
+    
+    def test_jsonl_import(self):
+        """Test JSON Lines layouts are accepted"""
+        import json
+        content = '\n'.join(json.dumps({
+            'floor': 1, 'section': 'Reading', 'seat_number': f'R{number}', 'is_near_window': True
+        }) for number in range(1, 4))
+        
+        response = self.upload('layout.jsonl', content)
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Seat.objects.filter(library=self.library, is_near_window=True).count(), 3)
+    
+    def test_invalid_rows_roll_back_everything(self):
+        """Test an import with bad rows reports them and creates nothing"""
+        rows = [
+            '3,,Silent Study,SILENT,A001,SILENT,1,1,yes,',
+            '3,,Silent Study,SILENT,A001,SILENT,2,1,yes,',
+            '3,,Silent Study,SILENT,A002,BEANBAG,3,1,yes,',
+        ]
+        
+        response = self.upload('layout.csv', self.csv_layout(rows))
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([row['row'] for row in response.data['rows']], [3, 4])
+        self.assertFalse(Seat.objects.exists())
+        self.assertFalse(LibraryFloor.objects.filter(floor_number=3).exists())
+    
+    def test_dry_run_keeps_nothing(self):
+        """Test a dry run validates and counts without writing"""
+        rows = [f'1,,Silent Study,SILENT,A{number:03d},SILENT,{number},1,yes,' for number in range(1, 6)]
+        
+        response = self.upload('layout.csv', self.csv_layout(rows), dry_run=True)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['seats'], 5)
+        self.assertFalse(Seat.objects.exists())
+    
+    def test_colliding_codes_are_regenerated(self):
+        """Test seat codes clashing with existing seats or each other are redrawn"""
+        from unittest import mock
+        
+        Seat.objects.create(
+            library=self.library,
+            floor=self.floor,
+            section=LibrarySection.objects.create(
+                floor=self.floor, name='Existing', section_type='GENERAL', created_by=self.user
+            ),
+            seat_number='E001',
+            seat_code=f'{self.library.code}-SAAAA',
+            created_by=self.user
+        )
+        rows = [f'1,,Silent Study,SILENT,A{number:03d},SILENT,{number},1,yes,' for number in range(1, 4)]
+        
+        codes = iter(['SAAAA', 'SBBBB', 'SBBBB', 'SCCCC', 'SDDDD'])
+        with mock.patch('apps.seats.layout_import.generate_unique_code', side_effect=lambda *args: next(codes)):
+            response = self.upload('layout.csv', self.csv_layout(rows))
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(Seat.objects.filter(section__name='Silent Study').values_list('seat_code', flat=True)),
+            [f'{self.library.code}-{code}' for code in ['SBBBB', 'SCCCC', 'SDDDD']]
+        )
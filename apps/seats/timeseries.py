@@ -0,0 +1,184 @@
+"""
+Per-day occupancy time-series for seats, sections and libraries
+
+Check-in/check-out intervals of a day are swept once into fixed slots
+(``SLOT_MINUTES`` long) holding the seat-minutes in use, and stored as one
+array per seat, section and library. Heatmaps and peak hours are read from
+these rows, so dashboards never scan bookings.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+SLOT_MINUTES = 15
+SLOT_SECONDS = SLOT_MINUTES * 60
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+SLOTS_PER_HOUR = 60 // SLOT_MINUTES
+
+
+def day_window(day):
+    """Start and end of a local calendar day as aware datetimes"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def sweep_occupancy(intervals, window_start, slot_count=SLOTS_PER_DAY):
+    """
+    Sweep intervals into per-slot occupancy
+
+    The start and end points of all intervals are sorted and walked once,
+    carrying the number of seats in use between consecutive points and
+    spreading that span over the slots it covers.
+
+    Args:
+        intervals: (start, end) datetime pairs; parts outside the window are ignored
+        window_start: Start of the first slot
+
+    Returns:
+        tuple: Seat-minutes in use per slot, the peak number of seats in use
+            at once, and the offset in seconds at which the peak was first reached
+    """
+    window_seconds = slot_count * SLOT_SECONDS
+    points = []
+    for start, end in intervals:
+        start_offset = max((start - window_start).total_seconds(), 0)
+        end_offset = min((end - window_start).total_seconds(), window_seconds)
+        if end_offset > start_offset:
+            points.append((start_offset, 1))
+            points.append((end_offset, -1))
+    # Ends sort before starts at the same instant, so back-to-back stays do not overlap
+    points.sort()
+
+    seconds = [0.0] * slot_count
+    in_use = peak = 0
+    peak_offset = None
+    previous = 0.0
+    for offset, change in points:
+        if in_use:
+            position = previous
+            while position < offset:
+                slot = int(position // SLOT_SECONDS)
+                boundary = min((slot + 1) * SLOT_SECONDS, offset)
+                seconds[slot] += (boundary - position) * in_use
+                position = boundary
+        previous = offset
+        in_use += change
+        if in_use > peak:
+            peak, peak_offset = in_use, offset
+
+    return [round(value / 60) for value in seconds], peak, peak_offset
+
+
+def hourly(minutes):
+    """Fold per-slot seat-minutes into per-hour totals"""
+    return [
+        sum(minutes[hour * SLOTS_PER_HOUR:(hour + 1) * SLOTS_PER_HOUR])
+        for hour in range(len(minutes) // SLOTS_PER_HOUR)
+    ]
+
+
+def busiest_hour(hourly_minutes):
+    """Start of the hour with the most seat-minutes in use, or None if idle"""
+    if not any(hourly_minutes):
+        return None
+    return time(hourly_minutes.index(max(hourly_minutes)))
+
+
+def peak_hour(minutes):
+    """Start of the busiest hour of a per-slot series"""
+    return busiest_hour(hourly(minutes))
+
+
+def build_occupancy_series(day, library_ids=None):
+    """
+    Recompute the occupancy series of one day from check-in intervals
+
+    Stays still checked in are counted up to now. Existing series for the day
+    are replaced.
+
+    Args:
+        day: Calendar day to build
+        library_ids: Restrict to these libraries
+
+    Returns:
+        dict: The library-wide series, keyed by library id
+    """
+    from .models import Seat, SeatBooking, OccupancySeries
+
+    window_start, window_end = day_window(day)
+    now = timezone.now()
+
+    seats = Seat.objects.filter(is_deleted=False)
+    if library_ids is not None:
+        seats = seats.filter(library_id__in=library_ids)
+    seats = list(seats.values('id', 'library_id', 'section_id'))
+    seat_ids = [seat['id'] for seat in seats]
+
+    # Stays can run past midnight, so include bookings from the day before
+    bookings = SeatBooking.objects.filter(
+        seat_id__in=seat_ids,
+        booking_date__range=(day - timedelta(days=1), day),
+        actual_start_time__lt=window_end,
+        is_deleted=False
+    ).filter(
+        Q(actual_end_time__gt=window_start) |
+        Q(actual_end_time__isnull=True, status='CHECKED_IN')
+    ).values_list('seat_id', 'actual_start_time', 'actual_end_time')
+
+    intervals_by_seat = defaultdict(list)
+    for seat_id, start, end in bookings:
+        intervals_by_seat[seat_id].append((start, end or now))
+
+    intervals_by_section = defaultdict(list)
+    intervals_by_library = defaultdict(list)
+    seats_by_section = defaultdict(int)
+    seats_by_library = defaultdict(int)
+    section_library = {}
+    for seat in seats:
+        intervals = intervals_by_seat.get(seat['id'], [])
+        intervals_by_section[seat['section_id']].extend(intervals)
+        intervals_by_library[seat['library_id']].extend(intervals)
+        seats_by_section[seat['section_id']] += 1
+        seats_by_library[seat['library_id']] += 1
+        section_library[seat['section_id']] = seat['library_id']
+
+    def series(scope, library_id, intervals, seat_count, **target):
+        minutes, peak, peak_offset = sweep_occupancy(intervals, window_start)
+        return OccupancySeries(
+            scope=scope,
+            library_id=library_id,
+            date=day,
+            seat_count=seat_count,
+            occupied_minutes=minutes,
+            peak_occupancy=peak,
+            peak_at=(
+                timezone.localtime(window_start + timedelta(seconds=peak_offset)).time()
+                if peak_offset is not None else None
+            ),
+            **target
+        )
+
+    rows = [
+        series('SEAT', seat['library_id'], intervals_by_seat[seat['id']], 1, seat_id=seat['id'])
+        for seat in seats if seat['id'] in intervals_by_seat
+    ]
+    rows += [
+        series('SECTION', section_library[section_id], intervals, seats_by_section[section_id], section_id=section_id)
+        for section_id, intervals in intervals_by_section.items()
+    ]
+    library_rows = {
+        library_id: series('LIBRARY', library_id, intervals, seats_by_library[library_id])
+        for library_id, intervals in intervals_by_library.items()
+    }
+    rows += library_rows.values()
+
+    with transaction.atomic():
+        existing = OccupancySeries.objects.filter(date=day)
+        if library_ids is not None:
+            existing = existing.filter(library_id__in=library_ids)
+        existing.delete()
+        OccupancySeries.objects.bulk_create(rows, batch_size=500)
+
+    return library_rows
@@ -10,6 +10,7 @@ urlpatterns = [
     # Seat Views
     path('', views.SeatListView.as_view(), name='seat-list'),
     path('search/', views.search_seats, name='seat-search'),
+    path('recommend/', views.recommend_seats_for_user, name='seat-recommend'),
     path('<uuid:id>/', views.SeatDetailView.as_view(), name='seat-detail'),
     path('library/<uuid:library_id>/', views.SeatListView.as_view(), name='library-seats'),
     path('floor/<uuid:floor_id>/', views.SeatListView.as_view(), name='floor-seats'),
@@ -17,16 +18,20 @@ urlpatterns = [
     
     # Seat Availability
     path('availability/check/', views.check_seat_availability, name='check-availability'),
+    path('availability/matrix/', views.seat_availability_matrix, name='availability-matrix'),
     
     # Seat Bookings
     path('bookings/', views.SeatBookingListCreateView.as_view(), name='booking-list'),
     path('bookings/<uuid:id>/', views.SeatBookingDetailView.as_view(), name='booking-detail'),
     path('bookings/summary/', views.get_user_booking_summary, name='booking-summary'),
+    path('bookings/recurring/', views.create_recurring_booking, name='booking-recurring'),
+    path('bookings/group/', views.create_group_booking, name='booking-group'),
     
     # QR Code and Check-in/Check-out
     path('bookings/<uuid:booking_id>/qr-code/', views.generate_qr_code, name='generate-qr-code'),
     path('check-in/', views.check_in_seat, name='check-in'),
     path('check-out/', views.check_out_seat, name='check-out'),
+    path('kiosk/scans/', views.process_kiosk_scans, name='kiosk-scans'),
     
     # Waitlist
     path('waitlist/', views.SeatBookingWaitlistListCreateView.as_view(), name='waitlist'),
@@ -37,8 +42,11 @@ urlpatterns = [
     
     # Admin Views
     path('admin/manage/', views.SeatManagementView.as_view(), name='admin-seat-management'),
+    path('admin/layout/import/', views.import_seat_layout_file, name='layout-import'),
     path('admin/maintenance/', views.SeatMaintenanceLogListCreateView.as_view(), name='maintenance-logs'),
+    path('admin/maintenance/plan/', views.plan_seat_maintenance, name='maintenance-plan'),
     path('admin/<uuid:seat_id>/maintenance/', views.SeatMaintenanceLogListCreateView.as_view(), name='seat-maintenance'),
     path('admin/statistics/', views.SeatUsageStatisticsView.as_view(), name='usage-statistics'),
     path('admin/<uuid:seat_id>/statistics/', views.SeatUsageStatisticsView.as_view(), name='seat-statistics'),
+    path('admin/occupancy/heatmap/', views.occupancy_heatmap, name='occupancy-heatmap'),
 ]
\ No newline at end of file
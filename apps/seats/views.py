@@ -4,13 +4,18 @@ Views for seats app
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Q, Count, Avg
+from rest_framework.pagination import PageNumberPagination
+from django.db.models import Count, Avg
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from apps.core.permissions import IsAdminUser, CanManageBookings
+from apps.core.exceptions import ConflictError
+from apps.core.qr_tokens import QRTokenError, verify_qr_token, consume_qr_token
+from apps.library.models import Library
+from apps.dashboard.summary import get_user_summary
 from .models import (
     Seat, SeatBooking, SeatBookingWaitlist, SeatReview,
-    SeatMaintenanceLog, SeatUsageStatistics
+    SeatMaintenanceLog, SeatUsageStatistics, OccupancySeries
 )
 from .serializers import (
     SeatSerializer, SeatListSerializer, SeatBookingSerializer,
@@ -18,9 +23,29 @@ from .serializers import (
     SeatReviewSerializer, SeatMaintenanceLogSerializer,
     SeatUsageStatisticsSerializer, SeatAvailabilitySerializer,
     CheckInSerializer, CheckOutSerializer, SeatSearchSerializer,
-    QRCodeDataSerializer
+    QRCodeDataSerializer, SeatAvailabilityMatrixSerializer,
+    RecurringSeatBookingSerializer, GroupSeatBookingSerializer,
+    KioskScanSerializer, KioskScanBatchSerializer, OccupancyHeatmapSerializer,
+    SeatRecommendationSerializer, SeatMaintenancePlanSerializer, SeatLayoutImportSerializer
 )
-import json
+from .availability import (
+    SeatAvailabilityIndex, SLOT_MINUTES, SLOTS_PER_DAY,
+    time_to_slot, slot_to_time, occupied_runs, bitstring, summarise_free_time
+)
+from .grouping import find_seat_cluster
+from .kiosk import apply_kiosk_scans
+from .layout_import import LayoutImportError, iter_layout_rows, import_seat_layout
+from .maintenance import (
+    MaintenanceConflictError, affected_bookings, planned_maintenance, suggest_windows,
+    schedule_maintenance
+)
+from .recommend import recommend_seats
+from .managers import BookingConflictError
+from .timeseries import hourly, peak_hour, busiest_hour
+from collections import defaultdict
+import uuid
+
+GROUP_ALLOCATION_ATTEMPTS = 3
 
 
 class SeatListView(generics.ListAPIView):
@@ -124,23 +149,6 @@ def search_seats(request):
     if data.get('min_rating'):
         queryset = queryset.filter(average_rating__gte=data['min_rating'])
     
-    # Filter by availability if date and time provided
-    if data.get('date') and data.get('start_time') and data.get('end_time'):
-        booking_date = data['date']
-        start_time = data['start_time']
-        end_time = data['end_time']
-        
-        # Exclude seats with conflicting bookings
-        conflicting_bookings = SeatBooking.objects.filter(
-            booking_date=booking_date,
-            status__in=['CONFIRMED', 'CHECKED_IN'],
-            is_deleted=False
-        ).filter(
-            Q(start_time__lt=end_time) & Q(end_time__gt=start_time)
-        ).values_list('seat_id', flat=True)
-        
-        queryset = queryset.exclude(id__in=conflicting_bookings)
-    
     # Apply user access restrictions
     user = request.user
     if not user.is_super_admin:
@@ -156,22 +164,138 @@ def search_seats(request):
             ).values_list('library_id', flat=True)
             queryset = queryset.filter(library_id__in=accessible_libraries)
     
+    # Filter by availability if date and time provided
+    if data.get('date') and data.get('start_time') and data.get('end_time'):
+        seats_by_library = defaultdict(list)
+        for seat_id, library_id in queryset.values_list('id', 'library_id'):
+            seats_by_library[library_id].append(seat_id)
+        
+        free_seat_ids = []
+        for library_id, seat_ids in seats_by_library.items():
+            index = SeatAvailabilityIndex(library_id, data['date'])
+            free_seat_ids.extend(
+                index.free_seat_ids(seat_ids, data['start_time'], data['end_time'])
+            )
+        
+        queryset = queryset.filter(id__in=free_seat_ids)
+    
     # Apply sorting
     sort_by = data.get('sort_by', 'seat_number')
+    paginator = PageNumberPagination()
+    if sort_by == 'availability':
+        ranking = _rank_seats_by_availability(
+            queryset,
+            data.get('date') or timezone.now().date(),
+            data.get('start_time')
+        )
+        page = paginator.paginate_queryset(list(ranking), request)
+        seats = queryset.select_related('library', 'floor', 'section').in_bulk(page)
+        results = []
+        for seat_id in page:
+            result = SeatListSerializer(seats[seat_id], context={'request': request}).data
+            result['availability'] = ranking[seat_id]
+            results.append(result)
+        return paginator.get_paginated_response(results)
+    
     if sort_by == 'rating':
-        queryset = queryset.order_by('-average_rating')
-    elif sort_by == 'availability':
-        # This would require more complex logic
-        queryset = queryset.order_by('status', 'seat_number')
+        queryset = queryset.order_by('-average_rating', 'seat_number')
     else:
         queryset = queryset.order_by('seat_number')
     
     # Serialize results
-    serializer = SeatListSerializer(queryset, many=True, context={'request': request})
+    page = paginator.paginate_queryset(queryset.select_related('library', 'floor', 'section'), request)
+    serializer = SeatListSerializer(page, many=True, context={'request': request})
+    
+    return paginator.get_paginated_response(serializer.data)
+
+
+def _rank_seats_by_availability(queryset, availability_date, requested_start=None):
+    """
+    Rank seats by free minutes, longest free block and wait from the requested start
+
+    Returns an ordered dict of seat id to its availability summary, computed
+    from the slot-bitmap index with one seat query and one cache read per library.
+    """
+    seats_by_library = defaultdict(list)
+    opening_hours = {}
+    for seat_id, seat_number, library_id, opening_time, closing_time, is_24_hours in queryset.values_list(
+        'id', 'seat_number', 'library_id',
+        'library__opening_time', 'library__closing_time', 'library__is_24_hours'
+    ):
+        seats_by_library[library_id].append((seat_id, seat_number))
+        if is_24_hours:
+            opening_hours[library_id] = (0, SLOTS_PER_DAY)
+        else:
+            opening_hours[library_id] = (
+                time_to_slot(opening_time, round_up=True),
+                time_to_slot(closing_time)
+            )
+    
+    requested_slot = time_to_slot(requested_start) if requested_start else None
+    ranked = []
+    for library_id, seats in seats_by_library.items():
+        bitmaps = SeatAvailabilityIndex(library_id, availability_date).get_bitmaps(
+            [seat_id for seat_id, _ in seats]
+        )
+        first_slot, last_slot = opening_hours[library_id]
+        for seat_id, seat_number in seats:
+            free_minutes, longest_minutes, wait_minutes = summarise_free_time(
+                bitmaps[str(seat_id)], first_slot, last_slot, requested_slot
+            )
+            ranked.append((
+                -free_minutes,
+                -longest_minutes,
+                wait_minutes if wait_minutes is not None else SLOTS_PER_DAY * SLOT_MINUTES,
+                seat_number,
+                seat_id,
+                {
+                    'free_minutes': free_minutes,
+                    'longest_free_block_minutes': longest_minutes,
+                    'minutes_from_requested_start': wait_minutes,
+                }
+            ))
+    
+    ranked.sort(key=lambda row: row[:4])
+    return {row[4]: row[5] for row in ranked}
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def recommend_seats_for_user(request):
+    """Top free seats for a time window, ranked for the requesting user"""
+    serializer = SeatRecommendationSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    data = serializer.validated_data
+    library = get_object_or_404(Library, id=data['library_id'], is_deleted=False)
+    
+    # Check if user can access this library
+    if not library.can_user_access(request.user):
+        return Response(
+            {'error': "You don't have access to this library"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    ranking = recommend_seats(
+        request.user, library.id, data['date'],
+        data['start_time'], data['end_time'], data['limit']
+    )
+    seats = Seat.objects.select_related('library', 'floor', 'section').in_bulk(
+        [seat_id for seat_id, _ in ranking]
+    )
+    
+    results = []
+    for seat_id, score in ranking:
+        result = SeatListSerializer(seats[uuid.UUID(seat_id)], context={'request': request}).data
+        result['score'] = score
+        results.append(result)
     
     return Response({
-        'count': queryset.count(),
-        'results': serializer.data
+        'library_id': library.id,
+        'date': data['date'],
+        'start_time': data['start_time'],
+        'end_time': data['end_time'],
+        'results': results
     })
 
 
@@ -219,6 +343,58 @@ def check_seat_availability(request):
         })
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def seat_availability_matrix(request):
+    """Availability of every seat in a library, floor or section for one day"""
+    serializer = SeatAvailabilityMatrixSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    data = serializer.validated_data
+    library = get_object_or_404(Library, id=data['library_id'], is_deleted=False)
+    
+    # Check if user can access this library
+    if not library.can_user_access(request.user):
+        return Response(
+            {'error': "You don't have access to this library"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    seats = Seat.objects.filter(library=library, is_deleted=False)
+    if data.get('floor_id'):
+        seats = seats.filter(floor_id=data['floor_id'])
+    if data.get('section_id'):
+        seats = seats.filter(section_id=data['section_id'])
+    
+    seats = list(seats.values(
+        'id', 'seat_number', 'seat_type', 'status', 'is_bookable',
+        'floor_id', 'section_id', 'x_coordinate', 'y_coordinate', 'rotation'
+    ))
+    
+    index = SeatAvailabilityIndex(library.id, data['date'])
+    bitmaps = index.get_bitmaps([seat['id'] for seat in seats])
+    
+    if library.is_24_hours:
+        first_slot, last_slot = 0, SLOTS_PER_DAY
+    else:
+        first_slot = time_to_slot(library.opening_time, round_up=True)
+        last_slot = time_to_slot(library.closing_time)
+    encode = bitstring if data['encoding'] == 'bits' else occupied_runs
+    
+    for seat in seats:
+        seat['occupancy'] = encode(bitmaps[str(seat['id'])], first_slot, last_slot)
+    
+    return Response({
+        'library_id': library.id,
+        'date': data['date'],
+        'slot_minutes': SLOT_MINUTES,
+        'start_time': slot_to_time(first_slot),
+        'slot_count': last_slot - first_slot,
+        'encoding': data['encoding'],
+        'seats': seats
+    })
+
+
 class SeatBookingListCreateView(generics.ListCreateAPIView):
     """List and create seat bookings"""
     permission_classes = [permissions.IsAuthenticated, CanManageBookings]
@@ -239,6 +415,177 @@ class SeatBookingListCreateView(generics.ListCreateAPIView):
         return queryset.select_related('user', 'seat', 'seat__library').order_by('-booking_date', '-start_time')
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, CanManageBookings])
+def create_recurring_booking(request):
+    """Book a seat for every occurrence of a recurrence pattern"""
+    serializer = RecurringSeatBookingSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    data = serializer.validated_data
+    seat = get_object_or_404(
+        Seat.objects.select_related('library__configuration'),
+        id=data['seat_id'],
+        is_deleted=False
+    )
+    
+    # Check if user can access this seat's library
+    if not seat.library.can_user_access(request.user):
+        return Response(
+            {'error': "You don't have access to this library"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    if not seat.library.configuration.enable_recurring_bookings:
+        return Response(
+            {'error': 'Recurring bookings are not enabled for this library'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if not seat.is_available:
+        return Response(
+            {'error': 'Seat is not available'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    duration_hours = (
+        timezone.datetime.combine(data['start_date'], data['end_time']) -
+        timezone.datetime.combine(data['start_date'], data['start_time'])
+    ).total_seconds() / 3600
+    if duration_hours > seat.max_booking_duration_hours:
+        return Response(
+            {'error': f"Booking duration exceeds maximum ({seat.max_booking_duration_hours} hours)"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if seat.is_premium and not getattr(request.user, 'current_subscription', None):
+        return Response(
+            {'error': 'Premium seat requires active subscription'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    parent, bookings, conflicts = SeatBooking.objects.create_recurring_booking(
+        user=request.user,
+        seat=seat,
+        start_time=data['start_time'],
+        end_time=data['end_time'],
+        recurrence_pattern=data['recurrence_pattern'],
+        created_by=request.user,
+        purpose=data.get('purpose', ''),
+        special_requirements=data.get('special_requirements', ''),
+        notes=data.get('notes', '')
+    )
+    
+    if parent is None:
+        return Response(
+            {'error': 'No occurrence could be booked', 'conflicts': conflicts},
+            status=status.HTTP_409_CONFLICT
+        )
+    
+    return Response({
+        'parent_booking': SeatBookingSerializer(parent).data,
+        'created_count': len(bookings),
+        'bookings': [
+            {
+                'id': booking.id,
+                'booking_code': booking.booking_code,
+                'booking_date': booking.booking_date,
+            }
+            for booking in bookings
+        ],
+        'conflicts': conflicts
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, CanManageBookings])
+def create_group_booking(request):
+    """Find and book the tightest cluster of adjacent free seats for a group"""
+    serializer = GroupSeatBookingSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    data = serializer.validated_data
+    library = get_object_or_404(
+        Library.objects.select_related('configuration'),
+        id=data['library_id'],
+        is_deleted=False
+    )
+    
+    # Check if user can access this library
+    if not library.can_user_access(request.user):
+        return Response(
+            {'error': "You don't have access to this library"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    if not library.configuration.enable_group_bookings:
+        return Response(
+            {'error': 'Group bookings are not enabled for this library'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    seats = Seat.objects.filter(
+        library=library,
+        status='AVAILABLE',
+        is_bookable=True,
+        is_premium=False,
+        is_deleted=False
+    )
+    if data.get('floor_id'):
+        seats = seats.filter(floor_id=data['floor_id'])
+    if data.get('section_id'):
+        seats = seats.filter(section_id=data['section_id'])
+    if data.get('seat_type'):
+        seats = seats.filter(seat_type=data['seat_type'])
+    
+    booking_start = timezone.make_aware(timezone.datetime.combine(data['booking_date'], data['start_time']))
+    booking_end = timezone.make_aware(timezone.datetime.combine(data['booking_date'], data['end_time']))
+    seats = seats.exclude(id__in=planned_maintenance(booking_start, booking_end).values('seat_id'))
+    
+    duration_hours = (
+        timezone.datetime.combine(data['booking_date'], data['end_time']) -
+        timezone.datetime.combine(data['booking_date'], data['start_time'])
+    ).total_seconds() / 3600
+    seats = list(seats.filter(max_booking_duration_hours__gte=duration_hours).values(
+        'id', 'section_id', 'x_coordinate', 'y_coordinate'
+    ))
+    
+    # Seats lost to a concurrent booking are excluded and the search retried
+    lost_seats = set()
+    for _ in range(GROUP_ALLOCATION_ATTEMPTS):
+        cluster = find_seat_cluster(
+            seats, library.id, data['booking_date'], data['start_time'],
+            data['end_time'], data['group_size'], exclude=lost_seats
+        )
+        if not cluster:
+            return Response(
+                {'error': f"No section has {data['group_size']} adjacent free seats for this time"},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        try:
+            bookings = SeatBooking.objects.create_group_booking(
+                group_leader=request.user,
+                seat_ids=cluster,
+                booking_date=data['booking_date'],
+                start_time=data['start_time'],
+                end_time=data['end_time'],
+                created_by=request.user,
+                purpose=data.get('purpose', ''),
+                notes=data.get('notes', '')
+            )
+        except BookingConflictError as e:
+            lost_seats.update(getattr(e, 'seat_ids', cluster))
+            continue
+        
+        return Response({
+            'group_booking_id': bookings[0].group_booking_id,
+            'bookings': SeatBookingSerializer(bookings, many=True).data
+        }, status=status.HTTP_201_CREATED)
+    
+    raise ConflictError('Seats were taken by other bookings, please try again')
+
+
 class SeatBookingDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Seat booking detail view"""
     serializer_class = SeatBookingSerializer
@@ -281,7 +628,7 @@ class SeatBookingDetailView(generics.RetrieveUpdateDestroyAPIView):
 def generate_qr_code(request, booking_id):
     """Generate QR code for booking"""
     try:
-        booking = SeatBooking.objects.get(
+        booking = SeatBooking.objects.select_related('seat__library__configuration').get(
             id=booking_id,
             user=request.user,
             is_deleted=False
@@ -330,34 +677,27 @@ def check_in_seat(request):
                 status=status.HTTP_404_NOT_FOUND
             )
     elif data.get('qr_code_data'):
+        # Signed tokens are checked in without loading the booking
         try:
-            qr_data = json.loads(data['qr_code_data'])
-            booking = SeatBooking.objects.get(
-                id=qr_data['booking_id'],
-                booking_code=qr_data['booking_code'],
-                user=request.user,
-                is_deleted=False
+            claims = verify_qr_token(data['qr_code_data'], 'seat_booking', request.user)
+            success, message = SeatBooking.objects.check_in_with_token(
+                claims, request.user, data.get('check_in_method', 'QR')
             )
-            
-            # Verify access token if provided
-            if data.get('access_token') and qr_data.get('access_token') != data['access_token']:
-                return Response(
-                    {'error': 'Invalid access token'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-                
-            # Check QR code expiry
-            if booking.qr_code_expires_at and timezone.now() > booking.qr_code_expires_at:
-                return Response(
-                    {'error': 'QR code has expired'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-                
-        except (json.JSONDecodeError, KeyError, SeatBooking.DoesNotExist):
+        except QRTokenError as e:
             return Response(
-                {'error': 'Invalid QR code'},
+                {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        
+        if success:
+            return Response({
+                'message': message,
+                'booking_id': str(uuid.UUID(claims['i']))
+            })
+        return Response(
+            {'error': message},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     # Perform check-in
     success, message = booking.check_in(data.get('check_in_method', 'QR'))
@@ -382,6 +722,7 @@ def check_out_seat(request):
     serializer.is_valid(raise_exception=True)
     
     data = serializer.validated_data
+    claims = None
     
     # Get booking
     if data.get('booking_id'):
@@ -398,23 +739,35 @@ def check_out_seat(request):
             )
     elif data.get('qr_code_data'):
         try:
-            qr_data = json.loads(data['qr_code_data'])
+            # Codes serve for check-out until the booking ends
+            claims = verify_qr_token(data['qr_code_data'], 'seat_booking', request.user, expiry_claim='be')
             booking = SeatBooking.objects.get(
-                id=qr_data['booking_id'],
-                booking_code=qr_data['booking_code'],
+                id=claims['i'],
                 user=request.user,
                 is_deleted=False
             )
-        except (json.JSONDecodeError, KeyError, SeatBooking.DoesNotExist):
+        except QRTokenError as e:
             return Response(
-                {'error': 'Invalid QR code'},
+                {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        except SeatBooking.DoesNotExist:
+            return Response(
+                {'error': 'Booking not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
     
     # Perform check-out
     success, message = booking.check_out(data.get('check_out_method', 'QR'))
     
     if success:
+        if claims is not None:
+            # Record the code only once it has checked the booking out; the
+            # status change already rejects a second scan racing this one
+            try:
+                consume_qr_token(claims, 'check_out', expiry_claim='be')
+            except QRTokenError:
+                pass
         return Response({
             'message': message,
             'booking': SeatBookingSerializer(booking).data
@@ -426,6 +779,51 @@ def check_out_seat(request):
         )
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsAdminUser])
+def process_kiosk_scans(request):
+    """Apply a batch of check-in and check-out scans queued by a kiosk"""
+    serializer = KioskScanBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    # Admins can only process scans for the library they manage
+    library_id = None
+    if not request.user.is_super_admin:
+        admin_profile = getattr(request.user, 'admin_profile', None)
+        if not (admin_profile and admin_profile.managed_library_id):
+            return Response(
+                {'error': 'Permission denied'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        library_id = admin_profile.managed_library_id
+    
+    # Malformed scans are reported without holding up the rest of the batch
+    results = []
+    valid_scans, valid_positions = [], []
+    for position, scan_data in enumerate(serializer.validated_data['scans']):
+        scan_serializer = KioskScanSerializer(data=scan_data)
+        if scan_serializer.is_valid():
+            valid_scans.append(scan_serializer.validated_data)
+            valid_positions.append(position)
+            results.append(None)
+        else:
+            results.append({
+                'scan_id': scan_data.get('scan_id'),
+                'action': scan_data.get('action'),
+                'success': False,
+                'error': scan_serializer.errors
+            })
+    
+    for position, result in zip(valid_positions, apply_kiosk_scans(valid_scans, library_id)):
+        results[position] = result
+    
+    return Response({
+        'processed': len(results),
+        'succeeded': sum(1 for result in results if result['success']),
+        'results': results
+    })
+
+
 class SeatBookingWaitlistListCreateView(generics.ListCreateAPIView):
     """List and create seat booking waitlist entries"""
     serializer_class = SeatBookingWaitlistSerializer
@@ -471,47 +869,32 @@ def get_user_booking_summary(request):
     """Get user's booking summary"""
     user = request.user
     today = timezone.now().date()
+    bookings = SeatBooking.objects.filter(
+        user=user,
+        is_deleted=False
+    ).select_related('user', 'created_by', 'updated_by', 'seat', 'seat__library', 'seat__library__configuration')
     
     # Current bookings
-    current_bookings = SeatBooking.objects.filter(
-        user=user,
+    current_bookings = bookings.filter(
         booking_date=today,
-        status__in=['CONFIRMED', 'CHECKED_IN'],
-        is_deleted=False
-    ).select_related('seat', 'seat__library')
+        status__in=['CONFIRMED', 'CHECKED_IN']
+    )
     
     # Upcoming bookings
-    upcoming_bookings = SeatBooking.objects.filter(
-        user=user,
+    upcoming_bookings = bookings.filter(
         booking_date__gt=today,
-        status='CONFIRMED',
-        is_deleted=False
-    ).select_related('seat', 'seat__library')[:5]
+        status='CONFIRMED'
+    )[:5]
     
     # Recent bookings
-    recent_bookings = SeatBooking.objects.filter(
-        user=user,
-        booking_date__lt=today,
-        is_deleted=False
-    ).select_related('seat', 'seat__library')[:5]
+    recent_bookings = bookings.filter(
+        booking_date__lt=today
+    )[:5]
     
-    # Statistics
-    total_bookings = SeatBooking.objects.filter(
-        user=user,
-        is_deleted=False
-    ).count()
-    
-    completed_bookings = SeatBooking.objects.filter(
-        user=user,
-        status='COMPLETED',
-        is_deleted=False
-    ).count()
-    
-    no_shows = SeatBooking.objects.filter(
-        user=user,
-        status='NO_SHOW',
-        is_deleted=False
-    ).count()
+    # Statistics, counted in one query and cached until the user's bookings change
+    counts = get_user_summary(user.id, ['seat_bookings'])['seat_bookings']
+    total_bookings = counts['total']
+    completed_bookings = counts['completed']
     
     return Response({
         'current_bookings': SeatBookingSerializer(current_bookings, many=True).data,
@@ -520,7 +903,7 @@ def get_user_booking_summary(request):
         'statistics': {
             'total_bookings': total_bookings,
             'completed_bookings': completed_bookings,
-            'no_shows': no_shows,
+            'no_shows': counts['no_shows'],
             'completion_rate': (completed_bookings / total_bookings * 100) if total_bookings > 0 else 0
         }
     })
@@ -548,6 +931,44 @@ class SeatManagementView(generics.ListCreateAPIView):
         serializer.save(created_by=self.request.user)
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsAdminUser])
+def import_seat_layout_file(request):
+    """Create a library's seats in bulk from a CSV or JSON Lines layout file"""
+    serializer = SeatLayoutImportSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    data = serializer.validated_data
+    library = get_object_or_404(Library, id=data['library_id'], is_deleted=False)
+    
+    # Admins can only import into the library they manage
+    if not request.user.is_super_admin:
+        admin_profile = getattr(request.user, 'admin_profile', None)
+        if not (admin_profile and admin_profile.managed_library_id == library.id):
+            return Response(
+                {'error': 'Permission denied'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+    
+    try:
+        summary = import_seat_layout(
+            library,
+            iter_layout_rows(data['file'].file, data['format']),
+            request.user,
+            dry_run=data['dry_run']
+        )
+    except LayoutImportError as e:
+        return Response(
+            {'error': str(e), 'rows': e.errors},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return Response(
+        {'dry_run': data['dry_run'], **summary},
+        status=status.HTTP_200_OK if data['dry_run'] else status.HTTP_201_CREATED
+    )
+
+
 class SeatMaintenanceLogListCreateView(generics.ListCreateAPIView):
     """List and create seat maintenance logs"""
     serializer_class = SeatMaintenanceLogSerializer
@@ -574,6 +995,83 @@ class SeatMaintenanceLogListCreateView(generics.ListCreateAPIView):
         serializer.save(created_by=self.request.user)
 
 
+def _maintenance_booking_summary(booking):
+    return {
+        'booking_id': booking['id'],
+        'seat_id': booking['seat_id'],
+        'seat_number': booking['seat__seat_number'],
+        'start_time': booking['start_time'],
+        'end_time': booking['end_time'],
+        'status': booking['status'],
+    }
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsAdminUser])
+def plan_seat_maintenance(request):
+    """Check a maintenance window against bookings, suggest windows or schedule it"""
+    serializer = SeatMaintenancePlanSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    data = serializer.validated_data
+    library = get_object_or_404(Library, id=data['library_id'], is_deleted=False)
+    
+    # Admins can only plan maintenance in the library they manage
+    if not request.user.is_super_admin:
+        admin_profile = getattr(request.user, 'admin_profile', None)
+        if not (admin_profile and admin_profile.managed_library_id == library.id):
+            return Response(
+                {'error': 'Permission denied'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+    
+    seats = Seat.objects.filter(library=library, is_deleted=False)
+    if data.get('seat_ids'):
+        seats = seats.filter(id__in=data['seat_ids'])
+    if data.get('section_id'):
+        seats = seats.filter(section_id=data['section_id'])
+    seat_ids = list(seats.values_list('id', flat=True))
+    if not seat_ids:
+        return Response(
+            {'error': 'No seats match this selection'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if data['action'] == 'suggest':
+        affected = affected_bookings(seat_ids, data['start'], data['end'])
+        return Response({
+            'seat_count': len(seat_ids),
+            'affected_bookings': [_maintenance_booking_summary(booking) for booking in affected],
+            'suggestions': [] if not affected else suggest_windows(
+                library, seat_ids, data['start'], data['end']
+            )
+        })
+    
+    try:
+        logs, relocations = schedule_maintenance(
+            library, seat_ids, data['start'], data['end'],
+            data['maintenance_type'], data['description'], request.user
+        )
+    except MaintenanceConflictError as e:
+        return Response({
+            'error': str(e),
+            'unresolved_bookings': [_maintenance_booking_summary(booking) for booking in e.bookings],
+            'suggestions': suggest_windows(library, seat_ids, data['start'], data['end'])
+        }, status=status.HTTP_409_CONFLICT)
+    
+    return Response({
+        'maintenance_log_ids': [log.id for log in logs],
+        'relocated_bookings': [
+            {
+                **_maintenance_booking_summary(booking),
+                'new_seat_id': seat['id'],
+                'new_seat_number': seat['seat_number'],
+            }
+            for booking, seat in relocations
+        ]
+    }, status=status.HTTP_201_CREATED)
+
+
 class SeatUsageStatisticsView(generics.ListAPIView):
     """View seat usage statistics"""
     serializer_class = SeatUsageStatisticsSerializer
@@ -594,4 +1092,61 @@ class SeatUsageStatisticsView(generics.ListAPIView):
             else:
                 queryset = queryset.none()
         
-        return queryset.select_related('seat').order_by('-date')
\ No newline at end of file
+        return queryset.select_related('seat').order_by('-date')
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated, IsAdminUser])
+def occupancy_heatmap(request):
+    """Hourly occupancy of a library or section over a date range"""
+    serializer = OccupancyHeatmapSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    data = serializer.validated_data
+    library = get_object_or_404(Library, id=data['library_id'], is_deleted=False)
+    
+    # Admins can only view the library they manage
+    if not request.user.is_super_admin:
+        admin_profile = getattr(request.user, 'admin_profile', None)
+        if not (admin_profile and admin_profile.managed_library_id == library.id):
+            return Response(
+                {'error': 'Permission denied'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+    
+    series = OccupancySeries.objects.filter(
+        library=library,
+        date__range=(data['start_date'], data['end_date'])
+    )
+    if data.get('section_id'):
+        series = series.filter(scope='SECTION', section_id=data['section_id'])
+    else:
+        series = series.filter(scope='LIBRARY')
+    
+    days = []
+    total_minutes = [0] * 24
+    total_capacity = 0
+    for row in series.order_by('date').values('date', 'seat_count', 'occupied_minutes', 'peak_occupancy', 'peak_at'):
+        minutes = hourly(row['occupied_minutes'])
+        capacity = row['seat_count'] * 60
+        days.append({
+            'date': row['date'],
+            'hourly_occupancy': [round(value / capacity * 100, 2) if capacity else 0 for value in minutes],
+            'peak_hour': peak_hour(row['occupied_minutes']),
+            'peak_occupancy': row['peak_occupancy'],
+            'peak_at': row['peak_at'],
+        })
+        total_minutes = [total + value for total, value in zip(total_minutes, minutes)]
+        total_capacity += capacity
+    
+    return Response({
+        'library_id': library.id,
+        'section_id': data.get('section_id'),
+        'start_date': data['start_date'],
+        'end_date': data['end_date'],
+        'days': days,
+        'hourly_occupancy': [
+            round(value / total_capacity * 100, 2) if total_capacity else 0 for value in total_minutes
+        ],
+        'peak_hour': busiest_hour(total_minutes),
+    })
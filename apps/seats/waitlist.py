@@ -0,0 +1,229 @@
+"""
+Event-driven waitlist matching for seats
+
+Waiting requests for a seat and day are kept in the cache as an interval
+index sorted by preferred start slot. When capacity is freed (cancellation,
+no-show, early check-out or the end of maintenance) the free run around the
+freed window is read from the availability index and matched against the
+waiting requests; the best candidate is notified or booked straight away.
+Seats with nobody waiting cost a single cache read.
+"""
+from bisect import bisect_left, bisect_right
+from django.core.cache import cache
+from django.utils import timezone
+from apps.core.utils import SmartLibCache
+from .availability import (
+    SeatAvailabilityIndex, SLOT_MINUTES, time_to_slot, slot_to_time, free_runs
+)
+
+WAITLIST_INDEX_TIMEOUT = 60 * 60 * 24
+
+
+class WaitlistIndex:
+    """
+    Interval index of the active waitlist entries for one seat on one day
+    """
+    def __init__(self, seat_id, booking_date):
+        self.seat_id = seat_id
+        self.booking_date = booking_date
+
+    def get_cache_key(self):
+        """Generate cache key for the seat's waitlist"""
+        return SmartLibCache.get_cache_key('waitlist', self.seat_id, self.booking_date.isoformat())
+
+    def get_entries(self):
+        """
+        Get waiting requests as (start_slot, end_slot, -priority, created_at,
+        entry_id, flexible, duration_slots) tuples sorted by start slot
+        """
+        entries = cache.get(self.get_cache_key())
+        if entries is None:
+            entries = self.rebuild()
+        return entries
+
+    def rebuild(self):
+        """Rebuild the index from one waitlist query"""
+        from .models import SeatBookingWaitlist
+
+        rows = SeatBookingWaitlist.objects.filter(
+            seat_id=self.seat_id,
+            booking_date=self.booking_date,
+            is_active=True,
+            notified_at__isnull=True,
+            expires_at__gt=timezone.now(),
+            is_deleted=False
+        ).values_list(
+            'id', 'preferred_start_time', 'preferred_end_time', 'priority_score',
+            'created_at', 'flexible_timing', 'acceptable_duration_hours'
+        )
+        entries = sorted(
+            (
+                time_to_slot(start_time),
+                time_to_slot(end_time, round_up=True),
+                -priority_score,
+                created_at.timestamp(),
+                str(entry_id),
+                flexible_timing,
+                acceptable_duration_hours * 60 // SLOT_MINUTES,
+            )
+            for entry_id, start_time, end_time, priority_score, created_at,
+            flexible_timing, acceptable_duration_hours in rows
+        )
+        cache.set(self.get_cache_key(), entries, WAITLIST_INDEX_TIMEOUT)
+        return entries
+
+    def invalidate(self):
+        """Drop the cached index so it is rebuilt on next use"""
+        cache.delete(self.get_cache_key())
+
+    def candidates(self, first_slot, last_slot):
+        """
+        Waiting requests that fit in the free run [first_slot, last_slot), best
+        first, as (entry_id, start_slot, end_slot) offers
+        """
+        entries = self.get_entries()
+        offers = []
+
+        # Fixed requests must start inside the run and end before it closes
+        starts = [entry[0] for entry in entries]
+        for entry in entries[bisect_left(starts, first_slot):bisect_right(starts, last_slot)]:
+            start_slot, end_slot, priority, created_at, entry_id, flexible, _ = entry
+            if not flexible and end_slot <= last_slot:
+                offers.append(((priority, created_at), entry_id, start_slot, end_slot))
+
+        # Flexible requests accept any block of their duration, placed as close
+        # to the preferred start as the run allows
+        for start_slot, end_slot, priority, created_at, entry_id, flexible, duration in entries:
+            if flexible and 0 < duration <= last_slot - first_slot:
+                offer_start = min(max(start_slot, first_slot), last_slot - duration)
+                offers.append(((priority, created_at), entry_id, offer_start, offer_start + duration))
+
+        offers.sort()
+        return [(entry_id, start_slot, end_slot) for _, entry_id, start_slot, end_slot in offers]
+
+
+def match_freed_window(library_id, seat_id, booking_date, start_time, end_time):
+    """
+    Offer a freed window on a seat to the best waiting candidate
+
+    Returns:
+        SeatBookingWaitlist: The entry that was served, or None
+    """
+    from .models import Seat, SeatBooking, SeatBookingWaitlist
+    from .managers import BookingConflictError
+
+    waitlist = WaitlistIndex(seat_id, booking_date)
+    if not waitlist.get_entries():
+        return None
+
+    # Widen the freed window to the whole free run around it, ignoring time
+    # that has already passed
+    now = timezone.localtime()
+    not_before = time_to_slot(now.time(), round_up=True) if booking_date == now.date() else 0
+    bitmap = SeatAvailabilityIndex(library_id, booking_date).get_bitmap(seat_id)
+    freed_first = max(time_to_slot(start_time), not_before)
+    freed_last = time_to_slot(end_time, round_up=True)
+    runs = [
+        (max(first, not_before), last) for first, last in free_runs(bitmap)
+        if first < freed_last and last > freed_first and last > not_before
+    ]
+    if not runs:
+        return None
+
+    seat = Seat.objects.select_related('library__configuration').get(pk=seat_id)
+    library_config = seat.library.configuration
+    if not seat.is_available or not library_config.enable_waitlist:
+        return None
+    auto_book = library_config.auto_book_from_waitlist
+
+    for first_slot, last_slot in runs:
+        for entry_id, offer_start, offer_end in waitlist.candidates(first_slot, last_slot):
+            # Claim the entry so concurrent matchers cannot serve it twice
+            now = timezone.now()
+            claimed = SeatBookingWaitlist.objects.filter(
+                id=entry_id,
+                is_active=True,
+                notified_at__isnull=True
+            ).update(notified_at=now, is_active=not auto_book, updated_at=now)
+            if not claimed:
+                continue
+
+            entry = SeatBookingWaitlist.objects.select_related('user').get(id=entry_id)
+            window = (slot_to_time(offer_start), slot_to_time(offer_end))
+            waitlist.invalidate()
+
+            if auto_book:
+                # Booking on the user's behalf is subject to the same limits as booking directly
+                can_book, _ = seat.can_user_book(entry.user, window[0], window[1], booking_date)
+                if can_book:
+                    try:
+                        SeatBooking.objects.create_booking(
+                            seat=seat,
+                            booking_date=booking_date,
+                            start_time=window[0],
+                            end_time=window[1],
+                            user=entry.user,
+                            created_by=entry.user,
+                            notes='Booked from waitlist'
+                        )
+                    except BookingConflictError:
+                        can_book = False
+                if not can_book:
+                    # Over a limit or lost the window to another booking; keep the request waiting
+                    SeatBookingWaitlist.objects.filter(id=entry_id).update(
+                        notified_at=None, is_active=True
+                    )
+                    continue
+
+            _notify_waitlist_user(entry, seat, window, auto_book)
+            return entry
+
+    return None
+
+
+def schedule_waitlist_match(library_id, seat_id, booking_date, start_time, end_time):
+    """Queue waitlist matching for a freed window once the current transaction commits"""
+    from django.db import transaction
+    from .tasks import match_seat_waitlist
+
+    if not WaitlistIndex(seat_id, booking_date).get_entries():
+        return
+
+    transaction.on_commit(lambda: match_seat_waitlist.delay(
+        str(library_id), str(seat_id), booking_date.isoformat(),
+        start_time.isoformat(), end_time.isoformat()
+    ))
+
+
+def _notify_waitlist_user(entry, seat, window, booked):
+    """Tell a waiting user about the seat that became available"""
+    from apps.core.utils import send_notification_email
+
+    if booked:
+        subject = "Smart Lib - Seat Booked From Waitlist"
+        action = "We have booked it for you."
+    else:
+        subject = "Smart Lib - Seat Available!"
+        action = "Please book it soon as it may be taken by others."
+
+    message = f"""
+    Dear {entry.user.get_full_name()},
+
+    Great news! The seat you were waiting for is now available:
+
+    Seat: {seat.seat_number}
+    Library: {seat.library.name}
+    Date: {entry.booking_date}
+    Time: {window[0]} - {window[1]}
+
+    {action}
+
+    Best regards,
+    Smart Lib Team
+    """
+
+    send_notification_email(
+        to_email=entry.user.email,
+        subject=subject,
+        message=message
+    )
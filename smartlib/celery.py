@@ -23,14 +23,46 @@ app.conf.beat_schedule = {
         'task': 'apps.seats.tasks.process_expired_bookings',
         'schedule': 60.0,  # Run every minute
     },
-    'send-booking-reminders': {
-        'task': 'apps.notifications.tasks.send_booking_reminders',
-        'schedule': 300.0,  # Run every 5 minutes
+    'flush-buffered-counters': {
+        'task': 'apps.core.tasks.flush_buffered_counters',
+        'schedule': 10.0,  # Run every 10 seconds
+    },
+    'reconcile-seat-counters': {
+        'task': 'apps.seats.tasks.reconcile_seat_counters',
+        'schedule': 3600.0,  # Run every hour
+    },
+    'reconcile-book-counters': {
+        'task': 'apps.books.tasks.reconcile_book_counters',
+        'schedule': 3600.0,  # Run every hour
+    },
+    'rebuild-book-search-index': {
+        'task': 'apps.books.tasks.rebuild_book_search_index',
+        'schedule': 86400.0,  # Run daily
+    },
+    'build-book-autocomplete-snapshot': {
+        'task': 'apps.books.tasks.build_book_autocomplete_snapshot',
+        'schedule': 3600.0,  # Run every hour
     },
-    'send-due-date-reminders': {
-        'task': 'apps.notifications.tasks.send_due_date_reminders',
+    'reconcile-event-counters': {
+        'task': 'apps.events.tasks.reconcile_event_counters',
         'schedule': 3600.0,  # Run every hour
     },
+    'train-no-show-model': {
+        'task': 'apps.seats.tasks.train_no_show_model',
+        'schedule': 86400.0,  # Run daily
+    },
+    'reconcile-occupancy-counters': {
+        'task': 'apps.library.tasks.reconcile_occupancy_counters',
+        'schedule': 300.0,  # Run every 5 minutes
+    },
+    'build-occupancy-series': {
+        'task': 'apps.seats.tasks.build_daily_occupancy_series',
+        'schedule': 900.0,  # Run every 15 minutes
+    },
+    'dispatch-due-reminders': {
+        'task': 'apps.notifications.tasks.dispatch_due_reminders',
+        'schedule': 60.0,  # Run every minute
+    },
     'clean-old-notifications': {
         'task': 'apps.notifications.tasks.clean_old_notifications',
         'schedule': 86400.0,  # Run daily
@@ -90,6 +90,17 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts so concurrent
+            # writers queue for it instead of failing with "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # Shared-cache in-memory databases fail on lock contention instead of
+        # waiting, so tests run against a file like the real database
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -264,6 +275,8 @@ SMART_LIB_SETTINGS = {
     'MAX_ACTIVE_SEAT_BOOKINGS': 1,
     'MAX_ACTIVE_BOOK_RESERVATIONS': 5,
     'NOTIFICATION_REMINDER_HOURS': [24, 2],  # Hours before expiry to send reminders
+    # Prebuilt autocomplete index loaded at start-up; empty builds it from the database
+    'BOOK_AUTOCOMPLETE_SNAPSHOT': config('BOOK_AUTOCOMPLETE_SNAPSHOT', default=''),
 }
 
 # Cache Configuration